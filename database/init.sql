@@ -1,37 +1,70 @@
 -- Database initialization script for Event Platform
 -- This script creates the necessary tables for user analytics and chemical research
 
--- Enable UUID extension
-CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
+-- Time-ordered UUIDv7 keys (RFC 9562): a millisecond Unix timestamp followed
+-- by random bits. New rows append at the right edge of the primary key index
+-- instead of splitting random pages. The subscriber mints the same layout in
+-- Python (app/infrastructure/ids.py).
+CREATE OR REPLACE FUNCTION uuid_generate_v7() RETURNS uuid AS $$
+    SELECT encode(
+        set_bit(set_bit(
+            overlay(uuid_send(gen_random_uuid())
+                    PLACING substring(int8send(floor(extract(epoch FROM clock_timestamp()) * 1000)::bigint) FROM 3)
+                    FROM 1 FOR 6),
+            52, 1), 53, 1),
+        'hex')::uuid
+$$ LANGUAGE sql VOLATILE;
+
+-- Event tables are range-partitioned by timestamp. Daily or monthly child
+-- partitions are pre-created and expired by the subscriber's partition
+-- maintenance task; rows outside any managed range land in the default
+-- partition. The partition key must be part of the primary key.
 
 -- User Analytics Events table
 CREATE TABLE IF NOT EXISTS user_analytics_events (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    id UUID NOT NULL DEFAULT uuid_generate_v7(),
     user_id VARCHAR(255) NOT NULL,
     event_type VARCHAR(100) NOT NULL,
+    page_url TEXT,
+    user_agent TEXT,
+    session_id VARCHAR(255),
     timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
     metadata JSONB,
+    processed BOOLEAN DEFAULT FALSE,
     processed_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
-);
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+CREATE TABLE IF NOT EXISTS user_analytics_events_default
+    PARTITION OF user_analytics_events DEFAULT;
 
 -- Chemical Research Events table
 CREATE TABLE IF NOT EXISTS chemical_research_events (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    id UUID NOT NULL DEFAULT uuid_generate_v7(),
     molecule_id VARCHAR(255) NOT NULL,
     researcher VARCHAR(255) NOT NULL,
+    experiment_type VARCHAR(100),
     data JSONB NOT NULL,
+    properties JSONB,
+    results JSONB,
     timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
+    metadata JSONB,
     llm_properties JSONB, -- Extracted properties from LLM
+    processed BOOLEAN DEFAULT FALSE,
     processed_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
-);
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+CREATE TABLE IF NOT EXISTS chemical_research_events_default
+    PARTITION OF chemical_research_events DEFAULT;
 
 -- Event Processing Status table (for tracking processing state)
 CREATE TABLE IF NOT EXISTS event_processing_status (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v7(),
     event_id UUID NOT NULL,
     event_type VARCHAR(50) NOT NULL,
     status VARCHAR(50) NOT NULL DEFAULT 'pending', -- pending, processing, completed, failed
@@ -42,15 +75,165 @@ CREATE TABLE IF NOT EXISTS event_processing_status (
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+-- Summary rollups, upserted at ingest by the same statement that inserts the
+-- events, so the analytics summaries read exact totals without scanning events
+CREATE TABLE IF NOT EXISTS user_event_rollups (
+    user_id VARCHAR(255) NOT NULL,
+    event_type VARCHAR(100) NOT NULL,
+    event_count BIGINT NOT NULL DEFAULT 0,
+    first_seen TIMESTAMP WITH TIME ZONE NOT NULL,
+    last_seen TIMESTAMP WITH TIME ZONE NOT NULL,
+    PRIMARY KEY (user_id, event_type)
+);
+
+CREATE TABLE IF NOT EXISTS researcher_rollups (
+    researcher VARCHAR(255) PRIMARY KEY,
+    experiment_count BIGINT NOT NULL DEFAULT 0,
+    first_seen TIMESTAMP WITH TIME ZONE NOT NULL,
+    last_seen TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS researcher_molecules (
+    researcher VARCHAR(255) NOT NULL,
+    molecule_id VARCHAR(255) NOT NULL,
+    experiment_count BIGINT NOT NULL DEFAULT 0,
+    first_seen TIMESTAMP WITH TIME ZONE NOT NULL,
+    last_seen TIMESTAMP WITH TIME ZONE NOT NULL,
+    PRIMARY KEY (researcher, molecule_id)
+);
+
+-- Activity histogram buckets: event counts per user, event type or researcher
+-- and per minute, hour or day, upserted by the ingest statement like the
+-- rollups. Coverage rows mark where complete buckets start when they do not
+-- go back to the first event (see migrations/002_activity_buckets.sql and
+-- the per-minute bucket retention); earlier ranges are counted from events.
+CREATE TABLE IF NOT EXISTS activity_buckets (
+    dimension VARCHAR(20) NOT NULL,
+    subject VARCHAR(255) NOT NULL,
+    granularity VARCHAR(10) NOT NULL,
+    bucket_start TIMESTAMP WITH TIME ZONE NOT NULL,
+    event_count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (dimension, subject, granularity, bucket_start)
+);
+
+CREATE TABLE IF NOT EXISTS activity_bucket_coverage (
+    dimension VARCHAR(20) NOT NULL,
+    granularity VARCHAR(10) NOT NULL,
+    covered_from TIMESTAMP WITH TIME ZONE NOT NULL,
+    PRIMARY KEY (dimension, granularity)
+);
+
+-- HyperLogLog sketches for approximate distinct counts (users per event
+-- type, molecules per researcher, researchers per molecule), one per subject
+-- and UTC day. registers holds 4096 one-byte registers; ingest raises single
+-- registers with set_byte and readers merge days by register-wise maximum.
+CREATE TABLE IF NOT EXISTS distinct_sketches (
+    dimension VARCHAR(20) NOT NULL,
+    subject VARCHAR(255) NOT NULL,
+    day DATE NOT NULL,
+    registers BYTEA NOT NULL,
+    PRIMARY KEY (dimension, subject, day)
+);
+
+-- Top-K heavy hitters (most active users, most viewed pages, most studied
+-- molecules) per UTC day. Workers add their Space-Saving counts and trim
+-- each day back to its heaviest items; top_k_windows.floor is the largest
+-- count trimmed so far, which items arriving later start from.
+CREATE TABLE IF NOT EXISTS top_k_items (
+    dimension VARCHAR(20) NOT NULL,
+    day DATE NOT NULL,
+    item TEXT NOT NULL,
+    event_count BIGINT NOT NULL,
+    error BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (dimension, day, item)
+);
+
+CREATE TABLE IF NOT EXISTS top_k_windows (
+    dimension VARCHAR(20) NOT NULL,
+    day DATE NOT NULL,
+    floor BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (dimension, day)
+);
+
+-- Sessions of user analytics events, written incrementally by the worker
+-- sessionizers. session_id is NULL for sessions inferred from the
+-- inactivity gap; named sessions merge on (user_id, session_id).
+CREATE TABLE IF NOT EXISTS user_sessions (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v7(),
+    user_id VARCHAR(255) NOT NULL,
+    session_id VARCHAR(255),
+    started_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    ended_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    event_count BIGINT NOT NULL DEFAULT 0,
+    page_count BIGINT NOT NULL DEFAULT 0,
+    entry_page TEXT,
+    exit_page TEXT,
+    user_agent TEXT
+);
+
+-- Parquet files in the cold archive, one per day and event type. Archival
+-- deletes the rows and records the file in one transaction, so this table is
+-- the source of truth for which history lives outside Postgres.
+CREATE TABLE IF NOT EXISTS archive_manifest (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v7(),
+    dataset VARCHAR(100) NOT NULL,
+    day DATE NOT NULL,
+    event_type VARCHAR(100),
+    path TEXT NOT NULL,
+    row_count BIGINT NOT NULL,
+    min_timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
+    max_timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- LLM-extracted chemical properties keyed by a hash of the data payload,
+-- prompt and model version, shared by every worker until they expire
+CREATE TABLE IF NOT EXISTS llm_property_cache (
+    cache_key VARCHAR(64) PRIMARY KEY,
+    model_version VARCHAR(100) NOT NULL,
+    properties JSONB NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
 -- Indexes for better performance
-CREATE INDEX IF NOT EXISTS idx_user_analytics_user_id ON user_analytics_events(user_id);
+-- The per-user / per-researcher reads filter on the owner and return the
+-- newest rows first; the composite indexes match that ORDER BY exactly and
+-- INCLUDE the columns the summaries aggregate. They also replace the old
+-- single-column user_id / researcher indexes, which are their prefixes.
+CREATE INDEX IF NOT EXISTS idx_user_analytics_user_timestamp
+    ON user_analytics_events (user_id, timestamp DESC, id DESC) INCLUDE (event_type);
 CREATE INDEX IF NOT EXISTS idx_user_analytics_event_type ON user_analytics_events(event_type);
 CREATE INDEX IF NOT EXISTS idx_user_analytics_timestamp ON user_analytics_events(timestamp);
 
+CREATE INDEX IF NOT EXISTS idx_chemical_research_researcher_timestamp
+    ON chemical_research_events (researcher, timestamp DESC, id DESC) INCLUDE (molecule_id);
 CREATE INDEX IF NOT EXISTS idx_chemical_research_molecule_id ON chemical_research_events(molecule_id);
-CREATE INDEX IF NOT EXISTS idx_chemical_research_researcher ON chemical_research_events(researcher);
 CREATE INDEX IF NOT EXISTS idx_chemical_research_timestamp ON chemical_research_events(timestamp);
 
+-- GIN indexes for the JSONB filters on the event endpoints; jsonb_path_ops
+-- serves containment (@>) and jsonpath (@?) predicates
+CREATE INDEX IF NOT EXISTS idx_user_analytics_metadata
+    ON user_analytics_events USING GIN (metadata jsonb_path_ops);
+CREATE INDEX IF NOT EXISTS idx_chemical_research_data
+    ON chemical_research_events USING GIN (data jsonb_path_ops);
+CREATE INDEX IF NOT EXISTS idx_chemical_research_llm_properties
+    ON chemical_research_events USING GIN (llm_properties jsonb_path_ops);
+
+-- Serves the per-minute bucket retention delete
+CREATE INDEX IF NOT EXISTS idx_activity_buckets_granularity_start
+    ON activity_buckets (granularity, bucket_start);
+
+CREATE INDEX IF NOT EXISTS idx_archive_manifest_dataset_max_timestamp
+    ON archive_manifest (dataset, max_timestamp DESC);
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_user_sessions_user_session
+    ON user_sessions (user_id, session_id);
+CREATE INDEX IF NOT EXISTS idx_user_sessions_user_started_at
+    ON user_sessions (user_id, started_at DESC);
+
+CREATE INDEX IF NOT EXISTS idx_llm_property_cache_expires_at ON llm_property_cache(expires_at);
+
 CREATE INDEX IF NOT EXISTS idx_event_processing_status ON event_processing_status(status);
 CREATE INDEX IF NOT EXISTS idx_event_processing_event_id ON event_processing_status(event_id);
 
@@ -85,3 +268,23 @@ INSERT INTO chemical_research_events (molecule_id, researcher, data, timestamp)
 ('mol_h2o', 'Dr. Smith', '{"formula": "H2O", "weight": 18.015, "state": "liquid"}', '2024-01-01T09:00:00Z'),
 ('mol_nacl', 'Dr. Johnson', '{"formula": "NaCl", "weight": 58.44, "state": "solid"}', '2024-01-01T09:30:00Z'),
 ('mol_co2', 'Dr. Smith', '{"formula": "CO2", "weight": 44.01, "state": "gas"}', '2024-01-01T10:00:00Z');
+
+-- Build the rollups from rows that were not written by the subscriber
+-- (sample data above, or events loaded before the rollups existed)
+INSERT INTO user_event_rollups (user_id, event_type, event_count, first_seen, last_seen)
+SELECT user_id, event_type, COUNT(*), MIN(timestamp), MAX(timestamp)
+FROM user_analytics_events
+GROUP BY user_id, event_type
+ON CONFLICT (user_id, event_type) DO NOTHING;
+
+INSERT INTO researcher_rollups (researcher, experiment_count, first_seen, last_seen)
+SELECT researcher, COUNT(*), MIN(timestamp), MAX(timestamp)
+FROM chemical_research_events
+GROUP BY researcher
+ON CONFLICT (researcher) DO NOTHING;
+
+INSERT INTO researcher_molecules (researcher, molecule_id, experiment_count, first_seen, last_seen)
+SELECT researcher, molecule_id, COUNT(*), MIN(timestamp), MAX(timestamp)
+FROM chemical_research_events
+GROUP BY researcher, molecule_id
+ON CONFLICT (researcher, molecule_id) DO NOTHING;
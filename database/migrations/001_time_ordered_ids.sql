@@ -0,0 +1,45 @@
+-- Migrate an existing database from random (v4) to time-ordered (v7) UUID keys.
+--
+-- Safe to run on a live database and to re-run. Existing rows keep their
+-- ids: they are referenced by event_processing_status.event_id, by API
+-- cursors and by downstream consumers, and rewriting a primary key rewrites
+-- every index on the table. The column type stays UUID, so v4 and v7 ids
+-- coexist without any application change.
+--
+-- Only new rows get v7 ids, whether minted by the subscriber or by these
+-- defaults. On a database whose event tables are not partitioned yet,
+-- migration 007 partitions them later in this sequence; either way, the
+-- event partitions that partition maintenance creates after this migration
+-- hold only time-ordered keys. Older partitions, holding the random keys,
+-- age out through partition retention or cold archival, and step 3
+-- compacts their bloated indexes in the meantime.
+
+-- 1. Server-side generator (same definition as database/init.sql)
+CREATE OR REPLACE FUNCTION uuid_generate_v7() RETURNS uuid AS $$
+    SELECT encode(
+        set_bit(set_bit(
+            overlay(uuid_send(gen_random_uuid())
+                    PLACING substring(int8send(floor(extract(epoch FROM clock_timestamp()) * 1000)::bigint) FROM 3)
+                    FROM 1 FOR 6),
+            52, 1), 53, 1),
+        'hex')::uuid
+$$ LANGUAGE sql VOLATILE;
+
+-- 2. Column defaults (metadata-only changes; partitions inherit them)
+ALTER TABLE user_analytics_events ALTER COLUMN id SET DEFAULT uuid_generate_v7();
+ALTER TABLE chemical_research_events ALTER COLUMN id SET DEFAULT uuid_generate_v7();
+ALTER TABLE event_processing_status ALTER COLUMN id SET DEFAULT uuid_generate_v7();
+ALTER TABLE IF EXISTS archive_manifest ALTER COLUMN id SET DEFAULT uuid_generate_v7();
+
+-- 3. Optional: rebuild primary key indexes that random inserts left half
+--    empty, without blocking writes. Skip it for event tables that are not
+--    partitioned yet: migration 007 rebuilds their indexes as it copies the
+--    rows. REINDEX CONCURRENTLY cannot run inside a transaction block and
+--    works per partition, so run it outside psql -1, e.g. for each partition
+--    listed by
+--        SELECT inhrelid::regclass FROM pg_inherits
+--        WHERE inhparent IN ('user_analytics_events'::regclass, 'chemical_research_events'::regclass);
+--    run
+--        REINDEX TABLE CONCURRENTLY <partition>;
+--    and
+--        REINDEX TABLE CONCURRENTLY event_processing_status;
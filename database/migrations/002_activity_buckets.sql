@@ -0,0 +1,33 @@
+-- Add the activity histogram buckets to an existing database.
+--
+-- Run immediately before deploying the subscriber version that maintains
+-- them. Buckets only count events ingested from then on, so coverage rows
+-- mark the next UTC midnight as the start of complete buckets: histograms
+-- over earlier ranges are counted from the event rows (and the cold
+-- archive) with date_trunc, later ranges are read from the buckets.
+-- Re-running is harmless.
+
+CREATE TABLE IF NOT EXISTS activity_buckets (
+    dimension VARCHAR(20) NOT NULL,
+    subject VARCHAR(255) NOT NULL,
+    granularity VARCHAR(10) NOT NULL,
+    bucket_start TIMESTAMP WITH TIME ZONE NOT NULL,
+    event_count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (dimension, subject, granularity, bucket_start)
+);
+
+CREATE TABLE IF NOT EXISTS activity_bucket_coverage (
+    dimension VARCHAR(20) NOT NULL,
+    granularity VARCHAR(10) NOT NULL,
+    covered_from TIMESTAMP WITH TIME ZONE NOT NULL,
+    PRIMARY KEY (dimension, granularity)
+);
+
+CREATE INDEX IF NOT EXISTS idx_activity_buckets_granularity_start
+    ON activity_buckets (granularity, bucket_start);
+
+INSERT INTO activity_bucket_coverage (dimension, granularity, covered_from)
+SELECT dimension, granularity, date_trunc('day', now(), 'UTC') + interval '1 day'
+FROM unnest(ARRAY['user', 'event_type', 'researcher']) AS dimension,
+     unnest(ARRAY['minute', 'hour', 'day']) AS granularity
+ON CONFLICT (dimension, granularity) DO NOTHING;
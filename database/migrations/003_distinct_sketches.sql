@@ -0,0 +1,15 @@
+-- Add the HyperLogLog sketches for approximate distinct counts to an
+-- existing database.
+--
+-- Run before deploying the subscriber version that maintains them. Sketches
+-- only see events ingested from then on, so distinct counts over earlier
+-- days read as zero or undercount until those days have passed. Re-running
+-- is harmless.
+
+CREATE TABLE IF NOT EXISTS distinct_sketches (
+    dimension VARCHAR(20) NOT NULL,
+    subject VARCHAR(255) NOT NULL,
+    day DATE NOT NULL,
+    registers BYTEA NOT NULL,
+    PRIMARY KEY (dimension, subject, day)
+);
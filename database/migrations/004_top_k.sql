@@ -0,0 +1,20 @@
+-- Add the top-K heavy-hitter tables to an existing database.
+--
+-- Run before deploying the subscriber version that maintains them. Counts
+-- start with the events ingested from then on. Re-running is harmless.
+
+CREATE TABLE IF NOT EXISTS top_k_items (
+    dimension VARCHAR(20) NOT NULL,
+    day DATE NOT NULL,
+    item TEXT NOT NULL,
+    event_count BIGINT NOT NULL,
+    error BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (dimension, day, item)
+);
+
+CREATE TABLE IF NOT EXISTS top_k_windows (
+    dimension VARCHAR(20) NOT NULL,
+    day DATE NOT NULL,
+    floor BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (dimension, day)
+);
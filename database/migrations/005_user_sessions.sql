@@ -0,0 +1,23 @@
+-- Add the user_sessions table to an existing database.
+--
+-- Run before deploying the subscriber version that sessionizes events.
+-- Sessions start with the events ingested from then on; earlier events are
+-- not sessionized. Re-running is harmless.
+
+CREATE TABLE IF NOT EXISTS user_sessions (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v7(),
+    user_id VARCHAR(255) NOT NULL,
+    session_id VARCHAR(255),
+    started_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    ended_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    event_count BIGINT NOT NULL DEFAULT 0,
+    page_count BIGINT NOT NULL DEFAULT 0,
+    entry_page TEXT,
+    exit_page TEXT,
+    user_agent TEXT
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_user_sessions_user_session
+    ON user_sessions (user_id, session_id);
+CREATE INDEX IF NOT EXISTS idx_user_sessions_user_started_at
+    ON user_sessions (user_id, started_at DESC);
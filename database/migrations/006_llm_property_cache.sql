@@ -0,0 +1,15 @@
+-- Add the llm_property_cache table to an existing database.
+--
+-- Run before deploying the subscriber version that caches LLM chemical
+-- property extraction. The cache starts empty. Re-running is harmless.
+
+CREATE TABLE IF NOT EXISTS llm_property_cache (
+    cache_key VARCHAR(64) PRIMARY KEY,
+    model_version VARCHAR(100) NOT NULL,
+    properties JSONB NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_llm_property_cache_expires_at
+    ON llm_property_cache (expires_at);
@@ -0,0 +1,140 @@
+-- Convert the event tables of an existing database to range partitions.
+--
+-- Databases created before the event tables were partitioned hold them as
+-- plain tables keyed on id alone; partition maintenance cannot attach
+-- partitions to them. Run in a single transaction (psql -1 -f) with the
+-- subscribers and the API stopped: each table is renamed, recreated as a
+-- partitioned table keyed on (id, timestamp) with a default partition, and
+-- its rows are copied into one partition per calendar month they cover.
+-- Partition maintenance keeps those monthly partitions and creates its own
+-- interval after the last of them. Re-running is harmless: tables that are
+-- already partitioned are left alone. The recreated tables mint ids with
+-- uuid_generate_v7() from migration 001, which must have run first.
+
+DO $$
+DECLARE
+    month TIMESTAMP;
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = 'user_analytics_events'::regclass) = 'p' THEN
+        RETURN;
+    END IF;
+
+    ALTER TABLE user_analytics_events RENAME TO user_analytics_events_unpartitioned;
+    ALTER TABLE user_analytics_events_unpartitioned RENAME CONSTRAINT user_analytics_events_pkey TO user_analytics_events_unpartitioned_pkey;
+    DROP TRIGGER IF EXISTS update_user_analytics_events_updated_at ON user_analytics_events_unpartitioned;
+
+    CREATE TABLE user_analytics_events (
+        id UUID NOT NULL DEFAULT uuid_generate_v7(),
+        user_id VARCHAR(255) NOT NULL,
+        event_type VARCHAR(100) NOT NULL,
+        page_url TEXT,
+        user_agent TEXT,
+        session_id VARCHAR(255),
+        timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
+        metadata JSONB,
+        processed BOOLEAN DEFAULT FALSE,
+        processed_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+        updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+        PRIMARY KEY (id, timestamp)
+    ) PARTITION BY RANGE (timestamp);
+
+    CREATE TABLE user_analytics_events_default PARTITION OF user_analytics_events DEFAULT;
+
+    FOR month IN
+        SELECT DISTINCT date_trunc('month', timestamp AT TIME ZONE 'UTC')
+        FROM user_analytics_events_unpartitioned
+    LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF user_analytics_events FOR VALUES FROM (%L) TO (%L)',
+            'user_analytics_events_p' || to_char(month, 'YYYYMM'),
+            month AT TIME ZONE 'UTC',
+            (month + interval '1 month') AT TIME ZONE 'UTC'
+        );
+    END LOOP;
+
+    INSERT INTO user_analytics_events (
+        id, user_id, event_type, page_url, user_agent, session_id, timestamp,
+        metadata, processed, processed_at, created_at, updated_at
+    )
+    SELECT id, user_id, event_type, page_url, user_agent, session_id, timestamp,
+           metadata, processed, processed_at, created_at, updated_at
+    FROM user_analytics_events_unpartitioned;
+
+    DROP TABLE user_analytics_events_unpartitioned;
+
+    CREATE TRIGGER update_user_analytics_events_updated_at
+        BEFORE UPDATE ON user_analytics_events
+        FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+END $$;
+
+DO $$
+DECLARE
+    month TIMESTAMP;
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = 'chemical_research_events'::regclass) = 'p' THEN
+        RETURN;
+    END IF;
+
+    ALTER TABLE chemical_research_events RENAME TO chemical_research_events_unpartitioned;
+    ALTER TABLE chemical_research_events_unpartitioned RENAME CONSTRAINT chemical_research_events_pkey TO chemical_research_events_unpartitioned_pkey;
+    DROP TRIGGER IF EXISTS update_chemical_research_events_updated_at ON chemical_research_events_unpartitioned;
+
+    CREATE TABLE chemical_research_events (
+        id UUID NOT NULL DEFAULT uuid_generate_v7(),
+        molecule_id VARCHAR(255) NOT NULL,
+        researcher VARCHAR(255) NOT NULL,
+        experiment_type VARCHAR(100),
+        data JSONB NOT NULL,
+        properties JSONB,
+        results JSONB,
+        timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
+        metadata JSONB,
+        llm_properties JSONB,
+        processed BOOLEAN DEFAULT FALSE,
+        processed_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+        updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+        PRIMARY KEY (id, timestamp)
+    ) PARTITION BY RANGE (timestamp);
+
+    CREATE TABLE chemical_research_events_default PARTITION OF chemical_research_events DEFAULT;
+
+    FOR month IN
+        SELECT DISTINCT date_trunc('month', timestamp AT TIME ZONE 'UTC')
+        FROM chemical_research_events_unpartitioned
+    LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF chemical_research_events FOR VALUES FROM (%L) TO (%L)',
+            'chemical_research_events_p' || to_char(month, 'YYYYMM'),
+            month AT TIME ZONE 'UTC',
+            (month + interval '1 month') AT TIME ZONE 'UTC'
+        );
+    END LOOP;
+
+    INSERT INTO chemical_research_events (
+        id, molecule_id, researcher, experiment_type, data, properties, results,
+        timestamp, metadata, llm_properties, processed, processed_at, created_at, updated_at
+    )
+    SELECT id, molecule_id, researcher, experiment_type, data, properties, results,
+           timestamp, metadata, llm_properties, processed, processed_at, created_at, updated_at
+    FROM chemical_research_events_unpartitioned;
+
+    DROP TABLE chemical_research_events_unpartitioned;
+
+    CREATE TRIGGER update_chemical_research_events_updated_at
+        BEFORE UPDATE ON chemical_research_events
+        FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+END $$;
+
+-- The indexes of the partitioned tables (as in database/init.sql), built
+-- after the copy and inherited by every partition
+CREATE INDEX IF NOT EXISTS idx_user_analytics_user_timestamp
+    ON user_analytics_events (user_id, timestamp DESC, id DESC) INCLUDE (event_type);
+CREATE INDEX IF NOT EXISTS idx_user_analytics_event_type ON user_analytics_events(event_type);
+CREATE INDEX IF NOT EXISTS idx_user_analytics_timestamp ON user_analytics_events(timestamp);
+
+CREATE INDEX IF NOT EXISTS idx_chemical_research_researcher_timestamp
+    ON chemical_research_events (researcher, timestamp DESC, id DESC) INCLUDE (molecule_id);
+CREATE INDEX IF NOT EXISTS idx_chemical_research_molecule_id ON chemical_research_events(molecule_id);
+CREATE INDEX IF NOT EXISTS idx_chemical_research_timestamp ON chemical_research_events(timestamp);
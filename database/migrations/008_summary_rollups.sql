@@ -0,0 +1,50 @@
+-- Add the summary rollups to an existing database.
+--
+-- Run with the subscribers stopped, immediately before deploying the
+-- subscriber version that maintains them: the rollups are built from the
+-- event rows stored so far, and events stored by an older subscriber after
+-- that would be missing from them. Re-running is harmless; rollups that
+-- already exist are left as they are.
+
+CREATE TABLE IF NOT EXISTS user_event_rollups (
+    user_id VARCHAR(255) NOT NULL,
+    event_type VARCHAR(100) NOT NULL,
+    event_count BIGINT NOT NULL DEFAULT 0,
+    first_seen TIMESTAMP WITH TIME ZONE NOT NULL,
+    last_seen TIMESTAMP WITH TIME ZONE NOT NULL,
+    PRIMARY KEY (user_id, event_type)
+);
+
+CREATE TABLE IF NOT EXISTS researcher_rollups (
+    researcher VARCHAR(255) PRIMARY KEY,
+    experiment_count BIGINT NOT NULL DEFAULT 0,
+    first_seen TIMESTAMP WITH TIME ZONE NOT NULL,
+    last_seen TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS researcher_molecules (
+    researcher VARCHAR(255) NOT NULL,
+    molecule_id VARCHAR(255) NOT NULL,
+    experiment_count BIGINT NOT NULL DEFAULT 0,
+    first_seen TIMESTAMP WITH TIME ZONE NOT NULL,
+    last_seen TIMESTAMP WITH TIME ZONE NOT NULL,
+    PRIMARY KEY (researcher, molecule_id)
+);
+
+INSERT INTO user_event_rollups (user_id, event_type, event_count, first_seen, last_seen)
+SELECT user_id, event_type, COUNT(*), MIN(timestamp), MAX(timestamp)
+FROM user_analytics_events
+GROUP BY user_id, event_type
+ON CONFLICT (user_id, event_type) DO NOTHING;
+
+INSERT INTO researcher_rollups (researcher, experiment_count, first_seen, last_seen)
+SELECT researcher, COUNT(*), MIN(timestamp), MAX(timestamp)
+FROM chemical_research_events
+GROUP BY researcher
+ON CONFLICT (researcher) DO NOTHING;
+
+INSERT INTO researcher_molecules (researcher, molecule_id, experiment_count, first_seen, last_seen)
+SELECT researcher, molecule_id, COUNT(*), MIN(timestamp), MAX(timestamp)
+FROM chemical_research_events
+GROUP BY researcher, molecule_id
+ON CONFLICT (researcher, molecule_id) DO NOTHING;
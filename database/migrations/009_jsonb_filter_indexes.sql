@@ -0,0 +1,14 @@
+-- Add the GIN indexes of the JSONB filters to an existing database.
+--
+-- Run before deploying the subscriber version that accepts metadata, data
+-- and llm_properties filters; without them the filters scan every event
+-- row. An index on a partitioned table is built on each partition in turn
+-- and blocks writes to it meanwhile, so run it at a quiet time. Re-running
+-- is harmless.
+
+CREATE INDEX IF NOT EXISTS idx_user_analytics_metadata
+    ON user_analytics_events USING GIN (metadata jsonb_path_ops);
+CREATE INDEX IF NOT EXISTS idx_chemical_research_data
+    ON chemical_research_events USING GIN (data jsonb_path_ops);
+CREATE INDEX IF NOT EXISTS idx_chemical_research_llm_properties
+    ON chemical_research_events USING GIN (llm_properties jsonb_path_ops);
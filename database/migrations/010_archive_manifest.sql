@@ -0,0 +1,20 @@
+-- Add the archive_manifest table to an existing database.
+--
+-- Run before enabling ARCHIVE_ENABLED on the subscriber version that
+-- archives old event days to Parquet; archival records its files here and
+-- reads look them up. It starts empty. Re-running is harmless.
+
+CREATE TABLE IF NOT EXISTS archive_manifest (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v7(),
+    dataset VARCHAR(100) NOT NULL,
+    day DATE NOT NULL,
+    event_type VARCHAR(100),
+    path TEXT NOT NULL,
+    row_count BIGINT NOT NULL,
+    min_timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
+    max_timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_archive_manifest_dataset_max_timestamp
+    ON archive_manifest (dataset, max_timestamp DESC);
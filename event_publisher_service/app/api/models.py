@@ -1,13 +1,19 @@
 from pydantic import BaseModel, Field
 from typing import Optional
+from uuid import UUID
+
+# event_id is optional: clients that retry a POST can send their own id so the
+# retry is recognised as the same event; otherwise the publisher assigns one.
 
 class UserAnalyticsEvent(BaseModel):
+    event_id: Optional[UUID] = None
     user_id: str
     event_type: str
     timestamp: str
     metadata: Optional[dict] = None
 
 class ChemicalResearchEvent(BaseModel):
+    event_id: Optional[UUID] = None
     molecule_id: str
     researcher: str
     data: dict
@@ -1,8 +1,10 @@
 from .models import UserAnalyticsEvent, ChemicalResearchEvent
+from app.infrastructure.ids import uuid7
 
 def transform_user_analytics_event(event: UserAnalyticsEvent) -> dict:
     return {
         "type": "user_analytics",
+        "event_id": str(event.event_id or uuid7()),
         "user_id": event.user_id,
         "event_type": event.event_type,
         "timestamp": event.timestamp,
@@ -12,6 +14,7 @@ def transform_user_analytics_event(event: UserAnalyticsEvent) -> dict:
 def transform_chemical_research_event(event: ChemicalResearchEvent) -> dict:
     return {
         "type": "chemical_research",
+        "event_id": str(event.event_id or uuid7()),
         "molecule_id": event.molecule_id,
         "researcher": event.researcher,
         "data": event.data,
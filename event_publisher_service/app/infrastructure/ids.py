@@ -0,0 +1,39 @@
+import os
+import threading
+import time
+from uuid import UUID
+
+# Event ids stamped at publish time. UUIDv7 (RFC 9562): a millisecond Unix
+# timestamp, a counter for ids minted in the same millisecond, then random
+# bits. Every delivery of an event carries the same id, which the subscriber
+# uses to drop duplicates, and the ids stay in time order as primary keys.
+# Same generator as event_subscriber_service/app/infrastructure/ids.py,
+# which mints ids for events published without one; change both together.
+
+_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+
+_MAX_COUNTER = 0xFFF
+
+def uuid7() -> UUID:
+    """New UUIDv7, strictly increasing within this process"""
+    global _last_ms, _counter
+    rand_b = int.from_bytes(os.urandom(8), 'big')
+    with _lock:
+        unix_ms = time.time_ns() // 1_000_000
+        if unix_ms > _last_ms:
+            _last_ms = unix_ms
+            _counter = int.from_bytes(os.urandom(2), 'big') & 0x7FF
+        else:
+            _counter += 1
+            if _counter > _MAX_COUNTER:
+                _last_ms += 1
+                _counter = 0
+        unix_ms, counter = _last_ms, _counter
+    value = (unix_ms & 0xFFFFFFFFFFFF) << 80
+    value |= 0x7 << 76
+    value |= counter << 64
+    value |= 0b10 << 62
+    value |= rand_b & 0x3FFFFFFFFFFFFFFF
+    return UUID(int=value)
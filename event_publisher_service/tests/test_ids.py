@@ -0,0 +1,31 @@
+from unittest.mock import patch
+from app.infrastructure.ids import uuid7
+
+class TestUuid7:
+
+    def test_sets_version_and_variant(self):
+        # Act
+        value = uuid7()
+
+        # Assert
+        assert value.version == 7
+        assert value.variant == "specified in RFC 4122"
+
+    def test_ids_strictly_increase(self):
+        # Act
+        values = [uuid7() for _ in range(10000)]
+
+        # Assert
+        assert values == sorted(values)
+        assert len(set(values)) == len(values)
+
+    def test_counter_overflow_advances_timestamp(self):
+        # Arrange
+        with patch("app.infrastructure.ids.time.time_ns", return_value=1_700_000_000_000 * 1_000_000):
+
+            # Act
+            values = [uuid7() for _ in range(5000)]
+
+        # Assert
+        assert values == sorted(values)
+        assert values[-1].int >> 80 > values[0].int >> 80
@@ -1,4 +1,5 @@
 import pytest
+from uuid import UUID
 from app.api.transformers import transform_user_analytics_event, transform_chemical_research_event
 from app.api.models import UserAnalyticsEvent, ChemicalResearchEvent
 
@@ -17,6 +18,7 @@ class TestTransformers:
         result = transform_user_analytics_event(event)
         
         # Assert
+        assert UUID(result.pop("event_id")).version == 7
         expected = {
             "type": "user_analytics",
             "user_id": "user_123",
@@ -38,6 +40,7 @@ class TestTransformers:
         result = transform_user_analytics_event(event)
         
         # Assert
+        assert UUID(result.pop("event_id")).version == 7
         expected = {
             "type": "user_analytics",
             "user_id": "user_123",
@@ -60,6 +63,7 @@ class TestTransformers:
         result = transform_chemical_research_event(event)
         
         # Assert
+        assert UUID(result.pop("event_id")).version == 7
         expected = {
             "type": "chemical_research",
             "molecule_id": "mol_123",
@@ -68,3 +72,35 @@ class TestTransformers:
             "timestamp": "2024-01-01T12:00:00Z"
         }
         assert result == expected
+
+    def test_transform_keeps_client_supplied_event_id(self):
+        # Arrange
+        event_id = UUID("0190c5f2-6d3a-7b1e-8f00-123456789abc")
+        event = UserAnalyticsEvent(
+            event_id=event_id,
+            user_id="user_123",
+            event_type="click",
+            timestamp="2024-01-01T12:00:00Z"
+        )
+        
+        # Act
+        result = transform_user_analytics_event(event)
+        
+        # Assert
+        assert result["event_id"] == str(event_id)
+
+    def test_transform_stamps_distinct_event_ids(self):
+        # Arrange
+        event = ChemicalResearchEvent(
+            molecule_id="mol_123",
+            researcher="Dr. Smith",
+            data={},
+            timestamp="2024-01-01T12:00:00Z"
+        )
+        
+        # Act
+        first = transform_chemical_research_event(event)
+        second = transform_chemical_research_event(event)
+        
+        # Assert
+        assert first["event_id"] != second["event_id"]
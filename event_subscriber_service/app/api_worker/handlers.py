@@ -1,11 +1,19 @@
 from celery import Celery
+from celery.signals import worker_process_shutdown
 import asyncio
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 from app.config.settings import settings
 from app.infrastructure.postgresql_repository import PostgreSQLRepository
-from app.infrastructure.llm_service import MockLLMService
+from app.infrastructure.llm_service import build_llm_service
+from app.infrastructure.llm_cache import build_llm_cache
+from app.infrastructure.partition_manager import PartitionManager
+from app.infrastructure.summary_cache import build_summary_cache
+from app.infrastructure.sketches import DistinctSketchWriter
+from app.infrastructure.heavy_hitters import TopKTracker
+from app.infrastructure.sessions import Sessionizer
+from app.infrastructure.live_hub import build_live_publisher
 from app.core.event_processing_service import EventProcessingService
 
 logger = logging.getLogger(__name__)
@@ -29,12 +37,110 @@ app.conf.update(
     task_max_retries=settings.MAX_RETRIES,
     task_acks_late=True,
     worker_prefetch_multiplier=1,
+    beat_schedule={
+        'maintain-event-partitions': {
+            'task': 'app.api_worker.handlers.maintain_partitions_task',
+            'schedule': settings.PARTITION_MAINTENANCE_INTERVAL,
+        },
+    },
 )
+if settings.ARCHIVE_ENABLED:
+    app.conf.beat_schedule['archive-cold-events'] = {
+        'task': 'app.api_worker.handlers.archive_events_task',
+        'schedule': settings.ARCHIVE_INTERVAL,
+    }
+if settings.LLM_CACHE_ENABLED:
+    app.conf.beat_schedule['prune-llm-property-cache'] = {
+        'task': 'app.api_worker.handlers.prune_llm_cache_task',
+        'schedule': settings.LLM_CACHE_PRUNE_INTERVAL,
+    }
+if settings.HISTOGRAM_MINUTE_RETENTION_DAYS is not None:
+    app.conf.beat_schedule['prune-activity-buckets'] = {
+        'task': 'app.api_worker.handlers.prune_activity_buckets_task',
+        'schedule': settings.HISTOGRAM_MAINTENANCE_INTERVAL,
+    }
 
 # Initialize services (will be used by tasks)
 database_repo = PostgreSQLRepository()
-llm_service = MockLLMService()
-event_processing_service = EventProcessingService(database_repo, llm_service)
+# Keeps its pooled HTTP connections for the life of the worker process
+llm_service = build_llm_service(settings)
+# Identical data payloads are extracted once and shared by every worker
+llm_cache = build_llm_cache(settings, llm_service, database_repo)
+# Ingest only invalidates the cache; the API processes read through it
+summary_cache = build_summary_cache(settings)
+sketch_writer = DistinctSketchWriter(database_repo, settings.SKETCH_REGISTER_CACHE_SIZE)
+top_k_tracker = TopKTracker(
+    database_repo,
+    capacity=settings.TOP_K_CAPACITY,
+    checkpoint_interval=settings.TOP_K_CHECKPOINT_INTERVAL,
+    checkpoint_events=settings.TOP_K_CHECKPOINT_EVENTS
+)
+sessionizer = Sessionizer(
+    database_repo,
+    inactivity_gap=settings.SESSION_INACTIVITY_GAP,
+    max_open=settings.SESSION_MAX_OPEN,
+    checkpoint_interval=settings.SESSION_CHECKPOINT_INTERVAL,
+    checkpoint_events=settings.SESSION_CHECKPOINT_EVENTS
+)
+live_publisher = build_live_publisher(settings)
+# The live publisher goes last, so a dashboard refreshing its summary on a
+# live event never reads one the cache invalidation has not yet retired
+event_processing_service = EventProcessingService(
+    database_repo,
+    llm_cache if llm_cache is not None else llm_service,
+    ingest_listeners=[sketch_writer, top_k_tracker, sessionizer]
+    + ([summary_cache] if summary_cache is not None else [])
+    + ([live_publisher] if live_publisher is not None else [])
+)
+partition_manager = PartitionManager(
+    database_repo.async_engine,
+    interval=settings.PARTITION_INTERVAL,
+    premake=settings.PARTITION_PREMAKE,
+    retention_days=settings.PARTITION_RETENTION_DAYS,
+    retention_action=settings.PARTITION_RETENTION_ACTION
+)
+
+# One event loop per worker process. Pooled database connections and the
+# write-behind buffer are bound to the loop they were created on, so tasks
+# must not each spin up and close their own loop.
+_event_loop = None
+
+def _run(coro):
+    """Run a coroutine on the worker process' long-lived event loop"""
+    global _event_loop
+    if _event_loop is None or _event_loop.is_closed():
+        _event_loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_event_loop)
+    return _event_loop.run_until_complete(coro)
+
+@worker_process_shutdown.connect
+def shutdown_worker_process(**kwargs):
+    """Flush buffered writes and close the event loop when the worker process exits"""
+    if _event_loop is None or _event_loop.is_closed():
+        return
+    try:
+        _event_loop.run_until_complete(top_k_tracker.checkpoint())
+    except Exception as e:
+        logger.error(f"Error checkpointing top-K counts: {str(e)}")
+    try:
+        _event_loop.run_until_complete(sessionizer.checkpoint())
+    except Exception as e:
+        logger.error(f"Error writing user sessions: {str(e)}")
+    if llm_cache is not None:
+        logger.info(f"LLM property cache: {llm_cache.get_metrics()}")
+    if database_repo.write_buffer is not None:
+        logger.info(f"Write-behind buffer: {database_repo.write_buffer.get_metrics()}")
+    try:
+        _event_loop.run_until_complete(database_repo.close())
+        if summary_cache is not None:
+            _event_loop.run_until_complete(summary_cache.close())
+        if live_publisher is not None:
+            _event_loop.run_until_complete(live_publisher.close())
+        _event_loop.run_until_complete(llm_service.close())
+    except Exception as e:
+        logger.error(f"Error closing database repository: {str(e)}")
+    finally:
+        _event_loop.close()
 
 @app.task(bind=True, autoretry_for=(Exception,), retry_kwargs={'max_retries': 3, 'countdown': 60})
 def process_user_analytics_event_task(self, event_data: Dict[str, Any]):
@@ -42,18 +148,9 @@ def process_user_analytics_event_task(self, event_data: Dict[str, Any]):
     try:
         logger.info(f"Processing user analytics event task: {event_data.get('user_id')}")
         
-        # Run the async function in event loop
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        try:
-            result = loop.run_until_complete(
-                event_processing_service.process_user_analytics_event(event_data)
-            )
-            logger.info(f"Successfully processed user analytics event: {result}")
-            return str(result)
-        finally:
-            loop.close()
+        result = _run(event_processing_service.process_user_analytics_event(event_data))
+        logger.info(f"Successfully processed user analytics event: {result}")
+        return str(result)
             
     except Exception as e:
         logger.error(f"Error in user analytics task: {str(e)}")
@@ -65,23 +162,91 @@ def process_chemical_research_event_task(self, event_data: Dict[str, Any]):
     try:
         logger.info(f"Processing chemical research event task: {event_data.get('molecule_id')}")
         
-        # Run the async function in event loop
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        try:
-            result = loop.run_until_complete(
-                event_processing_service.process_chemical_research_event(event_data)
-            )
-            logger.info(f"Successfully processed chemical research event: {result}")
-            return str(result)
-        finally:
-            loop.close()
+        result = _run(event_processing_service.process_chemical_research_event(event_data))
+        logger.info(f"Successfully processed chemical research event: {result}")
+        return str(result)
             
     except Exception as e:
         logger.error(f"Error in chemical research task: {str(e)}")
         raise self.retry(exc=e)
 
+@app.task
+def process_event_batch_task(events: List[Dict[str, Any]]):
+    """Celery task processing a batch of consumed events concurrently.
+
+    With WRITE_BEHIND_ENABLED their saves share multi-row inserts. Events
+    that fail are dispatched again one by one, to the per-event tasks and
+    their retries; redelivery of the ones that were stored is harmless.
+    """
+    try:
+        logger.info(f"Processing batch of {len(events)} events")
+        
+        results = _run(event_processing_service.process_events(events))
+        failed = [event_data for event_data, result in zip(events, results) if isinstance(result, Exception)]
+        for event_data in failed:
+            dispatch_event(event_data)
+        logger.info(f"Processed batch: {len(events) - len(failed)} stored, {len(failed)} dispatched for retry")
+        return {"processed": len(events) - len(failed), "redispatched": len(failed)}
+            
+    except Exception as e:
+        logger.error(f"Error in event batch task: {str(e)}")
+        raise
+
+@app.task
+def maintain_partitions_task():
+    """Periodic task: pre-create upcoming event partitions and apply retention"""
+    try:
+        return _run(partition_manager.maintain())
+    except Exception as e:
+        logger.error(f"Error maintaining event partitions: {str(e)}")
+        raise
+
+@app.task
+def archive_events_task():
+    """Periodic task: move event days past the archive window into the cold tier"""
+    if database_repo.cold_archive is None:
+        return {}
+    try:
+        return _run(database_repo.cold_archive.archive())
+    except Exception as e:
+        logger.error(f"Error archiving events: {str(e)}")
+        raise
+
+@app.task
+def prune_activity_buckets_task():
+    """Periodic task: drop per-minute activity buckets past their retention"""
+    if settings.HISTOGRAM_MINUTE_RETENTION_DAYS is None:
+        return 0
+    try:
+        return _run(database_repo.prune_activity_buckets('minute', settings.HISTOGRAM_MINUTE_RETENTION_DAYS))
+    except Exception as e:
+        logger.error(f"Error pruning activity buckets: {str(e)}")
+        raise
+
+@app.task
+def prune_llm_cache_task():
+    """Periodic task: delete expired cached LLM properties"""
+    try:
+        return _run(database_repo.prune_cached_llm_properties())
+    except Exception as e:
+        logger.error(f"Error pruning LLM property cache: {str(e)}")
+        raise
+
+@app.task
+def repository_metrics_task():
+    """Connection pool and write-behind metrics of the worker process running the task.
+
+    The API's /metrics reports its own process, which never writes events.
+    """
+    return database_repo.get_metrics()
+
+@app.task
+def llm_cache_metrics_task():
+    """LLM property cache hit and miss counters of the worker process running the task"""
+    if llm_cache is None:
+        return {"enabled": False}
+    return llm_cache.get_metrics()
+
 # Event type to task mapping
 EVENT_HANDLERS = {
     'user_analytics': process_user_analytics_event_task,
@@ -104,3 +269,20 @@ def dispatch_event(event_data: Dict[str, Any]):
     logger.info(f"Task submitted with ID: {task_result.id}")
     
     return task_result.id
+
+def dispatch_events(events: List[Dict[str, Any]]):
+    """Dispatch consumed events to one Celery task that processes them together"""
+    known = []
+    for event_data in events:
+        if event_data.get('type') in EVENT_HANDLERS:
+            known.append(event_data)
+        else:
+            logger.error(f"Unknown event type: {event_data.get('type')}")
+    if not known:
+        return None
+    
+    logger.info(f"Dispatching batch of {len(known)} events to Celery task")
+    task_result = process_event_batch_task.delay(known)
+    logger.info(f"Task submitted with ID: {task_result.id}")
+    
+    return task_result.id
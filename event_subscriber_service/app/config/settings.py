@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from pydantic import Field
+from typing import Optional
 import logging
 
 class Settings(BaseSettings):
@@ -11,9 +12,139 @@ class Settings(BaseSettings):
     # Database Settings
     POSTGRES_DSN: str = Field(..., alias="POSTGRES_DSN")
     
+    # Read replicas for API queries (comma-separated DSNs); reads fall back
+    # to the primary when every replica is unreachable or lagging
+    POSTGRES_READ_DSNS: Optional[str] = Field(None, alias="POSTGRES_READ_DSNS")
+    READ_REPLICA_MAX_LAG_SECONDS: float = Field(5.0, alias="READ_REPLICA_MAX_LAG_SECONDS")
+    READ_REPLICA_LAG_CHECK_INTERVAL: float = Field(5.0, alias="READ_REPLICA_LAG_CHECK_INTERVAL")
+    
+    # Connection Pool Settings
+    DB_POOL_SIZE: int = Field(10, alias="DB_POOL_SIZE")
+    DB_MAX_OVERFLOW: int = Field(20, alias="DB_MAX_OVERFLOW")
+    DB_POOL_TIMEOUT: float = Field(30.0, alias="DB_POOL_TIMEOUT")
+    DB_POOL_RECYCLE: int = Field(1800, alias="DB_POOL_RECYCLE")
+    DB_POOL_PRE_PING: bool = Field(True, alias="DB_POOL_PRE_PING")
+    DB_STATEMENT_CACHE_SIZE: int = Field(100, alias="DB_STATEMENT_CACHE_SIZE")
+    
+    # Event table partitioning and retention
+    PARTITION_INTERVAL: str = Field("daily", alias="PARTITION_INTERVAL")  # 'daily' or 'monthly'
+    PARTITION_PREMAKE: int = Field(7, alias="PARTITION_PREMAKE")
+    PARTITION_RETENTION_DAYS: Optional[int] = Field(None, alias="PARTITION_RETENTION_DAYS")
+    PARTITION_RETENTION_ACTION: str = Field("drop", alias="PARTITION_RETENTION_ACTION")  # 'drop' or 'detach'
+    PARTITION_MAINTENANCE_INTERVAL: int = Field(3600, alias="PARTITION_MAINTENANCE_INTERVAL")
+    
+    # Write-behind batching of single-event saves (opt-in). Batches form from
+    # saves in flight together, so when enabled the Kafka consumer hands up
+    # to WRITE_BEHIND_CONSUME_BATCH_SIZE events at a time to one task, which
+    # processes them concurrently
+    WRITE_BEHIND_ENABLED: bool = Field(False, alias="WRITE_BEHIND_ENABLED")
+    WRITE_BEHIND_MAX_BATCH_SIZE: int = Field(500, alias="WRITE_BEHIND_MAX_BATCH_SIZE")
+    WRITE_BEHIND_MAX_DELAY_MS: int = Field(50, alias="WRITE_BEHIND_MAX_DELAY_MS")
+    WRITE_BEHIND_MAX_PENDING: int = Field(10000, alias="WRITE_BEHIND_MAX_PENDING")
+    WRITE_BEHIND_CONSUME_BATCH_SIZE: int = Field(100, alias="WRITE_BEHIND_CONSUME_BATCH_SIZE")
+    
+    # Bulk summaries: owners per request, and per query before requests fan
+    # out over several pooled connections
+    BULK_SUMMARY_MAX_OWNERS: int = Field(1000, alias="BULK_SUMMARY_MAX_OWNERS")
+    BULK_SUMMARY_CHUNK_SIZE: int = Field(100, alias="BULK_SUMMARY_CHUNK_SIZE")
+    
+    # Bulk export: rows fetched per server-side cursor round trip
+    EXPORT_CHUNK_SIZE: int = Field(5000, alias="EXPORT_CHUNK_SIZE")
+    
+    # Cold-tier archival: whole days older than ARCHIVE_AFTER_DAYS move into
+    # Parquet files under ARCHIVE_DIR; reads fall back to them transparently
+    ARCHIVE_ENABLED: bool = Field(False, alias="ARCHIVE_ENABLED")
+    ARCHIVE_DIR: str = Field("/var/lib/event_subscriber/archive", alias="ARCHIVE_DIR")
+    ARCHIVE_AFTER_DAYS: int = Field(90, alias="ARCHIVE_AFTER_DAYS")
+    ARCHIVE_COMPRESSION: str = Field("zstd", alias="ARCHIVE_COMPRESSION")
+    ARCHIVE_ROW_GROUP_SIZE: int = Field(10000, alias="ARCHIVE_ROW_GROUP_SIZE")
+    ARCHIVE_INTERVAL: int = Field(86400, alias="ARCHIVE_INTERVAL")
+    
+    # Activity histograms: per-minute buckets older than the retention are
+    # pruned (histograms over them are then counted from event rows)
+    HISTOGRAM_MAX_BUCKETS: int = Field(10000, alias="HISTOGRAM_MAX_BUCKETS")
+    HISTOGRAM_MINUTE_RETENTION_DAYS: Optional[int] = Field(14, alias="HISTOGRAM_MINUTE_RETENTION_DAYS")
+    HISTOGRAM_MAINTENANCE_INTERVAL: int = Field(3600, alias="HISTOGRAM_MAINTENANCE_INTERVAL")
+    
+    # Distinct-count sketches: recently written sketches whose registers each
+    # worker remembers, to skip updates that cannot raise them
+    SKETCH_REGISTER_CACHE_SIZE: int = Field(1024, alias="SKETCH_REGISTER_CACHE_SIZE")
+    
+    # Top-K heavy hitters: items kept per dimension and day, and how often
+    # each worker adds its in-memory counts to them
+    TOP_K_CAPACITY: int = Field(1000, alias="TOP_K_CAPACITY")
+    TOP_K_CHECKPOINT_INTERVAL: float = Field(10.0, alias="TOP_K_CHECKPOINT_INTERVAL")
+    TOP_K_CHECKPOINT_EVENTS: int = Field(1000, alias="TOP_K_CHECKPOINT_EVENTS")
+    
+    # Sessionization: seconds of inactivity that end a session without a
+    # session_id, open sessions each worker keeps, and how often it writes them
+    SESSION_INACTIVITY_GAP: float = Field(1800.0, alias="SESSION_INACTIVITY_GAP")
+    SESSION_MAX_OPEN: int = Field(10000, alias="SESSION_MAX_OPEN")
+    SESSION_CHECKPOINT_INTERVAL: float = Field(10.0, alias="SESSION_CHECKPOINT_INTERVAL")
+    SESSION_CHECKPOINT_EVENTS: int = Field(1000, alias="SESSION_CHECKPOINT_EVENTS")
+    
+    # Funnel and retention analysis: longest range and funnel accepted, and
+    # archived rows read per chunk
+    ANALYSIS_MAX_RANGE_DAYS: int = Field(92, alias="ANALYSIS_MAX_RANGE_DAYS")
+    ANALYSIS_MAX_FUNNEL_STEPS: int = Field(10, alias="ANALYSIS_MAX_FUNNEL_STEPS")
+    ANALYSIS_CHUNK_SIZE: int = Field(50000, alias="ANALYSIS_CHUNK_SIZE")
+    
+    # Read-through cache for the analytics summaries. Shared through Redis
+    # (CACHE_REDIS_URL, else the Celery broker when it is Redis) and
+    # invalidated by ingest; process-local and TTL-only without Redis
+    CACHE_ENABLED: bool = Field(True, alias="CACHE_ENABLED")
+    CACHE_REDIS_URL: Optional[str] = Field(None, alias="CACHE_REDIS_URL")
+    CACHE_REDIS_TIMEOUT: float = Field(0.5, alias="CACHE_REDIS_TIMEOUT")
+    CACHE_USER_SUMMARY_TTL: float = Field(30.0, alias="CACHE_USER_SUMMARY_TTL")
+    CACHE_RESEARCHER_SUMMARY_TTL: float = Field(60.0, alias="CACHE_RESEARCHER_SUMMARY_TTL")
+    CACHE_ANALYSIS_TTL: float = Field(300.0, alias="CACHE_ANALYSIS_TTL")
+    CACHE_LOCAL_MAX_ENTRIES: int = Field(1024, alias="CACHE_LOCAL_MAX_ENTRIES")
+    CACHE_LOCK_TIMEOUT: float = Field(5.0, alias="CACHE_LOCK_TIMEOUT")
+    
+    # Live event streams: workers publish stored events to a Redis channel
+    # (LIVE_REDIS_URL, else the Celery broker when it is Redis) that every
+    # API process relays to its SSE and WebSocket clients
+    LIVE_ENABLED: bool = Field(True, alias="LIVE_ENABLED")
+    LIVE_REDIS_URL: Optional[str] = Field(None, alias="LIVE_REDIS_URL")
+    LIVE_CHANNEL: str = Field("live_events", alias="LIVE_CHANNEL")
+    LIVE_PUBLISH_TIMEOUT: float = Field(0.5, alias="LIVE_PUBLISH_TIMEOUT")
+    LIVE_CLIENT_BUFFER: int = Field(100, alias="LIVE_CLIENT_BUFFER")
+    LIVE_HEARTBEAT_INTERVAL: float = Field(15.0, alias="LIVE_HEARTBEAT_INTERVAL")
+    LIVE_SUMMARY_INTERVAL: float = Field(1.0, alias="LIVE_SUMMARY_INTERVAL")
+    
+    # In-memory columnar store of each API process's newest events, fed by
+    # the live channel (which must be enabled): events kept per dataset
+    HOT_STORE_ENABLED: bool = Field(False, alias="HOT_STORE_ENABLED")
+    HOT_STORE_CAPACITY: int = Field(100000, alias="HOT_STORE_CAPACITY")
+    
     # LLM Settings
     LLM_API_URL: str = Field(..., alias="LLM_API_URL")
+    LLM_PROVIDER: str = Field("mock", alias="LLM_PROVIDER")  # 'mock' or 'http' (LLM_API_URL)
+    LLM_API_KEY: Optional[str] = Field(None, alias="LLM_API_KEY")
+    # Pooled HTTP client: connections kept per worker process, HTTP/2 (needs
+    # the h2 package) and timeouts per phase of a request, in seconds
+    LLM_MAX_CONNECTIONS: int = Field(20, alias="LLM_MAX_CONNECTIONS")
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = Field(10, alias="LLM_MAX_KEEPALIVE_CONNECTIONS")
+    LLM_KEEPALIVE_EXPIRY: float = Field(30.0, alias="LLM_KEEPALIVE_EXPIRY")
+    LLM_HTTP2: bool = Field(False, alias="LLM_HTTP2")
+    LLM_CONNECT_TIMEOUT: float = Field(5.0, alias="LLM_CONNECT_TIMEOUT")
+    LLM_READ_TIMEOUT: float = Field(30.0, alias="LLM_READ_TIMEOUT")
+    LLM_WRITE_TIMEOUT: float = Field(10.0, alias="LLM_WRITE_TIMEOUT")
+    LLM_POOL_TIMEOUT: float = Field(5.0, alias="LLM_POOL_TIMEOUT")
+    # Part of every cached extraction's key: change it when the model behind
+    # LLM_API_URL changes so earlier results are no longer used
+    LLM_MODEL_VERSION: str = Field("default", alias="LLM_MODEL_VERSION")
     
+    # Cache of LLM chemical property extraction: shared in Postgres for
+    # LLM_CACHE_TTL seconds, and in each worker's LRU for at most
+    # LLM_CACHE_LOCAL_TTL seconds, which bounds how long an invalidation
+    # takes to reach every worker
+    LLM_CACHE_ENABLED: bool = Field(True, alias="LLM_CACHE_ENABLED")
+    LLM_CACHE_TTL: float = Field(2592000.0, alias="LLM_CACHE_TTL")
+    LLM_CACHE_LOCAL_TTL: float = Field(300.0, alias="LLM_CACHE_LOCAL_TTL")
+    LLM_CACHE_LOCAL_MAX_ENTRIES: int = Field(1024, alias="LLM_CACHE_LOCAL_MAX_ENTRIES")
+    LLM_CACHE_PRUNE_INTERVAL: int = Field(3600, alias="LLM_CACHE_PRUNE_INTERVAL")
+
     # Celery Settings
     CELERY_BROKER_URL: str = Field(..., alias="CELERY_BROKER_URL")
     CELERY_RESULT_BACKEND: str = Field(..., alias="CELERY_RESULT_BACKEND")
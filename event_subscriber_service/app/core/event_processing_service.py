@@ -1,17 +1,93 @@
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Sequence
+import asyncio
 import logging
+from datetime import datetime, timedelta
 from uuid import UUID
 from app.infrastructure.database_repository import DatabaseRepository
 from app.infrastructure.llm_service import LLMService
+from app.infrastructure.histograms import floor_bucket, ceil_bucket
+from app.infrastructure.sketches import sketch_day, distinct_payload
+from app.infrastructure.heavy_hitters import top_payload
+from app.infrastructure.sessions import sessions_payload
+from app.infrastructure.event_analysis import (
+    PERIODS,
+    analysis_key,
+    epoch_ms,
+    funnel_counts,
+    funnel_payload,
+    period_count,
+    retention_matrix,
+    retention_payload
+)
 
 logger = logging.getLogger(__name__)
 
+def _window(since: Optional[datetime], until: Optional[datetime]) -> Dict[str, datetime]:
+    """Keyword arguments for the bounds of a time window that are set"""
+    return {name: value for name, value in (('since', since), ('until', until)) if value is not None}
+
+def _user_summary(user_id: str, rollups: List[Dict[str, Any]], recent_events: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """User summary from its per event_type counts and newest events"""
+    return {
+        "user_id": user_id,
+        "total_events": sum(rollup['event_count'] for rollup in rollups),
+        "event_types": {rollup['event_type']: rollup['event_count'] for rollup in rollups},
+        "first_seen": min((rollup['first_seen'] for rollup in rollups), default=None),
+        "last_seen": max((rollup['last_seen'] for rollup in rollups), default=None),
+        "recent_events": recent_events
+    }
+
+def _researcher_summary(researcher: str, rollup: Optional[Dict[str, Any]], recent_experiments: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Researcher summary from its experiment counter and newest experiments"""
+    molecules_studied = rollup['molecules'] if rollup else []
+    return {
+        "researcher": researcher,
+        "total_experiments": rollup['experiment_count'] if rollup else 0,
+        "unique_molecules": len(molecules_studied),
+        "molecules_list": molecules_studied,
+        "first_seen": rollup['first_seen'] if rollup else None,
+        "last_seen": rollup['last_seen'] if rollup else None,
+        "recent_experiments": recent_experiments
+    }
+
 class EventProcessingService:
     """Core service for processing different types of events"""
     
-    def __init__(self, database_repo: DatabaseRepository, llm_service: LLMService):
+    def __init__(self, database_repo: DatabaseRepository, llm_service: LLMService, ingest_listeners: Sequence[Any] = ()):
         self.database_repo = database_repo
         self.llm_service = llm_service
+        # Notified with (event_type, event_data) once an event is committed,
+        # e.g. to invalidate cached summaries of its user or researcher;
+        # event_data then carries the stored event_id. Redelivered events are
+        # not stored again and never reach them, so they count each event once
+        self.ingest_listeners = list(ingest_listeners)
+    
+    async def _notify_ingested(self, event_type: str, event_data: Dict[str, Any]):
+        """Tell ingest listeners about a committed event; their failures never fail ingest"""
+        for listener in self.ingest_listeners:
+            try:
+                await listener.event_ingested(event_type, event_data)
+            except Exception as e:
+                logger.warning(f"Ingest listener failed for {event_type} event: {str(e)}")
+    
+    async def process_events(self, events: Sequence[Dict[str, Any]]) -> List[Any]:
+        """Process events concurrently; returns each one's event id, or the exception it raised.
+        
+        Their saves are in flight together, so a repository write-behind
+        buffer coalesces them into multi-row inserts.
+        """
+        processors = {
+            'user_analytics': self.process_user_analytics_event,
+            'chemical_research': self.process_chemical_research_event,
+        }
+        
+        async def process(event_data: Dict[str, Any]) -> UUID:
+            processor = processors.get(event_data.get('type'))
+            if processor is None:
+                raise ValueError(f"Unknown event type: {event_data.get('type')}")
+            return await processor(event_data)
+        
+        return await asyncio.gather(*(process(event_data) for event_data in events), return_exceptions=True)
     
     async def process_user_analytics_event(self, event_data: Dict[str, Any]) -> UUID:
         """Process user analytics event"""
@@ -24,14 +100,11 @@ class EventProcessingService:
                 if field not in event_data:
                     raise ValueError(f"Missing required field: {field}")
             
-            # Save to database
-            event_id = await self.database_repo.save_user_analytics_event(event_data)
-            
-            # Create processing status
-            await self.database_repo.create_event_processing_status(event_id, 'user_analytics')
-            
-            # Update status to completed
-            await self.database_repo.update_event_processing_status(event_id, 'completed')
+            # Save event and its final processing status in a single transaction
+            event_id, inserted = await self.database_repo.save_user_analytics_event_with_status(event_data)
+            event_data['event_id'] = str(event_id)
+            if inserted:
+                await self._notify_ingested('user_analytics', event_data)
             
             logger.info(f"Successfully processed user analytics event: {event_id}")
             return event_id
@@ -58,14 +131,11 @@ class EventProcessingService:
             # Add LLM properties to event data
             event_data['llm_properties'] = llm_properties
             
-            # Save to database
-            event_id = await self.database_repo.save_chemical_research_event(event_data)
-            
-            # Create processing status
-            await self.database_repo.create_event_processing_status(event_id, 'chemical_research')
-            
-            # Update status to completed
-            await self.database_repo.update_event_processing_status(event_id, 'completed')
+            # Save event and its final processing status in a single transaction
+            event_id, inserted = await self.database_repo.save_chemical_research_event_with_status(event_data)
+            event_data['event_id'] = str(event_id)
+            if inserted:
+                await self._notify_ingested('chemical_research', event_data)
             
             logger.info(f"Successfully processed chemical research event: {event_id}")
             return event_id
@@ -77,49 +147,241 @@ class EventProcessingService:
 class DataAnalyticsService:
     """Service for analytics and data processing functions"""
     
-    def __init__(self, database_repo: DatabaseRepository):
+    def __init__(
+        self,
+        database_repo: DatabaseRepository,
+        cache: Optional[Any] = None,
+        bulk_chunk_size: int = 100,
+        session_inactivity_gap: float = 1800.0,
+        analysis_chunk_size: int = 50000,
+        hot_store: Optional[Any] = None
+    ):
         self.database_repo = database_repo
+        # Optional read-through cache (see app/infrastructure/summary_cache.py)
+        self.cache = cache
+        # Owners per query in bulk summaries; larger requests fan out across the pool
+        self.bulk_chunk_size = bulk_chunk_size
+        # Must match the workers' sessionizer to tell open sessions from closed ones
+        self.session_inactivity_gap = timedelta(seconds=session_inactivity_gap)
+        # Archived rows read per chunk when loading events for funnel and retention analysis
+        self.analysis_chunk_size = analysis_chunk_size
+        # Optional in-memory store of the newest events (see app/infrastructure/hot_store.py)
+        self.hot_store = hot_store
+    
+    def _hot(self, dataset: str, window: Dict[str, datetime]) -> bool:
+        """Whether the hot store holds every event of a window, which it then counts in memory"""
+        return self.hot_store is not None and self.hot_store.covers(dataset, window.get('since'))
+    
+    async def _fan_out(self, owners: Sequence[str], load) -> Dict[str, Any]:
+        """Run load over chunks of owners concurrently and merge the per-owner results"""
+        owners = list(dict.fromkeys(owners))
+        chunks = [owners[i:i + self.bulk_chunk_size] for i in range(0, len(owners), self.bulk_chunk_size)]
+        merged: Dict[str, Any] = {}
+        for result in await asyncio.gather(*(load(chunk) for chunk in chunks)):
+            merged.update(result)
+        return merged
     
-    async def get_user_analytics_summary(self, user_id: str) -> Dict[str, Any]:
-        """Get analytics summary for a user"""
+    async def get_user_analytics_summaries(self, user_ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        """Get the analytics summaries of several users with set-based queries"""
+        async def load(chunk):
+            rollups, recent_events = await asyncio.gather(
+                self.database_repo.get_user_event_rollups_bulk(chunk),
+                self.database_repo.get_recent_user_analytics_events_bulk(chunk, limit=10)
+            )
+            return {user_id: _user_summary(user_id, rollups[user_id], recent_events[user_id]) for user_id in chunk}
         try:
-            events = await self.database_repo.get_user_analytics_events(user_id, limit=100)
-            
-            # Calculate analytics
-            total_events = len(events)
-            event_types = {}
-            
-            for event in events:
-                event_type = event['event_type']
-                event_types[event_type] = event_types.get(event_type, 0) + 1
-            
+            return await self._fan_out(user_ids, load)
+        except Exception as e:
+            logger.error(f"Error getting user analytics summaries: {str(e)}")
+            raise
+    
+    async def get_researcher_summaries(self, researchers: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        """Get the research summaries of several researchers with set-based queries"""
+        async def load(chunk):
+            rollups, recent_experiments = await asyncio.gather(
+                self.database_repo.get_researcher_rollups_bulk(chunk),
+                self.database_repo.get_recent_chemical_research_events_bulk(chunk, limit=10)
+            )
             return {
-                "user_id": user_id,
-                "total_events": total_events,
-                "event_types": event_types,
-                "recent_events": events[:10]
+                researcher: _researcher_summary(researcher, rollups[researcher], recent_experiments[researcher])
+                for researcher in chunk
             }
+        try:
+            return await self._fan_out(researchers, load)
+        except Exception as e:
+            logger.error(f"Error getting researcher summaries: {str(e)}")
+            raise
+    
+    async def get_user_analytics_summary(
+        self,
+        user_id: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """Get analytics summary for a user, optionally over [since, until)"""
+        window = _window(since, until)
+        if self.cache is not None and not window:
+            return await self.cache.get_or_load(
+                'user_summary', user_id, lambda: self._load_user_analytics_summary(user_id, window)
+            )
+        return await self._load_user_analytics_summary(user_id, window)
+    
+    async def _load_user_analytics_summary(self, user_id: str, window: Dict[str, datetime]) -> Dict[str, Any]:
+        try:
+            if window and self._hot('user_analytics', window):
+                rollups = self.hot_store.user_event_counts(user_id, **window)
+            elif window:
+                # A window is counted by a GROUP BY in the database
+                rollups = await self.database_repo.get_user_event_counts(user_id, **window)
+            else:
+                # All-time totals come from the ingest-time rollups, so they are exact at any volume
+                rollups = await self.database_repo.get_user_event_rollups(user_id)
+            recent_events = self.hot_store.user_events(user_id, limit=10, **window) if self.hot_store is not None else None
+            if recent_events is None:
+                recent_events = await self.database_repo.get_user_analytics_events(user_id, limit=10, **window)
+            return _user_summary(user_id, rollups, recent_events)
             
         except Exception as e:
             logger.error(f"Error getting user analytics summary: {str(e)}")
             raise
     
-    async def get_researcher_summary(self, researcher: str) -> Dict[str, Any]:
-        """Get research summary for a researcher"""
+    async def get_researcher_summary(
+        self,
+        researcher: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """Get research summary for a researcher, optionally over [since, until)"""
+        window = _window(since, until)
+        if self.cache is not None and not window:
+            return await self.cache.get_or_load(
+                'researcher_summary', researcher, lambda: self._load_researcher_summary(researcher, window)
+            )
+        return await self._load_researcher_summary(researcher, window)
+    
+    async def get_activity_histogram(
+        self,
+        dimension: str,
+        subject: str,
+        granularity: str,
+        since: datetime,
+        until: datetime
+    ) -> Dict[str, Any]:
+        """Get event counts per minute, hour or day for a user, event type or researcher"""
+        since, until = floor_bucket(since, granularity), ceil_bucket(until, granularity)
         try:
-            events = await self.database_repo.get_chemical_research_events(researcher, limit=100)
-            
-            # Calculate analytics
-            total_experiments = len(events)
-            molecules_studied = set(event['molecule_id'] for event in events)
-            
+            buckets = await self.database_repo.get_activity_histogram(dimension, subject, granularity, since, until)
             return {
-                "researcher": researcher,
-                "total_experiments": total_experiments,
-                "unique_molecules": len(molecules_studied),
-                "molecules_list": list(molecules_studied),
-                "recent_experiments": events[:10]
+                "dimension": dimension,
+                "subject": subject,
+                "granularity": granularity,
+                "since": since.isoformat(),
+                "until": until.isoformat(),
+                "buckets": buckets
             }
+        except Exception as e:
+            logger.error(f"Error getting activity histogram: {str(e)}")
+            raise
+    
+    async def get_distinct_count(self, dimension: str, subject: str, since: datetime, until: datetime) -> Dict[str, Any]:
+        """Estimate the distinct users of an event type, molecules of a researcher or researchers of a molecule"""
+        since, until = sketch_day(since), sketch_day(until)
+        try:
+            registers = await self.database_repo.get_distinct_sketch(dimension, subject, since, until)
+            return distinct_payload(dimension, subject, since, until, registers)
+        except Exception as e:
+            logger.error(f"Error getting distinct count: {str(e)}")
+            raise
+    
+    async def get_top_items(self, dimension: str, since: datetime, until: datetime, k: int) -> Dict[str, Any]:
+        """Get the most active users, most viewed pages or most studied molecules over whole UTC days"""
+        since, until = sketch_day(since), sketch_day(until)
+        try:
+            items = await self.database_repo.get_top_items(dimension, since, until, k)
+            return top_payload(dimension, since, until, items)
+        except Exception as e:
+            logger.error(f"Error getting top items: {str(e)}")
+            raise
+    
+    async def get_user_sessions(self, user_id: str, since: datetime, until: datetime, limit: int) -> Dict[str, Any]:
+        """Get a user's sessions started in [since, until) with their aggregate metrics"""
+        try:
+            metrics = await self.database_repo.get_user_session_metrics(user_id, since, until)
+            sessions = await self.database_repo.get_user_sessions(user_id, since, until, limit)
+            return sessions_payload(user_id, since, until, self.session_inactivity_gap, metrics, sessions)
+        except Exception as e:
+            logger.error(f"Error getting user sessions: {str(e)}")
+            raise
+    
+    async def get_funnel(self, steps: Sequence[str], since: datetime, until: datetime, window_seconds: float) -> Dict[str, Any]:
+        """Get how many users went through each step of an ordered funnel within the window"""
+        loader = lambda: self._load_funnel(list(steps), since, until, window_seconds)
+        if self.cache is not None:
+            key = analysis_key('funnel', steps=list(steps), since=since, until=until, window_seconds=window_seconds)
+            return await self.cache.get_or_load('funnel', key, loader)
+        return await loader()
+    
+    async def _load_funnel(self, steps: List[str], since: datetime, until: datetime, window_seconds: float) -> Dict[str, Any]:
+        try:
+            columns = await self.database_repo.load_user_activity(since, until, steps, self.analysis_chunk_size)
+            window_ms = round(window_seconds * 1000)
+            
+            def compute():
+                users, types, times = columns.arrays()
+                return funnel_counts(users, types, times, len(steps), window_ms)
+            
+            # The vectorized passes are CPU-bound; keep the event loop free meanwhile
+            counts = await asyncio.to_thread(compute)
+            return funnel_payload(steps, since, until, window_seconds, counts)
+        except Exception as e:
+            logger.error(f"Error computing funnel: {str(e)}")
+            raise
+    
+    async def get_retention(
+        self,
+        since: datetime,
+        until: datetime,
+        period: str,
+        event_type: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Get the users of each cohort active in each following day or week"""
+        loader = lambda: self._load_retention(since, until, period, event_type)
+        if self.cache is not None:
+            key = analysis_key('retention', since=since, until=until, period=period, event_type=event_type)
+            return await self.cache.get_or_load('retention', key, loader)
+        return await loader()
+    
+    async def _load_retention(self, since: datetime, until: datetime, period: str, event_type: Optional[str]) -> Dict[str, Any]:
+        try:
+            columns = await self.database_repo.load_user_activity(
+                since, until, [event_type] if event_type else None, self.analysis_chunk_size
+            )
+            period_ms = round(PERIODS[period].total_seconds() * 1000)
+            
+            def compute():
+                users, _, times = columns.arrays()
+                return retention_matrix(users, times, epoch_ms(since), period_ms, period_count(since, until, period))
+            
+            matrix = await asyncio.to_thread(compute)
+            return retention_payload(since, until, period, event_type, matrix)
+        except Exception as e:
+            logger.error(f"Error computing retention: {str(e)}")
+            raise
+    
+    async def _load_researcher_summary(self, researcher: str, window: Dict[str, datetime]) -> Dict[str, Any]:
+        try:
+            if window and self._hot('chemical_research', window):
+                rollup = self.hot_store.researcher_counts(researcher, **window)
+            elif window:
+                rollup = await self.database_repo.get_researcher_counts(researcher, **window)
+            else:
+                rollup = await self.database_repo.get_researcher_rollup(researcher)
+            recent_experiments = (
+                self.hot_store.researcher_events(researcher, limit=10, **window) if self.hot_store is not None else None
+            )
+            if recent_experiments is None:
+                recent_experiments = await self.database_repo.get_chemical_research_events(researcher, limit=10, **window)
+            return _researcher_summary(researcher, rollup, recent_experiments)
             
         except Exception as e:
             logger.error(f"Error getting researcher summary: {str(e)}")
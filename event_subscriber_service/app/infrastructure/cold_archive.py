@@ -0,0 +1,453 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+from urllib.parse import quote
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from .database_models import ArchiveManifestEntry, ChemicalResearchEvent, UserAnalyticsEvent
+from .export import arrow_schema, record_batch, require_pyarrow
+from .jsonb_filters import JsonFilter
+from .pagination import Keyset
+from .partition_manager import DAILY, partition_start
+
+logger = logging.getLogger(__name__)
+
+# Cold tier for event history. Whole days older than the archive window are
+# moved out of Postgres into Parquet files laid out as
+#
+#   <ARCHIVE_DIR>/<table>/date=YYYY-MM-DD/type=<event type>/part-<uuid>.parquet
+#
+# and recorded in archive_manifest. Within a file rows are ordered by owner
+# and newest first, so the per-row-group statistics let reads skip every row
+# group that cannot hold the requested user or researcher.
+
+Rows = List[Dict[str, Any]]
+
+class ArchivedTable:
+    """An event table with the columns its reads select and partition on"""
+
+    def __init__(self, model, owner_column: str, type_column: str):
+        self.table = model.__table__
+        self.owner_column = owner_column
+        self.type_column = type_column
+        self.json_columns = [c.name for c in self.table.columns if isinstance(c.type, JSONB)]
+
+ARCHIVED_TABLES = {
+    'user_analytics_events': ArchivedTable(UserAnalyticsEvent, 'user_id', 'event_type'),
+    'chemical_research_events': ArchivedTable(ChemicalResearchEvent, 'researcher', 'experiment_type'),
+}
+
+def _utc(moment: datetime) -> datetime:
+    """Treat naive datetimes as UTC, like the API does"""
+    return moment if moment.tzinfo is not None else moment.replace(tzinfo=timezone.utc)
+
+def _row_key(row: Dict[str, Any]):
+    # Canonical lowercase UUID strings sort like Postgres compares uuids
+    return row['timestamp'], str(row['id'])
+
+def merge_newest(hot: list, cold: list, limit: int) -> list:
+    """First ``limit`` events of both tiers in (timestamp DESC, id DESC) order"""
+    return sorted(
+        hot + cold,
+        key=lambda event: (_utc(event.timestamp), uuid.UUID(str(event.id))),
+        reverse=True
+    )[:limit]
+
+def merge_counts(groups: Dict[Any, Dict[str, Any]], key, event_count: int, first_seen: datetime, last_seen: datetime):
+    """Fold one group's count and time span into ``groups``"""
+    group = groups.get(key)
+    if group is None:
+        groups[key] = {"event_count": event_count, "first_seen": first_seen, "last_seen": last_seen}
+        return
+    group["event_count"] += event_count
+    group["first_seen"] = min(group["first_seen"], first_seen)
+    group["last_seen"] = max(group["last_seen"], last_seen)
+
+def _fsync(path: str):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+class _DayFile:
+    """A Parquet file being written for one day and event type"""
+
+    def __init__(self, directory: str, table: str, day: date, event_type: Optional[str], schema, compression: str):
+        pa = require_pyarrow()
+        type_dir = quote(event_type, safe='') if event_type is not None else '__null__'
+        self.path = os.path.join(table, f"date={day.isoformat()}", f"type={type_dir}", f"part-{uuid.uuid4()}.parquet")
+        self.full_path = os.path.join(directory, self.path)
+        os.makedirs(os.path.dirname(self.full_path), exist_ok=True)
+        self.tmp_path = self.full_path + '.tmp'
+        self.event_type = event_type
+        self.schema = schema
+        self.row_count = 0
+        self.min_timestamp = None
+        self.max_timestamp = None
+        self.writer = pa.parquet.ParquetWriter(self.tmp_path, schema, compression=compression)
+
+    def write(self, rows: Rows):
+        """Append rows as one row group"""
+        self.writer.write_batch(record_batch(rows, self.schema))
+        self.row_count += len(rows)
+        timestamps = [row['timestamp'] for row in rows]
+        self.min_timestamp = min([*timestamps, self.min_timestamp or timestamps[0]])
+        self.max_timestamp = max([*timestamps, self.max_timestamp or timestamps[0]])
+
+    def finish(self):
+        """Close the file durably under its final name"""
+        self.writer.close()
+        _fsync(self.tmp_path)
+        os.replace(self.tmp_path, self.full_path)
+
+    def discard(self):
+        """Remove whatever was written, e.g. after the archival transaction failed"""
+        for path in (self.tmp_path, self.full_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+class ColdArchive:
+    """Moves old event days into compressed Parquet files and reads them back.
+
+    Each day is archived in one REPEATABLE READ transaction: its rows are
+    streamed into files, the files are made durable, and then the same
+    snapshot's rows are deleted and the files recorded in the manifest before
+    commit. A file whose transaction failed is never in the manifest and is
+    never read, so a crash at any point loses or duplicates nothing.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        directory: str,
+        after_days: int = 90,
+        compression: str = 'zstd',
+        row_group_size: int = 10000
+    ):
+        require_pyarrow()
+        self.engine = engine
+        self.directory = directory
+        self.after_days = after_days
+        self.compression = compression
+        self.row_group_size = row_group_size
+        self.archived_rows = 0
+        self.files_read = 0
+
+    def cutoff(self, now: Optional[datetime] = None) -> datetime:
+        """Start of the oldest day still kept hot; every archived row is older"""
+        now = now or datetime.now(timezone.utc)
+        return partition_start(now - timedelta(days=self.after_days), DAILY)
+
+    def reaches_archive(self, lower_bound: Optional[datetime]) -> bool:
+        """Whether a read going back to lower_bound (None: all history) can find archived rows"""
+        return lower_bound is None or _utc(lower_bound) < self.cutoff()
+
+    async def archive(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """Archive every day older than the cutoff, oldest first, for each event table"""
+        cutoff = self.cutoff(now)
+        report = {}
+        for name in ARCHIVED_TABLES:
+            report[name] = await self.archive_table(name, cutoff)
+            logger.info(f"Archived {report[name]} rows of {name} older than {cutoff.isoformat()}")
+        return report
+
+    async def archive_table(self, name: str, cutoff: datetime) -> int:
+        """Archive one table day by day until nothing older than the cutoff is left"""
+        table = ARCHIVED_TABLES[name].table
+        archived = 0
+        while True:
+            async with self.engine.connect() as conn:
+                oldest = (await conn.execute(
+                    select(func.min(table.c.timestamp)).where(table.c.timestamp < cutoff)
+                )).scalar()
+            if oldest is None:
+                return archived
+            archived += await self.archive_day(name, partition_start(oldest, DAILY))
+
+    async def archive_day(self, name: str, start: datetime) -> int:
+        """Move one UTC day of a table into Parquet files and record them in the manifest"""
+        spec = ARCHIVED_TABLES[name]
+        table = spec.table
+        end = start + timedelta(days=1)
+        in_day = (table.c.timestamp >= start, table.c.timestamp < end)
+        schema = arrow_schema(table.columns)
+        type_column = table.c[spec.type_column]
+        files: List[_DayFile] = []
+        async with self.engine.connect() as conn:
+            await conn.execution_options(isolation_level='REPEATABLE READ')
+            try:
+                async with conn.begin():
+                    result = await conn.stream(
+                        select(table)
+                        .where(*in_day)
+                        .order_by(
+                            type_column.nulls_last(),
+                            table.c[spec.owner_column],
+                            table.c.timestamp.desc(),
+                            table.c.id.desc()
+                        )
+                        .execution_options(yield_per=self.row_group_size)
+                    )
+                    async for partition in result.mappings().partitions():
+                        rows = [dict(row) for row in partition]
+                        for event_type, group in itertools.groupby(rows, key=lambda row: row[spec.type_column]):
+                            if not files or files[-1].event_type != event_type:
+                                if files:
+                                    await asyncio.to_thread(files[-1].finish)
+                                files.append(await asyncio.to_thread(
+                                    _DayFile, self.directory, name, start.date(), event_type, schema, self.compression
+                                ))
+                            await asyncio.to_thread(files[-1].write, list(group))
+                    if not files:
+                        return 0
+                    await asyncio.to_thread(files[-1].finish)
+
+                    # The snapshot hides rows inserted since the stream began,
+                    # so this deletes exactly the rows that were written out
+                    deleted = (await conn.execute(delete(table).where(*in_day))).rowcount
+                    row_count = sum(f.row_count for f in files)
+                    if deleted != row_count:
+                        raise RuntimeError(f"Archived {row_count} rows of {name} but deleted {deleted}")
+                    await conn.execute(insert(ArchiveManifestEntry), [
+                        {
+                            'dataset': name,
+                            'day': start.date(),
+                            'event_type': f.event_type,
+                            'path': f.path,
+                            'row_count': f.row_count,
+                            'min_timestamp': f.min_timestamp,
+                            'max_timestamp': f.max_timestamp,
+                        }
+                        for f in files
+                    ])
+            except Exception as e:
+                for f in files:
+                    f.discard()
+                logger.error(f"Error archiving {name} for {start.date().isoformat()}: {str(e)}")
+                raise
+        self.archived_rows += row_count
+        return row_count
+
+    async def manifest_entries(
+        self,
+        session: AsyncSession,
+        name: str,
+        lower_bound: Optional[datetime] = None,
+        upper_bound: Optional[datetime] = None,
+        event_type: Optional[str] = None
+    ) -> List[ArchiveManifestEntry]:
+        """Files whose time span overlaps [lower_bound, upper_bound], newest first"""
+        filters = [ArchiveManifestEntry.dataset == name]
+        if lower_bound is not None:
+            filters.append(ArchiveManifestEntry.max_timestamp >= _utc(lower_bound))
+        if upper_bound is not None:
+            filters.append(ArchiveManifestEntry.min_timestamp <= _utc(upper_bound))
+        if event_type is not None:
+            filters.append(ArchiveManifestEntry.event_type == event_type)
+        result = await session.execute(
+            select(ArchiveManifestEntry).where(*filters).order_by(ArchiveManifestEntry.max_timestamp.desc())
+        )
+        return list(result.scalars().all())
+
+    def _expression(
+        self,
+        spec: ArchivedTable,
+        owner: Optional[str],
+        since: Optional[datetime],
+        until: Optional[datetime],
+        cursor: Optional[Keyset]
+    ):
+        """Arrow filter for the row-level predicates, pushed down to row group statistics"""
+        pa = require_pyarrow()
+        import pyarrow.compute as pc
+
+        def moment(value: datetime):
+            return pa.scalar(_utc(value), type=pa.timestamp('us', tz='UTC'))
+
+        timestamp = pc.field('timestamp')
+        conditions = []
+        if owner is not None:
+            conditions.append(pc.field(spec.owner_column) == owner)
+        if since is not None:
+            conditions.append(timestamp >= moment(since))
+        if until is not None:
+            conditions.append(timestamp < moment(until))
+        if cursor is not None:
+            cursor_timestamp, cursor_id = cursor
+            conditions.append(
+                (timestamp < moment(cursor_timestamp))
+                | ((timestamp == moment(cursor_timestamp)) & (pc.field('id') < str(cursor_id)))  # see _row_key
+            )
+        if not conditions:
+            return None
+        expression = conditions[0]
+        for condition in conditions[1:]:
+            expression = expression & condition
+        return expression
+
+    def _decode(self, spec: ArchivedTable, rows: Rows) -> Rows:
+        """Turn JSON text columns back into documents"""
+        for row in rows:
+            for name in spec.json_columns:
+                if name in row and row[name] is not None:
+                    row[name] = json.loads(row[name])
+        return rows
+
+    def _scan(self, path: str, columns: Optional[Sequence[str]], expression, batch_size: int):
+        import pyarrow.dataset as ds
+        self.files_read += 1
+        dataset = ds.dataset(os.path.join(self.directory, path), format='parquet')
+        return dataset.to_batches(columns=list(columns) if columns else None, filter=expression, batch_size=batch_size)
+
+    def _read_file(self, path: str, columns: Sequence[str], expression) -> Rows:
+        rows = []
+        for batch in self._scan(path, columns, expression, self.row_group_size):
+            rows.extend(batch.to_pylist())
+        return rows
+
+    async def read_newest(
+        self,
+        session: AsyncSession,
+        name: str,
+        owner: str,
+        limit: int,
+        columns: Sequence[str],
+        lower_bound: Optional[datetime] = None,
+        cursor: Optional[Keyset] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        event_type: Optional[str] = None,
+        json_filters: Sequence[JsonFilter] = ()
+    ) -> Rows:
+        """Up to ``limit`` newest archived rows of an owner, reading only the files and columns needed.
+
+        Files are visited newest first and the scan stops as soon as no
+        remaining file can hold a row newer than the limit-th one found.
+        """
+        spec = ARCHIVED_TABLES[name]
+        upper_bound = min(
+            (_utc(moment) for moment in (until, cursor[0] if cursor else None) if moment is not None),
+            default=None
+        )
+        entries = await self.manifest_entries(session, name, lower_bound, upper_bound, event_type)
+        # Files hold a single event type, so the manifest already applied event_type
+        expression = self._expression(spec, owner, since, until, cursor)
+        needed = list(dict.fromkeys([*columns, *(f.column for f in json_filters), 'timestamp', 'id']))
+        rows: Rows = []
+        for entry in entries:
+            if len(rows) >= limit and entry.max_timestamp < rows[limit - 1]['timestamp']:
+                break
+            found = self._decode(spec, await asyncio.to_thread(self._read_file, entry.path, needed, expression))
+            found = [row for row in found if all(f.matches(row[f.column]) for f in json_filters)]
+            rows = sorted(rows + found, key=_row_key, reverse=True)[:limit]
+        return [{name: row[name] for name in columns} for row in rows]
+
+    def _aggregate_file(self, path: str, group_column: str, expression):
+        import pyarrow.dataset as ds
+        self.files_read += 1
+        dataset = ds.dataset(os.path.join(self.directory, path), format='parquet')
+        table = dataset.to_table(columns=[group_column, 'timestamp'], filter=expression)
+        return table.group_by(group_column).aggregate(
+            [('timestamp', 'count'), ('timestamp', 'min'), ('timestamp', 'max')]
+        ).to_pylist()
+
+    async def aggregate(
+        self,
+        session: AsyncSession,
+        name: str,
+        owner: str,
+        group_column: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None
+    ) -> Dict[Any, Dict[str, Any]]:
+        """Row count and time span per group_column value of an owner's archived rows.
+
+        Each file is grouped by Arrow reading just the two columns involved, so
+        only the per-group results are ever held as Python objects.
+        """
+        spec = ARCHIVED_TABLES[name]
+        entries = await self.manifest_entries(session, name, since, until)
+        expression = self._expression(spec, owner, since, until, None)
+        groups: Dict[Any, Dict[str, Any]] = {}
+        for entry in entries:
+            for row in await asyncio.to_thread(self._aggregate_file, entry.path, group_column, expression):
+                merge_counts(
+                    groups, row[group_column], row['timestamp_count'], row['timestamp_min'], row['timestamp_max']
+                )
+        return groups
+
+    def _histogram_file(self, path: str, granularity: str, expression):
+        pa = require_pyarrow()
+        import pyarrow.compute as pc
+        import pyarrow.dataset as ds
+        self.files_read += 1
+        dataset = ds.dataset(os.path.join(self.directory, path), format='parquet')
+        timestamps = dataset.to_table(columns=['timestamp'], filter=expression)['timestamp']
+        starts = pa.table({'bucket_start': pc.floor_temporal(timestamps, unit=granularity)})
+        return starts.group_by('bucket_start').aggregate([([], 'count_all')]).to_pylist()
+
+    async def histogram(
+        self,
+        session: AsyncSession,
+        name: str,
+        granularity: str,
+        since: datetime,
+        until: datetime,
+        owner: Optional[str] = None,
+        event_type: Optional[str] = None
+    ) -> Dict[datetime, int]:
+        """Archived row counts per 'minute', 'hour' or 'day' bucket, for one owner or event type"""
+        spec = ARCHIVED_TABLES[name]
+        entries = await self.manifest_entries(session, name, since, until, event_type)
+        expression = self._expression(spec, owner, since, until, None)
+        counts: Dict[datetime, int] = {}
+        for entry in entries:
+            for row in await asyncio.to_thread(self._histogram_file, entry.path, granularity, expression):
+                counts[row['bucket_start']] = counts.get(row['bucket_start'], 0) + row['count_all']
+        return counts
+
+    async def stream(
+        self,
+        session: AsyncSession,
+        name: str,
+        owner: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        event_type: Optional[str] = None,
+        json_filters: Sequence[JsonFilter] = (),
+        chunk_size: int = 5000
+    ) -> AsyncIterator[Rows]:
+        """Archived rows matching an export, chunk_size rows at a time, in no particular order"""
+        spec = ARCHIVED_TABLES[name]
+        entries = await self.manifest_entries(session, name, since, until, event_type)
+        expression = self._expression(spec, owner, since, until, None)
+        for entry in entries:
+            batches = await asyncio.to_thread(self._scan, entry.path, None, expression, chunk_size)
+            while True:
+                batch = await asyncio.to_thread(next, batches, None)
+                if batch is None:
+                    break
+                rows = self._decode(spec, batch.to_pylist())
+                rows = [row for row in rows if all(f.matches(row[f.column]) for f in json_filters)]
+                if rows:
+                    yield rows
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Archive window and activity counters"""
+        return {
+            "enabled": True,
+            "directory": self.directory,
+            "after_days": self.after_days,
+            "cutoff": self.cutoff().isoformat(),
+            "archived_rows": self.archived_rows,
+            "files_read": self.files_read,
+        }
@@ -0,0 +1,64 @@
+import time
+from typing import Any, Dict
+
+from sqlalchemy import exc
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from .metrics import RunningStats
+from app.config.settings import settings
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """Async queue pool that records how long callers wait to check out a connection"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkout_wait_stats = RunningStats()
+        self.checkout_timeouts = 0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.checkout_timeouts += 1
+            raise
+        finally:
+            self.checkout_wait_stats.observe(time.perf_counter() - started)
+
+def async_dsn(dsn: str) -> URL:
+    """Convert a sync DSN to an asyncpg URL carrying the statement cache size"""
+    url = make_url(dsn.replace("postgresql://", "postgresql+asyncpg://"))
+    return url.update_query_dict({
+        "prepared_statement_cache_size": str(settings.DB_STATEMENT_CACHE_SIZE)
+    })
+
+def pool_options() -> Dict[str, Any]:
+    """Engine keyword arguments for a tuned, instrumented connection pool"""
+    return {
+        "poolclass": InstrumentedAsyncQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+def get_pool_metrics(engine: AsyncEngine) -> Dict[str, Any]:
+    """Occupancy, saturation and checkout wait statistics for an engine's pool"""
+    pool = engine.pool
+    capacity = pool.size() + max(pool._max_overflow, 0)
+    checked_out = pool.checkedout()
+    metrics = {
+        "size": pool.size(),
+        "max_overflow": pool._max_overflow,
+        "checked_out": checked_out,
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+        "saturation": checked_out / capacity if capacity else 0.0,
+    }
+    if isinstance(pool, InstrumentedAsyncQueuePool):
+        metrics["checkout_wait_seconds"] = pool.checkout_wait_stats.snapshot()
+        metrics["checkout_timeouts"] = pool.checkout_timeouts
+    return metrics
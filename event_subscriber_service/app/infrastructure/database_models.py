@@ -1,49 +1,237 @@
-from sqlalchemy import Column, String, DateTime, Text, JSON, Integer, Boolean
+from sqlalchemy import Column, String, DateTime, Date, Text, Integer, BigInteger, Boolean, LargeBinary, Index, DDL, event
+from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 from datetime import datetime
-import uuid
+
+from .ids import uuid7, UUID_V7_FUNCTION_SQL
 
 Base = declarative_base()
 
+# Server-side UUIDv7 generator used by ingest statements; init.sql defines the same function
+event.listen(Base.metadata, 'before_create', DDL(UUID_V7_FUNCTION_SQL))
+
 class UserAnalyticsEvent(Base):
     __tablename__ = 'user_analytics_events'
+    __table_args__ = {'postgresql_partition_by': 'RANGE (timestamp)'}
     
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_id = Column(String, nullable=False, index=True)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
+    user_id = Column(String, nullable=False)
     event_type = Column(String, nullable=False)
     page_url = Column(String)
     user_agent = Column(String)
     session_id = Column(String)
-    timestamp = Column(DateTime, nullable=False)
-    event_metadata = Column(JSON)  # Changed from 'metadata' to 'event_metadata'
+    timestamp = Column(DateTime(timezone=True), primary_key=True, nullable=False)  # partition key
+    event_metadata = Column('metadata', JSONB)  # 'metadata' is reserved on declarative models
     processed = Column(Boolean, default=False)
-    created_at = Column(DateTime, default=func.now())
-    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    processed_at = Column(DateTime(timezone=True), default=func.now())
+    created_at = Column(DateTime(timezone=True), default=func.now())
+    updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
 
 class ChemicalResearchEvent(Base):
     __tablename__ = 'chemical_research_events'
+    __table_args__ = {'postgresql_partition_by': 'RANGE (timestamp)'}
     
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     molecule_id = Column(String, nullable=False, index=True)
-    researcher = Column(String, nullable=False, index=True)
-    experiment_type = Column(String, nullable=False)
-    properties = Column(JSON)
-    results = Column(JSON)
-    timestamp = Column(DateTime, nullable=False)
-    event_metadata = Column(JSON)  # Changed from 'metadata' to 'event_metadata'
+    researcher = Column(String, nullable=False)
+    experiment_type = Column(String)
+    data = Column(JSONB)
+    llm_properties = Column(JSONB)  # Extracted properties from LLM
+    properties = Column(JSONB)
+    results = Column(JSONB)
+    timestamp = Column(DateTime(timezone=True), primary_key=True, nullable=False)  # partition key
+    event_metadata = Column('metadata', JSONB)  # 'metadata' is reserved on declarative models
     processed = Column(Boolean, default=False)
-    created_at = Column(DateTime, default=func.now())
-    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    processed_at = Column(DateTime(timezone=True), default=func.now())
+    created_at = Column(DateTime(timezone=True), default=func.now())
+    updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
 
 class EventProcessingStatus(Base):
     __tablename__ = 'event_processing_status'
     
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    event_id = Column(String, nullable=False, index=True)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
+    event_id = Column(UUID(as_uuid=True), nullable=False, index=True)
     event_type = Column(String, nullable=False)
     status = Column(String, nullable=False)  # 'pending', 'processing', 'completed', 'failed'
     error_message = Column(Text)
     retry_count = Column(Integer, default=0)
-    created_at = Column(DateTime, default=func.now())
-    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    created_at = Column(DateTime(timezone=True), default=func.now())
+    updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
+
+# Rollups maintained at ingest, in the same statement that inserts the events,
+# so summaries are exact at any data size without rescanning event rows.
+
+class UserEventRollup(Base):
+    __tablename__ = 'user_event_rollups'
+    
+    user_id = Column(String, primary_key=True)
+    event_type = Column(String, primary_key=True)
+    event_count = Column(BigInteger, nullable=False, default=0)
+    first_seen = Column(DateTime(timezone=True), nullable=False)
+    last_seen = Column(DateTime(timezone=True), nullable=False)
+
+class ResearcherRollup(Base):
+    __tablename__ = 'researcher_rollups'
+    
+    researcher = Column(String, primary_key=True)
+    experiment_count = Column(BigInteger, nullable=False, default=0)
+    first_seen = Column(DateTime(timezone=True), nullable=False)
+    last_seen = Column(DateTime(timezone=True), nullable=False)
+
+class ResearcherMolecule(Base):
+    __tablename__ = 'researcher_molecules'
+    
+    researcher = Column(String, primary_key=True)
+    molecule_id = Column(String, primary_key=True)
+    experiment_count = Column(BigInteger, nullable=False, default=0)
+    first_seen = Column(DateTime(timezone=True), nullable=False)
+    last_seen = Column(DateTime(timezone=True), nullable=False)
+
+# Activity histograms: event counts per subject and time bucket, upserted at
+# ingest like the rollups so long-range charts never scan event rows.
+
+class ActivityBucket(Base):
+    __tablename__ = 'activity_buckets'
+    
+    dimension = Column(String, primary_key=True)  # 'user', 'event_type' or 'researcher'
+    subject = Column(String, primary_key=True)  # the user id, event type or researcher
+    granularity = Column(String, primary_key=True)  # 'minute', 'hour' or 'day'
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)
+    event_count = Column(BigInteger, nullable=False, default=0)
+
+class ActivityBucketCoverage(Base):
+    """Start of the buckets of a dimension and granularity that are complete.
+    
+    Without a row the buckets have been maintained since the first event.
+    Earlier ranges are counted from the event rows instead.
+    """
+    __tablename__ = 'activity_bucket_coverage'
+    
+    dimension = Column(String, primary_key=True)
+    granularity = Column(String, primary_key=True)
+    covered_from = Column(DateTime(timezone=True), nullable=False)
+
+Index(
+    'idx_activity_buckets_granularity_start',
+    ActivityBucket.granularity,
+    ActivityBucket.bucket_start
+)
+
+class DistinctSketch(Base):
+    """HyperLogLog sketch of the distinct values seen for a subject on one UTC day"""
+    __tablename__ = 'distinct_sketches'
+    
+    dimension = Column(String, primary_key=True)  # 'event_type', 'researcher' or 'molecule'
+    subject = Column(String, primary_key=True)  # the event type, researcher or molecule id
+    day = Column(Date, primary_key=True)
+    registers = Column(LargeBinary, nullable=False)  # one byte per register
+
+class TopKItem(Base):
+    """Heavy-hitter count of an item (user, page or molecule) on one UTC day"""
+    __tablename__ = 'top_k_items'
+    
+    dimension = Column(String, primary_key=True)  # 'users', 'pages' or 'molecules'
+    day = Column(Date, primary_key=True)
+    item = Column(Text, primary_key=True)
+    event_count = Column(BigInteger, nullable=False)  # never below the true count
+    error = Column(BigInteger, nullable=False, default=0)  # event_count - error never above it
+
+class TopKWindow(Base):
+    """Largest count trimmed from a dimension's items on a day, which later items start from"""
+    __tablename__ = 'top_k_windows'
+    
+    dimension = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+    floor = Column(BigInteger, nullable=False, default=0)
+
+class UserSession(Base):
+    """A user's session: the events of one session_id, or events at most the inactivity gap apart"""
+    __tablename__ = 'user_sessions'
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
+    user_id = Column(String, nullable=False)
+    session_id = Column(String)  # None for sessions inferred from the inactivity gap
+    started_at = Column(DateTime(timezone=True), nullable=False)
+    ended_at = Column(DateTime(timezone=True), nullable=False)
+    event_count = Column(BigInteger, nullable=False, default=0)
+    page_count = Column(BigInteger, nullable=False, default=0)
+    entry_page = Column(Text)
+    exit_page = Column(Text)
+    user_agent = Column(String)
+
+# Named sessions merge on (user_id, session_id); NULLs never conflict, so
+# inferred sessions are left to the gap rule
+Index('uq_user_sessions_user_session', UserSession.user_id, UserSession.session_id, unique=True)
+Index('idx_user_sessions_user_started_at', UserSession.user_id, UserSession.started_at.desc())
+
+class ArchiveManifestEntry(Base):
+    """A Parquet file in the cold archive holding one day of one event type's rows"""
+    __tablename__ = 'archive_manifest'
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
+    dataset = Column(String, nullable=False)  # source event table
+    day = Column(Date, nullable=False)
+    event_type = Column(String)  # event_type / experiment_type shared by every row in the file
+    path = Column(Text, nullable=False)  # relative to ARCHIVE_DIR
+    row_count = Column(BigInteger, nullable=False)
+    min_timestamp = Column(DateTime(timezone=True), nullable=False)
+    max_timestamp = Column(DateTime(timezone=True), nullable=False)
+    created_at = Column(DateTime(timezone=True), default=func.now())
+
+Index(
+    'idx_archive_manifest_dataset_max_timestamp',
+    ArchiveManifestEntry.dataset,
+    ArchiveManifestEntry.max_timestamp.desc()
+)
+
+class LLMPropertyCacheEntry(Base):
+    """LLM-extracted chemical properties of one data payload, prompt and model version"""
+    __tablename__ = 'llm_property_cache'
+
+    cache_key = Column(String(64), primary_key=True)  # SHA-256 of the canonical payload, prompt and model version
+    model_version = Column(String, nullable=False)
+    properties = Column(JSONB, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+Index('idx_llm_property_cache_expires_at', LLMPropertyCacheEntry.expires_at)
+
+# Composite indexes for the per-user and per-researcher "newest first" reads.
+# They match the ORDER BY exactly (no sort step) and carry the columns the
+# summaries aggregate, so those can be answered with index-only scans.
+Index(
+    'idx_user_analytics_user_timestamp',
+    UserAnalyticsEvent.user_id,
+    UserAnalyticsEvent.timestamp.desc(),
+    UserAnalyticsEvent.id.desc(),
+    postgresql_include=['event_type']
+)
+Index(
+    'idx_chemical_research_researcher_timestamp',
+    ChemicalResearchEvent.researcher,
+    ChemicalResearchEvent.timestamp.desc(),
+    ChemicalResearchEvent.id.desc(),
+    postgresql_include=['molecule_id']
+)
+
+# GIN indexes for JSONB filters. jsonb_path_ops serves containment (@>) and
+# jsonpath (@?) predicates with a smaller, faster index than the default opclass.
+Index(
+    'idx_user_analytics_metadata',
+    UserAnalyticsEvent.event_metadata,
+    postgresql_using='gin',
+    postgresql_ops={'metadata': 'jsonb_path_ops'}
+)
+Index(
+    'idx_chemical_research_data',
+    ChemicalResearchEvent.data,
+    postgresql_using='gin',
+    postgresql_ops={'data': 'jsonb_path_ops'}
+)
+Index(
+    'idx_chemical_research_llm_properties',
+    ChemicalResearchEvent.llm_properties,
+    postgresql_using='gin',
+    postgresql_ops={'llm_properties': 'jsonb_path_ops'}
+)
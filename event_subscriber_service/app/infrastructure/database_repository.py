@@ -1,6 +1,11 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
+from typing import AsyncIterator, List, Dict, Any, Optional, Sequence, Tuple
 from uuid import UUID
+from datetime import date, datetime, timedelta
+
+from .pagination import Keyset
+from .jsonb_filters import JsonFilter
+from .event_analysis import EventColumns
 
 class DatabaseRepository(ABC):
     """Abstract base repository for database operations"""
@@ -14,11 +19,191 @@ class DatabaseRepository(ABC):
         pass
     
     @abstractmethod
-    async def get_user_analytics_events(self, user_id: str, limit: int = 10) -> List[Dict[str, Any]]:
+    async def save_user_analytics_event_with_status(
+        self, event_data: Dict[str, Any], status: str = 'completed', error_message: Optional[str] = None
+    ) -> Tuple[UUID, bool]:
+        pass
+    
+    @abstractmethod
+    async def save_chemical_research_event_with_status(
+        self, event_data: Dict[str, Any], status: str = 'completed', error_message: Optional[str] = None
+    ) -> Tuple[UUID, bool]:
+        pass
+    
+    @abstractmethod
+    async def get_user_analytics_events(
+        self,
+        user_id: str,
+        limit: int = 10,
+        cursor: Optional[Keyset] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        event_type: Optional[str] = None,
+        json_filters: Sequence[JsonFilter] = ()
+    ) -> List[Dict[str, Any]]:
+        pass
+    
+    @abstractmethod
+    async def get_chemical_research_events(
+        self,
+        researcher: str,
+        limit: int = 10,
+        cursor: Optional[Keyset] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        experiment_type: Optional[str] = None,
+        json_filters: Sequence[JsonFilter] = ()
+    ) -> List[Dict[str, Any]]:
+        pass
+    
+    @abstractmethod
+    async def get_user_event_rollups(self, user_id: str) -> List[Dict[str, Any]]:
+        pass
+    
+    @abstractmethod
+    async def get_researcher_rollup(self, researcher: str) -> Optional[Dict[str, Any]]:
+        pass
+    
+    @abstractmethod
+    async def get_user_event_rollups_bulk(self, user_ids: Sequence[str]) -> Dict[str, List[Dict[str, Any]]]:
+        pass
+    
+    @abstractmethod
+    async def get_researcher_rollups_bulk(self, researchers: Sequence[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        pass
+    
+    @abstractmethod
+    async def get_recent_user_analytics_events_bulk(
+        self,
+        user_ids: Sequence[str],
+        limit: int = 10
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        pass
+    
+    @abstractmethod
+    async def get_recent_chemical_research_events_bulk(
+        self,
+        researchers: Sequence[str],
+        limit: int = 10
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        pass
+    
+    @abstractmethod
+    async def get_user_event_counts(
+        self,
+        user_id: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
+        pass
+    
+    @abstractmethod
+    async def get_researcher_counts(
+        self,
+        researcher: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None
+    ) -> Optional[Dict[str, Any]]:
+        pass
+    
+    @abstractmethod
+    async def get_activity_histogram(
+        self,
+        dimension: str,
+        subject: str,
+        granularity: str,
+        since: datetime,
+        until: datetime
+    ) -> List[Dict[str, Any]]:
+        pass
+    
+    @abstractmethod
+    async def raise_sketch_registers(self, updates: List[Dict[str, Any]]):
+        pass
+    
+    @abstractmethod
+    async def get_distinct_sketch(self, dimension: str, subject: str, since: date, until: date) -> Optional[bytes]:
+        pass
+    
+    @abstractmethod
+    async def checkpoint_top_k(self, dimension: str, day: date, counters: List[tuple], capacity: int):
+        pass
+    
+    @abstractmethod
+    async def get_top_items(self, dimension: str, since: date, until: date, k: int) -> List[Dict[str, Any]]:
+        pass
+    
+    @abstractmethod
+    async def write_session_fragments(self, fragments: List[Dict[str, Any]], inactivity_gap: timedelta):
+        pass
+    
+    @abstractmethod
+    async def get_user_sessions(self, user_id: str, since: datetime, until: datetime, limit: int) -> List[Dict[str, Any]]:
+        pass
+    
+    @abstractmethod
+    async def get_user_session_metrics(self, user_id: str, since: datetime, until: datetime) -> Dict[str, Any]:
+        pass
+    
+    @abstractmethod
+    async def prune_activity_buckets(self, granularity: str, retention_days: int, now: Optional[datetime] = None) -> int:
+        pass
+    
+    @abstractmethod
+    async def get_cached_llm_properties(self, cache_key: str, now: datetime) -> Optional[tuple]:
+        pass
+    
+    @abstractmethod
+    async def save_cached_llm_properties(
+        self,
+        cache_key: str,
+        model_version: str,
+        properties: Dict[str, Any],
+        now: datetime,
+        expires_at: datetime
+    ):
+        pass
+    
+    @abstractmethod
+    async def invalidate_cached_llm_properties(self, cache_keys: Optional[Sequence[str]] = None) -> int:
+        pass
+    
+    @abstractmethod
+    async def prune_cached_llm_properties(self, now: Optional[datetime] = None) -> int:
+        pass
+    
+    @abstractmethod
+    def stream_user_analytics_events(
+        self,
+        user_id: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        event_type: Optional[str] = None,
+        json_filters: Sequence[JsonFilter] = (),
+        chunk_size: int = 5000
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        pass
+    
+    @abstractmethod
+    async def load_user_activity(
+        self,
+        since: datetime,
+        until: datetime,
+        event_types: Optional[Sequence[str]] = None,
+        chunk_size: int = 50000
+    ) -> EventColumns:
         pass
     
     @abstractmethod
-    async def get_chemical_research_events(self, researcher: str, limit: int = 10) -> List[Dict[str, Any]]:
+    def stream_chemical_research_events(
+        self,
+        researcher: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        experiment_type: Optional[str] = None,
+        json_filters: Sequence[JsonFilter] = (),
+        chunk_size: int = 5000
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
         pass
     
     @abstractmethod
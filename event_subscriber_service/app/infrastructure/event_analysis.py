@@ -0,0 +1,222 @@
+import hashlib
+import json
+import math
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Funnel and retention analysis over user analytics events.
+#
+# Events are loaded into three int64 columns: a key per user, a code per
+# event type of interest and the epoch time in milliseconds. Postgres sends
+# them as a binary COPY of fixed-width integers, decoded chunk by chunk
+# straight into arrays without a Python object per row; users are keyed by
+# a 64-bit hash of their id. Funnels and retention are then computed on
+# whole columns with sorting, searchsorted and bincount, never per user or
+# per event in Python, so multi-million event analyses take seconds.
+
+PERIODS = {
+    'day': timedelta(days=1),
+    'week': timedelta(weeks=1),
+}
+
+# One row of a binary COPY of (bigint, integer, bigint): the field count,
+# then each field's length and value, all big-endian
+ACTIVITY_ROW = np.dtype([
+    ('fields', '>i2'),
+    ('user_length', '>i4'), ('user_key', '>i8'),
+    ('type_length', '>i4'), ('type_code', '>i4'),
+    ('time_length', '>i4'), ('epoch_ms', '>i8'),
+])
+COPY_SIGNATURE = b'PGCOPY\n\xff\r\n\x00'
+COPY_TRAILER = b'\xff\xff'
+_COPY_HEADER_SIZE = len(COPY_SIGNATURE) + 8  # signature, flags, header extension length
+
+Columns = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+def epoch_ms(moment: datetime) -> int:
+    """Epoch time of a moment in milliseconds"""
+    return round(moment.timestamp() * 1000)
+
+def _rate(part: int, whole: int) -> float:
+    return round(part / whole, 4) if whole else 0.0
+
+class ActivityCopyDecoder:
+    """Decodes a binary COPY of (user key, type code, epoch ms) rows into columns as its bytes arrive"""
+
+    def __init__(self, columns: 'EventColumns'):
+        self.columns = columns
+        self._buffer = bytearray()
+        self._header_read = False
+
+    async def feed(self, data: bytes):
+        """COPY output callback"""
+        self._buffer += data
+        if not self._header_read:
+            if len(self._buffer) < _COPY_HEADER_SIZE:
+                return
+            if not self._buffer.startswith(COPY_SIGNATURE):
+                raise ValueError("Not a binary COPY stream")
+            extension = int.from_bytes(self._buffer[_COPY_HEADER_SIZE - 4:_COPY_HEADER_SIZE], 'big')
+            if len(self._buffer) < _COPY_HEADER_SIZE + extension:
+                return
+            del self._buffer[:_COPY_HEADER_SIZE + extension]
+            self._header_read = True
+        # The two-byte trailer is shorter than a row, so it is never taken for one
+        size = len(self._buffer) // ACTIVITY_ROW.itemsize * ACTIVITY_ROW.itemsize
+        if not size:
+            return
+        rows = np.frombuffer(bytes(self._buffer[:size]), dtype=ACTIVITY_ROW)
+        del self._buffer[:size]
+        if (rows['fields'] != 3).any() or (rows['type_length'] != 4).any():
+            raise ValueError("Unexpected row in activity COPY stream")
+        self.columns.add(rows['user_key'], rows['type_code'], rows['epoch_ms'])
+
+    def finish(self):
+        """Check the stream ended after a whole number of rows"""
+        if bytes(self._buffer) != COPY_TRAILER:
+            raise ValueError("Truncated activity COPY stream")
+
+class EventColumns:
+    """User analytics events as NumPy columns, gathered one chunk at a time"""
+
+    def __init__(self):
+        self._chunks: List[Columns] = []
+
+    def add(self, user_keys: np.ndarray, type_codes: np.ndarray, times: np.ndarray):
+        """Add a chunk of (user key, type code, epoch ms) columns"""
+        self._chunks.append((
+            user_keys.astype(np.int64), type_codes.astype(np.int64), times.astype(np.int64)
+        ))
+
+    def arrays(self) -> Columns:
+        """(dense user codes, type codes, epoch milliseconds) of every chunk added"""
+        if not self._chunks:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, empty
+        keys, types, times = (np.concatenate(column) for column in zip(*self._chunks))
+        return dense_codes(keys), types, times
+
+def dense_codes(keys: np.ndarray) -> np.ndarray:
+    """Codes 0..n-1 for the n distinct keys, by one sort"""
+    order = np.argsort(keys, kind='stable')
+    ordered = keys[order]
+    codes = np.empty(len(keys), dtype=np.int64)
+    codes[order] = np.cumsum(np.r_[True, ordered[1:] != ordered[:-1]]) - 1
+    return codes
+
+def funnel_counts(users: np.ndarray, steps: np.ndarray, times: np.ndarray, step_count: int, window_ms: int) -> np.ndarray:
+    """Users completing each prefix of an ordered funnel within the window.
+
+    A user reaches step k when some event of the first step is followed
+    by events of steps 2..k, each strictly later than the one before and
+    all within window_ms of the first. From every first-step event the
+    earliest next step is chased for all users at once, and each user
+    keeps the furthest step any of their starts reached.
+    """
+    if not len(users):
+        return np.zeros(step_count, dtype=np.int64)
+    offsets = times - times.min()
+    # One key per event sorts by user, then time; a user's keys plus the
+    # window never reach the next user's
+    span = int(offsets.max()) + window_ms + 1
+    if (int(users.max()) + 1) * span >= 2 ** 62:
+        raise ValueError("Too many users over too long a range for one funnel")
+    keys = users * span + offsets
+    step_keys = [np.sort(keys[steps == step]) for step in range(step_count)]
+    starts = step_keys[0]
+    deadline = starts + window_ms
+    current = starts
+    reached = np.ones(len(starts), dtype=np.int64)
+    alive = np.ones(len(starts), dtype=bool)
+    for step in range(1, step_count):
+        candidates = step_keys[step]
+        if not len(candidates):
+            break
+        position = np.searchsorted(candidates, current, side='right')
+        following = candidates[np.minimum(position, len(candidates) - 1)]
+        alive &= (position < len(candidates)) & (following <= deadline)
+        reached[alive] = step + 1
+        current = np.where(alive, following, current)
+    furthest = np.zeros(int(users.max()) + 1, dtype=np.int64)
+    np.maximum.at(furthest, starts // span, reached)
+    # Users whose furthest step is exactly k, then at least k
+    exactly = np.bincount(furthest, minlength=step_count + 1)
+    return np.cumsum(exactly[::-1])[::-1][1:]
+
+def retention_matrix(users: np.ndarray, times: np.ndarray, since_ms: int, period_ms: int, period_count: int) -> np.ndarray:
+    """Users of each cohort active in each later period.
+
+    A user's cohort is the period of their first event in the range.
+    Row c, column k counts cohort c's users with an event k periods later,
+    so column 0 holds the cohort sizes.
+    """
+    if not len(users):
+        return np.zeros((period_count, period_count), dtype=np.int64)
+    period = (times - since_ms) // period_ms
+    # Each (user, period) pair once, sorted by user then period, so a
+    # user's first pair holds their cohort
+    pairs = np.sort(users * period_count + period)
+    pairs = pairs[np.r_[True, pairs[1:] != pairs[:-1]]]
+    pair_users, pair_periods = np.divmod(pairs, period_count)
+    starts = np.flatnonzero(np.r_[True, pair_users[1:] != pair_users[:-1]])
+    cohorts = np.repeat(pair_periods[starts], np.diff(np.r_[starts, len(pairs)]))
+    cells = np.bincount(cohorts * period_count + (pair_periods - cohorts), minlength=period_count * period_count)
+    return cells.reshape(period_count, period_count)
+
+def period_count(since: datetime, until: datetime, period: str) -> int:
+    """Periods of a length starting at since needed to cover [since, until)"""
+    return max(0, math.ceil((until - since) / PERIODS[period]))
+
+def analysis_key(analysis: str, **params) -> str:
+    """Cache key for an analysis request"""
+    canonical = json.dumps({"analysis": analysis, **params}, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+def funnel_payload(steps: Sequence[str], since: datetime, until: datetime, window_seconds: float, counts: np.ndarray) -> Dict[str, Any]:
+    """Users reaching each step, with conversion from the first and the previous step"""
+    counts = [int(count) for count in counts]
+    return {
+        "since": since.isoformat(),
+        "until": until.isoformat(),
+        "window_seconds": window_seconds,
+        "steps": [
+            {
+                "event_type": event_type,
+                "users": count,
+                "conversion_rate": _rate(count, counts[0]),
+                "step_conversion_rate": _rate(count, counts[index - 1] if index else counts[0]),
+            }
+            for index, (event_type, count) in enumerate(zip(steps, counts))
+        ],
+    }
+
+def retention_payload(
+    since: datetime,
+    until: datetime,
+    period: str,
+    event_type: Optional[str],
+    matrix: np.ndarray
+) -> Dict[str, Any]:
+    """Cohorts with the users retained, and their share, in each period they have been around for"""
+    periods = len(matrix)
+    cohorts = []
+    for cohort in range(periods):
+        size = int(matrix[cohort, 0])
+        if not size:
+            continue
+        retained = [int(count) for count in matrix[cohort, :periods - cohort]]
+        cohorts.append({
+            "cohort_start": (since + cohort * PERIODS[period]).isoformat(),
+            "users": size,
+            "retained": retained,
+            "retention_rates": [round(count / size, 4) for count in retained],
+        })
+    return {
+        "since": since.isoformat(),
+        "until": until.isoformat(),
+        "period": period,
+        "event_type": event_type,
+        "cohorts": cohorts,
+    }
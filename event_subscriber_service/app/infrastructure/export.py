@@ -0,0 +1,158 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Sequence
+from uuid import UUID
+
+from sqlalchemy import Boolean, Column, DateTime, Integer, BigInteger
+
+# Bulk export encoders. Each consumes row chunks from the repository's
+# server-side cursor and yields encoded bytes chunk by chunk, so memory use
+# is bounded by the chunk size rather than the size of the export.
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'arrow': 'application/vnd.apache.arrow.stream',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+ARROW_FORMATS = ('arrow', 'parquet')
+
+Rows = List[Dict[str, Any]]
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _flat_value(value: Any) -> Any:
+    """Scalar form of a column value for CSV cells and Arrow string columns"""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=_json_default)
+    if isinstance(value, UUID):
+        return str(value)
+    return value
+
+def require_pyarrow():
+    """Import pyarrow on first use; it is only needed for Arrow and Parquet exports"""
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError as e:
+        raise RuntimeError("Arrow and Parquet exports require the pyarrow package") from e
+    return pyarrow
+
+async def encode_ndjson(chunks: AsyncIterator[Rows]) -> AsyncIterator[bytes]:
+    """One JSON object per line"""
+    async for rows in chunks:
+        yield ''.join(json.dumps(row, default=_json_default) + '\n' for row in rows).encode()
+
+async def encode_csv(chunks: AsyncIterator[Rows], columns: Sequence[str]) -> AsyncIterator[bytes]:
+    """CSV with a header row; JSON columns are written as JSON text"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    async for rows in chunks:
+        for row in rows:
+            writer.writerow([
+                value.isoformat() if isinstance(value, datetime) else _flat_value(value)
+                for value in (row[name] for name in columns)
+            ])
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+def arrow_schema(columns: Sequence[Column]):
+    """Fixed Arrow schema for table columns, so every chunk encodes identically"""
+    pa = require_pyarrow()
+    fields = []
+    for column in columns:
+        if isinstance(column.type, DateTime):
+            arrow_type = pa.timestamp('us', tz='UTC')
+        elif isinstance(column.type, Boolean):
+            arrow_type = pa.bool_()
+        elif isinstance(column.type, (Integer, BigInteger)):
+            arrow_type = pa.int64()
+        else:
+            # Strings, UUIDs and JSONB documents (as JSON text)
+            arrow_type = pa.string()
+        fields.append(pa.field(column.name, arrow_type))
+    return pa.schema(fields)
+
+def record_batch(rows: Rows, schema):
+    """Arrow record batch of rows in a fixed schema"""
+    pa = require_pyarrow()
+    arrays = []
+    for field in schema:
+        values = [row[field.name] for row in rows]
+        if pa.types.is_string(field.type):
+            values = [_flat_value(value) for value in values]
+        arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands back whatever was written since the last drain"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+async def encode_arrow(chunks: AsyncIterator[Rows], columns: Sequence[Column]) -> AsyncIterator[bytes]:
+    """Arrow IPC stream, one record batch per chunk"""
+    pa = require_pyarrow()
+    schema = arrow_schema(columns)
+    sink = _ChunkSink()
+    writer = pa.ipc.new_stream(sink, schema)
+    async for rows in chunks:
+        writer.write_batch(record_batch(rows, schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+async def encode_parquet(chunks: AsyncIterator[Rows], columns: Sequence[Column]) -> AsyncIterator[bytes]:
+    """Parquet file, one row group per chunk"""
+    pa = require_pyarrow()
+    schema = arrow_schema(columns)
+    sink = _ChunkSink()
+    writer = pa.parquet.ParquetWriter(sink, schema)
+    async for rows in chunks:
+        writer.write_batch(record_batch(rows, schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+def encode_export(export_format: str, chunks: AsyncIterator[Rows], columns: Sequence[Column]) -> AsyncIterator[bytes]:
+    """Byte stream for an export in one of EXPORT_FORMATS"""
+    if export_format == 'ndjson':
+        return encode_ndjson(chunks)
+    if export_format == 'csv':
+        return encode_csv(chunks, [column.name for column in columns])
+    if export_format == 'arrow':
+        return encode_arrow(chunks, columns)
+    if export_format == 'parquet':
+        return encode_parquet(chunks, columns)
+    raise ValueError(f"Unsupported export format: {export_format}")
@@ -0,0 +1,242 @@
+import heapq
+import itertools
+import logging
+import time
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, literal, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from .database_models import TopKItem, TopKWindow
+from .sketches import sketch_day
+
+logger = logging.getLogger(__name__)
+
+# Top-K heavy hitters ("most active users", "most viewed pages", "most
+# studied molecules") per UTC day, without scanning event tables.
+#
+# Each worker counts the events it ingests in a Space-Saving summary per
+# dimension and day, and periodically adds those counts to the day's table
+# in the database. The table is then trimmed back to the heaviest items;
+# the largest count trimmed becomes the day's *floor*, which an item that
+# arrives later may have lost, so it starts from the floor like a
+# Space-Saving eviction. Every stored count is at most `error` above the
+# true count of events seen, and dashboards read one bounded table per day.
+
+# Dimension -> (event type feeding it, path of the counted item in the event,
+# event type value the event must have, if any)
+TOP_K_DIMENSIONS = {
+    'users': ('user_analytics', ('user_id',), None),
+    'pages': ('user_analytics', ('metadata', 'page'), 'page_view'),
+    'molecules': ('chemical_research', ('molecule_id',), None),
+}
+
+def event_item(dimension: str, event_type: str, event_data: Dict[str, Any]) -> Optional[str]:
+    """The item an event counts towards in a dimension, if any"""
+    feeding_type, path, only_event_type = TOP_K_DIMENSIONS[dimension]
+    if feeding_type != event_type:
+        return None
+    if only_event_type is not None and event_data.get('event_type') != only_event_type:
+        return None
+    value: Any = event_data
+    for key in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return None if value is None else str(value)
+
+class SpaceSaving:
+    """Space-Saving summary: approximate counts of the heaviest items in bounded memory.
+
+    Once capacity items are tracked, a new item replaces the one with the
+    lowest count and inherits that count as its error, so any item counted
+    more than the lowest tracked count is guaranteed to be present.
+
+    The lightest item is found with a min-heap of (count, insertion order,
+    item) entries. An add pushes a fresh entry instead of updating the old
+    one, which goes stale and is skipped when it reaches the top; the heap
+    is rebuilt from the counters once stale entries outnumber them. Adds
+    therefore take O(log capacity) amortized, evictions included.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.counters: Dict[str, List[int]] = {}  # item -> [count, error]
+        self._inserted: Dict[str, int] = {}  # item -> insertion order, the tie-break among equal counts
+        self._heap: List[Tuple[int, int, str]] = []
+        self._order = itertools.count()
+
+    def add(self, item: str, count: int = 1, error: int = 0):
+        counter = self.counters.get(item)
+        if counter is not None:
+            counter[0] += count
+            counter[1] += error
+            self._push(item)
+            return
+        if len(self.counters) >= self.capacity:
+            floor = self._evict()
+            count, error = count + floor, error + floor
+        self.counters[item] = [count, error]
+        self._inserted[item] = next(self._order)
+        self._push(item)
+
+    def _push(self, item: str):
+        if len(self._heap) >= 2 * self.capacity + 16:
+            self._heap = [(counter[0], self._inserted[key], key) for key, counter in self.counters.items()]
+            heapq.heapify(self._heap)
+        else:
+            heapq.heappush(self._heap, (self.counters[item][0], self._inserted[item], item))
+
+    def _evict(self) -> int:
+        """Drop the lightest item, the earliest tracked among equals, and return its count"""
+        while True:
+            count, inserted, item = heapq.heappop(self._heap)
+            counter = self.counters.get(item)
+            if counter is not None and counter[0] == count and self._inserted[item] == inserted:
+                del self.counters[item]
+                del self._inserted[item]
+                return count
+
+    def items(self) -> List[Tuple[str, int, int]]:
+        """(item, count, error), heaviest first"""
+        return sorted(
+            ((item, count, error) for item, (count, error) in self.counters.items()),
+            key=lambda entry: (-entry[1], entry[0])
+        )
+
+def checkpoint_statements(dimension: str, day: date, counters: List[Tuple[str, int, int]], floor: int, capacity: int) -> list:
+    """Add a summary's counts to a day's stored items, then trim it to capacity.
+
+    New items start from the day's floor. The trim returns the counts it
+    deleted so the caller can raise the floor to the largest of them.
+    """
+    upsert = pg_insert(TopKItem).values([
+        {"dimension": dimension, "day": day, "item": item, "event_count": count + floor, "error": error + floor}
+        for item, count, error in counters
+    ])
+    table = TopKItem.__table__
+    upsert = upsert.on_conflict_do_update(
+        index_elements=['dimension', 'day', 'item'],
+        set_={
+            'event_count': table.c.event_count + upsert.excluded.event_count - literal(floor),
+            'error': table.c.error + upsert.excluded.error - literal(floor),
+        }
+    )
+    overflow = (
+        select(TopKItem.item)
+        .where(TopKItem.dimension == dimension, TopKItem.day == day)
+        .order_by(TopKItem.event_count.desc(), TopKItem.item)
+        .offset(capacity)
+    )
+    trim = (
+        delete(TopKItem)
+        .where(TopKItem.dimension == dimension, TopKItem.day == day, TopKItem.item.in_(overflow))
+        .returning(TopKItem.event_count)
+    )
+    return [upsert, trim]
+
+def lock_window_statement(dimension: str, day: date):
+    """Create or lock a day's window row and return its floor; concurrent checkpoints of the day queue here"""
+    statement = pg_insert(TopKWindow).values(dimension=dimension, day=day, floor=0)
+    return statement.on_conflict_do_update(
+        index_elements=['dimension', 'day'],
+        set_={'floor': TopKWindow.__table__.c.floor}
+    ).returning(TopKWindow.floor)
+
+def raise_floor_statement(dimension: str, day: date, floor: int):
+    """Raise a day's floor to the largest count just trimmed"""
+    return (
+        update(TopKWindow)
+        .where(TopKWindow.dimension == dimension, TopKWindow.day == day)
+        .values(floor=func.greatest(TopKWindow.floor, floor))
+    )
+
+def top_items_query(dimension: str, since: date, until: date, k: int):
+    """Heaviest items over the days [since, until], summed across days"""
+    count = func.sum(TopKItem.event_count).label('event_count')
+    return (
+        select(TopKItem.item, count, func.sum(TopKItem.error).label('error'))
+        .where(TopKItem.dimension == dimension, TopKItem.day >= since, TopKItem.day <= until)
+        .group_by(TopKItem.item)
+        .order_by(count.desc(), TopKItem.item)
+        .limit(k)
+    )
+
+class TopKTracker:
+    """Ingest listener counting heavy hitters and checkpointing them to the database.
+
+    Counts are kept in memory until CHECKPOINT_EVENTS events or
+    CHECKPOINT_INTERVAL seconds have accumulated, and on worker shutdown.
+    A failed checkpoint keeps its counts for the next one.
+    """
+
+    def __init__(self, database_repo, capacity: int = 1000, checkpoint_interval: float = 10.0, checkpoint_events: int = 1000):
+        self.database_repo = database_repo
+        self.capacity = capacity
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint_events = checkpoint_events
+        self._summaries: Dict[Tuple[str, date], SpaceSaving] = {}
+        self._pending_events = 0
+        self._last_checkpoint = time.monotonic()
+        self.checkpoints = 0
+
+    async def event_ingested(self, event_type: str, event_data: Dict[str, Any]):
+        """Count an event towards each dimension it belongs to"""
+        day = None
+        for dimension in TOP_K_DIMENSIONS:
+            item = event_item(dimension, event_type, event_data)
+            if item is None:
+                continue
+            day = day or sketch_day(event_data['timestamp'])
+            summary = self._summaries.get((dimension, day))
+            if summary is None:
+                summary = self._summaries[(dimension, day)] = SpaceSaving(self.capacity)
+            summary.add(item)
+        self._pending_events += 1
+        if (
+            self._pending_events >= self.checkpoint_events
+            or time.monotonic() - self._last_checkpoint >= self.checkpoint_interval
+        ):
+            await self.checkpoint()
+
+    async def checkpoint(self):
+        """Add the counts gathered since the last checkpoint to the database"""
+        summaries, self._summaries = self._summaries, {}
+        self._pending_events = 0
+        self._last_checkpoint = time.monotonic()
+        for key in sorted(summaries):
+            dimension, day = key
+            try:
+                await self.database_repo.checkpoint_top_k(dimension, day, summaries[key].items(), self.capacity)
+                self.checkpoints += 1
+            except Exception as e:
+                logger.error(f"Error checkpointing top-K counts: {str(e)}")
+                self._restore({k: summaries[k] for k in sorted(summaries) if k >= key})
+                raise
+
+    def _restore(self, summaries: Dict[Tuple[str, date], SpaceSaving]):
+        for key, summary in summaries.items():
+            current = self._summaries.setdefault(key, SpaceSaving(self.capacity))
+            for item, count, error in summary.items():
+                current.add(item, count, error)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Checkpoints written and counts still held in memory"""
+        return {
+            "checkpoints": self.checkpoints,
+            "pending_events": self._pending_events,
+            "tracked_windows": len(self._summaries),
+        }
+
+def top_payload(dimension: str, since: date, until: date, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Ranked items with the count range each is known to lie in"""
+    return {
+        "dimension": dimension,
+        "since": since.isoformat(),
+        "until": until.isoformat(),
+        "items": [
+            {"item": item["item"], "count": item["event_count"], "guaranteed_count": item["event_count"] - item["error"]}
+            for item in items
+        ],
+    }
@@ -0,0 +1,153 @@
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import DateTime, String, delete, func, literal, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from .database_models import ActivityBucket, ActivityBucketCoverage, ChemicalResearchEvent, UserAnalyticsEvent
+
+# Time-bucketed activity counts for charts. Every ingest statement folds its
+# new events into per-minute, per-hour and per-day buckets for each
+# dimension below, so a chart reads one row per bucket however many events
+# it covers. Ranges the buckets do not cover (history from before they were
+# introduced, or minute buckets past retention) are counted from the event
+# rows with date_trunc instead.
+
+# Dimension -> (event type feeding it, event column naming the subject)
+HISTOGRAM_DIMENSIONS = {
+    'user': ('user_analytics', 'user_id'),
+    'event_type': ('user_analytics', 'event_type'),
+    'researcher': ('chemical_research', 'researcher'),
+}
+
+GRANULARITIES = {
+    'minute': timedelta(minutes=1),
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+}
+
+_EVENT_MODELS = {
+    'user_analytics': UserAnalyticsEvent,
+    'chemical_research': ChemicalResearchEvent,
+}
+
+def _utc(moment: datetime) -> datetime:
+    return moment.astimezone(timezone.utc) if moment.tzinfo is not None else moment.replace(tzinfo=timezone.utc)
+
+def floor_bucket(moment: datetime, granularity: str) -> datetime:
+    """Start (UTC) of the bucket containing a moment"""
+    moment = _utc(moment)
+    if granularity == 'day':
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(second=0, microsecond=0)
+
+def ceil_bucket(moment: datetime, granularity: str) -> datetime:
+    """End (UTC) of the bucket containing a moment, or the moment itself on a boundary"""
+    start = floor_bucket(moment, granularity)
+    return start if start == _utc(moment) else start + GRANULARITIES[granularity]
+
+def bucket_count(since: datetime, until: datetime, granularity: str) -> int:
+    """Number of buckets a histogram over [since, until) spans, 0 for an empty range"""
+    if _utc(until) <= _utc(since):
+        return 0
+    span = ceil_bucket(until, granularity) - floor_bucket(since, granularity)
+    return int(span / GRANULARITIES[granularity])
+
+def _truncate(granularity: str, timestamp):
+    # The three-argument form truncates in UTC whatever the session time zone
+    return func.date_trunc(granularity, timestamp, 'UTC', type_=DateTime(timezone=True))
+
+def _bucket_upsert(dimension: str, column: str, granularity: str, source):
+    """Fold a batch of new events into one dimension's buckets of one granularity"""
+    subject = source.c[column]
+    start = _truncate(granularity, source.c.timestamp)
+    statement = pg_insert(ActivityBucket).from_select(
+        ['dimension', 'subject', 'granularity', 'bucket_start', 'event_count'],
+        select(literal(dimension, String), subject, literal(granularity, String), start, func.count())
+        .group_by(subject, start)
+        # Same key order in every batch, so concurrent upserts cannot deadlock
+        .order_by(subject, start)
+    )
+    return statement.on_conflict_do_update(
+        index_elements=['dimension', 'subject', 'granularity', 'bucket_start'],
+        set_={'event_count': ActivityBucket.__table__.c.event_count + statement.excluded.event_count}
+    )
+
+def bucket_upserts(event_type: str, source) -> list:
+    """Bucket statements for events of a type, read from a CTE or VALUES source"""
+    return [
+        _bucket_upsert(dimension, column, granularity, source)
+        for dimension, (feeding_type, column) in HISTOGRAM_DIMENSIONS.items() if feeding_type == event_type
+        for granularity in GRANULARITIES
+    ]
+
+def bucket_counts_query(dimension: str, subject: str, granularity: str, since: datetime, until: datetime):
+    """Stored bucket counts over [since, until), served by the bucket primary key"""
+    return (
+        select(ActivityBucket.bucket_start, ActivityBucket.event_count)
+        .where(
+            ActivityBucket.dimension == dimension,
+            ActivityBucket.subject == subject,
+            ActivityBucket.granularity == granularity,
+            ActivityBucket.bucket_start >= since,
+            ActivityBucket.bucket_start < until
+        )
+        .order_by(ActivityBucket.bucket_start)
+    )
+
+def event_counts_query(dimension: str, subject: str, granularity: str, since: datetime, until: datetime):
+    """Bucket counts over [since, until) computed from the event rows with date_trunc"""
+    event_type, column = HISTOGRAM_DIMENSIONS[dimension]
+    model = _EVENT_MODELS[event_type]
+    start = _truncate(granularity, model.timestamp).label('bucket_start')
+    return (
+        select(start, func.count().label('event_count'))
+        .where(getattr(model, column) == subject, model.timestamp >= since, model.timestamp < until)
+        .group_by(start)
+        .order_by(start)
+    )
+
+def coverage_query(dimension: str, granularity: str):
+    """When the complete buckets of a dimension and granularity start, if not from the first event"""
+    return select(ActivityBucketCoverage.covered_from).where(
+        ActivityBucketCoverage.dimension == dimension,
+        ActivityBucketCoverage.granularity == granularity
+    )
+
+def prune_statements(granularity: str, cutoff: datetime) -> list:
+    """Drop buckets older than cutoff and move their coverage up to it"""
+    statements = [
+        delete(ActivityBucket).where(
+            ActivityBucket.granularity == granularity,
+            ActivityBucket.bucket_start < cutoff
+        )
+    ]
+    for dimension in HISTOGRAM_DIMENSIONS:
+        upsert = pg_insert(ActivityBucketCoverage).values(
+            dimension=dimension, granularity=granularity, covered_from=cutoff
+        )
+        statements.append(upsert.on_conflict_do_update(
+            index_elements=['dimension', 'granularity'],
+            set_={'covered_from': func.greatest(
+                ActivityBucketCoverage.__table__.c.covered_from, upsert.excluded.covered_from
+            )}
+        ))
+    return statements
+
+def split_by_coverage(
+    since: datetime,
+    until: datetime,
+    covered_from: Optional[datetime]
+) -> Dict[str, Optional[tuple]]:
+    """Split [since, until) into the part counted from events and the part read from buckets"""
+    split = since if covered_from is None else min(max(since, _utc(covered_from)), until)
+    return {
+        'events': (since, split) if split > since else None,
+        'buckets': (split, until) if until > split else None,
+    }
+
+def histogram_payload(counts: Dict[datetime, int]) -> List[Dict[str, object]]:
+    """Non-empty buckets, oldest first"""
+    return [{"start": start.isoformat(), "count": counts[start]} for start in sorted(counts)]
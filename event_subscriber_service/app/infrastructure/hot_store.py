@@ -0,0 +1,346 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence
+from uuid import UUID
+
+import numpy as np
+
+from .live_hub import live_redis_url
+from .pagination import Keyset
+from .read_routing import primary_reads_required
+
+logger = logging.getLogger(__name__)
+
+# Recent events held in memory by each API process.
+#
+# Every committed event reaches the API processes through the live channel
+# (see live_hub.py); each process also appends it to a ring buffer of NumPy
+# columns per dataset, holding the newest HOT_STORE_CAPACITY events. Owner,
+# type and molecule columns are dictionary-encoded to integer codes, so a
+# query is a few vectorized comparisons over the columns and only the
+# matching rows' payloads are touched.
+#
+# The store only answers what it has every event for. Its coverage starts
+# when it (re)subscribes to the channel, since anything published while it
+# was not listening is lost, and moves past the time of every event the
+# ring overwrites. Queries reaching before the coverage return None and the
+# caller reads the database instead, as do requests asking to read their
+# own writes, since the channel trails the commit. Redelivered events are
+# not published, and an event id already in the ring is skipped anyway, so
+# counts agree with the database rollups.
+
+# Dataset -> dictionary-encoded columns: owner, type, then any others
+HOT_DATASETS = {
+    'user_analytics': ('user_id', 'event_type'),
+    'chemical_research': ('researcher', 'experiment_type', 'molecule_id'),
+}
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+_LOW_BITS = (1 << 64) - 1
+
+def _utc(value) -> datetime:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return value.astimezone(timezone.utc) if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+def _micros(moment: datetime) -> int:
+    return (_utc(moment) - _EPOCH) // _MICROSECOND
+
+def event_payload(event_type: str, event_data: Dict[str, Any], timestamp: datetime, processed_at: datetime) -> Dict[str, Any]:
+    """API representation of an ingested event, as the events endpoints return it from the database"""
+    if event_type == 'user_analytics':
+        return {
+            "id": str(event_data['event_id']),
+            "user_id": event_data['user_id'],
+            "event_type": event_data['event_type'],
+            "page_url": event_data.get('page_url'),
+            "timestamp": timestamp.isoformat(),
+            "metadata": event_data.get('metadata', {}),
+            "processed_at": processed_at.isoformat()
+        }
+    return {
+        "id": str(event_data['event_id']),
+        "molecule_id": event_data['molecule_id'],
+        "researcher": event_data['researcher'],
+        "experiment_type": event_data.get('experiment_type'),
+        "data": event_data.get('data', {}),
+        "timestamp": timestamp.isoformat(),
+        "llm_properties": event_data.get('llm_properties'),
+        "properties": event_data.get('properties', {}),
+        "results": event_data.get('results', {}),
+        "processed_at": processed_at.isoformat()
+    }
+
+class Dictionary:
+    """Dense integer codes for a column's values"""
+
+    def __init__(self, values: Sequence[Any] = ()):
+        self.values = list(values)
+        self.codes = {value: code for code, value in enumerate(self.values)}
+
+    def encode(self, value) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def code(self, value) -> int:
+        """Code of a value, -1 if no event has had it"""
+        return self.codes.get(value, -1)
+
+class EventRing:
+    """The newest events of a dataset in fixed-size NumPy columns, oldest overwritten first"""
+
+    def __init__(self, capacity: int, columns: Sequence[str]):
+        self.capacity = capacity
+        self.columns = tuple(columns)
+        self.times = np.zeros(capacity, dtype=np.int64)  # epoch microseconds
+        # Ids as two unsigned halves compare like Postgres compares uuids
+        self.id_high = np.zeros(capacity, dtype=np.uint64)
+        self.id_low = np.zeros(capacity, dtype=np.uint64)
+        self.codes = {name: np.zeros(capacity, dtype=np.int32) for name in self.columns}
+        self.dictionaries = {name: Dictionary() for name in self.columns}
+        self.payloads = np.empty(capacity, dtype=object)
+        self.size = 0
+        self._next = 0
+        # Slot of each stored event id, so a repeated event is held once
+        self._slots: Dict[int, int] = {}
+        self.duplicates = 0
+        # Epoch microseconds from which every event is here; None until fed
+        self.covered_since: Optional[int] = None
+
+    def restart(self, moment: datetime):
+        """Events before a moment may be missing, e.g. after missing some of the feed"""
+        self.covered_since = max(self.covered_since or 0, _micros(moment))
+
+    def append(self, event_id: UUID, timestamp: datetime, values: Dict[str, Any], payload: Dict[str, Any]):
+        if event_id.int in self._slots:
+            self.duplicates += 1
+            return
+        slot = self._next
+        if self.size == self.capacity:
+            # Events up to the one overwritten may now be missing
+            self.covered_since = max(self.covered_since or 0, int(self.times[slot]) + 1)
+            del self._slots[(int(self.id_high[slot]) << 64) | int(self.id_low[slot])]
+        else:
+            self.size += 1
+        self._slots[event_id.int] = slot
+        self.times[slot] = _micros(timestamp)
+        self.id_high[slot], self.id_low[slot] = event_id.int >> 64, event_id.int & _LOW_BITS
+        for name in self.columns:
+            self.codes[name][slot] = self.dictionaries[name].encode(values.get(name))
+        self.payloads[slot] = payload
+        self._next = (slot + 1) % self.capacity
+        if any(len(dictionary.values) > 2 * self.capacity for dictionary in self.dictionaries.values()):
+            self._compact()
+
+    def _compact(self):
+        """Drop dictionary values no stored event has any more"""
+        for name in self.columns:
+            live = np.unique(self.codes[name][:self.size])
+            remap = np.full(len(self.dictionaries[name].values), -1, dtype=np.int32)
+            remap[live] = np.arange(len(live), dtype=np.int32)
+            self.codes[name][:self.size] = remap[self.codes[name][:self.size]]
+            self.dictionaries[name] = Dictionary([self.dictionaries[name].values[code] for code in live])
+
+    def covers(self, since: Optional[datetime]) -> bool:
+        """Whether every event from since on is here"""
+        return self.covered_since is not None and since is not None and _micros(since) >= self.covered_since
+
+    def select(
+        self,
+        filters: Dict[str, Any],
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        cursor: Optional[Keyset] = None
+    ) -> np.ndarray:
+        """Slots of the events matching every filter in [since, until), after the cursor"""
+        size = self.size
+        mask = np.ones(size, dtype=bool)
+        for name, value in filters.items():
+            code = self.dictionaries[name].code(value)
+            if code < 0:
+                return np.zeros(0, dtype=np.int64)
+            mask &= self.codes[name][:size] == code
+        times = self.times[:size]
+        if since is not None:
+            mask &= times >= _micros(since)
+        if until is not None:
+            mask &= times < _micros(until)
+        if cursor is not None:
+            # (timestamp, id) < cursor, continuing a newest-first page
+            cursor_time, cursor_id = _micros(cursor[0]), cursor[1].int
+            high, low = np.uint64(cursor_id >> 64), np.uint64(cursor_id & _LOW_BITS)
+            earlier_id = (self.id_high[:size] < high) | ((self.id_high[:size] == high) & (self.id_low[:size] < low))
+            mask &= (times < cursor_time) | ((times == cursor_time) & earlier_id)
+        return np.flatnonzero(mask)
+
+    def newest(self, filters: Dict[str, Any], limit: int, cursor: Optional[Keyset], since: Optional[datetime], until: Optional[datetime]) -> Optional[List[Dict[str, Any]]]:
+        """Page of matching events, newest first, or None unless the page is known complete"""
+        if self.covered_since is None:
+            return None
+        slots = self.select(filters, since, until, cursor)
+        order = np.lexsort((self.id_low[slots], self.id_high[slots], self.times[slots]))[::-1]
+        page = slots[order[:limit]]
+        # Missing events are older than the coverage, so a page is complete
+        # when its range starts inside it or it filled up with covered events
+        if not self.covers(since) and (len(page) < limit or self.times[page[-1]] < self.covered_since):
+            return None
+        return list(self.payloads[page])
+
+    def group_counts(self, filters: Dict[str, Any], group: str, since: datetime, until: Optional[datetime]) -> Dict[Any, Dict[str, Any]]:
+        """Event count and first and last event time per value of a column"""
+        slots = self.select(filters, since, until)
+        if not len(slots):
+            return {}
+        order = np.argsort(self.codes[group][slots], kind='stable')
+        codes, times = self.codes[group][slots][order], self.times[slots][order]
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        counts = np.diff(np.r_[starts, len(codes)])
+        firsts, lasts = np.minimum.reduceat(times, starts), np.maximum.reduceat(times, starts)
+        values = self.dictionaries[group].values
+        return {
+            values[codes[start]]: {
+                "event_count": int(count),
+                "first_seen": _EPOCH + int(first) * _MICROSECOND,
+                "last_seen": _EPOCH + int(last) * _MICROSECOND,
+            }
+            for start, count, first, last in zip(starts, counts, firsts, lasts)
+        }
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            "events": self.size,
+            "capacity": self.capacity,
+            "covered_since": (
+                (_EPOCH + self.covered_since * _MICROSECOND).isoformat() if self.covered_since is not None else None
+            ),
+            "dictionary_sizes": {name: len(dictionary.values) for name, dictionary in self.dictionaries.items()},
+            "duplicates_skipped": self.duplicates,
+        }
+
+class HotStore:
+    """Relay listener keeping the newest events of each dataset in memory for recent-window reads.
+
+    Event pages come back as None when the store cannot answer them
+    exactly; counts are only asked for windows it covers(). Either way the
+    caller reads the database otherwise.
+    """
+
+    def __init__(self, capacity: int = 100000):
+        self.rings = {dataset: EventRing(capacity, columns) for dataset, columns in HOT_DATASETS.items()}
+        self.hits = 0
+        self.misses = 0
+
+    def feed_started(self):
+        """The relay (re)subscribed: whatever was published before may be missing"""
+        now = datetime.now(timezone.utc)
+        for ring in self.rings.values():
+            ring.restart(now)
+
+    async def event_ingested(self, event_type: str, event_data: Dict[str, Any]):
+        """Append a committed event to its dataset's ring"""
+        ring = self.rings.get(event_type)
+        if ring is None:
+            return
+        now = datetime.now(timezone.utc)
+        try:
+            timestamp = _utc(event_data['timestamp'])
+            payload = event_payload(event_type, event_data, timestamp, now)
+            ring.append(UUID(str(event_data['event_id'])), timestamp, event_data, payload)
+        except (KeyError, TypeError, ValueError) as e:
+            # An event the store cannot hold leaves a hole at its time
+            logger.warning(f"Cannot hold {event_type} event in hot store: {str(e)}")
+            ring.restart(now)
+
+    def covers(self, dataset: str, since: Optional[datetime]) -> bool:
+        """Whether the store has every event of a dataset from since on, so a window from since can be counted here"""
+        covered = not primary_reads_required() and self.rings[dataset].covers(since)
+        self._count(covered)
+        return covered
+
+    def _count(self, answered: bool):
+        if answered:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def _newest(self, dataset: str, filters: Dict[str, Any], limit: int, cursor, since, until):
+        events = None
+        if not primary_reads_required():
+            events = self.rings[dataset].newest(
+                {name: value for name, value in filters.items() if value is not None}, limit, cursor, since, until
+            )
+        self._count(events is not None)
+        return events
+
+    def user_events(
+        self,
+        user_id: str,
+        limit: int = 10,
+        cursor: Optional[Keyset] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        event_type: Optional[str] = None
+    ) -> Optional[List[Dict[str, Any]]]:
+        """A user's events, newest first, like PostgreSQLRepository.get_user_analytics_events"""
+        return self._newest('user_analytics', {'user_id': user_id, 'event_type': event_type}, limit, cursor, since, until)
+
+    def researcher_events(
+        self,
+        researcher: str,
+        limit: int = 10,
+        cursor: Optional[Keyset] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        experiment_type: Optional[str] = None
+    ) -> Optional[List[Dict[str, Any]]]:
+        """A researcher's events, newest first, like PostgreSQLRepository.get_chemical_research_events"""
+        return self._newest(
+            'chemical_research', {'researcher': researcher, 'experiment_type': experiment_type}, limit, cursor, since, until
+        )
+
+    def user_event_counts(self, user_id: str, since: datetime, until: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Per event_type counters for a user over a covered window, like PostgreSQLRepository.get_user_event_counts"""
+        groups = self.rings['user_analytics'].group_counts({'user_id': user_id}, 'event_type', since, until)
+        return [
+            {
+                "event_type": event_type,
+                "event_count": group["event_count"],
+                "first_seen": group["first_seen"].isoformat(),
+                "last_seen": group["last_seen"].isoformat()
+            }
+            for event_type, group in groups.items()
+        ]
+
+    def researcher_counts(self, researcher: str, since: datetime, until: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+        """Experiment counter and molecules for a researcher over a covered window, like PostgreSQLRepository.get_researcher_counts"""
+        groups = self.rings['chemical_research'].group_counts({'researcher': researcher}, 'molecule_id', since, until)
+        if not groups:
+            return None
+        return {
+            "experiment_count": sum(group["event_count"] for group in groups.values()),
+            "first_seen": min(group["first_seen"] for group in groups.values()).isoformat(),
+            "last_seen": max(group["last_seen"] for group in groups.values()).isoformat(),
+            "molecules": sorted(groups)
+        }
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Per dataset fill and coverage, and reads answered or passed to the database"""
+        return {
+            "enabled": True,
+            "hits": self.hits,
+            "misses": self.misses,
+            "datasets": {dataset: ring.get_metrics() for dataset, ring in self.rings.items()},
+        }
+
+def build_hot_store(settings) -> Optional[HotStore]:
+    """Hot store for an API process, or None when disabled or without the live channel to feed it"""
+    if not settings.HOT_STORE_ENABLED:
+        return None
+    if not (settings.LIVE_ENABLED and live_redis_url(settings)):
+        logger.warning("HOT_STORE_ENABLED needs live streaming to feed it; hot store disabled")
+        return None
+    return HotStore(settings.HOT_STORE_CAPACITY)
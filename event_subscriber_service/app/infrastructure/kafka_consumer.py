@@ -2,7 +2,7 @@ from confluent_kafka import Consumer, KafkaError
 import json
 import logging
 import asyncio
-from typing import Dict, Any, Callable
+from typing import Dict, Any, Callable, List, Optional
 from app.config.settings import settings
 
 logger = logging.getLogger(__name__)
@@ -10,8 +10,16 @@ logger = logging.getLogger(__name__)
 class KafkaEventConsumer:
     """Kafka consumer for processing events"""
     
-    def __init__(self, event_handler: Callable[[Dict[str, Any]], None]):
+    def __init__(
+        self,
+        event_handler: Callable[[Dict[str, Any]], None],
+        batch_handler: Optional[Callable[[List[Dict[str, Any]]], Any]] = None,
+        batch_size: int = 100
+    ):
         self.event_handler = event_handler
+        # When set, receives the events of each consume() call together instead
+        self.batch_handler = batch_handler
+        self.batch_size = batch_size
         self.consumer = Consumer({
             'bootstrap.servers': settings.KAFKA_BOOTSTRAP_SERVERS,
             'group.id': settings.KAFKA_GROUP_ID,
@@ -30,6 +38,10 @@ class KafkaEventConsumer:
         
         try:
             while self.running:
+                if self.batch_handler is not None:
+                    self._consume_batch()
+                    continue
+                
                 msg = self.consumer.poll(timeout=1.0)
                 
                 if msg is None:
@@ -61,6 +73,27 @@ class KafkaEventConsumer:
             self.consumer.close()
             logger.info("Kafka consumer closed")
     
+    def _consume_batch(self):
+        """Hand the decodable events of up to batch_size messages to the batch handler"""
+        events = []
+        for msg in self.consumer.consume(num_messages=self.batch_size, timeout=1.0):
+            if msg.error():
+                if msg.error().code() != KafkaError._PARTITION_EOF:
+                    logger.error(f"Consumer error: {msg.error()}")
+                continue
+            try:
+                events.append(json.loads(msg.value().decode('utf-8')))
+            except json.JSONDecodeError as e:
+                logger.error(f"Failed to decode message: {str(e)}")
+        if not events:
+            return
+        
+        logger.info(f"Received batch of {len(events)} events")
+        try:
+            self.batch_handler(events)
+        except Exception as e:
+            logger.error(f"Error processing batch of {len(events)} events: {str(e)}")
+    
     def stop_consuming(self):
         """Stop consuming messages"""
         self.running = False
@@ -0,0 +1,217 @@
+import asyncio
+import json
+import logging
+from typing import Any, Dict, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Live fan-out of newly stored events to dashboards.
+#
+# Workers publish every committed event to a Redis channel. Each API process
+# runs one bridge subscribed to that channel, which hands the events to an
+# in-process hub. The hub copies each event into the bounded queue of every
+# matching subscriber (an SSE or WebSocket client). A client that lets its
+# queue fill up is evicted instead of slowing down publishing or growing
+# memory without bound; it can reconnect and catch up through the regular
+# event endpoints.
+
+# Subscription filter -> event field it matches
+LIVE_FILTERS = ('user_id', 'researcher', 'event_type')
+
+DEFAULT_CHANNEL = 'live_events'
+
+_EVICTED = object()
+
+class SubscriberEvicted(Exception):
+    """The subscriber's buffer overflowed and it was dropped from the hub"""
+
+class Subscription:
+    """One client's filtered view of the hub, with a bounded buffer"""
+
+    def __init__(self, hub: 'LiveHub', filters: Dict[str, str], max_buffer: int):
+        self.hub = hub
+        self.filters = filters
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_buffer)
+        self.evicted = False
+
+    def matches(self, event_data: Dict[str, Any]) -> bool:
+        """Whether an event has every field the subscription filters on"""
+        return all(event_data.get(field) == value for field, value in self.filters.items())
+
+    def _offer(self, message: Dict[str, Any]) -> bool:
+        """Buffer a message; False (and the client evicted) if the buffer is full"""
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            # Drop what is buffered so the client learns of its eviction at once
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(_EVICTED)
+            self.evicted = True
+            return False
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Next message, or None if none arrives within timeout"""
+        try:
+            message = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if message is _EVICTED:
+            raise SubscriberEvicted()
+        return message
+
+    def close(self):
+        """Stop receiving events"""
+        self.hub.unsubscribe(self)
+
+class LiveHub:
+    """In-process pub/sub hub delivering events to filtered, bounded subscriptions"""
+
+    def __init__(self, max_buffer: int = 100):
+        self.max_buffer = max_buffer
+        self._subscriptions = set()
+        self.published = 0
+        self.delivered = 0
+        self.evicted = 0
+
+    def subscribe(self, filters: Optional[Dict[str, str]] = None) -> Subscription:
+        """Start receiving events whose fields equal every given filter"""
+        subscription = Subscription(self, {k: v for k, v in (filters or {}).items() if v is not None}, self.max_buffer)
+        self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscriptions.discard(subscription)
+
+    def publish(self, event_type: str, event_data: Dict[str, Any]):
+        """Deliver a stored event to every matching subscriber without waiting on any of them"""
+        self.published += 1
+        message = {"type": "event", "event_type": event_type, "event": event_data}
+        for subscription in list(self._subscriptions):
+            if not subscription.matches(event_data):
+                continue
+            if subscription._offer(message):
+                self.delivered += 1
+            else:
+                self.evicted += 1
+                self.unsubscribe(subscription)
+                logger.warning(f"Evicted slow live subscriber with filters {subscription.filters}")
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Subscriber and delivery counters"""
+        return {
+            "enabled": True,
+            "subscribers": len(self._subscriptions),
+            "published": self.published,
+            "delivered": self.delivered,
+            "evicted": self.evicted,
+        }
+
+class LiveEventPublisher:
+    """Ingest listener publishing each committed event to the live channel"""
+
+    def __init__(self, redis, channel: str = DEFAULT_CHANNEL):
+        self.redis = redis
+        self.channel = channel
+
+    async def event_ingested(self, event_type: str, event_data: Dict[str, Any]):
+        """Publish a committed event for the API processes to relay"""
+        await self.redis.publish(self.channel, json.dumps({"event_type": event_type, "event": event_data}, default=str))
+
+    async def close(self):
+        """Release the Redis connection pool"""
+        await self.redis.aclose()
+
+class LiveBridge:
+    """Feeds a hub from the live channel, resubscribing after Redis errors.
+
+    Listeners get every relayed event through event_ingested, like the
+    workers' ingest listeners, and feed_started on every (re)subscription,
+    before which they may have missed events.
+    """
+
+    def __init__(
+        self,
+        redis,
+        hub: LiveHub,
+        channel: str = DEFAULT_CHANNEL,
+        retry_delay: float = 1.0,
+        listeners: Sequence[Any] = ()
+    ):
+        self.redis = redis
+        self.hub = hub
+        self.channel = channel
+        self.retry_delay = retry_delay
+        self.listeners = list(listeners)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start relaying the channel into the hub in the background"""
+        self._task = asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                pubsub = self.redis.pubsub()
+                await pubsub.subscribe(self.channel)
+                for listener in self.listeners:
+                    listener.feed_started()
+                try:
+                    async for message in pubsub.listen():
+                        if message.get('type') != 'message':
+                            continue
+                        payload = json.loads(message['data'])
+                        self.hub.publish(payload['event_type'], payload['event'])
+                        await self._notify(payload['event_type'], payload['event'])
+                finally:
+                    await pubsub.aclose()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Live channel unavailable, resubscribing: {str(e)}")
+                await asyncio.sleep(self.retry_delay)
+
+    async def _notify(self, event_type: str, event_data: Dict[str, Any]):
+        for listener in self.listeners:
+            try:
+                await listener.event_ingested(event_type, event_data)
+            except Exception as e:
+                logger.warning(f"Live relay listener failed for {event_type} event: {str(e)}")
+
+    async def close(self):
+        """Stop listening and release the Redis connection pool"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await self.redis.aclose()
+
+def live_redis_url(settings) -> Optional[str]:
+    """Redis for the live channel: LIVE_REDIS_URL, else the Celery broker when it is Redis"""
+    if settings.LIVE_REDIS_URL:
+        return settings.LIVE_REDIS_URL
+    if settings.CELERY_BROKER_URL.startswith(('redis://', 'rediss://')):
+        return settings.CELERY_BROKER_URL
+    return None
+
+def _redis_client(settings, **options):
+    url = live_redis_url(settings) if settings.LIVE_ENABLED else None
+    if not url:
+        return None
+    from redis.asyncio import Redis
+    return Redis.from_url(url, **options)
+
+def build_live_publisher(settings) -> Optional[LiveEventPublisher]:
+    """Worker-side publisher, or None when live streaming is disabled or has no Redis"""
+    # A stalled Redis must not hold up ingest for long
+    client = _redis_client(settings, socket_timeout=settings.LIVE_PUBLISH_TIMEOUT)
+    return LiveEventPublisher(client, settings.LIVE_CHANNEL) if client is not None else None
+
+def build_live_bridge(settings, hub: LiveHub, listeners: Sequence[Any] = ()) -> Optional[LiveBridge]:
+    """API-side bridge into a hub, or None when live streaming is disabled or has no Redis"""
+    # No socket timeout: the subscription sits idle whenever ingest does
+    client = _redis_client(settings)
+    return LiveBridge(client, hub, settings.LIVE_CHANNEL, listeners=listeners) if client is not None else None
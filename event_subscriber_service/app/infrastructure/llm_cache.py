@@ -0,0 +1,216 @@
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Sequence
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from .database_models import LLMPropertyCacheEntry
+from .llm_service import HTTPLLMService, LLMService
+from .metrics import RunningStats
+
+logger = logging.getLogger(__name__)
+
+# Cache of LLM chemical property extraction.
+#
+# Researchers resubmit the same data payloads over and over, and every
+# extraction is a slow, paid LLM call. Results are keyed by a hash of the
+# canonical JSON of the payload together with the prompt template and the
+# model version, so a new prompt or model never reuses an old answer. A
+# Postgres table shares results between workers for LLM_CACHE_TTL; a
+# bounded in-process LRU in front of it answers repeated payloads without
+# a query. Local entries live at most LLM_CACHE_LOCAL_TTL, so an explicit
+# invalidation, which deletes the shared rows, reaches every worker within
+# that time.
+
+def properties_cache_key(chemical_data: Dict[str, Any], prompt: str, model_version: str) -> str:
+    """SHA-256 of the canonical JSON of a data payload, prompt and model version"""
+    canonical = json.dumps(
+        {"data": chemical_data, "prompt": prompt, "model_version": model_version},
+        sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+def cached_properties_query(cache_key: str, now: datetime):
+    """The unexpired properties stored under a key, served by the primary key"""
+    return select(LLMPropertyCacheEntry.properties, LLMPropertyCacheEntry.expires_at).where(
+        LLMPropertyCacheEntry.cache_key == cache_key,
+        LLMPropertyCacheEntry.expires_at > now
+    )
+
+def cached_properties_upsert(cache_key: str, model_version: str, properties: Dict[str, Any], now: datetime, expires_at: datetime):
+    """Store properties under a key, replacing an older or expired entry"""
+    statement = pg_insert(LLMPropertyCacheEntry).values(
+        cache_key=cache_key,
+        model_version=model_version,
+        properties=properties,
+        created_at=now,
+        expires_at=expires_at
+    )
+    return statement.on_conflict_do_update(
+        index_elements=[LLMPropertyCacheEntry.cache_key],
+        set_={
+            'model_version': statement.excluded.model_version,
+            'properties': statement.excluded.properties,
+            'created_at': statement.excluded.created_at,
+            'expires_at': statement.excluded.expires_at,
+        }
+    )
+
+def cached_properties_delete(cache_keys: Optional[Sequence[str]] = None):
+    """Delete the entries under some keys, or every entry"""
+    statement = delete(LLMPropertyCacheEntry)
+    if cache_keys is not None:
+        statement = statement.where(LLMPropertyCacheEntry.cache_key.in_(list(cache_keys)))
+    return statement
+
+def expired_properties_delete(now: datetime):
+    """Delete the entries that expired before now"""
+    return delete(LLMPropertyCacheEntry).where(LLMPropertyCacheEntry.expires_at <= now)
+
+class CachedLLMService(LLMService):
+    """An LLM service behind an in-process LRU and a shared Postgres cache.
+
+    Concurrent extractions of the same payload within a process share one
+    lookup and at most one LLM call. Failed calls are not cached: the LLM is
+    called through request_chemical_properties, which raises on failure, and
+    the wrapped service's fallback properties are returned uncached instead.
+    When the shared tier is unreachable, extraction goes straight to the LLM.
+    """
+
+    def __init__(
+        self,
+        llm_service,
+        database_repo,
+        prompt: str,
+        model_version: str,
+        ttl: float = 2592000.0,
+        local_ttl: float = 300.0,
+        max_entries: int = 1024
+    ):
+        self.llm_service = llm_service
+        self.database_repo = database_repo
+        self.prompt = prompt
+        self.model_version = model_version
+        self.ttl = ttl
+        self.local_ttl = local_ttl
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.errors = 0
+        self.fallbacks = 0
+        self.llm_latency_stats = RunningStats()
+
+    def cache_key(self, chemical_data: Dict[str, Any]) -> str:
+        """Key of a data payload under this service's prompt and model version"""
+        return properties_cache_key(chemical_data, self.prompt, self.model_version)
+
+    async def extract_chemical_properties(self, chemical_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Cached properties of a payload, extracting them with the LLM on a miss"""
+        key = self.cache_key(chemical_data)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(key)
+            self.local_hits += 1
+            return copy.deepcopy(entry[1])
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key, chemical_data))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        try:
+            properties = await asyncio.shield(task)
+        except Exception as e:
+            # Fallback properties are returned as they are and never cached
+            properties = await self.llm_service.fallback_chemical_properties(chemical_data, e)
+            self.fallbacks += 1
+            logger.error(f"Error calling LLM service, returning uncached fallback properties: {str(e)}")
+            return properties
+        # Callers get their own copy, as they add it to the event they store
+        return copy.deepcopy(properties)
+
+    async def _load(self, key: str, chemical_data: Dict[str, Any]) -> Dict[str, Any]:
+        now = datetime.now(timezone.utc)
+        try:
+            cached = await self.database_repo.get_cached_llm_properties(key, now)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"LLM property cache unavailable, calling the LLM: {str(e)}")
+            cached = None
+        if cached is not None:
+            properties, expires_at = cached
+            self.shared_hits += 1
+            self._store_local(key, properties, (expires_at - now).total_seconds())
+            return properties
+
+        self.misses += 1
+        started = time.monotonic()
+        properties = await self.llm_service.request_chemical_properties(chemical_data)
+        self.llm_latency_stats.observe(time.monotonic() - started)
+        try:
+            await self.database_repo.save_cached_llm_properties(
+                key, self.model_version, properties, now, now + timedelta(seconds=self.ttl)
+            )
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Error storing LLM property cache entry: {str(e)}")
+        self._store_local(key, properties, self.ttl)
+        return properties
+
+    def _store_local(self, key: str, properties: Dict[str, Any], ttl: float):
+        self._entries[key] = (time.monotonic() + min(ttl, self.local_ttl), properties)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def invalidate(self, chemical_data: Optional[Dict[str, Any]] = None) -> int:
+        """Drop the cached properties of one payload, or of every payload; returns the shared entries deleted"""
+        self.invalidations += 1
+        if chemical_data is None:
+            self._entries.clear()
+            return await self.database_repo.invalidate_cached_llm_properties()
+        key = self.cache_key(chemical_data)
+        self._entries.pop(key, None)
+        return await self.database_repo.invalidate_cached_llm_properties([key])
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Hit, miss and error counters, and the latency of the LLM calls made on misses"""
+        lookups = self.local_hits + self.shared_hits + self.misses
+        return {
+            "enabled": True,
+            "model_version": self.model_version,
+            "local_entries": len(self._entries),
+            "local_hits": self.local_hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.local_hits + self.shared_hits) / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "errors": self.errors,
+            "fallbacks": self.fallbacks,
+            "llm_latency_seconds": self.llm_latency_stats.snapshot(),
+        }
+
+def build_llm_cache(settings, llm_service, database_repo) -> Optional[CachedLLMService]:
+    """LLM service with cached extraction configured from settings, or None when caching is disabled"""
+    if not settings.LLM_CACHE_ENABLED:
+        return None
+    return CachedLLMService(
+        llm_service,
+        database_repo,
+        prompt=HTTPLLMService.PROMPT_TEMPLATE,
+        model_version=settings.LLM_MODEL_VERSION,
+        ttl=settings.LLM_CACHE_TTL,
+        local_ttl=settings.LLM_CACHE_LOCAL_TTL,
+        max_entries=settings.LLM_CACHE_LOCAL_MAX_ENTRIES
+    )
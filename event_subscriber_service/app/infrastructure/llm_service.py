@@ -1,8 +1,11 @@
 from abc import ABC, abstractmethod
+from datetime import datetime, timezone
 from typing import Dict, Any
 import logging
 import asyncio
 
+import httpx
+
 logger = logging.getLogger(__name__)
 
 class LLMService(ABC):
@@ -12,10 +15,46 @@ class LLMService(ABC):
     async def extract_chemical_properties(self, chemical_data: Dict[str, Any]) -> Dict[str, Any]:
         """Extract chemical properties using LLM"""
         pass
+    
+    async def request_chemical_properties(self, chemical_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Extract chemical properties, raising instead of falling back when the LLM fails"""
+        return await self.extract_chemical_properties(chemical_data)
+    
+    async def fallback_chemical_properties(self, chemical_data: Dict[str, Any], error: Exception) -> Dict[str, Any]:
+        """Properties to use when the LLM failed with error; re-raises it when there is no fallback"""
+        raise error
 
-class MockLLMService:
+class MockLLMService(LLMService):
     """Mock LLM service for testing purposes"""
     
+    MODEL_VERSION = "mock-1.0"
+    
+    # Canned properties of the formulas in the sample data
+    KNOWN_PROPERTIES = {
+        "H2O": {"color": "colorless", "ph": 7.0, "boiling_point": "100°C", "state": "liquid"},
+        "NaCl": {"color": "white", "ph": 7.0, "boiling_point": "1465°C", "state": "solid"},
+        "CO2": {"color": "colorless", "ph": None, "boiling_point": "-78.5°C", "state": "gas"},
+    }
+    
+    async def close(self):
+        """Nothing to release"""
+        pass
+    
+    async def extract_chemical_properties(self, chemical_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Mock property extraction: canned properties of known formulas, unknown otherwise"""
+        await asyncio.sleep(0.1)  # Simulate processing time
+        
+        properties = self.KNOWN_PROPERTIES.get(
+            chemical_data.get("formula"),
+            {"color": "unknown", "ph": None, "boiling_point": None, "state": chemical_data.get("state")}
+        )
+        return {
+            **properties,
+            "confidence_score": 0.95,
+            "analysis_timestamp": datetime.now(timezone.utc).isoformat(),
+            "model_version": self.MODEL_VERSION
+        }
+    
     async def analyze_user_behavior(self, event_data: Dict[str, Any]) -> Dict[str, Any]:
         """Mock user behavior analysis"""
         await asyncio.sleep(0.1)  # Simulate processing time
@@ -51,43 +90,111 @@ class MockLLMService:
         }
 
 class HTTPLLMService(LLMService):
-    """HTTP-based LLM service implementation"""
+    """HTTP-based LLM service implementation.
+
+    Requests share one long-lived client, so they reuse pooled keep-alive
+    connections instead of paying TCP and TLS setup on every call. The
+    client is created on first use, on the event loop that uses it, and
+    released by close().
+    """
+    
+    # Part of the key of cached extractions (see app/infrastructure/llm_cache.py)
+    PROMPT_TEMPLATE = "Extract chemical properties for: {chemical_data}"
     
-    def __init__(self, api_url: str, api_key: str = None):
+    def __init__(
+        self,
+        api_url: str,
+        api_key: str = None,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        http2: bool = False,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 30.0,
+        write_timeout: float = 10.0,
+        pool_timeout: float = 5.0
+    ):
         self.api_url = api_url
         self.api_key = api_key
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.timeout = httpx.Timeout(
+            connect=connect_timeout, read=read_timeout, write=write_timeout, pool=pool_timeout
+        )
+        self.http2 = http2 and _http2_available()
+        self._client = None
     
-    async def extract_chemical_properties(self, chemical_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Extract chemical properties using external LLM API"""
-        import httpx
-        
-        try:
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
             headers = {"Content-Type": "application/json"}
             if self.api_key:
                 headers["Authorization"] = f"Bearer {self.api_key}"
-            
-            payload = {
-                "prompt": f"Extract chemical properties for: {chemical_data}",
-                "chemical_data": chemical_data
-            }
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.api_url}/extract-properties",
-                    json=payload,
-                    headers=headers,
-                    timeout=30.0
-                )
-                response.raise_for_status()
-                return response.json()
+            self._client = httpx.AsyncClient(
+                headers=headers, limits=self.limits, timeout=self.timeout, http2=self.http2
+            )
+        return self._client
+    
+    async def close(self):
+        """Close the pooled connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    async def request_chemical_properties(self, chemical_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Extract chemical properties with the external LLM API, raising on failure"""
+        payload = {
+            "prompt": self.PROMPT_TEMPLATE.format(chemical_data=chemical_data),
+            "chemical_data": chemical_data
+        }
+        
+        response = await self._get_client().post(f"{self.api_url}/extract-properties", json=payload)
+        response.raise_for_status()
+        return response.json()
+    
+    async def fallback_chemical_properties(self, chemical_data: Dict[str, Any], error: Exception) -> Dict[str, Any]:
+        """Mock properties used when the LLM API fails"""
+        mock_service = MockLLMService()
+        return await mock_service.extract_chemical_properties(chemical_data)
+    
+    async def extract_chemical_properties(self, chemical_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Extract chemical properties using external LLM API"""
+        try:
+            return await self.request_chemical_properties(chemical_data)
                 
         except httpx.HTTPError as e:
             logger.error(f"HTTP error calling LLM service: {str(e)}")
             # Fallback to mock service
-            mock_service = MockLLMService()
-            return await mock_service.extract_chemical_properties(chemical_data)
+            return await self.fallback_chemical_properties(chemical_data, e)
         except Exception as e:
             logger.error(f"Error calling LLM service: {str(e)}")
             # Fallback to mock service
-            mock_service = MockLLMService()
-            return await mock_service.extract_chemical_properties(chemical_data)
+            return await self.fallback_chemical_properties(chemical_data, e)
+
+def _http2_available() -> bool:
+    """Whether the h2 package httpx needs for HTTP/2 is installed"""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.warning("HTTP/2 for the LLM service requires the h2 package; using HTTP/1.1")
+        return False
+    return True
+
+def build_llm_service(settings):
+    """LLM service configured from settings: pooled HTTP client for 'http', else the mock"""
+    if settings.LLM_PROVIDER != 'http':
+        return MockLLMService()
+    return HTTPLLMService(
+        settings.LLM_API_URL,
+        settings.LLM_API_KEY,
+        max_connections=settings.LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY,
+        http2=settings.LLM_HTTP2,
+        connect_timeout=settings.LLM_CONNECT_TIMEOUT,
+        read_timeout=settings.LLM_READ_TIMEOUT,
+        write_timeout=settings.LLM_WRITE_TIMEOUT,
+        pool_timeout=settings.LLM_POOL_TIMEOUT
+    )
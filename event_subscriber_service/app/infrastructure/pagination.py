@@ -0,0 +1,24 @@
+import base64
+import json
+from datetime import datetime
+from typing import Tuple, Union
+from uuid import UUID
+
+# Position of the last row a client has seen, in (timestamp DESC, id DESC) order
+Keyset = Tuple[datetime, UUID]
+
+def encode_cursor(timestamp: Union[datetime, str], event_id: Union[UUID, str]) -> str:
+    """Opaque page token for the row at (timestamp, id)"""
+    if isinstance(timestamp, datetime):
+        timestamp = timestamp.isoformat()
+    payload = json.dumps([timestamp, str(event_id)], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor: str) -> Keyset:
+    """Recover the (timestamp, id) keyset from a page token, raising ValueError if malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, event_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(timestamp.replace('Z', '+00:00')), UUID(event_id)
+    except (TypeError, ValueError, AttributeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
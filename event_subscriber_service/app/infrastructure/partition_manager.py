@@ -0,0 +1,170 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+import re
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+# Event tables that are range-partitioned on their timestamp column
+PARTITIONED_TABLES = ('user_analytics_events', 'chemical_research_events')
+
+DAILY = 'daily'
+MONTHLY = 'monthly'
+
+def partition_start(moment: datetime, interval: str) -> datetime:
+    """Start (inclusive, UTC) of the partition that contains a moment"""
+    moment = moment.astimezone(timezone.utc)
+    if interval == MONTHLY:
+        return datetime(moment.year, moment.month, 1, tzinfo=timezone.utc)
+    return datetime(moment.year, moment.month, moment.day, tzinfo=timezone.utc)
+
+def next_partition_start(start: datetime, interval: str) -> datetime:
+    """Start of the partition following the one beginning at start"""
+    if interval == MONTHLY:
+        if start.month == 12:
+            return start.replace(year=start.year + 1, month=1)
+        return start.replace(month=start.month + 1)
+    return start + timedelta(days=1)
+
+def partition_name(table: str, start: datetime, interval: str) -> str:
+    """Child table name, e.g. user_analytics_events_p20240101 or ..._p202401"""
+    suffix = start.strftime('%Y%m') if interval == MONTHLY else start.strftime('%Y%m%d')
+    return f"{table}_p{suffix}"
+
+def parse_partition_name(table: str, name: str) -> Optional[Tuple[datetime, datetime]]:
+    """Recover the [start, end) range of a managed partition from its name"""
+    match = re.fullmatch(rf"{re.escape(table)}_p(\d{{6}}|\d{{8}})", name)
+    if not match:
+        return None
+    suffix = match.group(1)
+    if len(suffix) == 6:
+        start = datetime.strptime(suffix, '%Y%m').replace(tzinfo=timezone.utc)
+        return start, next_partition_start(start, MONTHLY)
+    start = datetime.strptime(suffix, '%Y%m%d').replace(tzinfo=timezone.utc)
+    return start, next_partition_start(start, DAILY)
+
+class PartitionManager:
+    """Maintains timestamp range partitions for the event tables.
+
+    Each run makes sure the current and the next ``premake`` partitions exist
+    and removes partitions that lie entirely before the retention cutoff,
+    either by dropping them or by detaching them for external archival.
+    Rows that landed in the default partition before their range existed are
+    moved into the new partition when it is created.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        interval: str = DAILY,
+        premake: int = 7,
+        retention_days: Optional[int] = None,
+        retention_action: str = 'drop'
+    ):
+        if interval not in (DAILY, MONTHLY):
+            raise ValueError(f"Unsupported partition interval: {interval}")
+        if retention_action not in ('drop', 'detach'):
+            raise ValueError(f"Unsupported retention action: {retention_action}")
+        self.engine = engine
+        self.interval = interval
+        self.premake = premake
+        self.retention_days = retention_days
+        self.retention_action = retention_action
+
+    async def maintain(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Pre-create upcoming partitions and apply retention for every event table"""
+        now = now or datetime.now(timezone.utc)
+        report = {}
+        for table in PARTITIONED_TABLES:
+            created = await self.ensure_partitions(table, now)
+            removed = await self.apply_retention(table, now)
+            report[table] = {"created": created, "removed": removed}
+            logger.info(f"Partition maintenance for {table}: created={created} removed={removed}")
+        return report
+
+    async def list_partitions(self, table: str) -> List[str]:
+        """Names of the child tables currently attached to a partitioned table"""
+        async with self.engine.connect() as conn:
+            result = await conn.execute(
+                text(
+                    "SELECT child.relname FROM pg_inherits "
+                    "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+                    "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+                    "WHERE parent.relname = :table"
+                ),
+                {"table": table}
+            )
+            return [row[0] for row in result]
+
+    async def ensure_partitions(self, table: str, now: datetime) -> List[str]:
+        """Create the default partition plus the current and next premake partitions"""
+        existing = set(await self.list_partitions(table))
+        existing_ranges = [
+            bounds for bounds in (parse_partition_name(table, name) for name in existing)
+            if bounds is not None
+        ]
+        created = []
+        async with self.engine.begin() as conn:
+            await conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT"
+            ))
+
+        start = partition_start(now, self.interval)
+        for _ in range(self.premake + 1):
+            end = next_partition_start(start, self.interval)
+            name = partition_name(table, start, self.interval)
+            # Ranges left over from a different interval setting are kept as they are
+            overlaps = any(start < other_end and other_start < end for other_start, other_end in existing_ranges)
+            if name not in existing and not overlaps:
+                await self._create_partition(table, name, start, end)
+                created.append(name)
+            start = end
+        return created
+
+    async def _create_partition(self, table: str, name: str, start: datetime, end: datetime):
+        """Create a partition, first moving any matching rows out of the default partition"""
+        bounds = {"start": start, "end": end}
+        async with self.engine.begin() as conn:
+            await conn.execute(text(
+                f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+            ))
+            await conn.execute(
+                text(
+                    f"WITH moved AS ("
+                    f"DELETE FROM {table}_default "
+                    f"WHERE timestamp >= :start AND timestamp < :end RETURNING *"
+                    f") INSERT INTO {name} SELECT * FROM moved"
+                ),
+                bounds
+            )
+            await conn.execute(text(
+                f"ALTER TABLE {table} ATTACH PARTITION {name} "
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+            ))
+
+    async def apply_retention(self, table: str, now: datetime) -> List[str]:
+        """Detach or drop partitions that end before the retention cutoff"""
+        if self.retention_days is None:
+            return []
+        cutoff = now - timedelta(days=self.retention_days)
+        removed = []
+        for name in await self.list_partitions(table):
+            bounds = parse_partition_name(table, name)
+            if bounds is None or bounds[1] > cutoff:
+                continue
+            async with self.engine.begin() as conn:
+                await conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+                if self.retention_action == 'drop':
+                    await conn.execute(text(f"DROP TABLE {name}"))
+            removed.append(name)
+
+        # Late or out-of-range rows parked in the default partition expire too
+        async with self.engine.begin() as conn:
+            await conn.execute(
+                text(f"DELETE FROM {table}_default WHERE timestamp < :cutoff"),
+                {"cutoff": cutoff}
+            )
+        return removed
@@ -1,56 +1,516 @@
-from sqlalchemy import create_engine, select, update, desc
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import select, update, insert, literal, func, tuple_, values, column, true, any_, cast, String, Text, Integer, BigInteger
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import aliased
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import DBAPIError, IntegrityError
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from typing import List, Dict, Any, Optional
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Dict, Any, Optional, Sequence, Tuple
 from uuid import UUID
 import logging
-from datetime import datetime
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
 
 from .database_repository import DatabaseRepository
-from .database_models import UserAnalyticsEvent, ChemicalResearchEvent, EventProcessingStatus
+from .database_models import (
+    Base,
+    UserAnalyticsEvent,
+    ChemicalResearchEvent,
+    EventProcessingStatus,
+    UserEventRollup,
+    ResearcherRollup,
+    ResearcherMolecule,
+    UserSession
+)
+from .ids import uuid7
+from .connection_pool import async_dsn, pool_options, get_pool_metrics
+from .write_behind import WriteBehindBuffer
+from .pagination import Keyset
+from .jsonb_filters import JsonFilter, json_filter_clause
+from .read_routing import ReplicaRouter, parse_read_dsns, primary_reads_required
+from .cold_archive import ColdArchive, merge_counts, merge_newest
+from .histograms import (
+    HISTOGRAM_DIMENSIONS,
+    bucket_upserts,
+    bucket_counts_query,
+    event_counts_query,
+    coverage_query,
+    prune_statements,
+    split_by_coverage,
+    floor_bucket,
+    ceil_bucket,
+    histogram_payload
+)
+from .sketches import register_upsert, sketches_query, merge_registers
+from .heavy_hitters import checkpoint_statements, lock_window_statement, raise_floor_statement, top_items_query
+from .sessions import (
+    SESSION_COLUMNS,
+    adjacent_sessions_query,
+    lock_user_sessions_statement,
+    merge_sessions,
+    named_session_upsert,
+    session_metrics_query,
+    user_sessions_query
+)
+from .event_analysis import ActivityCopyDecoder, EventColumns, epoch_ms
+from .llm_cache import (
+    cached_properties_delete,
+    cached_properties_query,
+    cached_properties_upsert,
+    expired_properties_delete
+)
 from app.config.settings import settings
 
 logger = logging.getLogger(__name__)
 
+def _parse_timestamp(value: str) -> datetime:
+    """Parse an ISO-8601 event timestamp, accepting a trailing 'Z'"""
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+def _event_id(event_data: Dict[str, Any]) -> UUID:
+    """The publisher-assigned event id, or a fresh one for events published without it"""
+    event_id = event_data.get('event_id')
+    return UUID(str(event_id)) if event_id else uuid7()
+
+def _is_duplicate_event(error: IntegrityError) -> bool:
+    """Whether an insert failed only because the event (id, timestamp) already exists"""
+    return getattr(error.orig, 'sqlstate', None) == '23505'
+
+def _user_analytics_values(event_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Map an incoming user analytics event onto user_analytics_events columns"""
+    return {
+        'id': _event_id(event_data),
+        'user_id': event_data['user_id'],
+        'event_type': event_data['event_type'],
+        'page_url': event_data.get('page_url'),
+        'user_agent': event_data.get('user_agent'),
+        'session_id': event_data.get('session_id'),
+        'timestamp': _parse_timestamp(event_data['timestamp']),
+        'event_metadata': event_data.get('metadata', {}),
+    }
+
+def _chemical_research_values(event_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Map an incoming chemical research event onto chemical_research_events columns"""
+    return {
+        'id': _event_id(event_data),
+        'molecule_id': event_data['molecule_id'],
+        'researcher': event_data['researcher'],
+        'experiment_type': event_data.get('experiment_type'),
+        'data': event_data.get('data', {}),
+        'llm_properties': event_data.get('llm_properties'),
+        'properties': event_data.get('properties', {}),
+        'results': event_data.get('results', {}),
+        'timestamp': _parse_timestamp(event_data['timestamp']),
+        'event_metadata': event_data.get('metadata', {}),
+    }
+
+def _user_analytics_payload(event: UserAnalyticsEvent) -> Dict[str, Any]:
+    """API representation of a user analytics event"""
+    return {
+        "id": str(event.id),
+        "user_id": event.user_id,
+        "event_type": event.event_type,
+        "page_url": event.page_url,
+        "timestamp": event.timestamp.isoformat(),
+        "metadata": event.event_metadata,
+        "processed_at": event.processed_at.isoformat() if event.processed_at else None
+    }
+
+def _chemical_research_payload(event: ChemicalResearchEvent) -> Dict[str, Any]:
+    """API representation of a chemical research event"""
+    return {
+        "id": str(event.id),
+        "molecule_id": event.molecule_id,
+        "researcher": event.researcher,
+        "experiment_type": event.experiment_type,
+        "data": event.data,
+        "timestamp": event.timestamp.isoformat(),
+        "llm_properties": event.llm_properties,
+        "properties": event.properties,
+        "results": event.results,
+        "processed_at": event.processed_at.isoformat() if event.processed_at else None
+    }
+
+def _archive_lower_bound(events: list, limit: int, since: Optional[datetime]) -> Optional[datetime]:
+    """Oldest timestamp an archived row can have and still belong on a page.
+    
+    A full hot page only needs archived rows at least as new as its last row;
+    a short one needs everything back to ``since``.
+    """
+    return events[-1].timestamp if len(events) >= limit else since
+
+def _from_archive(model, row: Dict[str, Any]):
+    """Transient model instance for an archived row keyed by column name"""
+    return model(**{
+        attribute.key: row[attribute.columns[0].name]
+        for attribute in model.__mapper__.column_attrs
+        if attribute.columns[0].name in row
+    })
+
+# Columns the event endpoints return, and so the only ones read from the archive
+USER_ANALYTICS_EVENT_COLUMNS = ('id', 'user_id', 'event_type', 'page_url', 'timestamp', 'metadata', 'processed_at')
+CHEMICAL_RESEARCH_EVENT_COLUMNS = (
+    'id', 'molecule_id', 'researcher', 'experiment_type', 'data', 'timestamp',
+    'llm_properties', 'properties', 'results', 'processed_at'
+)
+
+# Query builders. Every statement the repository reads with is built here so
+# the plan regression check in tests/test_query_plans.py can EXPLAIN it.
+
+# JSONB columns that accept filters, each backed by a GIN (jsonb_path_ops) index
+USER_ANALYTICS_JSON_COLUMNS = {'metadata': UserAnalyticsEvent.event_metadata}
+CHEMICAL_RESEARCH_JSON_COLUMNS = {
+    'data': ChemicalResearchEvent.data,
+    'llm_properties': ChemicalResearchEvent.llm_properties,
+}
+
+def _json_filters(columns: Dict[str, Any], json_filters: Sequence[JsonFilter]):
+    """Containment and path predicates for parsed JSONB filters"""
+    return [json_filter_clause(columns[json_filter.column], json_filter) for json_filter in json_filters]
+
+def _keyset_filters(model, since: Optional[datetime], until: Optional[datetime], cursor: Optional[Keyset]):
+    """Time-range and keyset predicates shared by the event list queries"""
+    filters = []
+    if since is not None:
+        filters.append(model.timestamp >= since)
+    if until is not None:
+        filters.append(model.timestamp < until)
+    if cursor is not None:
+        # Row comparison continues the (timestamp DESC, id DESC) index scan
+        # right after the last row seen, so every page costs the same
+        filters.append(tuple_(model.timestamp, model.id) < tuple_(*cursor))
+    return filters
+
+def user_analytics_events_query(
+    user_id: str,
+    limit: int,
+    cursor: Optional[Keyset] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    event_type: Optional[str] = None,
+    json_filters: Sequence[JsonFilter] = ()
+):
+    """Newest events for a user, served by (user_id, timestamp DESC, id DESC)"""
+    filters = [UserAnalyticsEvent.user_id == user_id]
+    filters.extend(_keyset_filters(UserAnalyticsEvent, since, until, cursor))
+    if event_type is not None:
+        filters.append(UserAnalyticsEvent.event_type == event_type)
+    filters.extend(_json_filters(USER_ANALYTICS_JSON_COLUMNS, json_filters))
+    return (
+        select(UserAnalyticsEvent)
+        .where(*filters)
+        .order_by(UserAnalyticsEvent.timestamp.desc(), UserAnalyticsEvent.id.desc())
+        .limit(limit)
+    )
+
+def chemical_research_events_query(
+    researcher: str,
+    limit: int,
+    cursor: Optional[Keyset] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    experiment_type: Optional[str] = None,
+    json_filters: Sequence[JsonFilter] = ()
+):
+    """Newest experiments for a researcher, served by (researcher, timestamp DESC, id DESC)"""
+    filters = [ChemicalResearchEvent.researcher == researcher]
+    filters.extend(_keyset_filters(ChemicalResearchEvent, since, until, cursor))
+    if experiment_type is not None:
+        filters.append(ChemicalResearchEvent.experiment_type == experiment_type)
+    filters.extend(_json_filters(CHEMICAL_RESEARCH_JSON_COLUMNS, json_filters))
+    return (
+        select(ChemicalResearchEvent)
+        .where(*filters)
+        .order_by(ChemicalResearchEvent.timestamp.desc(), ChemicalResearchEvent.id.desc())
+        .limit(limit)
+    )
+
+def user_analytics_export_query(
+    user_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    event_type: Optional[str] = None,
+    json_filters: Sequence[JsonFilter] = ()
+):
+    """Every user analytics column for bulk export.
+    
+    Rows are left unordered so the server streams them straight from the
+    scan instead of sorting the whole result before sending the first row.
+    """
+    table = UserAnalyticsEvent.__table__
+    filters = _keyset_filters(UserAnalyticsEvent, since, until, None)
+    if user_id is not None:
+        filters.append(table.c.user_id == user_id)
+    if event_type is not None:
+        filters.append(table.c.event_type == event_type)
+    filters.extend(_json_filters(USER_ANALYTICS_JSON_COLUMNS, json_filters))
+    return select(table).where(*filters)
+
+def chemical_research_export_query(
+    researcher: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    experiment_type: Optional[str] = None,
+    json_filters: Sequence[JsonFilter] = ()
+):
+    """Every chemical research column for bulk export, unordered like the user export"""
+    table = ChemicalResearchEvent.__table__
+    filters = _keyset_filters(ChemicalResearchEvent, since, until, None)
+    if researcher is not None:
+        filters.append(table.c.researcher == researcher)
+    if experiment_type is not None:
+        filters.append(table.c.experiment_type == experiment_type)
+    filters.extend(_json_filters(CHEMICAL_RESEARCH_JSON_COLUMNS, json_filters))
+    return select(table).where(*filters)
+
+def user_activity_query(since: datetime, until: datetime, event_types: Optional[Sequence[str]] = None):
+    """User key, event type code and epoch milliseconds of user analytics events, unordered, for funnel and retention analysis.
+
+    Users are keyed by Postgres' 64-bit hash of their id, event types by
+    their position in event_types from 0 (all 0 without event_types), so
+    every column is a fixed-width integer.
+    """
+    filters = _keyset_filters(UserAnalyticsEvent, since, until, None)
+    type_code = literal(0, Integer)
+    if event_types:
+        types = literal(list(event_types), ARRAY(String))
+        filters.append(UserAnalyticsEvent.event_type == any_(types))
+        type_code = func.array_position(types, UserAnalyticsEvent.event_type) - 1
+    return select(
+        func.hashtextextended(UserAnalyticsEvent.user_id, 0),
+        type_code,
+        cast(func.extract('epoch', UserAnalyticsEvent.timestamp) * 1000, BigInteger)
+    ).where(*filters)
+
+def user_keys_query(user_ids: Sequence[str]):
+    """The keys user_activity_query gives users, for users of archived events"""
+    users = func.unnest(literal(list(user_ids), ARRAY(String))).table_valued('user_id').render_derived(name='users')
+    return select(users.c.user_id, func.hashtextextended(users.c.user_id, 0))
+
+def event_processing_status_update(event_id: UUID, status: str, error_message: Optional[str] = None):
+    """Status transition for an event, served by the event_id index"""
+    return (
+        update(EventProcessingStatus)
+        .where(EventProcessingStatus.event_id == event_id)
+        .values(
+            status=status,
+            error_message=error_message,
+            updated_at=datetime.now(timezone.utc)
+        )
+    )
+
+def user_event_rollups_query(user_id: str):
+    """Per event_type counters for a user, served by the rollup primary key"""
+    return select(UserEventRollup).where(UserEventRollup.user_id == user_id)
+
+def researcher_rollup_query(researcher: str):
+    """Experiment counter for a researcher, served by the rollup primary key"""
+    return select(ResearcherRollup).where(ResearcherRollup.researcher == researcher)
+
+def researcher_molecules_query(researcher: str):
+    """Molecules a researcher has studied, served by the rollup primary key"""
+    return select(ResearcherMolecule.molecule_id).where(ResearcherMolecule.researcher == researcher)
+
+def _owner_array(owners: Sequence[str]):
+    """Owners as a single array parameter, so one statement shape serves any number of them"""
+    return literal(list(owners), ARRAY(String))
+
+def _recent_events_query(model, owner_column: str, owners: Sequence[str], limit: int):
+    """Newest events of several owners: a LATERAL subquery runs the single-owner
+    (owner, timestamp DESC, id DESC) index scan once per owner"""
+    owner_list = func.unnest(_owner_array(owners)).table_valued('owner').render_derived(name='owners')
+    recent = (
+        select(model)
+        .where(getattr(model, owner_column) == owner_list.c.owner)
+        .order_by(model.timestamp.desc(), model.id.desc())
+        .limit(limit)
+        .lateral('recent')
+    )
+    return select(aliased(model, recent)).select_from(owner_list).join(recent, true())
+
+def recent_user_analytics_events_query(user_ids: Sequence[str], limit: int):
+    """Newest events of each of several users"""
+    return _recent_events_query(UserAnalyticsEvent, 'user_id', user_ids, limit)
+
+def recent_chemical_research_events_query(researchers: Sequence[str], limit: int):
+    """Newest experiments of each of several researchers"""
+    return _recent_events_query(ChemicalResearchEvent, 'researcher', researchers, limit)
+
+def bulk_user_event_rollups_query(user_ids: Sequence[str]):
+    """Per event_type counters of several users, served by the rollup primary key"""
+    return select(UserEventRollup).where(UserEventRollup.user_id == any_(_owner_array(user_ids)))
+
+def bulk_researcher_rollups_query(researchers: Sequence[str]):
+    """Experiment counters of several researchers, served by the rollup primary key"""
+    return select(ResearcherRollup).where(ResearcherRollup.researcher == any_(_owner_array(researchers)))
+
+def bulk_researcher_molecules_query(researchers: Sequence[str]):
+    """Molecules several researchers have studied, served by the rollup primary key"""
+    return select(ResearcherMolecule.researcher, ResearcherMolecule.molecule_id).where(
+        ResearcherMolecule.researcher == any_(_owner_array(researchers))
+    )
+
+def _owner_counts_query(model, owner_column, group_column, owner: str, since: Optional[datetime], until: Optional[datetime]):
+    """Row count and time span per group for one owner, reading only the grouped and time columns"""
+    return (
+        select(
+            group_column.label('key'),
+            func.count().label('event_count'),
+            func.min(model.timestamp).label('first_seen'),
+            func.max(model.timestamp).label('last_seen')
+        )
+        .where(owner_column == owner, *_keyset_filters(model, since, until, None))
+        .group_by(group_column)
+    )
+
+def user_event_counts_query(user_id: str, since: Optional[datetime] = None, until: Optional[datetime] = None):
+    """Per event_type counts for a user within a time window, served by (user_id, timestamp DESC, id DESC)"""
+    return _owner_counts_query(
+        UserAnalyticsEvent, UserAnalyticsEvent.user_id, UserAnalyticsEvent.event_type, user_id, since, until
+    )
+
+def researcher_molecule_counts_query(researcher: str, since: Optional[datetime] = None, until: Optional[datetime] = None):
+    """Per molecule experiment counts for a researcher within a time window, served by (researcher, timestamp DESC, id DESC)"""
+    return _owner_counts_query(
+        ChemicalResearchEvent, ChemicalResearchEvent.researcher, ChemicalResearchEvent.molecule_id,
+        researcher, since, until
+    )
+
+_EVENT_MODELS = {
+    'user_analytics': UserAnalyticsEvent,
+    'chemical_research': ChemicalResearchEvent,
+}
+
+# Rollups folded at ingest for each event type: (model, key columns, counter column)
+_ROLLUPS = {
+    'user_analytics': [
+        (UserEventRollup, ('user_id', 'event_type'), 'event_count'),
+    ],
+    'chemical_research': [
+        (ResearcherRollup, ('researcher',), 'experiment_count'),
+        (ResearcherMolecule, ('researcher', 'molecule_id'), 'experiment_count'),
+    ],
+}
+
+# Event columns the rollups read from newly inserted rows
+_ROLLUP_SOURCE_COLUMNS = {
+    'user_analytics': ('user_id', 'event_type', 'timestamp'),
+    'chemical_research': ('researcher', 'molecule_id', 'timestamp'),
+}
+
+def _rollup_upsert(model, key_columns, counter: str, source):
+    """Fold a batch of new events into a rollup table with INSERT ... ON CONFLICT DO UPDATE"""
+    keys = [source.c[name] for name in key_columns]
+    statement = pg_insert(model).from_select(
+        [*key_columns, counter, 'first_seen', 'last_seen'],
+        select(*keys, func.count(), func.min(source.c.timestamp), func.max(source.c.timestamp))
+        .group_by(*keys)
+        # Upsert in key order so concurrent batches lock rollup rows in the same order
+        .order_by(*keys)
+    )
+    table = model.__table__
+    return statement.on_conflict_do_update(
+        index_elements=list(key_columns),
+        set_={
+            counter: table.c[counter] + statement.excluded[counter],
+            'first_seen': func.least(table.c.first_seen, statement.excluded.first_seen),
+            'last_seen': func.greatest(table.c.last_seen, statement.excluded.last_seen),
+        }
+    )
+
+def rollup_upserts(event_type: str, source) -> list:
+    """Rollup and activity bucket statements for events of a type, read from a CTE or VALUES source"""
+    return [
+        _rollup_upsert(model, key_columns, counter, source)
+        for model, key_columns, counter in _ROLLUPS[event_type]
+    ] + bucket_upserts(event_type, source)
+
+def _rollup_source(event_type: str, rows: List[Dict[str, Any]]):
+    """VALUES clause exposing the rollup source columns of rows written through the ORM"""
+    table = _EVENT_MODELS[event_type].__table__
+    names = _ROLLUP_SOURCE_COLUMNS[event_type]
+    return values(*[column(name, table.c[name].type) for name in names], name='new_event').data(
+        [tuple(row[name] for name in names) for row in rows]
+    )
+
 class PostgreSQLRepository(DatabaseRepository):
     """PostgreSQL implementation of the database repository"""
     
     def __init__(self):
-        # Convert sync DSN to async DSN
-        async_dsn = settings.POSTGRES_DSN.replace("postgresql://", "postgresql+asyncpg://")
-        self.async_engine = create_async_engine(async_dsn, echo=False)
+        # All database access goes through the async pool; there is no
+        # blocking engine, so a slow query never stalls the event loop
+        self.async_engine = create_async_engine(
+            async_dsn(settings.POSTGRES_DSN),
+            echo=False,
+            **pool_options()
+        )
         self.async_session_factory = async_sessionmaker(
             self.async_engine, 
             class_=AsyncSession, 
             expire_on_commit=False
         )
-        self.engine = create_engine(settings.POSTGRES_DSN)
-        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
-        self._create_tables()
+        # Optional read replicas for the API's read-only queries
+        self.read_router = None
+        read_dsns = parse_read_dsns(settings.POSTGRES_READ_DSNS)
+        if read_dsns:
+            self.read_router = ReplicaRouter(
+                [create_async_engine(async_dsn(dsn), echo=False, **pool_options()) for dsn in read_dsns],
+                max_lag=settings.READ_REPLICA_MAX_LAG_SECONDS,
+                check_interval=settings.READ_REPLICA_LAG_CHECK_INTERVAL
+            )
+        # Optional cold tier that old event days are moved into
+        self.cold_archive = None
+        if settings.ARCHIVE_ENABLED:
+            self.cold_archive = ColdArchive(
+                self.async_engine,
+                settings.ARCHIVE_DIR,
+                after_days=settings.ARCHIVE_AFTER_DAYS,
+                compression=settings.ARCHIVE_COMPRESSION,
+                row_group_size=settings.ARCHIVE_ROW_GROUP_SIZE
+            )
+        self.write_buffer = None
+        if settings.WRITE_BEHIND_ENABLED:
+            self.write_buffer = WriteBehindBuffer(
+                self._flush_write_batch,
+                max_batch_size=settings.WRITE_BEHIND_MAX_BATCH_SIZE,
+                max_delay=settings.WRITE_BEHIND_MAX_DELAY_MS / 1000.0,
+                max_pending=settings.WRITE_BEHIND_MAX_PENDING
+            )
     
-    def _create_tables(self):
+    async def create_tables(self):
         """Create database tables"""
         try:
-            Base.metadata.create_all(bind=self.engine)
+            async with self.async_engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
             logger.info("Database tables created successfully")
         except Exception as e:
             logger.error(f"Error creating database tables: {str(e)}")
     
     async def save_user_analytics_event(self, event_data: Dict[str, Any]) -> UUID:
         """Save user analytics event to database"""
+        if self.write_buffer is not None:
+            event_id, _ = await self._write('user_analytics', _user_analytics_values(event_data))
+            return event_id
         async with self.async_session_factory() as session:
             try:
-                event = UserAnalyticsEvent(
-                    user_id=event_data["user_id"],
-                    event_type=event_data["event_type"],
-                    timestamp=datetime.fromisoformat(event_data["timestamp"].replace('Z', '+00:00')),
-                    metadata=event_data.get("metadata", {})
-                )
+                values = _user_analytics_values(event_data)
+                event = UserAnalyticsEvent(**values)
                 session.add(event)
+                for statement in rollup_upserts('user_analytics', _rollup_source('user_analytics', [values])):
+                    await session.execute(statement)
                 await session.commit()
                 await session.refresh(event)
                 logger.info(f"Saved user analytics event: {event.id}")
                 return event.id
+            except IntegrityError as e:
+                await session.rollback()
+                if not _is_duplicate_event(e):
+                    logger.error(f"Error saving user analytics event: {str(e)}")
+                    raise
+                # Redelivered event: it and its rollup counts are already stored
+                logger.info(f"Skipped duplicate user analytics event: {values['id']}")
+                return values['id']
             except Exception as e:
                 await session.rollback()
                 logger.error(f"Error saving user analytics event: {str(e)}")
@@ -58,80 +518,824 @@ class PostgreSQLRepository(DatabaseRepository):
     
     async def save_chemical_research_event(self, event_data: Dict[str, Any]) -> UUID:
         """Save chemical research event to database"""
+        if self.write_buffer is not None:
+            event_id, _ = await self._write('chemical_research', _chemical_research_values(event_data))
+            return event_id
         async with self.async_session_factory() as session:
             try:
-                event = ChemicalResearchEvent(
-                    molecule_id=event_data["molecule_id"],
-                    researcher=event_data["researcher"],
-                    data=event_data["data"],
-                    timestamp=datetime.fromisoformat(event_data["timestamp"].replace('Z', '+00:00')),
-                    llm_properties=event_data.get("llm_properties")
-                )
+                values = _chemical_research_values(event_data)
+                event = ChemicalResearchEvent(**values)
                 session.add(event)
+                for statement in rollup_upserts('chemical_research', _rollup_source('chemical_research', [values])):
+                    await session.execute(statement)
                 await session.commit()
                 await session.refresh(event)
                 logger.info(f"Saved chemical research event: {event.id}")
                 return event.id
+            except IntegrityError as e:
+                await session.rollback()
+                if not _is_duplicate_event(e):
+                    logger.error(f"Error saving chemical research event: {str(e)}")
+                    raise
+                # Redelivered event: it and its rollup counts are already stored
+                logger.info(f"Skipped duplicate chemical research event: {values['id']}")
+                return values['id']
             except Exception as e:
                 await session.rollback()
                 logger.error(f"Error saving chemical research event: {str(e)}")
                 raise
     
-    async def get_user_analytics_events(self, user_id: str, limit: int = 10) -> List[Dict[str, Any]]:
-        """Get user analytics events for a specific user"""
+    async def save_user_analytics_event_with_status(
+        self,
+        event_data: Dict[str, Any],
+        status: str = 'completed',
+        error_message: Optional[str] = None
+    ) -> Tuple[UUID, bool]:
+        """Save a user analytics event together with its processing status in one statement.
+        
+        Returns the event id and whether the event was new; a redelivered
+        event is not stored again.
+        """
+        try:
+            event_id, inserted = await self._write('user_analytics', _user_analytics_values(event_data), status, error_message)
+            if inserted:
+                logger.info(f"Saved user analytics event: {event_id} ({status})")
+            else:
+                logger.info(f"Skipped duplicate user analytics event: {event_id}")
+            return event_id, inserted
+        except Exception as e:
+            logger.error(f"Error saving user analytics event: {str(e)}")
+            raise
+    
+    async def save_chemical_research_event_with_status(
+        self,
+        event_data: Dict[str, Any],
+        status: str = 'completed',
+        error_message: Optional[str] = None
+    ) -> Tuple[UUID, bool]:
+        """Save a chemical research event together with its processing status in one statement.
+        
+        Returns the event id and whether the event was new; a redelivered
+        event is not stored again.
+        """
+        try:
+            event_id, inserted = await self._write('chemical_research', _chemical_research_values(event_data), status, error_message)
+            if inserted:
+                logger.info(f"Saved chemical research event: {event_id} ({status})")
+            else:
+                logger.info(f"Skipped duplicate chemical research event: {event_id}")
+            return event_id, inserted
+        except Exception as e:
+            logger.error(f"Error saving chemical research event: {str(e)}")
+            raise
+    
+    async def _write(
+        self,
+        event_type: str,
+        values: Dict[str, Any],
+        status: Optional[str] = None,
+        error_message: Optional[str] = None
+    ) -> Tuple[UUID, bool]:
+        """Write one event row, through the write-behind buffer when it is enabled; (id, whether it was new)"""
+        if self.write_buffer is not None:
+            return await self.write_buffer.submit((event_type, status, error_message), values)
+        written = await self._insert_events(event_type, [values], status, error_message)
+        return written[0]
+    
+    async def _flush_write_batch(self, key, rows: List[Dict[str, Any]]) -> List[Tuple[UUID, bool]]:
+        """Write-behind flush handler: one multi-row insert per batch key"""
+        event_type, status, error_message = key
+        return await self._insert_events(event_type, rows, status, error_message)
+    
+    async def _insert_events(
+        self,
+        event_type: str,
+        rows: List[Dict[str, Any]],
+        status: Optional[str] = None,
+        error_message: Optional[str] = None
+    ) -> List[Tuple[UUID, bool]]:
+        """Insert event rows, their rollups, and their status rows when a status is given, in a single round trip.
+        
+        The event insert runs as a data-modifying CTE. The rollup upserts and
+        the status rows read its RETURNING clause, so everything commits
+        together and no intermediate 'pending' state is ever written.
+        
+        Rows whose (id, timestamp) already exists are redeliveries and are
+        skipped by ON CONFLICT DO NOTHING. RETURNING only yields the rows
+        actually inserted, so duplicates add no rollup counts or status rows.
+        The statement selects those ids, and each row comes back as
+        (id, whether it was new), so callers can keep redeliveries away from
+        anything else that counts events.
+        """
+        model = _EVENT_MODELS[event_type]
+        inserted_event = (
+            pg_insert(model)
+            .values(rows)
+            .on_conflict_do_nothing(index_elements=['id', 'timestamp'])
+            .returning(model.id, *[getattr(model, name) for name in _ROLLUP_SOURCE_COLUMNS[event_type]])
+            .cte('inserted_event')
+        )
+        statements = rollup_upserts(event_type, inserted_event)
+        if status is not None:
+            statements.append(
+                insert(EventProcessingStatus)
+                .from_select(
+                    ['id', 'event_id', 'event_type', 'status', 'error_message'],
+                    select(
+                        func.uuid_generate_v7(),
+                        inserted_event.c.id,
+                        literal(event_type, String),
+                        literal(status, String),
+                        literal(error_message, Text)
+                    ),
+                    include_defaults=False
+                )
+            )
+        # Postgres runs every data-modifying CTE whether or not it is read
+        query = select(inserted_event.c.id).add_cte(
+            inserted_event,
+            *[statement.cte(f'write_{i}') for i, statement in enumerate(statements)]
+        )
         async with self.async_session_factory() as session:
             try:
-                query = (
-                    select(UserAnalyticsEvent)
-                    .where(UserAnalyticsEvent.user_id == user_id)
-                    .order_by(UserAnalyticsEvent.timestamp.desc())
-                    .limit(limit)
-                )
+                new_ids = set((await session.execute(query)).scalars())
+                await session.commit()
+                written = []
+                for row in rows:
+                    # A batch holding the same event twice inserts it once
+                    written.append((row['id'], row['id'] in new_ids))
+                    new_ids.discard(row['id'])
+                return written
+            except Exception:
+                await session.rollback()
+                raise
+    
+    @asynccontextmanager
+    async def _read_session(self, snapshot: bool = False):
+        """Session for a read-only query: a fresh replica when possible, else the primary.
+        
+        With snapshot=True every statement sees the same REPEATABLE READ
+        snapshot, so a read spanning the hot tables and the archive manifest
+        cannot observe an archival run half way.
+        """
+        replica = None
+        if self.read_router is not None and not primary_reads_required():
+            replica = await self.read_router.choose()
+        factory = replica.session_factory if replica is not None else self.async_session_factory
+        async with factory() as session:
+            try:
+                if snapshot:
+                    await session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+                yield session
+            except DBAPIError as e:
+                if replica is not None and e.connection_invalidated:
+                    self.read_router.mark_unavailable(replica)
+                raise
+    
+    async def close(self):
+        """Flush buffered writes and release pooled connections"""
+        if self.write_buffer is not None:
+            await self.write_buffer.close()
+        if self.read_router is not None:
+            await self.read_router.close()
+        await self.async_engine.dispose()
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """Repository-level operational metrics"""
+        return {
+            "pool": get_pool_metrics(self.async_engine),
+            "write_behind": (
+                self.write_buffer.get_metrics() if self.write_buffer is not None
+                else {"enabled": False}
+            ),
+            "read_replicas": (
+                self.read_router.get_metrics() if self.read_router is not None
+                else {"enabled": False}
+            ),
+            "cold_archive": (
+                self.cold_archive.get_metrics() if self.cold_archive is not None
+                else {"enabled": False}
+            ),
+        }
+    
+    async def get_user_analytics_events(
+        self,
+        user_id: str,
+        limit: int = 10,
+        cursor: Optional[Keyset] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        event_type: Optional[str] = None,
+        json_filters: Sequence[JsonFilter] = ()
+    ) -> List[Dict[str, Any]]:
+        """Get user analytics events for a specific user, newest first, from the archive too when the page reaches it"""
+        async with self._read_session(snapshot=self.cold_archive is not None) as session:
+            try:
+                query = user_analytics_events_query(user_id, limit, cursor, since, until, event_type, json_filters)
                 result = await session.execute(query)
                 events = result.scalars().all()
                 
-                return [
-                    {
-                        "id": str(event.id),
-                        "user_id": event.user_id,
-                        "event_type": event.event_type,
-                        "timestamp": event.timestamp.isoformat(),
-                        "metadata": event.metadata,
-                        "processed_at": event.processed_at.isoformat() if event.processed_at else None
-                    }
-                    for event in events
-                ]
+                lower_bound = _archive_lower_bound(events, limit, since)
+                if self.cold_archive is not None and self.cold_archive.reaches_archive(lower_bound):
+                    archived = await self.cold_archive.read_newest(
+                        session, 'user_analytics_events', user_id, limit, USER_ANALYTICS_EVENT_COLUMNS,
+                        lower_bound, cursor, since, until, event_type, json_filters
+                    )
+                    events = merge_newest(
+                        list(events), [_from_archive(UserAnalyticsEvent, row) for row in archived], limit
+                    )
+                return [_user_analytics_payload(event) for event in events]
             except Exception as e:
                 logger.error(f"Error getting user analytics events: {str(e)}")
                 raise
     
-    async def get_chemical_research_events(self, researcher: str, limit: int = 10) -> List[Dict[str, Any]]:
-        """Get chemical research events for a specific researcher"""
-        async with self.async_session_factory() as session:
+    async def get_chemical_research_events(
+        self,
+        researcher: str,
+        limit: int = 10,
+        cursor: Optional[Keyset] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        experiment_type: Optional[str] = None,
+        json_filters: Sequence[JsonFilter] = ()
+    ) -> List[Dict[str, Any]]:
+        """Get chemical research events for a specific researcher, newest first, from the archive too when the page reaches it"""
+        async with self._read_session(snapshot=self.cold_archive is not None) as session:
             try:
-                query = (
-                    select(ChemicalResearchEvent)
-                    .where(ChemicalResearchEvent.researcher == researcher)
-                    .order_by(ChemicalResearchEvent.timestamp.desc())
-                    .limit(limit)
+                query = chemical_research_events_query(
+                    researcher, limit, cursor, since, until, experiment_type, json_filters
                 )
                 result = await session.execute(query)
                 events = result.scalars().all()
                 
+                lower_bound = _archive_lower_bound(events, limit, since)
+                if self.cold_archive is not None and self.cold_archive.reaches_archive(lower_bound):
+                    archived = await self.cold_archive.read_newest(
+                        session, 'chemical_research_events', researcher, limit, CHEMICAL_RESEARCH_EVENT_COLUMNS,
+                        lower_bound, cursor, since, until, experiment_type, json_filters
+                    )
+                    events = merge_newest(
+                        list(events), [_from_archive(ChemicalResearchEvent, row) for row in archived], limit
+                    )
+                return [_chemical_research_payload(event) for event in events]
+            except Exception as e:
+                logger.error(f"Error getting chemical research events: {str(e)}")
+                raise
+    
+    async def get_user_event_rollups(self, user_id: str) -> List[Dict[str, Any]]:
+        """Get per event_type counters for a user"""
+        async with self._read_session() as session:
+            try:
+                result = await session.execute(user_event_rollups_query(user_id))
                 return [
                     {
-                        "id": str(event.id),
-                        "molecule_id": event.molecule_id,
-                        "researcher": event.researcher,
-                        "data": event.data,
-                        "timestamp": event.timestamp.isoformat(),
-                        "llm_properties": event.llm_properties,
-                        "processed_at": event.processed_at.isoformat() if event.processed_at else None
+                        "event_type": rollup.event_type,
+                        "event_count": rollup.event_count,
+                        "first_seen": rollup.first_seen.isoformat(),
+                        "last_seen": rollup.last_seen.isoformat()
                     }
-                    for event in events
+                    for rollup in result.scalars().all()
                 ]
             except Exception as e:
-                logger.error(f"Error getting chemical research events: {str(e)}")
+                logger.error(f"Error getting user event rollups: {str(e)}")
+                raise
+    
+    async def get_researcher_rollup(self, researcher: str) -> Optional[Dict[str, Any]]:
+        """Get the experiment counter and studied molecules for a researcher"""
+        async with self._read_session() as session:
+            try:
+                result = await session.execute(researcher_rollup_query(researcher))
+                rollup = result.scalars().first()
+                if rollup is None:
+                    return None
+                molecules = await session.execute(researcher_molecules_query(researcher))
+                return {
+                    "experiment_count": rollup.experiment_count,
+                    "first_seen": rollup.first_seen.isoformat(),
+                    "last_seen": rollup.last_seen.isoformat(),
+                    "molecules": sorted(molecules.scalars().all())
+                }
+            except Exception as e:
+                logger.error(f"Error getting researcher rollup: {str(e)}")
+                raise
+    
+    async def get_user_event_rollups_bulk(self, user_ids: Sequence[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """Get per event_type counters for several users in one query"""
+        async with self._read_session() as session:
+            try:
+                result = await session.execute(bulk_user_event_rollups_query(user_ids))
+                rollups: Dict[str, List[Dict[str, Any]]] = {user_id: [] for user_id in user_ids}
+                for rollup in result.scalars().all():
+                    rollups[rollup.user_id].append({
+                        "event_type": rollup.event_type,
+                        "event_count": rollup.event_count,
+                        "first_seen": rollup.first_seen.isoformat(),
+                        "last_seen": rollup.last_seen.isoformat()
+                    })
+                return rollups
+            except Exception as e:
+                logger.error(f"Error getting user event rollups: {str(e)}")
+                raise
+    
+    async def get_researcher_rollups_bulk(self, researchers: Sequence[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Get the experiment counters and studied molecules of several researchers in two queries"""
+        async with self._read_session() as session:
+            try:
+                result = await session.execute(bulk_researcher_rollups_query(researchers))
+                rollups: Dict[str, Optional[Dict[str, Any]]] = {researcher: None for researcher in researchers}
+                for rollup in result.scalars().all():
+                    rollups[rollup.researcher] = {
+                        "experiment_count": rollup.experiment_count,
+                        "first_seen": rollup.first_seen.isoformat(),
+                        "last_seen": rollup.last_seen.isoformat(),
+                        "molecules": []
+                    }
+                molecules = await session.execute(bulk_researcher_molecules_query(researchers))
+                for researcher, molecule_id in molecules:
+                    if rollups[researcher] is not None:
+                        rollups[researcher]["molecules"].append(molecule_id)
+                for rollup in rollups.values():
+                    if rollup is not None:
+                        rollup["molecules"].sort()
+                return rollups
+            except Exception as e:
+                logger.error(f"Error getting researcher rollups: {str(e)}")
+                raise
+    
+    async def get_recent_user_analytics_events_bulk(
+        self,
+        user_ids: Sequence[str],
+        limit: int = 10
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """Get the newest events of several users in one query, from the archive too for users it reaches"""
+        return await self._recent_events_bulk(
+            UserAnalyticsEvent, 'user_id', user_ids, limit,
+            recent_user_analytics_events_query, USER_ANALYTICS_EVENT_COLUMNS, _user_analytics_payload
+        )
+    
+    async def get_recent_chemical_research_events_bulk(
+        self,
+        researchers: Sequence[str],
+        limit: int = 10
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """Get the newest experiments of several researchers in one query, from the archive too for researchers it reaches"""
+        return await self._recent_events_bulk(
+            ChemicalResearchEvent, 'researcher', researchers, limit,
+            recent_chemical_research_events_query, CHEMICAL_RESEARCH_EVENT_COLUMNS, _chemical_research_payload
+        )
+    
+    async def _recent_events_bulk(self, model, owner_column: str, owners: Sequence[str], limit: int, query, columns, payload):
+        """Group a LATERAL newest-events query by owner; owners with a short hot page also read the archive"""
+        async with self._read_session(snapshot=self.cold_archive is not None) as session:
+            try:
+                result = await session.execute(query(owners, limit))
+                events: Dict[str, list] = {owner: [] for owner in owners}
+                for event in result.scalars().all():
+                    events[getattr(event, owner_column)].append(event)
+                if self.cold_archive is not None:
+                    for owner, hot in events.items():
+                        lower_bound = _archive_lower_bound(hot, limit, None)
+                        if not self.cold_archive.reaches_archive(lower_bound):
+                            continue
+                        archived = await self.cold_archive.read_newest(
+                            session, model.__tablename__, owner, limit, columns, lower_bound
+                        )
+                        events[owner] = merge_newest(hot, [_from_archive(model, row) for row in archived], limit)
+                return {owner: [payload(event) for event in owner_events] for owner, owner_events in events.items()}
+            except Exception as e:
+                logger.error(f"Error getting recent {model.__tablename__}: {str(e)}")
+                raise
+    
+    async def get_user_event_counts(
+        self,
+        user_id: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
+        """Per event_type counters for a user within a time window, aggregated in the database"""
+        try:
+            groups = await self._owner_counts(
+                user_event_counts_query(user_id, since, until),
+                'user_analytics_events', user_id, 'event_type', since, until
+            )
+            return [
+                {
+                    "event_type": event_type,
+                    "event_count": group["event_count"],
+                    "first_seen": group["first_seen"].isoformat(),
+                    "last_seen": group["last_seen"].isoformat()
+                }
+                for event_type, group in groups.items()
+            ]
+        except Exception as e:
+            logger.error(f"Error getting user event counts: {str(e)}")
+            raise
+    
+    async def get_researcher_counts(
+        self,
+        researcher: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Experiment counter and studied molecules for a researcher within a time window, aggregated in the database"""
+        try:
+            groups = await self._owner_counts(
+                researcher_molecule_counts_query(researcher, since, until),
+                'chemical_research_events', researcher, 'molecule_id', since, until
+            )
+            if not groups:
+                return None
+            return {
+                "experiment_count": sum(group["event_count"] for group in groups.values()),
+                "first_seen": min(group["first_seen"] for group in groups.values()).isoformat(),
+                "last_seen": max(group["last_seen"] for group in groups.values()).isoformat(),
+                "molecules": sorted(groups)
+            }
+        except Exception as e:
+            logger.error(f"Error getting researcher counts: {str(e)}")
+            raise
+    
+    async def _owner_counts(
+        self,
+        query,
+        dataset: str,
+        owner: str,
+        group_column: str,
+        since: Optional[datetime],
+        until: Optional[datetime]
+    ) -> Dict[Any, Dict[str, Any]]:
+        """Per group counts of a GROUP BY query, plus the archived rows' when the window reaches the archive.
+        
+        Archived rows are gone from the hot table, so the two tiers never
+        count the same row; both are read in one snapshot.
+        """
+        async with self._read_session(snapshot=self.cold_archive is not None) as session:
+            result = await session.execute(query)
+            groups: Dict[Any, Dict[str, Any]] = {}
+            for row in result:
+                merge_counts(groups, row.key, row.event_count, row.first_seen, row.last_seen)
+            if self.cold_archive is not None and self.cold_archive.reaches_archive(since):
+                archived = await self.cold_archive.aggregate(session, dataset, owner, group_column, since, until)
+                for key, group in archived.items():
+                    merge_counts(groups, key, group["event_count"], group["first_seen"], group["last_seen"])
+            return groups
+    
+    async def get_activity_histogram(
+        self,
+        dimension: str,
+        subject: str,
+        granularity: str,
+        since: datetime,
+        until: datetime
+    ) -> List[Dict[str, Any]]:
+        """Event counts per time bucket over [since, until), widened to whole buckets.
+        
+        Stored buckets answer the range they cover; anything earlier is
+        counted from the event rows with date_trunc, and from the archive
+        when it reaches archived days.
+        """
+        since, until = floor_bucket(since, granularity), ceil_bucket(until, granularity)
+        event_type, _ = HISTOGRAM_DIMENSIONS[dimension]
+        async with self._read_session(snapshot=self.cold_archive is not None) as session:
+            try:
+                covered_from = (await session.execute(coverage_query(dimension, granularity))).scalar()
+                ranges = split_by_coverage(since, until, covered_from)
+                counts: Dict[datetime, int] = {}
+                if ranges['events'] is not None:
+                    start, end = ranges['events']
+                    result = await session.execute(event_counts_query(dimension, subject, granularity, start, end))
+                    counts.update({row.bucket_start: row.event_count for row in result})
+                    if self.cold_archive is not None and self.cold_archive.reaches_archive(start):
+                        archived = await self.cold_archive.histogram(
+                            session, _EVENT_MODELS[event_type].__tablename__, granularity, start, end,
+                            owner=subject if dimension != 'event_type' else None,
+                            event_type=subject if dimension == 'event_type' else None
+                        )
+                        for bucket_start, count in archived.items():
+                            counts[bucket_start] = counts.get(bucket_start, 0) + count
+                if ranges['buckets'] is not None:
+                    start, end = ranges['buckets']
+                    result = await session.execute(bucket_counts_query(dimension, subject, granularity, start, end))
+                    counts.update({row.bucket_start: row.event_count for row in result})
+                return histogram_payload(counts)
+            except Exception as e:
+                logger.error(f"Error getting activity histogram: {str(e)}")
+                raise
+    
+    async def raise_sketch_registers(self, updates: List[Dict[str, Any]]):
+        """Apply distinct-count sketch register updates in one transaction"""
+        async with self.async_session_factory() as session:
+            try:
+                await session.execute(register_upsert(), updates)
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                logger.error(f"Error updating distinct sketches: {str(e)}")
+                raise
+    
+    async def get_distinct_sketch(self, dimension: str, subject: str, since: date, until: date) -> Optional[bytes]:
+        """Union of a subject's daily sketches over the days [since, until], or None when it has none"""
+        async with self._read_session() as session:
+            try:
+                merged = None
+                for (registers,) in await session.execute(sketches_query(dimension, subject, since, until)):
+                    merged = registers if merged is None else merge_registers(merged, registers)
+                return merged
+            except Exception as e:
+                logger.error(f"Error getting distinct sketch: {str(e)}")
+                raise
+    
+    async def checkpoint_top_k(self, dimension: str, day: date, counters: List[tuple], capacity: int):
+        """Add a worker's heavy-hitter counts for a day and trim the day back to capacity, in one transaction"""
+        async with self.async_session_factory() as session:
+            try:
+                floor = (await session.execute(lock_window_statement(dimension, day))).scalar_one()
+                upsert, trim = checkpoint_statements(dimension, day, counters, floor, capacity)
+                await session.execute(upsert)
+                trimmed = [row.event_count for row in await session.execute(trim)]
+                if trimmed:
+                    await session.execute(raise_floor_statement(dimension, day, max(trimmed)))
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                logger.error(f"Error checkpointing top-K counts: {str(e)}")
+                raise
+    
+    async def get_top_items(self, dimension: str, since: date, until: date, k: int) -> List[Dict[str, Any]]:
+        """Heaviest items of a dimension over the days [since, until]"""
+        async with self._read_session() as session:
+            try:
+                result = await session.execute(top_items_query(dimension, since, until, k))
+                return [
+                    {"item": row.item, "event_count": int(row.event_count), "error": int(row.error)}
+                    for row in result
+                ]
+            except Exception as e:
+                logger.error(f"Error getting top items: {str(e)}")
+                raise
+    
+    async def write_session_fragments(self, fragments: List[Dict[str, Any]], inactivity_gap: timedelta):
+        """Merge sessionizer fragments into the stored sessions, in one transaction"""
+        named: Dict[tuple, Dict[str, Any]] = {}
+        inferred = []
+        for fragment in fragments:
+            if fragment['session_id'] is None:
+                inferred.append(fragment)
+                continue
+            # One upsert may not update a row twice, so merge a session's fragments first
+            key = (fragment['user_id'], fragment['session_id'])
+            named[key] = {**fragment, **merge_sessions(named[key], fragment)} if key in named else fragment
+        async with self.async_session_factory() as session:
+            try:
+                if named:
+                    await session.execute(named_session_upsert([named[key] for key in sorted(named)]))
+                # Users in a fixed order, so concurrent checkpoints take their locks alike
+                for fragment in sorted(inferred, key=lambda f: (f['user_id'], f['started_at'])):
+                    await self._merge_inferred_session(session, fragment, inactivity_gap)
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                logger.error(f"Error writing user sessions: {str(e)}")
+                raise
+    
+    async def _merge_inferred_session(self, session: AsyncSession, fragment: Dict[str, Any], inactivity_gap: timedelta):
+        """Fold a fragment and the stored sessions within the gap of it into one row"""
+        await session.execute(lock_user_sessions_statement(fragment['user_id']))
+        adjacent = (await session.execute(adjacent_sessions_query(
+            fragment['user_id'], fragment['started_at'], fragment['ended_at'], inactivity_gap
+        ))).scalars().all()
+        merged = fragment
+        for row in adjacent:
+            merged = merge_sessions(merged, {name: getattr(row, name) for name in SESSION_COLUMNS})
+        if not adjacent:
+            session.add(UserSession(user_id=fragment['user_id'], **{name: merged[name] for name in SESSION_COLUMNS}))
+            return
+        survivor, *absorbed = adjacent
+        for name in SESSION_COLUMNS:
+            setattr(survivor, name, merged[name])
+        for row in absorbed:
+            await session.delete(row)
+    
+    async def get_user_sessions(self, user_id: str, since: datetime, until: datetime, limit: int) -> List[Dict[str, Any]]:
+        """A user's sessions started in [since, until), newest first"""
+        async with self._read_session() as session:
+            try:
+                result = await session.execute(user_sessions_query(user_id, since, until, limit))
+                return [
+                    {"session_id": row.session_id, **{name: getattr(row, name) for name in SESSION_COLUMNS}}
+                    for row in result.scalars()
+                ]
+            except Exception as e:
+                logger.error(f"Error getting user sessions: {str(e)}")
+                raise
+    
+    async def get_user_session_metrics(self, user_id: str, since: datetime, until: datetime) -> Dict[str, Any]:
+        """Session count, average duration and pages, and bounce rate of a user's sessions started in [since, until)"""
+        async with self._read_session() as session:
+            try:
+                row = (await session.execute(session_metrics_query(user_id, since, until))).one()
+                return {
+                    "sessions": row.sessions,
+                    "average_duration_seconds": round(float(row.average_duration), 3) if row.sessions else 0.0,
+                    "average_pages": round(float(row.average_pages), 3) if row.sessions else 0.0,
+                    "bounce_rate": round(float(row.bounce_rate), 4) if row.sessions else 0.0,
+                }
+            except Exception as e:
+                logger.error(f"Error getting user session metrics: {str(e)}")
+                raise
+    
+    async def prune_activity_buckets(self, granularity: str, retention_days: int, now: Optional[datetime] = None) -> int:
+        """Delete buckets of a granularity older than the retention window; later reads of that range count events"""
+        now = now or datetime.now(timezone.utc)
+        cutoff = floor_bucket(now - timedelta(days=retention_days), 'day')
+        async with self.async_session_factory() as session:
+            try:
+                deleted, *coverage = prune_statements(granularity, cutoff)
+                result = await session.execute(deleted)
+                for statement in coverage:
+                    await session.execute(statement)
+                await session.commit()
+                logger.info(f"Pruned {result.rowcount} {granularity} activity buckets before {cutoff.isoformat()}")
+                return result.rowcount
+            except Exception as e:
+                await session.rollback()
+                logger.error(f"Error pruning activity buckets: {str(e)}")
+                raise
+    
+    async def get_cached_llm_properties(self, cache_key: str, now: datetime) -> Optional[tuple]:
+        """(properties, expires_at) cached under a key, or None when absent or expired"""
+        # Workers look entries up right after other workers store them, so
+        # they read from the primary
+        async with self.async_session_factory() as session:
+            try:
+                row = (await session.execute(cached_properties_query(cache_key, now))).first()
+                return (row.properties, row.expires_at) if row is not None else None
+            except Exception as e:
+                logger.error(f"Error getting cached LLM properties: {str(e)}")
+                raise
+    
+    async def save_cached_llm_properties(
+        self,
+        cache_key: str,
+        model_version: str,
+        properties: Dict[str, Any],
+        now: datetime,
+        expires_at: datetime
+    ):
+        """Store LLM-extracted properties under a key until they expire"""
+        async with self.async_session_factory() as session:
+            try:
+                await session.execute(cached_properties_upsert(cache_key, model_version, properties, now, expires_at))
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                logger.error(f"Error saving cached LLM properties: {str(e)}")
+                raise
+    
+    async def invalidate_cached_llm_properties(self, cache_keys: Optional[Sequence[str]] = None) -> int:
+        """Delete the cached LLM properties under some keys, or all of them"""
+        async with self.async_session_factory() as session:
+            try:
+                result = await session.execute(cached_properties_delete(cache_keys))
+                await session.commit()
+                logger.info(f"Invalidated {result.rowcount} cached LLM property entries")
+                return result.rowcount
+            except Exception as e:
+                await session.rollback()
+                logger.error(f"Error invalidating cached LLM properties: {str(e)}")
+                raise
+    
+    async def prune_cached_llm_properties(self, now: Optional[datetime] = None) -> int:
+        """Delete expired cached LLM properties"""
+        now = now or datetime.now(timezone.utc)
+        async with self.async_session_factory() as session:
+            try:
+                result = await session.execute(expired_properties_delete(now))
+                await session.commit()
+                logger.info(f"Pruned {result.rowcount} expired cached LLM property entries")
+                return result.rowcount
+            except Exception as e:
+                await session.rollback()
+                logger.error(f"Error pruning cached LLM properties: {str(e)}")
+                raise
+    
+    async def stream_user_analytics_events(
+        self,
+        user_id: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        event_type: Optional[str] = None,
+        json_filters: Sequence[JsonFilter] = (),
+        chunk_size: int = 5000
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Stream user analytics rows in chunks from a server-side cursor, then from the archive"""
+        query = user_analytics_export_query(user_id, since, until, event_type, json_filters)
+        async for rows in self._stream(query, chunk_size, 'user_analytics_events', user_id, since, until, event_type, json_filters):
+            yield rows
+    
+    async def load_user_activity(
+        self,
+        since: datetime,
+        until: datetime,
+        event_types: Optional[Sequence[str]] = None,
+        chunk_size: int = 50000
+    ) -> EventColumns:
+        """Load the user key, event type code and time of user analytics events as NumPy columns.
+        
+        Hot rows arrive as a binary COPY, decoded as it streams in without a
+        Python object per row. Archived rows are read first, chunk_size at a
+        time, in the snapshot the COPY then runs in.
+        """
+        columns = EventColumns()
+        archived = self.cold_archive is not None and self.cold_archive.reaches_archive(since)
+        async with self._read_session(snapshot=archived) as session:
+            try:
+                if archived:
+                    async for rows in self.cold_archive.stream(
+                        session, 'user_analytics_events', None, since, until, None, (), chunk_size
+                    ):
+                        await self._add_archived_activity(session, columns, rows, event_types)
+                connection = await session.connection()
+                statement = user_activity_query(since, until, event_types).compile(dialect=connection.dialect)
+                decoder = ActivityCopyDecoder(columns)
+                raw_connection = await connection.get_raw_connection()
+                await raw_connection.driver_connection.copy_from_query(
+                    str(statement),
+                    *(statement.params[name] for name in statement.positiontup),
+                    output=decoder.feed,
+                    format='binary'
+                )
+                decoder.finish()
+                return columns
+            except Exception as e:
+                logger.error(f"Error loading user activity: {str(e)}")
+                raise
+    
+    async def _add_archived_activity(
+        self,
+        session: AsyncSession,
+        columns: EventColumns,
+        rows: List[Dict[str, Any]],
+        event_types: Optional[Sequence[str]]
+    ):
+        """Add archived rows to the columns, keyed like the hot rows"""
+        codes = {event_type: code for code, event_type in enumerate(event_types or ())}
+        if event_types:
+            rows = [row for row in rows if row['event_type'] in codes]
+        if not rows:
+            return
+        keys = dict((await session.execute(user_keys_query({row['user_id'] for row in rows}))).all())
+        columns.add(
+            np.array([keys[row['user_id']] for row in rows], dtype=np.int64),
+            np.array([codes.get(row['event_type'], 0) for row in rows], dtype=np.int64),
+            np.array([epoch_ms(row['timestamp']) for row in rows], dtype=np.int64)
+        )
+    
+    async def stream_chemical_research_events(
+        self,
+        researcher: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        experiment_type: Optional[str] = None,
+        json_filters: Sequence[JsonFilter] = (),
+        chunk_size: int = 5000
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Stream chemical research rows in chunks from a server-side cursor, then from the archive"""
+        query = chemical_research_export_query(researcher, since, until, experiment_type, json_filters)
+        async for rows in self._stream(
+            query, chunk_size, 'chemical_research_events', researcher, since, until, experiment_type, json_filters
+        ):
+            yield rows
+    
+    async def _stream(
+        self,
+        query,
+        chunk_size: int,
+        dataset: str,
+        owner: Optional[str],
+        since: Optional[datetime],
+        until: Optional[datetime],
+        event_type: Optional[str],
+        json_filters: Sequence[JsonFilter]
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Fetch a query's rows chunk_size at a time, holding at most one chunk in memory.
+        
+        When the time range reaches the cold archive, the matching archived
+        rows follow, read in the same snapshot as the hot rows.
+        """
+        archived = self.cold_archive is not None and self.cold_archive.reaches_archive(since)
+        async with self._read_session(snapshot=archived) as session:
+            try:
+                result = await session.stream(query.execution_options(yield_per=chunk_size))
+                async for partition in result.mappings().partitions():
+                    yield [dict(row) for row in partition]
+                if archived:
+                    async for rows in self.cold_archive.stream(
+                        session, dataset, owner, since, until, event_type, json_filters, chunk_size
+                    ):
+                        yield rows
+            except Exception as e:
+                logger.error(f"Error streaming events: {str(e)}")
                 raise
     
     async def create_event_processing_status(self, event_id: UUID, event_type: str) -> UUID:
@@ -161,15 +1365,7 @@ class PostgreSQLRepository(DatabaseRepository):
         """Update event processing status"""
         async with self.async_session_factory() as session:
             try:
-                query = (
-                    update(EventProcessingStatus)
-                    .where(EventProcessingStatus.event_id == event_id)
-                    .values(
-                        status=status,
-                        error_message=error_message,
-                        updated_at=datetime.utcnow()
-                    )
-                )
+                query = event_processing_status_update(event_id, status, error_message)
                 await session.execute(query)
                 await session.commit()
                 logger.info(f"Updated event processing status for {event_id}: {status}")
@@ -178,103 +1374,10 @@ class PostgreSQLRepository(DatabaseRepository):
                 logger.error(f"Error updating event processing status: {str(e)}")
                 raise
     
-    async def store_user_analytics_event(self, event_data: Dict[str, Any]) -> str:
-        """Store user analytics event"""
-        session = self.SessionLocal()
-        try:
-            event = UserAnalyticsEvent(
-                user_id=event_data['user_id'],
-                event_type=event_data['event_type'],
-                page_url=event_data.get('page_url'),
-                user_agent=event_data.get('user_agent'),
-                session_id=event_data.get('session_id'),
-                timestamp=datetime.fromisoformat(event_data['timestamp'].replace('Z', '+00:00')),
-                event_metadata=event_data.get('metadata', {})
-            )
-            session.add(event)
-            session.commit()
-            logger.info(f"Stored user analytics event: {event.id}")
-            return event.id
-        except Exception as e:
-            session.rollback()
-            logger.error(f"Error storing user analytics event: {str(e)}")
-            raise
-        finally:
-            session.close()
-    
-    async def store_chemical_research_event(self, event_data: Dict[str, Any]) -> str:
-        """Store chemical research event"""
-        session = self.SessionLocal()
-        try:
-            event = ChemicalResearchEvent(
-                molecule_id=event_data['molecule_id'],
-                researcher=event_data['researcher'],
-                experiment_type=event_data['experiment_type'],
-                properties=event_data.get('properties', {}),
-                results=event_data.get('results', {}),
-                timestamp=datetime.fromisoformat(event_data['timestamp'].replace('Z', '+00:00')),
-                event_metadata=event_data.get('metadata', {})
-            )
-            session.add(event)
-            session.commit()
-            logger.info(f"Stored chemical research event: {event.id}")
-            return event.id
-        except Exception as e:
-            session.rollback()
-            logger.error(f"Error storing chemical research event: {str(e)}")
-            raise
-        finally:
-            session.close()
-    
-    async def get_user_analytics_events(self, user_id: str, limit: int = 10) -> List[Dict[str, Any]]:
-        """Get user analytics events"""
-        session = self.SessionLocal()
-        try:
-            events = session.query(UserAnalyticsEvent)\
-                           .filter(UserAnalyticsEvent.user_id == user_id)\
-                           .order_by(desc(UserAnalyticsEvent.timestamp))\
-                           .limit(limit)\
-                           .all()
-            
-            return [
-                {
-                    'id': event.id,
-                    'event_type': event.event_type,
-                    'page_url': event.page_url,
-                    'timestamp': event.timestamp.isoformat(),
-                    'metadata': event.event_metadata
-                }
-                for event in events
-            ]
-        except Exception as e:
-            logger.error(f"Error retrieving user analytics events: {str(e)}")
-            raise
-        finally:
-            session.close()
+    async def store_user_analytics_event(self, event_data: Dict[str, Any]) -> UUID:
+        """Store user analytics event (alias of save_user_analytics_event)"""
+        return await self.save_user_analytics_event(event_data)
     
-    async def get_chemical_research_events(self, researcher: str, limit: int = 10) -> List[Dict[str, Any]]:
-        """Get chemical research events"""
-        session = self.SessionLocal()
-        try:
-            events = session.query(ChemicalResearchEvent)\
-                           .filter(ChemicalResearchEvent.researcher == researcher)\
-                           .order_by(desc(ChemicalResearchEvent.timestamp))\
-                           .limit(limit)\
-                           .all()
-            
-            return [
-                {
-                    'id': event.id,
-                    'molecule_id': event.molecule_id,
-                    'experiment_type': event.experiment_type,
-                    'timestamp': event.timestamp.isoformat(),
-                    'properties': event.properties,
-                    'results': event.results
-                }
-                for event in events
-            ]
-        except Exception as e:
-            logger.error(f"Error retrieving chemical research events: {str(e)}")
-            raise
-        finally:
-            session.close()
+    async def store_chemical_research_event(self, event_data: Dict[str, Any]) -> UUID:
+        """Store chemical research event (alias of save_chemical_research_event)"""
+        return await self.save_chemical_research_event(event_data)
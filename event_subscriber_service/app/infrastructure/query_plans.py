@@ -0,0 +1,59 @@
+import json
+from typing import Any, Dict, Iterator, List
+
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+# Plan node types that indicate a hot query is not served by an index
+FORBIDDEN_NODE_TYPES = ('Seq Scan', 'Sort', 'Incremental Sort')
+
+def iter_plan_nodes(plan: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Walk a JSON EXPLAIN plan tree depth-first"""
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from iter_plan_nodes(child)
+
+def _grouping_sorts(plan: Dict[str, Any]) -> List[int]:
+    """Ids of Sort nodes that order rows for a GroupAggregate, or order its groups"""
+    feeding = [
+        id(child)
+        for node in iter_plan_nodes(plan) if node.get('Node Type') == 'Aggregate'
+        for child in node.get('Plans', []) if child.get('Node Type') == 'Sort'
+    ]
+    ordering = [
+        id(node)
+        for node in iter_plan_nodes(plan) if node.get('Node Type') == 'Sort'
+        if any(child.get('Node Type') == 'Aggregate' for child in node.get('Plans', []))
+    ]
+    return feeding + ordering
+
+def find_plan_violations(plan: Dict[str, Any], allow_grouping_sorts: bool = False) -> List[str]:
+    """Describe every sequential scan or sort node in a JSON EXPLAIN plan.
+    
+    With allow_grouping_sorts, a sort feeding a GROUP BY aggregate is
+    accepted: an aggregate reads every row its index scan finds, so sorting
+    them by the group key is part of the query, not a missing index. So is
+    a sort of the groups themselves, e.g. by their summed count, which no
+    index can provide.
+    """
+    allowed = _grouping_sorts(plan) if allow_grouping_sorts else []
+    violations = []
+    for node in iter_plan_nodes(plan):
+        node_type = node.get('Node Type')
+        if node_type in FORBIDDEN_NODE_TYPES and id(node) not in allowed:
+            relation = node.get('Relation Name') or node.get('Sort Key') or ''
+            violations.append(f"{node_type} {relation}".strip())
+    return violations
+
+async def explain(conn: AsyncConnection, statement) -> Dict[str, Any]:
+    """Return the JSON plan Postgres chooses for a SQLAlchemy statement"""
+    compiled = statement.compile(dialect=conn.dialect)
+    params = compiled.construct_params()
+    # Apply type bind processors (e.g. JSONB serialization) that execute() would run
+    processors = compiled._bind_processors
+    params = {name: processors[name](value) if name in processors else value for name, value in params.items()}
+    positional = tuple(params[name] for name in compiled.positiontup) if compiled.positiontup else params
+    result = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", positional)
+    document = result.scalar_one()
+    if isinstance(document, str):
+        document = json.loads(document)
+    return document[0]['Plan']
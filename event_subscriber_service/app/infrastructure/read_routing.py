@@ -0,0 +1,123 @@
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+logger = logging.getLogger(__name__)
+
+# Set for the duration of a request that must observe its own writes
+_primary_reads = ContextVar('primary_reads', default=False)
+
+# Seconds the replica is behind the primary; zero when it has replayed
+# everything it received, so an idle primary does not look like lag
+REPLICATION_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+@contextmanager
+def read_your_writes():
+    """Route every repository read in this context to the primary"""
+    token = _primary_reads.set(True)
+    try:
+        yield
+    finally:
+        _primary_reads.reset(token)
+
+def primary_reads_required() -> bool:
+    """Whether the current context asked for read-your-writes consistency"""
+    return _primary_reads.get()
+
+async def replication_lag(engine: AsyncEngine) -> float:
+    """Replication lag of a replica in seconds (0 for a server that is not in recovery)"""
+    async with engine.connect() as conn:
+        lag = (await conn.execute(REPLICATION_LAG_QUERY)).scalar()
+    return float(lag or 0.0)
+
+class Replica:
+    """A read replica engine and the last observation of its health"""
+
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine
+        self.name = engine.url.set(query={}).render_as_string(hide_password=True)
+        self.session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        self.lag_seconds: Optional[float] = None
+        self.available = True
+        self.checked_at = 0.0
+        self.reads = 0
+
+class ReplicaRouter:
+    """Spreads reads round-robin over replicas that are reachable and fresh enough.
+
+    Each replica's lag is measured at most every ``check_interval`` seconds.
+    A replica that is unreachable, has not been measured yet, or lags by more
+    than ``max_lag`` seconds is skipped; when none qualifies the caller falls
+    back to the primary.
+    """
+
+    def __init__(self, engines: List[AsyncEngine], max_lag: float = 5.0, check_interval: float = 5.0):
+        self.replicas = [Replica(engine) for engine in engines]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.primary_fallbacks = 0
+        self._next = 0
+
+    async def choose(self) -> Optional[Replica]:
+        """Next eligible replica, or None when reads should go to the primary"""
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[self._next % len(self.replicas)]
+            self._next += 1
+            await self._refresh(replica)
+            if replica.available and replica.lag_seconds is not None and replica.lag_seconds <= self.max_lag:
+                replica.reads += 1
+                return replica
+        self.primary_fallbacks += 1
+        return None
+
+    async def _refresh(self, replica: Replica):
+        """Re-measure a replica's lag once its last check is older than check_interval"""
+        now = time.monotonic()
+        if replica.checked_at and now - replica.checked_at < self.check_interval:
+            return
+        # Claim the check before awaiting so concurrent readers don't repeat it
+        replica.checked_at = now
+        try:
+            replica.lag_seconds = await replication_lag(replica.engine)
+            replica.available = True
+        except Exception as e:
+            replica.available = False
+            logger.warning(f"Read replica {replica.name} unavailable: {str(e)}")
+
+    def mark_unavailable(self, replica: Replica):
+        """Take a replica out of rotation until its next lag check"""
+        replica.available = False
+        replica.checked_at = time.monotonic()
+
+    async def close(self):
+        """Release every replica's pooled connections"""
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Per-replica lag, availability and read counts"""
+        return {
+            "max_lag_seconds": self.max_lag,
+            "primary_fallbacks": self.primary_fallbacks,
+            "replicas": [
+                {
+                    "name": replica.name,
+                    "available": replica.available,
+                    "lag_seconds": replica.lag_seconds,
+                    "reads": replica.reads,
+                }
+                for replica in self.replicas
+            ],
+        }
+
+def parse_read_dsns(value: Optional[str]) -> List[str]:
+    """Split a comma-separated list of replica DSNs"""
+    return [dsn.strip() for dsn in (value or '').split(',') if dsn.strip()]
@@ -0,0 +1,280 @@
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import case, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from .database_models import UserSession
+
+logger = logging.getLogger(__name__)
+
+# Sessionization of user analytics events as they are ingested.
+#
+# An event belongs to the session its session_id names or, without one, to
+# its user's session whose events are at most the inactivity gap away. Each
+# worker keeps the sessions open on it in a bounded store keyed by user and
+# writes what it has gathered of each (a fragment) to user_sessions when the
+# session closes, when the store evicts it, and at every checkpoint.
+# Fragments merge in the database: a named session's by its (user_id,
+# session_id), an inferred session's with the user's stored sessions within
+# the gap of it. Sessions therefore come out the same whichever worker saw
+# which events, and a restarted worker's sessions carry on from their last
+# checkpoint.
+
+SESSION_COLUMNS = ('started_at', 'ended_at', 'event_count', 'page_count', 'entry_page', 'exit_page', 'user_agent')
+
+def _event_time(value) -> datetime:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+def event_page(event_data: Dict[str, Any]) -> Optional[str]:
+    """Page an event was on: page_url, else metadata.page"""
+    metadata = event_data.get('metadata')
+    return event_data.get('page_url') or (metadata.get('page') if isinstance(metadata, dict) else None)
+
+def merge_sessions(left: Dict[str, Any], right: Dict[str, Any]) -> Dict[str, Any]:
+    """Session covering two fragments of it"""
+    first, last = (left, right) if left['started_at'] <= right['started_at'] else (right, left)
+    latest, other = (left, right) if left['ended_at'] >= right['ended_at'] else (right, left)
+    return {
+        'started_at': first['started_at'],
+        'ended_at': latest['ended_at'],
+        'event_count': left['event_count'] + right['event_count'],
+        'page_count': left['page_count'] + right['page_count'],
+        'entry_page': first['entry_page'] or last['entry_page'],
+        'exit_page': latest['exit_page'] or other['exit_page'],
+        'user_agent': left['user_agent'] or right['user_agent'],
+    }
+
+class SessionFragment:
+    """Events of one session seen by a worker since it last wrote the session"""
+
+    def __init__(self, user_id: str, session_id: Optional[str], timestamp: datetime):
+        self.user_id = user_id
+        self.session_id = session_id
+        self.started_at = self.ended_at = timestamp
+        self.event_count = 0
+        self.page_count = 0
+        self.entry_page = self.exit_page = None
+        self.user_agent = None
+        self._entry_at = self._exit_at = None
+
+    def continues(self, session_id: Optional[str], timestamp: datetime, gap: timedelta) -> bool:
+        """Whether an event belongs to this session"""
+        if session_id is not None or self.session_id is not None:
+            return session_id == self.session_id
+        return self.started_at - gap <= timestamp <= self.ended_at + gap
+
+    def add(self, timestamp: datetime, page: Optional[str], user_agent: Optional[str]):
+        self.started_at = min(self.started_at, timestamp)
+        self.ended_at = max(self.ended_at, timestamp)
+        self.event_count += 1
+        self.user_agent = self.user_agent or user_agent
+        if page is None:
+            return
+        self.page_count += 1
+        if self._entry_at is None or timestamp < self._entry_at:
+            self.entry_page, self._entry_at = page, timestamp
+        if self._exit_at is None or timestamp >= self._exit_at:
+            self.exit_page, self._exit_at = page, timestamp
+
+    def values(self) -> Dict[str, Any]:
+        """Row values of the fragment"""
+        return {
+            'user_id': self.user_id,
+            'session_id': self.session_id,
+            **{name: getattr(self, name) for name in SESSION_COLUMNS},
+        }
+
+    def take(self) -> Dict[str, Any]:
+        """Row values of the fragment, after which it starts over from its last event"""
+        taken = self.values()
+        self.started_at = self.ended_at
+        self.event_count = self.page_count = 0
+        self.entry_page = self.exit_page = None
+        self._entry_at = self._exit_at = None
+        return taken
+
+def named_session_upsert(values: List[Dict[str, Any]]):
+    """Merge fragments of sessions named by a session_id into their stored rows"""
+    statement = pg_insert(UserSession).values(values)
+    stored, new = UserSession.__table__.c, statement.excluded
+    return statement.on_conflict_do_update(
+        index_elements=['user_id', 'session_id'],
+        set_={
+            'started_at': func.least(stored.started_at, new.started_at),
+            'ended_at': func.greatest(stored.ended_at, new.ended_at),
+            'event_count': stored.event_count + new.event_count,
+            'page_count': stored.page_count + new.page_count,
+            'entry_page': case(
+                (new.started_at < stored.started_at, func.coalesce(new.entry_page, stored.entry_page)),
+                else_=func.coalesce(stored.entry_page, new.entry_page)
+            ),
+            'exit_page': case(
+                (new.ended_at >= stored.ended_at, func.coalesce(new.exit_page, stored.exit_page)),
+                else_=func.coalesce(stored.exit_page, new.exit_page)
+            ),
+            'user_agent': func.coalesce(stored.user_agent, new.user_agent),
+        }
+    )
+
+def lock_user_sessions_statement(user_id: str):
+    """Serialize merges of a user's inferred sessions across workers until the transaction ends"""
+    return select(func.pg_advisory_xact_lock(func.hashtext('user_sessions:' + user_id)))
+
+def adjacent_sessions_query(user_id: str, started_at: datetime, ended_at: datetime, gap: timedelta):
+    """A user's stored inferred sessions within the inactivity gap of a fragment; any of them may absorb the others"""
+    return (
+        select(UserSession)
+        .where(
+            UserSession.user_id == user_id,
+            UserSession.session_id.is_(None),
+            UserSession.started_at <= ended_at + gap,
+            UserSession.ended_at >= started_at - gap
+        )
+        .with_for_update()
+    )
+
+def user_sessions_query(user_id: str, since: datetime, until: datetime, limit: int):
+    """A user's sessions started in [since, until), newest first"""
+    return (
+        select(UserSession)
+        .where(UserSession.user_id == user_id, UserSession.started_at >= since, UserSession.started_at < until)
+        .order_by(UserSession.started_at.desc())
+        .limit(limit)
+    )
+
+def session_metrics_query(user_id: str, since: datetime, until: datetime):
+    """Session count, average duration and pages, and bounce rate over [since, until)"""
+    return select(
+        func.count().label('sessions'),
+        func.avg(func.extract('epoch', UserSession.ended_at - UserSession.started_at)).label('average_duration'),
+        func.avg(UserSession.page_count).label('average_pages'),
+        func.avg(case((UserSession.event_count == 1, 1.0), else_=0.0)).label('bounce_rate')
+    ).where(UserSession.user_id == user_id, UserSession.started_at >= since, UserSession.started_at < until)
+
+class Sessionizer:
+    """Ingest listener grouping user analytics events into sessions.
+
+    Open sessions are kept per user, at most MAX_OPEN of them, least
+    recently active evicted first. A session closes when its user's next
+    event starts another one, or once the latest event the worker has seen
+    is more than the inactivity gap past it. Fragments are written every
+    CHECKPOINT_EVENTS events or CHECKPOINT_INTERVAL seconds and on worker
+    shutdown; a failed checkpoint keeps them for the next one.
+    """
+
+    def __init__(
+        self,
+        database_repo,
+        inactivity_gap: float = 1800.0,
+        max_open: int = 10000,
+        checkpoint_interval: float = 10.0,
+        checkpoint_events: int = 1000
+    ):
+        self.database_repo = database_repo
+        self.inactivity_gap = timedelta(seconds=inactivity_gap)
+        self.max_open = max_open
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint_events = checkpoint_events
+        self._open: 'OrderedDict[str, SessionFragment]' = OrderedDict()
+        self._pending: List[Dict[str, Any]] = []
+        self._pending_events = 0
+        self._last_checkpoint = time.monotonic()
+        self._watermark: Optional[datetime] = None
+        self.closed = 0
+        self.evicted = 0
+        self.written = 0
+
+    async def event_ingested(self, event_type: str, event_data: Dict[str, Any]):
+        """Add a user analytics event to its user's session"""
+        if event_type != 'user_analytics':
+            return
+        user_id, session_id = event_data['user_id'], event_data.get('session_id')
+        timestamp = _event_time(event_data['timestamp'])
+        session = self._open.get(user_id)
+        if session is not None and not session.continues(session_id, timestamp, self.inactivity_gap):
+            self._close(user_id)
+            session = None
+        if session is None:
+            session = self._open[user_id] = SessionFragment(user_id, session_id, timestamp)
+            if len(self._open) > self.max_open:
+                _, victim = self._open.popitem(last=False)
+                if victim.event_count:
+                    self._pending.append(victim.values())
+                self.evicted += 1
+        self._open.move_to_end(user_id)
+        session.add(timestamp, event_page(event_data), event_data.get('user_agent'))
+        self._watermark = max(self._watermark or timestamp, timestamp)
+        self._pending_events += 1
+        if (
+            self._pending_events >= self.checkpoint_events
+            or time.monotonic() - self._last_checkpoint >= self.checkpoint_interval
+        ):
+            await self.checkpoint()
+
+    def _close(self, user_id: str):
+        session = self._open.pop(user_id)
+        if session.event_count:
+            self._pending.append(session.values())
+        self.closed += 1
+
+    async def checkpoint(self):
+        """Close idle sessions and write every fragment gathered since the last checkpoint"""
+        if self._watermark is not None:
+            for user_id in [u for u, s in self._open.items() if s.ended_at < self._watermark - self.inactivity_gap]:
+                self._close(user_id)
+        fragments, self._pending = self._pending, []
+        fragments += [session.take() for session in self._open.values() if session.event_count]
+        self._pending_events = 0
+        self._last_checkpoint = time.monotonic()
+        if not fragments:
+            return
+        try:
+            await self.database_repo.write_session_fragments(fragments, self.inactivity_gap)
+            self.written += len(fragments)
+        except Exception as e:
+            logger.error(f"Error writing user sessions: {str(e)}")
+            self._pending = fragments + self._pending
+            raise
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Open sessions and fragments written or waiting to be"""
+        return {
+            "open_sessions": len(self._open),
+            "closed": self.closed,
+            "evicted": self.evicted,
+            "written": self.written,
+            "pending_fragments": len(self._pending),
+        }
+
+def sessions_payload(user_id: str, since: datetime, until: datetime, gap: timedelta, metrics: Dict[str, Any], sessions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """A user's sessions with their aggregate metrics"""
+    now = datetime.now(timezone.utc)
+    return {
+        "user_id": user_id,
+        "since": since.isoformat(),
+        "until": until.isoformat(),
+        "inactivity_gap_seconds": gap.total_seconds(),
+        "metrics": metrics,
+        "sessions": [
+            {
+                "session_id": session["session_id"],
+                "started_at": session["started_at"].isoformat(),
+                "ended_at": session["ended_at"].isoformat(),
+                "duration_seconds": (session["ended_at"] - session["started_at"]).total_seconds(),
+                "event_count": session["event_count"],
+                "page_count": session["page_count"],
+                "entry_page": session["entry_page"],
+                "exit_page": session["exit_page"],
+                "user_agent": session["user_agent"],
+                # A session may still grow until its inactivity gap has passed
+                "open": session["ended_at"] + gap > now,
+            }
+            for session in sessions
+        ],
+    }
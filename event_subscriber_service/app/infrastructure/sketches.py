@@ -0,0 +1,185 @@
+import hashlib
+import math
+from collections import OrderedDict
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from .database_models import DistinctSketch
+
+# HyperLogLog sketches for approximate distinct counts, one per subject and
+# UTC day. Each sketch is 2^PRECISION one-byte registers (4 KiB). Sketches
+# of any number of days merge by taking the register-wise maximum, so a
+# count over months costs one 4 KiB row per day and constant memory.
+#
+# Adding an element only ever raises one register, and raising a register
+# to a value it already has changes nothing. Once an event is committed, an
+# ingest listener writes its single register updates, which are safe to
+# repeat on redelivery, and skips those a register it has already written
+# makes redundant.
+
+PRECISION = 12
+REGISTERS = 1 << PRECISION
+RELATIVE_STANDARD_ERROR = 1.04 / math.sqrt(REGISTERS)
+
+# Dimension -> (event type feeding it, event column naming the subject,
+# event column whose distinct values are counted)
+DISTINCT_DIMENSIONS = {
+    'event_type': ('user_analytics', 'event_type', 'user_id'),
+    'researcher': ('chemical_research', 'researcher', 'molecule_id'),
+    'molecule': ('chemical_research', 'molecule_id', 'researcher'),
+}
+
+_HASH_BITS = 64
+_RANK_BITS = _HASH_BITS - PRECISION
+
+def register_update(element: str) -> Tuple[int, int]:
+    """The (register, rank) an element sets: the hash's top bits pick the register,
+    the position of the first one bit in the rest is the rank"""
+    hashed = int.from_bytes(hashlib.blake2b(element.encode(), digest_size=8).digest(), 'big')
+    register = hashed >> _RANK_BITS
+    rest = hashed & ((1 << _RANK_BITS) - 1)
+    return register, _RANK_BITS - rest.bit_length() + 1
+
+def merge_registers(left: bytes, right: bytes) -> bytes:
+    """Register-wise maximum of two sketches: the sketch of the union of their elements"""
+    return bytes(map(max, left, right))
+
+def estimate(registers: bytes) -> int:
+    """HyperLogLog cardinality estimate, with linear counting for small cardinalities"""
+    alpha = 0.7213 / (1 + 1.079 / REGISTERS)
+    raw = alpha * REGISTERS * REGISTERS / sum(2.0 ** -value for value in registers)
+    zeros = registers.count(0)
+    if raw <= 2.5 * REGISTERS and zeros:
+        return round(REGISTERS * math.log(REGISTERS / zeros))
+    return round(raw)
+
+def sketch_day(timestamp) -> date:
+    """UTC day a sketch for an event's timestamp (a datetime or ISO-8601 string) covers"""
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+    if timestamp.tzinfo is None:
+        return timestamp.date()
+    return timestamp.astimezone(timezone.utc).date()
+
+def register_upsert():
+    """Raise one register of one day's sketch, creating the sketch if needed.
+
+    The conditional DO UPDATE leaves a sketch whose register is already
+    high enough untouched, so repeating an update writes nothing.
+    """
+    register, rank = bindparam('register'), bindparam('rank')
+    statement = pg_insert(DistinctSketch).values(
+        dimension=bindparam('dimension'),
+        subject=bindparam('subject'),
+        day=bindparam('day'),
+        registers=func.set_byte(func.decode(func.repeat('00', REGISTERS), 'hex'), register, rank)
+    )
+    current = DistinctSketch.__table__.c.registers
+    return statement.on_conflict_do_update(
+        index_elements=['dimension', 'subject', 'day'],
+        set_={'registers': func.set_byte(current, register, rank)},
+        where=func.get_byte(current, register) < rank
+    )
+
+def sketches_query(dimension: str, subject: str, since: date, until: date):
+    """A subject's daily sketches over the days [since, until], served by the primary key"""
+    return select(DistinctSketch.registers).where(
+        DistinctSketch.dimension == dimension,
+        DistinctSketch.subject == subject,
+        DistinctSketch.day >= since,
+        DistinctSketch.day <= until
+    )
+
+class RegisterCache:
+    """Lower bounds of the stored registers of recently updated sketches.
+
+    Registers only grow, so a register this process has already raised to
+    a rank makes any update with a rank no higher redundant. On a busy
+    subject most updates are, which keeps the hot sketch rows from being
+    rewritten and locked for every event.
+    """
+
+    def __init__(self, max_sketches: int = 1024):
+        self.max_sketches = max_sketches
+        self._sketches: 'OrderedDict[tuple, bytearray]' = OrderedDict()
+        self.skipped = 0
+
+    def pending(self, event_type: str, events: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Register updates for events that may still raise a register,
+        one per (sketch, register) in key order so concurrent writers lock rows alike"""
+        updates: Dict[tuple, int] = {}
+        for row in events:
+            for dimension, (feeding_type, subject_column, element_column) in DISTINCT_DIMENSIONS.items():
+                if feeding_type != event_type or row.get(element_column) is None:
+                    continue
+                register, rank = register_update(str(row[element_column]))
+                key = (dimension, row[subject_column], sketch_day(row['timestamp']), register)
+                if updates.get(key, 0) < rank:
+                    updates[key] = rank
+        pending = []
+        for (dimension, subject, day, register), rank in sorted(updates.items()):
+            known = self._sketches.get((dimension, subject, day))
+            if known is not None and known[register] >= rank:
+                self.skipped += 1
+                continue
+            pending.append({
+                "dimension": dimension, "subject": subject, "day": day, "register": register, "rank": rank
+            })
+        return pending
+
+    def written(self, updates: List[Dict[str, Any]]):
+        """Remember register updates once they are committed"""
+        for update in updates:
+            key = (update["dimension"], update["subject"], update["day"])
+            known = self._sketches.get(key)
+            if known is None:
+                known = self._sketches[key] = bytearray(REGISTERS)
+            self._sketches.move_to_end(key)
+            known[update["register"]] = max(known[update["register"]], update["rank"])
+        while len(self._sketches) > self.max_sketches:
+            self._sketches.popitem(last=False)
+
+class DistinctSketchWriter:
+    """Ingest listener raising the sketch registers of each committed event.
+
+    Sketches are approximate to begin with, so like any listener a failed
+    update is logged and does not fail ingest.
+    """
+
+    def __init__(self, database_repo, max_sketches: int = 1024):
+        self.database_repo = database_repo
+        self.registers = RegisterCache(max_sketches)
+        self.writes = 0
+
+    async def event_ingested(self, event_type: str, event_data: Dict[str, Any]):
+        """Write the register updates an event can still make"""
+        updates = self.registers.pending(event_type, [event_data])
+        if not updates:
+            return
+        await self.database_repo.raise_sketch_registers(updates)
+        self.registers.written(updates)
+        self.writes += len(updates)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Register updates written and skipped"""
+        return {"written": self.writes, "skipped": self.registers.skipped}
+
+def distinct_payload(dimension: str, subject: str, since: date, until: date, registers: Optional[bytes]) -> Dict[str, Any]:
+    """Estimate with its error bound, for the days [since, until]"""
+    count = estimate(registers) if registers is not None else 0
+    margin = 2 * RELATIVE_STANDARD_ERROR * count
+    return {
+        "dimension": dimension,
+        "subject": subject,
+        "counts": DISTINCT_DIMENSIONS[dimension][2],
+        "since": since.isoformat(),
+        "until": until.isoformat(),
+        "distinct_estimate": count,
+        "relative_standard_error": round(RELATIVE_STANDARD_ERROR, 4),
+        # About 95% of estimates fall within two standard errors
+        "lower_bound": max(0, math.floor(count - margin)),
+        "upper_bound": math.ceil(count + margin),
+    }
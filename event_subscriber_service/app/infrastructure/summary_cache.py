@@ -0,0 +1,246 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from .read_routing import primary_reads_required
+
+logger = logging.getLogger(__name__)
+
+# Read-through cache for the analytics summaries.
+#
+# Every cached value is stored under the current *version* of its owner (a
+# user or a researcher). The ingest path replaces that version after it
+# commits an owner's events, so readers stop seeing older values at once and
+# never need to find and delete them. A value loaded just before a version
+# change is written under the old version and is never read again. Redis
+# holds the versions and the values shared by every API process; a bounded
+# in-process LRU in front of it answers repeated reads of the same version
+# without fetching and decoding the value again.
+
+# Cached endpoint -> the owner scope whose version guards it. Values of
+# endpoints without one span every owner and only expire by TTL.
+ENDPOINT_SCOPES = {
+    'user_summary': 'user',
+    'researcher_summary': 'researcher',
+    'funnel': None,
+    'retention': None,
+}
+
+# Ingested event type -> (owner scope, event field naming the owner)
+INGEST_SCOPES = {
+    'user_analytics': ('user', 'user_id'),
+    'chemical_research': ('researcher', 'researcher'),
+}
+
+# Version keys outlive every value written under them, so an expired version
+# never comes back while values cached under it are still alive
+VERSION_TTL_SECONDS = 86400
+
+INITIAL_VERSION = '0'
+
+Loader = Callable[[], Awaitable[Any]]
+
+class SummaryCache:
+    """Two-level (in-process LRU + Redis) cache with version-based invalidation.
+
+    Concurrent misses for the same value are collapsed: within a process they
+    share one load, and across processes the first to take a short Redis lock
+    loads while the others wait for its result. Without Redis the cache is
+    process-local and entries only expire by TTL.
+    """
+
+    def __init__(
+        self,
+        redis=None,
+        ttls: Optional[Dict[str, float]] = None,
+        max_entries: int = 1024,
+        lock_timeout: float = 5.0,
+        namespace: str = 'summary_cache'
+    ):
+        self.redis = redis
+        self.ttls = ttls or {}
+        self.max_entries = max_entries
+        self.lock_timeout = lock_timeout
+        self.namespace = namespace
+        self._entries: 'OrderedDict[tuple, tuple]' = OrderedDict()
+        self._local_versions: Dict[tuple, str] = {}
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    def _version_key(self, scope: str, owner: str) -> str:
+        return f"{self.namespace}:version:{scope}:{owner}"
+
+    def _value_key(self, endpoint: str, owner: str, version: str) -> str:
+        return f"{self.namespace}:{endpoint}:{owner}:{version}"
+
+    async def _version(self, scope: Optional[str], owner: str) -> str:
+        if scope is None:
+            return INITIAL_VERSION
+        if self.redis is None:
+            return self._local_versions.get((scope, owner), INITIAL_VERSION)
+        version = await self.redis.get(self._version_key(scope, owner))
+        if version is None:
+            return INITIAL_VERSION
+        return version.decode() if isinstance(version, bytes) else version
+
+    async def get_or_load(self, endpoint: str, owner: str, loader: Loader) -> Any:
+        """Cached value of an endpoint for an owner, loading it on a miss"""
+        if primary_reads_required():
+            # Read-your-writes requests must not be answered from the cache
+            return await loader()
+        try:
+            version = await self._version(ENDPOINT_SCOPES[endpoint], owner)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Summary cache unavailable, reading through: {str(e)}")
+            return await loader()
+
+        key = (endpoint, owner)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version and entry[1] > time.monotonic():
+            self._entries.move_to_end(key)
+            self.local_hits += 1
+            return entry[2]
+
+        flight = (endpoint, owner, version)
+        task = self._inflight.get(flight)
+        if task is None:
+            task = asyncio.ensure_future(self._load(endpoint, owner, version, loader))
+            self._inflight[flight] = task
+            task.add_done_callback(lambda _: self._inflight.pop(flight, None))
+        return await asyncio.shield(task)
+
+    async def _load(self, endpoint: str, owner: str, version: str, loader: Loader) -> Any:
+        ttl = self.ttls.get(endpoint, 30.0)
+        if self.redis is None:
+            self.misses += 1
+            value = await self._call(loader)
+        else:
+            value = await self._load_shared(endpoint, owner, version, ttl, loader)
+        self._store_local((endpoint, owner), version, value, ttl)
+        return value
+
+    async def _call(self, loader: Loader) -> Any:
+        self.loads += 1
+        return await loader()
+
+    async def _load_shared(self, endpoint: str, owner: str, version: str, ttl: float, loader: Loader) -> Any:
+        """Fetch the value from Redis, or load and publish it under a short lock"""
+        value_key = self._value_key(endpoint, owner, version)
+        lock_key = f"{value_key}:lock"
+        try:
+            cached = await self.redis.get(value_key)
+            if cached is not None:
+                self.shared_hits += 1
+                return json.loads(cached)
+            self.misses += 1
+            locked = await self.redis.set(lock_key, '1', nx=True, px=int(self.lock_timeout * 1000))
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Summary cache unavailable, reading through: {str(e)}")
+            return await self._call(loader)
+
+        if not locked:
+            # Another process is loading this value; wait for it rather than
+            # piling the same query onto the database
+            deadline = time.monotonic() + self.lock_timeout
+            while time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+                try:
+                    cached = await self.redis.get(value_key)
+                except Exception:
+                    break
+                if cached is not None:
+                    self.shared_hits += 1
+                    return json.loads(cached)
+            return await self._call(loader)
+
+        try:
+            value = await self._call(loader)
+            try:
+                await self.redis.set(value_key, json.dumps(value, default=str), px=int(ttl * 1000))
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Error storing summary cache value: {str(e)}")
+            return value
+        finally:
+            try:
+                await self.redis.delete(lock_key)
+            except Exception as e:
+                logger.warning(f"Error releasing summary cache lock: {str(e)}")
+
+    def _store_local(self, key: tuple, version: str, value: Any, ttl: float):
+        self._entries[key] = (version, time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def invalidate(self, scope: str, owner: str):
+        """Start a new version for an owner, retiring every value cached for it"""
+        self.invalidations += 1
+        if self.redis is None:
+            self._local_versions[(scope, owner)] = uuid.uuid4().hex
+            return
+        await self.redis.set(self._version_key(scope, owner), uuid.uuid4().hex, ex=VERSION_TTL_SECONDS)
+
+    async def event_ingested(self, event_type: str, event_data: Dict[str, Any]):
+        """Ingest listener: invalidate the summaries of the event's owner"""
+        scope, field = INGEST_SCOPES[event_type]
+        await self.invalidate(scope, event_data[field])
+
+    async def close(self):
+        """Release the Redis connection pool"""
+        if self.redis is not None:
+            await self.redis.aclose()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Hit, miss and error counters"""
+        return {
+            "enabled": True,
+            "shared": self.redis is not None,
+            "local_entries": len(self._entries),
+            "local_hits": self.local_hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "loads": self.loads,
+            "invalidations": self.invalidations,
+            "errors": self.errors,
+        }
+
+def cache_redis_url(settings) -> Optional[str]:
+    """Redis for the cache: CACHE_REDIS_URL, else the Celery broker when it is Redis"""
+    if settings.CACHE_REDIS_URL:
+        return settings.CACHE_REDIS_URL
+    if settings.CELERY_BROKER_URL.startswith(('redis://', 'rediss://')):
+        return settings.CELERY_BROKER_URL
+    return None
+
+def build_summary_cache(settings) -> Optional[SummaryCache]:
+    """Summary cache configured from settings, or None when caching is disabled"""
+    if not settings.CACHE_ENABLED:
+        return None
+    client = None
+    url = cache_redis_url(settings)
+    if url:
+        from redis.asyncio import Redis
+        client = Redis.from_url(url, socket_timeout=settings.CACHE_REDIS_TIMEOUT)
+    return SummaryCache(
+        client,
+        ttls={
+            'user_summary': settings.CACHE_USER_SUMMARY_TTL,
+            'researcher_summary': settings.CACHE_RESEARCHER_SUMMARY_TTL,
+            'funnel': settings.CACHE_ANALYSIS_TTL,
+            'retention': settings.CACHE_ANALYSIS_TTL,
+        },
+        max_entries=settings.CACHE_LOCAL_MAX_ENTRIES,
+        lock_timeout=settings.CACHE_LOCK_TIMEOUT
+    )
@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Tuple
+
+from .metrics import RunningStats
+
+logger = logging.getLogger(__name__)
+
+FlushHandler = Callable[[Hashable, List[Dict[str, Any]]], Awaitable[List[Any]]]
+
+class WriteBehindBuffer:
+    """Coalesces single-row writes into multi-row batches.
+
+    Callers submit one row at a time under a batch key and await their own
+    result. Rows sharing a key are handed to the flush handler together once
+    the batch reaches ``max_batch_size``, once the oldest row has waited
+    ``max_delay`` seconds, or when the buffer is closed. At most
+    ``max_pending`` rows are buffered; further submitters wait for room.
+
+    Batches only form when many submitters are awaiting at once on the same
+    event loop; a caller with one write in flight at a time gets batches of
+    one, each delayed by ``max_delay``. The subscriber worker therefore
+    processes consumed events in concurrent batches when it is enabled
+    (see process_event_batch_task).
+    """
+
+    def __init__(
+        self,
+        flush_handler: FlushHandler,
+        max_batch_size: int = 500,
+        max_delay: float = 0.05,
+        max_pending: int = 10000
+    ):
+        self.flush_handler = flush_handler
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self._pending: Dict[Hashable, List[Tuple[Dict[str, Any], asyncio.Future]]] = {}
+        self._timers: Dict[Hashable, asyncio.TimerHandle] = {}
+        self._slots = asyncio.Semaphore(max_pending)
+        self._flushes = set()
+        self.batch_size_stats = RunningStats()
+        self.flush_latency_stats = RunningStats()
+        self.failed_flushes = 0
+
+    async def submit(self, key: Hashable, row: Dict[str, Any]) -> Any:
+        """Queue a row for writing and wait for its individual result"""
+        await self._slots.acquire()
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(lambda _: self._slots.release())
+
+        batch = self._pending.setdefault(key, [])
+        batch.append((row, future))
+        if len(batch) >= self.max_batch_size:
+            self._schedule_flush(key)
+        elif key not in self._timers:
+            self._timers[key] = asyncio.get_running_loop().call_later(
+                self.max_delay, self._schedule_flush, key
+            )
+        return await future
+
+    def _schedule_flush(self, key: Hashable):
+        """Detach the pending batch for a key and flush it in the background"""
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(key, None)
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._flush(key, batch))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, key: Hashable, batch: List[Tuple[Dict[str, Any], asyncio.Future]]):
+        """Write a batch and resolve every caller's future"""
+        started = time.perf_counter()
+        try:
+            results = await self.flush_handler(key, [row for row, _ in batch])
+        except Exception as e:
+            self.failed_flushes += 1
+            if len(batch) == 1:
+                self._resolve(batch[0][1], error=e)
+                return
+            # Retry rows one at a time so a single bad row only fails its own caller
+            logger.warning(f"Batch write of {len(batch)} rows for {key} failed, retrying individually: {str(e)}")
+            for item in batch:
+                await self._flush(key, [item])
+            return
+        finally:
+            self.flush_latency_stats.observe(time.perf_counter() - started)
+
+        self.batch_size_stats.observe(len(batch))
+        for (_, future), result in zip(batch, results):
+            self._resolve(future, result=result)
+
+    @staticmethod
+    def _resolve(future: asyncio.Future, result: Any = None, error: Exception = None):
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    async def flush(self):
+        """Flush every pending batch and wait for the writes to finish"""
+        for key in list(self._pending):
+            self._schedule_flush(key)
+        if self._flushes:
+            await asyncio.gather(*list(self._flushes), return_exceptions=True)
+
+    async def close(self):
+        """Flush outstanding rows on shutdown"""
+        await self.flush()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Buffer occupancy, batch size and flush latency statistics"""
+        return {
+            "pending_rows": sum(len(batch) for batch in self._pending.values()),
+            "max_pending": self.max_pending,
+            "batch_size": self.batch_size_stats.snapshot(),
+            "flush_latency_seconds": self.flush_latency_stats.snapshot(),
+            "failed_flushes": self.failed_flushes,
+        }
@@ -1,12 +1,34 @@
-from fastapi import FastAPI, HTTPException, Depends
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
 import asyncio
+import json
 import logging
-from typing import Dict, Any, List
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional
 
 from app.config.settings import settings
-from app.infrastructure.postgresql_repository import PostgreSQLRepository
+from app.infrastructure.postgresql_repository import (
+    PostgreSQLRepository,
+    USER_ANALYTICS_JSON_COLUMNS,
+    CHEMICAL_RESEARCH_JSON_COLUMNS
+)
 from app.core.event_processing_service import DataAnalyticsService
+from app.infrastructure.pagination import encode_cursor, decode_cursor
+from app.infrastructure.read_routing import read_your_writes
+from app.infrastructure.summary_cache import build_summary_cache
+from app.infrastructure.live_hub import LiveHub, SubscriberEvicted, build_live_bridge
+from app.infrastructure.hot_store import build_hot_store
+from app.infrastructure.jsonb_filters import parse_json_filters
+from app.infrastructure.histograms import HISTOGRAM_DIMENSIONS, GRANULARITIES, bucket_count
+from app.infrastructure.sketches import DISTINCT_DIMENSIONS, sketch_day
+from app.infrastructure.heavy_hitters import TOP_K_DIMENSIONS
+from app.infrastructure.event_analysis import PERIODS
+from app.infrastructure.database_models import UserAnalyticsEvent, ChemicalResearchEvent
+from app.infrastructure.llm_cache import properties_cache_key
+from app.infrastructure.llm_service import HTTPLLMService
+from app.infrastructure.export import EXPORT_FORMATS, ARROW_FORMATS, encode_export, require_pyarrow
 
 logger = logging.getLogger(__name__)
 
@@ -19,53 +41,477 @@ app = FastAPI(
 
 # Initialize services
 database_repo = PostgreSQLRepository()
-analytics_service = DataAnalyticsService(database_repo)
+summary_cache = build_summary_cache(settings)
+hot_store = build_hot_store(settings)
+analytics_service = DataAnalyticsService(
+    database_repo,
+    cache=summary_cache,
+    bulk_chunk_size=settings.BULK_SUMMARY_CHUNK_SIZE,
+    session_inactivity_gap=settings.SESSION_INACTIVITY_GAP,
+    analysis_chunk_size=settings.ANALYSIS_CHUNK_SIZE,
+    hot_store=hot_store
+)
+live_hub = LiveHub(max_buffer=settings.LIVE_CLIENT_BUFFER)
+live_bridge = build_live_bridge(settings, live_hub, listeners=[hot_store] if hot_store is not None else [])
+
+@app.on_event("startup")
+async def startup():
+    """Ensure database tables exist and start relaying live events"""
+    await database_repo.create_tables()
+    if live_bridge is not None:
+        live_bridge.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Flush buffered writes and release database, cache and live channel connections"""
+    await database_repo.close()
+    if summary_cache is not None:
+        await summary_cache.close()
+    if live_bridge is not None:
+        await live_bridge.close()
+
+@app.middleware("http")
+async def route_reads(request: Request, call_next):
+    """Send a request's reads to the primary when it asks to see its own writes"""
+    if request.headers.get("X-Read-Your-Writes", "").lower() in ("1", "true", "yes"):
+        with read_your_writes():
+            return await call_next(request)
+    return await call_next(request)
 
 @app.get("/healthz")
 async def health_check():
     """Health check endpoint"""
     return {"status": "ok", "service": "event_subscriber"}
 
+@app.get("/metrics")
+def get_metrics():
+    """Operational metrics for the repository layer"""
+    return {
+        "service": "event_subscriber",
+        "database": database_repo.get_metrics(),
+        "summary_cache": summary_cache.get_metrics() if summary_cache is not None else {"enabled": False},
+        "live": live_hub.get_metrics() if live_bridge is not None else {"enabled": False},
+        "hot_store": hot_store.get_metrics() if hot_store is not None else {"enabled": False}
+    }
+
 @app.get("/api/v1/analytics/user/{user_id}")
-async def get_user_analytics(user_id: str):
-    """Get analytics summary for a specific user"""
+async def get_user_analytics(user_id: str, since: Optional[datetime] = None, until: Optional[datetime] = None):
+    """Get analytics summary for a specific user, optionally over [since, until)"""
     try:
-        summary = await analytics_service.get_user_analytics_summary(user_id)
+        summary = await analytics_service.get_user_analytics_summary(user_id, since=since, until=until)
         return summary
     except Exception as e:
         logger.error(f"Error getting user analytics: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/v1/analytics/user/{user_id}/sessions")
+async def get_user_sessions(
+    user_id: str,
+    since: datetime,
+    until: Optional[datetime] = None,
+    limit: int = Query(50, ge=1, le=500)
+):
+    """Get a user's sessions and session metrics"""
+    until = until or datetime.now(timezone.utc)
+    if since >= until:
+        raise HTTPException(status_code=400, detail="since must be before until")
+    try:
+        return await analytics_service.get_user_sessions(user_id, since, until, limit)
+    except Exception as e:
+        logger.error(f"Error getting user sessions: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/api/v1/analytics/researcher/{researcher}")
-async def get_researcher_analytics(researcher: str):
-    """Get analytics summary for a specific researcher"""
+async def get_researcher_analytics(researcher: str, since: Optional[datetime] = None, until: Optional[datetime] = None):
+    """Get analytics summary for a specific researcher, optionally over [since, until)"""
     try:
-        summary = await analytics_service.get_researcher_summary(researcher)
+        summary = await analytics_service.get_researcher_summary(researcher, since=since, until=until)
         return summary
     except Exception as e:
         logger.error(f"Error getting researcher analytics: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+class UserSummariesRequest(BaseModel):
+    user_ids: List[str]
+
+class ResearcherSummariesRequest(BaseModel):
+    researchers: List[str]
+
+def _check_bulk_owners(owners: List[str]) -> List[str]:
+    """Distinct owners of a bulk request in request order, rejecting empty or oversized requests"""
+    owners = list(dict.fromkeys(owners))
+    if not owners:
+        raise HTTPException(status_code=400, detail="At least one owner is required")
+    if len(owners) > settings.BULK_SUMMARY_MAX_OWNERS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"{len(owners)} owners requested; the limit is {settings.BULK_SUMMARY_MAX_OWNERS}"
+        )
+    return owners
+
+@app.post("/api/v1/analytics/users")
+async def get_user_analytics_bulk(request: UserSummariesRequest):
+    """Get analytics summaries for many users in one request"""
+    user_ids = _check_bulk_owners(request.user_ids)
+    try:
+        summaries = await analytics_service.get_user_analytics_summaries(user_ids)
+        return {"summaries": [summaries[user_id] for user_id in user_ids]}
+    except Exception as e:
+        logger.error(f"Error getting user analytics summaries: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/v1/analytics/researchers")
+async def get_researcher_analytics_bulk(request: ResearcherSummariesRequest):
+    """Get research summaries for many researchers in one request"""
+    researchers = _check_bulk_owners(request.researchers)
+    try:
+        summaries = await analytics_service.get_researcher_summaries(researchers)
+        return {"summaries": [summaries[researcher] for researcher in researchers]}
+    except Exception as e:
+        logger.error(f"Error getting researcher summaries: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/v1/histograms/{dimension}/{subject}")
+async def get_activity_histogram(
+    dimension: str,
+    subject: str,
+    since: datetime,
+    until: Optional[datetime] = None,
+    granularity: str = "hour"
+):
+    """Get event counts per minute, hour or day for a user, event type or researcher"""
+    if dimension not in HISTOGRAM_DIMENSIONS:
+        raise HTTPException(status_code=404, detail=f"Unknown histogram dimension: {dimension}")
+    if granularity not in GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"Unsupported granularity: {granularity}")
+    until = until or datetime.now(timezone.utc)
+    buckets = bucket_count(since, until, granularity)
+    if buckets == 0:
+        raise HTTPException(status_code=400, detail="since must be before until")
+    if buckets > settings.HISTOGRAM_MAX_BUCKETS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Range spans {buckets} {granularity} buckets; the limit is {settings.HISTOGRAM_MAX_BUCKETS}"
+        )
+    try:
+        return await analytics_service.get_activity_histogram(dimension, subject, granularity, since, until)
+    except Exception as e:
+        logger.error(f"Error getting activity histogram: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/v1/analytics/distinct/{dimension}/{subject}")
+async def get_distinct_count(dimension: str, subject: str, since: datetime, until: Optional[datetime] = None):
+    """Get the approximate number of distinct users, molecules or researchers over whole UTC days"""
+    if dimension not in DISTINCT_DIMENSIONS:
+        raise HTTPException(status_code=404, detail=f"Unknown distinct-count dimension: {dimension}")
+    until = until or datetime.now(timezone.utc)
+    if sketch_day(until) < sketch_day(since):
+        raise HTTPException(status_code=400, detail="since must not be after until")
+    try:
+        return await analytics_service.get_distinct_count(dimension, subject, since, until)
+    except Exception as e:
+        logger.error(f"Error getting distinct count: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/v1/analytics/top/{dimension}")
+async def get_top_items(
+    dimension: str,
+    since: datetime,
+    until: Optional[datetime] = None,
+    k: int = Query(10, ge=1)
+):
+    """Get the most active users, most viewed pages or most studied molecules over whole UTC days"""
+    if dimension not in TOP_K_DIMENSIONS:
+        raise HTTPException(status_code=404, detail=f"Unknown top-K dimension: {dimension}")
+    if k > settings.TOP_K_CAPACITY:
+        raise HTTPException(status_code=400, detail=f"k may be at most {settings.TOP_K_CAPACITY}")
+    until = until or datetime.now(timezone.utc)
+    if sketch_day(until) < sketch_day(since):
+        raise HTTPException(status_code=400, detail="since must not be after until")
+    try:
+        return await analytics_service.get_top_items(dimension, since, until, k)
+    except Exception as e:
+        logger.error(f"Error getting top items: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _check_analysis_range(since: datetime, until: Optional[datetime]) -> datetime:
+    until = until or datetime.now(timezone.utc)
+    if since >= until:
+        raise HTTPException(status_code=400, detail="since must be before until")
+    if until - since > timedelta(days=settings.ANALYSIS_MAX_RANGE_DAYS):
+        raise HTTPException(status_code=400, detail=f"Range may span at most {settings.ANALYSIS_MAX_RANGE_DAYS} days")
+    return until
+
+@app.get("/api/v1/analytics/funnel")
+async def get_funnel(
+    since: datetime,
+    until: Optional[datetime] = None,
+    steps: List[str] = Query(...),
+    window: float = Query(3600.0, gt=0)
+):
+    """Get how many users performed the event types of steps in order, within window seconds of the first"""
+    until = _check_analysis_range(since, until)
+    if not 2 <= len(steps) <= settings.ANALYSIS_MAX_FUNNEL_STEPS:
+        raise HTTPException(status_code=400, detail=f"A funnel has 2 to {settings.ANALYSIS_MAX_FUNNEL_STEPS} steps")
+    if len(set(steps)) != len(steps):
+        raise HTTPException(status_code=400, detail="Funnel steps must be distinct event types")
+    try:
+        return await analytics_service.get_funnel(steps, since, until, window)
+    except Exception as e:
+        logger.error(f"Error computing funnel: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/v1/analytics/retention")
+async def get_retention(
+    since: datetime,
+    until: Optional[datetime] = None,
+    period: str = "day",
+    event_type: Optional[str] = None
+):
+    """Get cohort retention: users by the period of their first event, and how many return in each later one"""
+    until = _check_analysis_range(since, until)
+    if period not in PERIODS:
+        raise HTTPException(status_code=400, detail=f"Unsupported period: {period}")
+    try:
+        return await analytics_service.get_retention(since, until, period, event_type)
+    except Exception as e:
+        logger.error(f"Error computing retention: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def _live_messages(filters: Dict[str, Optional[str]], summaries: bool):
+    """Messages for one live client: matching events, the updated summary of its
+    user or researcher at most every LIVE_SUMMARY_INTERVAL, and None as a heartbeat"""
+    loader = None
+    if summaries and filters.get('user_id') is not None:
+        loader = lambda: analytics_service.get_user_analytics_summary(filters['user_id'])
+    elif summaries and filters.get('researcher') is not None:
+        loader = lambda: analytics_service.get_researcher_summary(filters['researcher'])
+    subscription = live_hub.subscribe(filters)
+    summary_due = None
+    last_summary = 0.0
+    try:
+        while True:
+            timeout = settings.LIVE_HEARTBEAT_INTERVAL
+            if summary_due is not None:
+                timeout = max(0.0, summary_due - time.monotonic())
+            try:
+                message = await subscription.get(timeout)
+            except SubscriberEvicted:
+                yield {"type": "evicted", "detail": "Client fell too far behind"}
+                return
+            if message is not None:
+                yield message
+                if loader is not None and summary_due is None:
+                    summary_due = max(time.monotonic(), last_summary + settings.LIVE_SUMMARY_INTERVAL)
+            if summary_due is not None and time.monotonic() >= summary_due:
+                summary_due, last_summary = None, time.monotonic()
+                yield {"type": "summary", "summary": await loader()}
+            elif message is None and summary_due is None:
+                yield None
+    finally:
+        subscription.close()
+
+def _require_live():
+    if live_bridge is None:
+        raise HTTPException(status_code=503, detail="Live streaming is not configured")
+
+@app.get("/api/v1/live/events")
+async def stream_live_events(
+    user_id: Optional[str] = None,
+    researcher: Optional[str] = None,
+    event_type: Optional[str] = None,
+    summaries: bool = False
+):
+    """Stream newly stored events, optionally with updated summaries, over Server-Sent Events"""
+    _require_live()
+    filters = {"user_id": user_id, "researcher": researcher, "event_type": event_type}
+    
+    async def body():
+        async for message in _live_messages(filters, summaries):
+            if message is None:
+                yield ": keepalive\n\n"
+            else:
+                yield f"event: {message['type']}\ndata: {json.dumps(message, default=str)}\n\n"
+    
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.websocket("/api/v1/live/ws")
+async def live_events_socket(
+    websocket: WebSocket,
+    user_id: Optional[str] = None,
+    researcher: Optional[str] = None,
+    event_type: Optional[str] = None,
+    summaries: bool = False
+):
+    """Stream newly stored events, optionally with updated summaries, over a WebSocket"""
+    if live_bridge is None:
+        await websocket.close(code=1013, reason="Live streaming is not configured")
+        return
+    await websocket.accept()
+    messages = _live_messages({"user_id": user_id, "researcher": researcher, "event_type": event_type}, summaries)
+    try:
+        async for message in messages:
+            await websocket.send_text(json.dumps(message or {"type": "heartbeat"}, default=str))
+        # Evicted: the client should reconnect and catch up from the event endpoints
+        await websocket.close(code=1013)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await messages.aclose()
+
+def _decode_cursor_param(cursor: Optional[str]):
+    """Decode a page token from the query string, rejecting malformed ones"""
+    if cursor is None:
+        return None
+    try:
+        return decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _parse_filter_params(expressions: List[str], allowed_columns) -> list:
+    """Parse ?filter= expressions on JSONB columns, rejecting malformed ones"""
+    try:
+        return parse_json_filters(expressions, list(allowed_columns))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _page(events: List[Dict[str, Any]], limit: int) -> Dict[str, Any]:
+    """Trim the look-ahead row and derive the next page token"""
+    page = events[:limit]
+    next_cursor = None
+    if len(events) > limit:
+        last = page[-1]
+        next_cursor = encode_cursor(last["timestamp"], last["id"])
+    return {"events": page, "next_cursor": next_cursor}
+
 @app.get("/api/v1/events/user/{user_id}")
-async def get_user_events(user_id: str, limit: int = 10):
-    """Get recent events for a specific user"""
+async def get_user_events(
+    user_id: str,
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    event_type: Optional[str] = None,
+    json_filter: List[str] = Query([], alias="filter")
+):
+    """Get events for a specific user, newest first, one page at a time"""
+    keyset = _decode_cursor_param(cursor)
+    json_filters = _parse_filter_params(json_filter, USER_ANALYTICS_JSON_COLUMNS)
     try:
-        events = await database_repo.get_user_analytics_events(user_id, limit)
-        return {"user_id": user_id, "events": events}
+        # Fetch one row beyond the page to learn whether another page exists
+        events = None
+        if hot_store is not None and not json_filters:
+            events = hot_store.user_events(user_id, limit + 1, cursor=keyset, since=since, until=until, event_type=event_type)
+        if events is None:
+            events = await database_repo.get_user_analytics_events(
+                user_id, limit + 1, cursor=keyset, since=since, until=until, event_type=event_type,
+                json_filters=json_filters
+            )
+        return {"user_id": user_id, **_page(events, limit)}
     except Exception as e:
         logger.error(f"Error getting user events: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/v1/events/researcher/{researcher}")
-async def get_researcher_events(researcher: str, limit: int = 10):
-    """Get recent events for a specific researcher"""
+async def get_researcher_events(
+    researcher: str,
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    experiment_type: Optional[str] = None,
+    json_filter: List[str] = Query([], alias="filter")
+):
+    """Get events for a specific researcher, newest first, one page at a time"""
+    keyset = _decode_cursor_param(cursor)
+    json_filters = _parse_filter_params(json_filter, CHEMICAL_RESEARCH_JSON_COLUMNS)
     try:
-        events = await database_repo.get_chemical_research_events(researcher, limit)
-        return {"researcher": researcher, "events": events}
+        events = None
+        if hot_store is not None and not json_filters:
+            events = hot_store.researcher_events(
+                researcher, limit + 1, cursor=keyset, since=since, until=until, experiment_type=experiment_type
+            )
+        if events is None:
+            events = await database_repo.get_chemical_research_events(
+                researcher, limit + 1, cursor=keyset, since=since, until=until, experiment_type=experiment_type,
+                json_filters=json_filters
+            )
+        return {"researcher": researcher, **_page(events, limit)}
     except Exception as e:
         logger.error(f"Error getting researcher events: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _export_response(dataset: str, export_format: str, columns, chunks) -> StreamingResponse:
+    """Stream an export, encoding each chunk from the server-side cursor as it arrives"""
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported export format: {export_format}")
+    if export_format in ARROW_FORMATS:
+        try:
+            require_pyarrow()
+        except RuntimeError as e:
+            raise HTTPException(status_code=501, detail=str(e))
+    extension = 'arrows' if export_format == 'arrow' else export_format
+    return StreamingResponse(
+        encode_export(export_format, chunks, columns),
+        media_type=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{dataset}.{extension}"'}
+    )
+
+@app.get("/api/v1/export/user_analytics")
+async def export_user_analytics_events(
+    format: str = "ndjson",
+    user_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    event_type: Optional[str] = None,
+    json_filter: List[str] = Query([], alias="filter")
+):
+    """Stream user analytics events as NDJSON, CSV, Arrow or Parquet"""
+    json_filters = _parse_filter_params(json_filter, USER_ANALYTICS_JSON_COLUMNS)
+    chunks = database_repo.stream_user_analytics_events(
+        user_id=user_id, since=since, until=until, event_type=event_type,
+        json_filters=json_filters, chunk_size=settings.EXPORT_CHUNK_SIZE
+    )
+    return _export_response("user_analytics", format, UserAnalyticsEvent.__table__.columns, chunks)
+
+@app.get("/api/v1/export/chemical_research")
+async def export_chemical_research_events(
+    format: str = "ndjson",
+    researcher: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    experiment_type: Optional[str] = None,
+    json_filter: List[str] = Query([], alias="filter")
+):
+    """Stream chemical research events as NDJSON, CSV, Arrow or Parquet"""
+    json_filters = _parse_filter_params(json_filter, CHEMICAL_RESEARCH_JSON_COLUMNS)
+    chunks = database_repo.stream_chemical_research_events(
+        researcher=researcher, since=since, until=until, experiment_type=experiment_type,
+        json_filters=json_filters, chunk_size=settings.EXPORT_CHUNK_SIZE
+    )
+    return _export_response("chemical_research", format, ChemicalResearchEvent.__table__.columns, chunks)
+
+class LLMCacheInvalidation(BaseModel):
+    data: Optional[Dict[str, Any]] = None
+
+@app.post("/api/v1/llm-cache/invalidate")
+async def invalidate_llm_cache(request: LLMCacheInvalidation):
+    """Drop the cached LLM properties of one data payload, or of every payload"""
+    cache_keys = None
+    if request.data is not None:
+        cache_keys = [properties_cache_key(request.data, HTTPLLMService.PROMPT_TEMPLATE, settings.LLM_MODEL_VERSION)]
+    try:
+        invalidated = await database_repo.invalidate_cached_llm_properties(cache_keys)
+        # Workers may answer from their local copies for up to LLM_CACHE_LOCAL_TTL more
+        return {"invalidated": invalidated, "local_ttl_seconds": settings.LLM_CACHE_LOCAL_TTL}
+    except Exception as e:
+        logger.error(f"Error invalidating LLM property cache: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -1,8 +1,8 @@
 import asyncio
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, List
 from app.infrastructure.kafka_consumer import KafkaEventConsumer
-from app.api_worker.handlers import dispatch_event
+from app.api_worker.handlers import dispatch_event, dispatch_events
 from app.config.settings import settings
 
 logger = logging.getLogger(__name__)
@@ -11,7 +11,12 @@ class EventWorker:
     """Main worker class that coordinates Kafka consumption and Celery task dispatch"""
     
     def __init__(self):
-        self.kafka_consumer = KafkaEventConsumer(self.handle_event)
+        # Write-behind batches form only from saves in flight together, so
+        # with it enabled events go to the workers in concurrent batches
+        batch_handler = self.handle_events if settings.WRITE_BEHIND_ENABLED else None
+        self.kafka_consumer = KafkaEventConsumer(
+            self.handle_event, batch_handler, settings.WRITE_BEHIND_CONSUME_BATCH_SIZE
+        )
     
     async def handle_event(self, event_data: Dict[str, Any]):
         """Handle incoming events from Kafka"""
@@ -26,6 +31,15 @@ class EventWorker:
             logger.error(f"Error handling event: {str(e)}")
             # Could implement dead letter queue here
     
+    def handle_events(self, events: List[Dict[str, Any]]):
+        """Handle a batch of events from Kafka"""
+        try:
+            task_id = dispatch_events(events)
+            logger.info(f"Batch of {len(events)} events dispatched to task: {task_id}")
+            
+        except Exception as e:
+            logger.error(f"Error handling batch of events: {str(e)}")
+    
     def start(self):
         """Start the worker"""
         logger.info("Starting Event Subscriber Worker")
@@ -9,8 +9,12 @@ def mock_database_repo():
     repo = Mock()
     repo.save_user_analytics_event = AsyncMock()
     repo.save_chemical_research_event = AsyncMock()
+    repo.save_user_analytics_event_with_status = AsyncMock()
+    repo.save_chemical_research_event_with_status = AsyncMock()
     repo.get_user_analytics_events = AsyncMock()
     repo.get_chemical_research_events = AsyncMock()
+    repo.get_user_event_rollups = AsyncMock()
+    repo.get_researcher_rollup = AsyncMock()
     repo.create_event_processing_status = AsyncMock()
     repo.update_event_processing_status = AsyncMock()
     return repo
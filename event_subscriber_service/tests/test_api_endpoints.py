@@ -1,7 +1,10 @@
 import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import Mock, AsyncMock, patch
-from app.main import app
+from fastapi import WebSocketDisconnect
+from app.main import app, _live_messages
+from app.infrastructure.live_hub import LiveHub
+from app.infrastructure.pagination import encode_cursor, decode_cursor
 
 @pytest.fixture
 def client():
@@ -112,3 +115,320 @@ class TestAPIEndpoints:
         data = response.json()
         assert data["researcher"] == "Dr. Test"
         assert len(data["events"]) == 2
+    
+    @patch('app.main.database_repo')
+    def test_get_user_events_returns_next_cursor(self, mock_repo, client):
+        # Arrange
+        mock_repo.get_user_analytics_events = AsyncMock(return_value=[
+            {"id": "7d1f6b52-8f3a-4a43-9d38-0b7a5c1e2f10", "event_type": "click", "timestamp": "2024-01-01T12:01:00+00:00"},
+            {"id": "1c3a7b0e-2b4d-4c5e-8f60-718293a4b5c6", "event_type": "view", "timestamp": "2024-01-01T12:00:00+00:00"}
+        ])
+        
+        # Act
+        response = client.get("/api/v1/events/user/test_user?limit=1&event_type=click")
+        
+        # Assert
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data["events"]) == 1
+        assert data["next_cursor"] == encode_cursor(
+            "2024-01-01T12:01:00+00:00", "7d1f6b52-8f3a-4a43-9d38-0b7a5c1e2f10"
+        )
+        args, kwargs = mock_repo.get_user_analytics_events.call_args
+        assert args == ("test_user", 2)
+        assert kwargs["event_type"] == "click"
+    
+    @patch('app.main.database_repo')
+    def test_get_researcher_events_last_page_has_no_cursor(self, mock_repo, client):
+        # Arrange
+        mock_repo.get_chemical_research_events = AsyncMock(return_value=[
+            {"id": "7d1f6b52-8f3a-4a43-9d38-0b7a5c1e2f10", "timestamp": "2024-01-01T12:00:00+00:00"}
+        ])
+        cursor = encode_cursor("2024-01-02T00:00:00+00:00", "1c3a7b0e-2b4d-4c5e-8f60-718293a4b5c6")
+        
+        # Act
+        response = client.get(f"/api/v1/events/researcher/Dr.%20Test?limit=5&cursor={cursor}")
+        
+        # Assert
+        assert response.status_code == 200
+        assert response.json()["next_cursor"] is None
+        assert mock_repo.get_chemical_research_events.call_args.kwargs["cursor"] == decode_cursor(cursor)
+    
+    def test_get_user_events_rejects_malformed_cursor(self, client):
+        # Act
+        response = client.get("/api/v1/events/user/test_user?cursor=garbage")
+        
+        # Assert
+        assert response.status_code == 400
+    
+    @patch('app.main.database_repo')
+    def test_get_user_events_passes_metadata_filters(self, mock_repo, client):
+        # Arrange
+        mock_repo.get_user_analytics_events = AsyncMock(return_value=[])
+        
+        # Act
+        response = client.get("/api/v1/events/user/test_user?filter=metadata.page=/dashboard&filter=metadata.score>3")
+        
+        # Assert
+        assert response.status_code == 200
+        json_filters = mock_repo.get_user_analytics_events.call_args.kwargs["json_filters"]
+        assert [(f.path, f.op, f.value) for f in json_filters] == [(["page"], "=", "/dashboard"), (["score"], ">", 3)]
+    
+    @patch('app.main.analytics_service')
+    def test_get_activity_histogram(self, mock_service, client):
+        # Arrange
+        mock_service.get_activity_histogram = AsyncMock(return_value={"buckets": []})
+        
+        # Act
+        response = client.get(
+            "/api/v1/histograms/researcher/Dr.%20Test?granularity=day"
+            "&since=2024-01-01T00:00:00Z&until=2024-02-01T00:00:00Z"
+        )
+        
+        # Assert
+        assert response.status_code == 200
+        args = mock_service.get_activity_histogram.call_args.args
+        assert args[:3] == ("researcher", "Dr. Test", "day")
+    
+    def test_get_activity_histogram_rejects_bad_requests(self, client):
+        # Act
+        unknown_dimension = client.get("/api/v1/histograms/molecule/mol_1?since=2024-01-01T00:00:00Z")
+        bad_granularity = client.get("/api/v1/histograms/user/u1?granularity=week&since=2024-01-01T00:00:00Z")
+        too_many_buckets = client.get(
+            "/api/v1/histograms/user/u1?granularity=minute&since=2024-01-01T00:00:00Z&until=2024-03-01T00:00:00Z"
+        )
+        empty_range = client.get("/api/v1/histograms/user/u1?since=2024-01-02T00:00:00Z&until=2024-01-01T00:00:00Z")
+        
+        # Assert
+        assert unknown_dimension.status_code == 404
+        assert bad_granularity.status_code == 400
+        assert too_many_buckets.status_code == 400
+        assert empty_range.status_code == 400
+    
+    @patch('app.main.analytics_service')
+    def test_get_distinct_count(self, mock_service, client):
+        # Arrange
+        mock_service.get_distinct_count = AsyncMock(return_value={"distinct_estimate": 42})
+        
+        # Act
+        response = client.get(
+            "/api/v1/analytics/distinct/researcher/Dr.%20Test"
+            "?since=2024-01-01T00:00:00Z&until=2024-02-01T00:00:00Z"
+        )
+        
+        # Assert
+        assert response.status_code == 200
+        assert response.json() == {"distinct_estimate": 42}
+        args = mock_service.get_distinct_count.call_args.args
+        assert args[:2] == ("researcher", "Dr. Test")
+    
+    @patch('app.main.analytics_service')
+    def test_get_user_sessions(self, mock_service, client):
+        # Arrange
+        mock_service.get_user_sessions = AsyncMock(return_value={"user_id": "user_1", "sessions": []})
+        
+        # Act
+        response = client.get("/api/v1/analytics/user/user_1/sessions?since=2024-01-01T00:00:00Z&limit=20")
+        
+        # Assert
+        assert response.status_code == 200
+        user_id, since, until, limit = mock_service.get_user_sessions.call_args.args
+        assert (user_id, limit) == ("user_1", 20)
+        assert since < until
+    
+    def test_get_user_sessions_rejects_reversed_range(self, client):
+        # Act
+        response = client.get(
+            "/api/v1/analytics/user/user_1/sessions?since=2024-02-01T00:00:00Z&until=2024-01-01T00:00:00Z"
+        )
+        
+        # Assert
+        assert response.status_code == 400
+    
+    @patch('app.main.analytics_service')
+    def test_get_funnel(self, mock_service, client):
+        # Arrange
+        mock_service.get_funnel = AsyncMock(return_value={"steps": []})
+        
+        # Act
+        response = client.get(
+            "/api/v1/analytics/funnel?steps=page_view&steps=signup&window=600"
+            "&since=2024-01-01T00:00:00Z&until=2024-01-08T00:00:00Z"
+        )
+        
+        # Assert
+        assert response.status_code == 200
+        steps, since, until, window = mock_service.get_funnel.call_args.args
+        assert (steps, window) == (["page_view", "signup"], 600.0)
+    
+    def test_get_funnel_rejects_bad_requests(self, client):
+        # Act
+        one_step = client.get("/api/v1/analytics/funnel?steps=page_view&since=2024-01-01T00:00:00Z")
+        repeated = client.get("/api/v1/analytics/funnel?steps=a&steps=a&since=2024-01-01T00:00:00Z")
+        too_long = client.get(
+            "/api/v1/analytics/funnel?steps=a&steps=b&since=2023-01-01T00:00:00Z&until=2024-01-01T00:00:00Z"
+        )
+        
+        # Assert
+        assert one_step.status_code == 400
+        assert repeated.status_code == 400
+        assert too_long.status_code == 400
+    
+    @patch('app.main.analytics_service')
+    def test_get_retention(self, mock_service, client):
+        # Arrange
+        mock_service.get_retention = AsyncMock(return_value={"cohorts": []})
+        
+        # Act
+        response = client.get(
+            "/api/v1/analytics/retention?period=week&event_type=login"
+            "&since=2024-01-01T00:00:00Z&until=2024-03-01T00:00:00Z"
+        )
+        unknown_period = client.get("/api/v1/analytics/retention?period=month&since=2024-01-01T00:00:00Z")
+        
+        # Assert
+        assert response.status_code == 200
+        assert mock_service.get_retention.call_args.args[2:] == ("week", "login")
+        assert unknown_period.status_code == 400
+    
+    @patch('app.main.database_repo')
+    @patch('app.main.hot_store')
+    def test_get_user_events_from_hot_store(self, mock_store, mock_repo, client):
+        # Arrange
+        mock_store.user_events.return_value = [{"id": "e1", "timestamp": "2024-01-01T12:00:00+00:00"}]
+        mock_repo.get_user_analytics_events = AsyncMock()
+        
+        # Act
+        response = client.get("/api/v1/events/user/user_1?limit=5&since=2024-01-01T00:00:00Z")
+        filtered = client.get("/api/v1/events/user/user_1?filter=metadata.page=/x")
+        
+        # Assert
+        assert response.status_code == 200
+        assert response.json()["events"] == [{"id": "e1", "timestamp": "2024-01-01T12:00:00+00:00"}]
+        assert mock_store.user_events.call_args.args == ("user_1", 6)
+        # JSONB filters always go to the database
+        assert filtered.status_code == 200
+        mock_repo.get_user_analytics_events.assert_awaited_once()
+    
+    def test_get_distinct_count_rejects_bad_requests(self, client):
+        # Act
+        unknown_dimension = client.get("/api/v1/analytics/distinct/user/u1?since=2024-01-01T00:00:00Z")
+        empty_range = client.get(
+            "/api/v1/analytics/distinct/event_type/click?since=2024-01-02T00:00:00Z&until=2024-01-01T00:00:00Z"
+        )
+        
+        # Assert
+        assert unknown_dimension.status_code == 404
+        assert empty_range.status_code == 400
+    
+    @patch('app.main.analytics_service')
+    def test_get_user_analytics_bulk_keeps_request_order(self, mock_service, client):
+        # Arrange
+        mock_service.get_user_analytics_summaries = AsyncMock(return_value={
+            "u2": {"user_id": "u2"}, "u1": {"user_id": "u1"}
+        })
+        
+        # Act
+        response = client.post("/api/v1/analytics/users", json={"user_ids": ["u1", "u2", "u1"]})
+        
+        # Assert
+        assert response.status_code == 200
+        assert response.json() == {"summaries": [{"user_id": "u1"}, {"user_id": "u2"}]}
+        mock_service.get_user_analytics_summaries.assert_awaited_once_with(["u1", "u2"])
+    
+    @patch('app.main.settings')
+    def test_bulk_analytics_rejects_empty_and_oversized_requests(self, mock_settings, client):
+        # Arrange
+        mock_settings.BULK_SUMMARY_MAX_OWNERS = 2
+        
+        # Act
+        empty = client.post("/api/v1/analytics/researchers", json={"researchers": []})
+        oversized = client.post("/api/v1/analytics/users", json={"user_ids": ["u1", "u2", "u3"]})
+        malformed = client.post("/api/v1/analytics/users", json={"users": ["u1"]})
+        
+        # Assert
+        assert empty.status_code == 400
+        assert oversized.status_code == 400
+        assert malformed.status_code == 422
+    
+    def test_get_researcher_events_rejects_unsupported_filter_column(self, client):
+        # Act
+        response = client.get("/api/v1/events/researcher/Dr.%20Test?filter=metadata.page=/x")
+        
+        # Assert
+        assert response.status_code == 400
+
+    @patch('app.main.database_repo')
+    def test_invalidate_llm_cache(self, mock_repo, client):
+        # Arrange
+        mock_repo.invalidate_cached_llm_properties = AsyncMock(return_value=3)
+        
+        # Act
+        everything = client.post("/api/v1/llm-cache/invalidate", json={})
+        one = client.post("/api/v1/llm-cache/invalidate", json={"data": {"formula": "H2O"}})
+        
+        # Assert
+        assert everything.status_code == 200
+        assert everything.json()["invalidated"] == 3
+        assert mock_repo.invalidate_cached_llm_properties.call_args_list[0].args == (None,)
+        (keys,) = mock_repo.invalidate_cached_llm_properties.call_args_list[1].args
+        assert one.status_code == 200
+        assert len(keys) == 1 and len(keys[0]) == 64
+    
+class TestLiveEndpoints:
+
+    @pytest.fixture
+    def live(self):
+        hub = LiveHub(max_buffer=2)
+        settings = Mock(LIVE_HEARTBEAT_INTERVAL=0.01, LIVE_SUMMARY_INTERVAL=1.0)
+        with patch('app.main.live_hub', hub), patch('app.main.settings', settings):
+            yield hub
+
+    @pytest.mark.asyncio
+    @patch('app.main.analytics_service')
+    async def test_live_messages_send_events_summaries_and_heartbeats(self, mock_service, live):
+        # Arrange
+        mock_service.get_user_analytics_summary = AsyncMock(return_value={"user_id": "user_1", "total_events": 1})
+        messages = _live_messages({"user_id": "user_1", "researcher": None, "event_type": None}, summaries=True)
+
+        # Act
+        heartbeat = await anext(messages)
+        live.publish('user_analytics', {"user_id": "user_2"})
+        live.publish('user_analytics', {"user_id": "user_1"})
+        event = await anext(messages)
+        summary = await anext(messages)
+        await messages.aclose()
+
+        # Assert
+        assert heartbeat is None
+        assert event == {"type": "event", "event_type": "user_analytics", "event": {"user_id": "user_1"}}
+        assert summary == {"type": "summary", "summary": {"user_id": "user_1", "total_events": 1}}
+        mock_service.get_user_analytics_summary.assert_awaited_once_with("user_1")
+        assert live.get_metrics()["subscribers"] == 0
+
+    @pytest.mark.asyncio
+    async def test_live_messages_end_when_client_is_evicted(self, live):
+        # Arrange
+        messages = _live_messages({"event_type": "click"}, summaries=False)
+        await anext(messages)
+
+        # Act
+        for _ in range(3):
+            live.publish('user_analytics', {"event_type": "click"})
+
+        # Assert
+        assert (await anext(messages))["type"] == "evicted"
+        with pytest.raises(StopAsyncIteration):
+            await anext(messages)
+
+    @patch('app.main.live_bridge', None)
+    def test_live_endpoints_unavailable_without_live_channel(self, client):
+        # Act
+        response = client.get("/api/v1/live/events")
+
+        # Assert
+        assert response.status_code == 503
+        with pytest.raises(WebSocketDisconnect) as closed:
+            with client.websocket_connect("/api/v1/live/ws") as websocket:
+                websocket.receive_text()
+        assert closed.value.code == 1013
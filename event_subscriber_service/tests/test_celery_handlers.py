@@ -3,7 +3,9 @@ from unittest.mock import Mock, patch, AsyncMock
 from app.api_worker.handlers import (
     process_user_analytics_event_task,
     process_chemical_research_event_task,
+    process_event_batch_task,
     dispatch_event,
+    dispatch_events,
     EVENT_HANDLERS
 )
 
@@ -84,6 +86,35 @@ class TestCeleryHandlers:
         with pytest.raises(ValueError, match="Unknown event type"):
             dispatch_event(event_data)
     
+    @patch('app.api_worker.handlers.dispatch_event')
+    @patch('app.api_worker.handlers.event_processing_service')
+    def test_process_event_batch_task_redispatches_failed_events(self, mock_service, mock_dispatch):
+        # Arrange
+        stored = {"type": "user_analytics", "user_id": "ok"}
+        failing = {"type": "user_analytics", "user_id": "fails"}
+        mock_service.process_events = AsyncMock(return_value=["event-id-123", RuntimeError("db down")])
+        
+        # Act
+        result = process_event_batch_task([stored, failing])
+        
+        # Assert
+        assert result == {"processed": 1, "redispatched": 1}
+        mock_dispatch.assert_called_once_with(failing)
+    
+    def test_dispatch_events_sends_known_events_as_one_task(self):
+        # Arrange
+        events = [{"type": "user_analytics", "user_id": "a"}, {"type": "unknown_type"}, {"type": "chemical_research"}]
+        
+        with patch.object(process_event_batch_task, 'delay') as mock_delay:
+            mock_delay.return_value.id = "task-789"
+            
+            # Act
+            result = dispatch_events(events)
+            
+            # Assert
+            assert result == "task-789"
+            mock_delay.assert_called_once_with([events[0], events[2]])
+    
     def test_event_handlers_mapping(self):
         # Assert
         assert "user_analytics" in EVENT_HANDLERS
@@ -0,0 +1,163 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock, patch
+from uuid import UUID, uuid4
+
+pytest.importorskip("pyarrow")
+
+from app.infrastructure.cold_archive import ColdArchive, _DayFile, merge_newest
+from app.infrastructure.database_models import UserAnalyticsEvent
+from app.infrastructure.export import arrow_schema
+from app.infrastructure.jsonb_filters import JsonFilter
+
+TABLE = "user_analytics_events"
+COLUMNS = ("id", "user_id", "event_type", "timestamp", "metadata")
+DAY = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+def _row(user_id, minute, event_type="click", metadata=None, event_id=None):
+    return {
+        "id": event_id or uuid4(),
+        "user_id": user_id,
+        "event_type": event_type,
+        "page_url": None,
+        "user_agent": None,
+        "session_id": None,
+        "timestamp": DAY + timedelta(minutes=minute),
+        "metadata": metadata or {"n": minute},
+        "processed": True,
+        "processed_at": None,
+        "created_at": None,
+        "updated_at": None,
+    }
+
+def _write_file(directory, rows, event_type="click"):
+    day_file = _DayFile(
+        str(directory), TABLE, DAY.date(), event_type,
+        arrow_schema(UserAnalyticsEvent.__table__.columns), "zstd"
+    )
+    day_file.write(rows)
+    day_file.finish()
+    return SimpleNamespace(
+        path=day_file.path, min_timestamp=day_file.min_timestamp, max_timestamp=day_file.max_timestamp
+    )
+
+class TestColdArchiveReads:
+
+    @pytest.fixture
+    def archive(self, tmp_path):
+        return ColdArchive(Mock(), str(tmp_path), after_days=90)
+
+    @pytest.mark.asyncio
+    async def test_read_newest_filters_owner_and_decodes_json(self, archive, tmp_path):
+        # Arrange
+        entry = _write_file(tmp_path, [_row("user_a", 5), _row("user_b", 4), _row("user_a", 3)])
+
+        # Act
+        with patch.object(archive, "manifest_entries", AsyncMock(return_value=[entry])):
+            rows = await archive.read_newest(Mock(), TABLE, "user_a", 10, COLUMNS)
+
+        # Assert
+        assert [row["timestamp"] for row in rows] == [DAY + timedelta(minutes=5), DAY + timedelta(minutes=3)]
+        assert rows[0]["metadata"] == {"n": 5}
+        assert set(rows[0]) == set(COLUMNS)
+
+    @pytest.mark.asyncio
+    async def test_read_newest_continues_after_cursor_and_applies_json_filters(self, archive, tmp_path):
+        # Arrange
+        low, high = UUID(int=1), UUID(int=2)
+        entry = _write_file(tmp_path, [
+            _row("user_a", 5, event_id=high, metadata={"tag": "a"}),
+            _row("user_a", 5, event_id=low, metadata={"tag": "a"}),
+            _row("user_a", 4, metadata={"tag": "b"}),
+            _row("user_a", 3, metadata={"tag": "a"}),
+        ])
+
+        # Act
+        with patch.object(archive, "manifest_entries", AsyncMock(return_value=[entry])):
+            rows = await archive.read_newest(
+                Mock(), TABLE, "user_a", 10, COLUMNS,
+                cursor=(DAY + timedelta(minutes=5), high),
+                json_filters=[JsonFilter("metadata", ["tag"], "=", "a")]
+            )
+
+        # Assert
+        assert [row["id"] for row in rows] == [str(low), rows[1]["id"]]
+        assert rows[1]["timestamp"] == DAY + timedelta(minutes=3)
+
+    @pytest.mark.asyncio
+    async def test_read_newest_stops_once_older_files_cannot_contribute(self, archive, tmp_path):
+        # Arrange
+        newer = _write_file(tmp_path, [_row("user_a", 50), _row("user_a", 40)], event_type="view")
+        older = _write_file(tmp_path, [_row("user_a", 10)])
+
+        # Act
+        with patch.object(archive, "manifest_entries", AsyncMock(return_value=[newer, older])):
+            rows = await archive.read_newest(Mock(), TABLE, "user_a", 2, COLUMNS)
+
+        # Assert
+        assert len(rows) == 2
+        assert archive.files_read == 1
+
+    @pytest.mark.asyncio
+    async def test_stream_yields_archived_chunks(self, archive, tmp_path):
+        # Arrange
+        entry = _write_file(tmp_path, [_row("user_a", minute) for minute in range(5)])
+
+        # Act
+        with patch.object(archive, "manifest_entries", AsyncMock(return_value=[entry])):
+            chunks = [chunk async for chunk in archive.stream(Mock(), TABLE, chunk_size=2)]
+
+        # Assert
+        assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+        assert chunks[0][0]["metadata"] == {"n": 0}
+
+    @pytest.mark.asyncio
+    async def test_aggregate_counts_owner_rows_per_group_across_files(self, archive, tmp_path):
+        # Arrange
+        clicks = _write_file(tmp_path, [_row("user_a", 9), _row("user_b", 8), _row("user_a", 2)])
+        views = _write_file(tmp_path, [_row("user_a", 7, event_type="view")], event_type="view")
+
+        # Act
+        with patch.object(archive, "manifest_entries", AsyncMock(return_value=[clicks, views])):
+            groups = await archive.aggregate(Mock(), TABLE, "user_a", "event_type", since=DAY + timedelta(minutes=1))
+
+        # Assert
+        assert groups == {
+            "click": {"event_count": 2, "first_seen": DAY + timedelta(minutes=2), "last_seen": DAY + timedelta(minutes=9)},
+            "view": {"event_count": 1, "first_seen": DAY + timedelta(minutes=7), "last_seen": DAY + timedelta(minutes=7)},
+        }
+
+    @pytest.mark.asyncio
+    async def test_histogram_counts_owner_rows_per_bucket(self, archive, tmp_path):
+        # Arrange
+        entry = _write_file(tmp_path, [_row("user_a", 70), _row("user_a", 65), _row("user_b", 64), _row("user_a", 5)])
+
+        # Act
+        with patch.object(archive, "manifest_entries", AsyncMock(return_value=[entry])):
+            counts = await archive.histogram(Mock(), TABLE, "hour", DAY, DAY + timedelta(days=1), owner="user_a")
+
+        # Assert
+        assert counts == {DAY: 1, DAY + timedelta(hours=1): 2}
+
+    def test_reaches_archive_only_before_cutoff(self, archive):
+        # Act & Assert
+        assert archive.reaches_archive(None)
+        assert archive.reaches_archive(datetime.now(timezone.utc) - timedelta(days=120))
+        assert not archive.reaches_archive(datetime.now(timezone.utc) - timedelta(days=10))
+
+class TestMergeNewest:
+
+    def test_orders_by_timestamp_then_id_across_tiers(self):
+        # Arrange
+        hot = [SimpleNamespace(timestamp=DAY + timedelta(minutes=2), id=UUID(int=1))]
+        cold = [
+            SimpleNamespace(timestamp=DAY + timedelta(minutes=2), id=UUID(int=3)),
+            SimpleNamespace(timestamp=DAY, id=UUID(int=9)),
+        ]
+
+        # Act
+        merged = merge_newest(hot, cold, 2)
+
+        # Assert
+        assert [event.id for event in merged] == [UUID(int=3), UUID(int=1)]
@@ -1,7 +1,15 @@
 import pytest
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
 from unittest.mock import Mock, AsyncMock, patch
-from uuid import uuid4
+from uuid import uuid4, UUID
+import numpy as np
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import asyncpg
+from sqlalchemy.exc import IntegrityError
 from app.infrastructure.postgresql_repository import PostgreSQLRepository
+from app.infrastructure.database_models import UserAnalyticsEvent
+from app.infrastructure.event_analysis import ACTIVITY_ROW, COPY_SIGNATURE, COPY_TRAILER
 
 class TestPostgreSQLRepository:
     
@@ -126,3 +134,539 @@ class TestPostgreSQLRepository:
         assert len(result) == 2
         assert result[0]["user_id"] == "test_user"
         assert result[0]["event_type"] == "event_0"
+
+    @pytest.mark.asyncio
+    @patch('app.infrastructure.postgresql_repository.create_async_engine')
+    @patch('app.infrastructure.postgresql_repository.async_sessionmaker')
+    async def test_save_user_analytics_event_with_status_single_statement(
+        self, 
+        mock_sessionmaker, 
+        mock_engine,
+        mock_session_factory,
+        mock_session
+    ):
+        # Arrange
+        mock_sessionmaker.return_value = mock_session_factory
+        repo = PostgreSQLRepository()
+        repo.async_session_factory = mock_session_factory
+        
+        event_data = {
+            "user_id": "test_user",
+            "event_type": "click",
+            "timestamp": "2024-01-01T12:00:00Z",
+            "metadata": {"key": "value"}
+        }
+        
+        mock_session.execute.return_value = Mock(scalars=Mock(return_value=[]))
+        
+        # Act
+        event_id, inserted = await repo.save_user_analytics_event_with_status(event_data)
+        
+        # Assert
+        assert isinstance(event_id, UUID)
+        assert not inserted
+        mock_session.execute.assert_called_once()
+        mock_session.commit.assert_called_once()
+        
+        sql = str(mock_session.execute.call_args[0][0].compile(dialect=postgresql.dialect()))
+        assert sql.startswith("WITH inserted_event AS")
+        assert "SELECT inserted_event.id" in sql
+        assert "INSERT INTO user_analytics_events" in sql
+        assert "INSERT INTO event_processing_status" in sql
+        assert "INSERT INTO user_event_rollups" in sql
+        assert "ON CONFLICT (user_id, event_type) DO UPDATE" in sql
+        assert "ON CONFLICT (id, timestamp) DO NOTHING" in sql
+    
+    @pytest.mark.asyncio
+    @patch('app.infrastructure.postgresql_repository.create_async_engine')
+    @patch('app.infrastructure.postgresql_repository.async_sessionmaker')
+    async def test_save_event_with_status_keeps_publisher_event_id(
+        self, 
+        mock_sessionmaker, 
+        mock_engine,
+        mock_session_factory,
+        mock_session
+    ):
+        # Arrange
+        mock_sessionmaker.return_value = mock_session_factory
+        repo = PostgreSQLRepository()
+        repo.async_session_factory = mock_session_factory
+        event_id = uuid4()
+        
+        event_data = {
+            "event_id": str(event_id),
+            "user_id": "test_user",
+            "event_type": "click",
+            "timestamp": "2024-01-01T12:00:00Z"
+        }
+        
+        mock_session.execute.return_value = Mock(scalars=Mock(return_value=[event_id]))
+        
+        # Act
+        result = await repo.save_user_analytics_event_with_status(event_data)
+        
+        # Assert
+        assert result == (event_id, True)
+        mock_session.commit.assert_called_once()
+    
+    @pytest.mark.asyncio
+    @patch('app.infrastructure.postgresql_repository.create_async_engine')
+    @patch('app.infrastructure.postgresql_repository.async_sessionmaker')
+    async def test_insert_events_reports_redelivered_rows(
+        self,
+        mock_sessionmaker,
+        mock_engine,
+        mock_session_factory,
+        mock_session
+    ):
+        # Arrange
+        mock_sessionmaker.return_value = mock_session_factory
+        repo = PostgreSQLRepository()
+        repo.async_session_factory = mock_session_factory
+        new_id, stored_id = uuid4(), uuid4()
+        mock_session.execute.return_value = Mock(scalars=Mock(return_value=[new_id]))
+        rows = [
+            {"id": new_id, "user_id": "u1", "event_type": "click", "timestamp": datetime(2024, 1, 1, tzinfo=timezone.utc)},
+            {"id": stored_id, "user_id": "u1", "event_type": "click", "timestamp": datetime(2024, 1, 1, tzinfo=timezone.utc)},
+            {"id": new_id, "user_id": "u1", "event_type": "click", "timestamp": datetime(2024, 1, 1, tzinfo=timezone.utc)},
+        ]
+        
+        # Act
+        written = await repo._insert_events('user_analytics', rows, 'completed')
+        
+        # Assert
+        assert written == [(new_id, True), (stored_id, False), (new_id, False)]
+    
+    @pytest.mark.asyncio
+    @patch('app.infrastructure.postgresql_repository.create_async_engine')
+    @patch('app.infrastructure.postgresql_repository.async_sessionmaker')
+    async def test_save_user_analytics_event_duplicate_is_success(
+        self, 
+        mock_sessionmaker, 
+        mock_engine,
+        mock_session_factory,
+        mock_session
+    ):
+        # Arrange
+        mock_sessionmaker.return_value = mock_session_factory
+        repo = PostgreSQLRepository()
+        repo.async_session_factory = mock_session_factory
+        event_id = uuid4()
+        
+        mock_session.execute.side_effect = IntegrityError("INSERT", {}, Mock(sqlstate="23505"))
+        
+        event_data = {
+            "event_id": str(event_id),
+            "user_id": "test_user",
+            "event_type": "click",
+            "timestamp": "2024-01-01T12:00:00Z"
+        }
+        
+        # Act
+        result = await repo.save_user_analytics_event(event_data)
+        
+        # Assert
+        assert result == event_id
+        mock_session.rollback.assert_called_once()
+        mock_session.commit.assert_not_called()
+    
+    @pytest.mark.asyncio
+    @patch('app.infrastructure.postgresql_repository.create_async_engine')
+    @patch('app.infrastructure.postgresql_repository.async_sessionmaker')
+    async def test_save_chemical_research_event_updates_rollups_in_same_statement(
+        self, 
+        mock_sessionmaker, 
+        mock_engine,
+        mock_session_factory,
+        mock_session
+    ):
+        # Arrange
+        mock_sessionmaker.return_value = mock_session_factory
+        repo = PostgreSQLRepository()
+        repo.async_session_factory = mock_session_factory
+        
+        event_data = {
+            "molecule_id": "mol_123",
+            "researcher": "Dr. Test",
+            "data": {"formula": "H2O"},
+            "timestamp": "2024-01-01T12:00:00Z"
+        }
+        
+        mock_session.execute.return_value = Mock(scalars=Mock(return_value=[]))
+        
+        # Act
+        await repo.save_chemical_research_event_with_status(event_data)
+        
+        # Assert
+        mock_session.execute.assert_called_once()
+        sql = str(mock_session.execute.call_args[0][0].compile(dialect=postgresql.dialect()))
+        assert "INSERT INTO researcher_rollups" in sql
+        assert "INSERT INTO researcher_molecules" in sql
+        assert "experiment_count = (researcher_molecules.experiment_count + excluded.experiment_count)" in sql
+    
+    @pytest.mark.asyncio
+    @patch('app.infrastructure.postgresql_repository.create_async_engine')
+    @patch('app.infrastructure.postgresql_repository.async_sessionmaker')
+    async def test_get_researcher_rollup_unknown_researcher(
+        self, 
+        mock_sessionmaker, 
+        mock_engine,
+        mock_session_factory,
+        mock_session
+    ):
+        # Arrange
+        mock_sessionmaker.return_value = mock_session_factory
+        repo = PostgreSQLRepository()
+        repo.async_session_factory = mock_session_factory
+        
+        mock_result = Mock()
+        mock_result.scalars.return_value.first.return_value = None
+        mock_session.execute.return_value = mock_result
+        
+        # Act
+        result = await repo.get_researcher_rollup("nobody")
+        
+        # Assert
+        assert result is None
+        mock_session.execute.assert_called_once()
+    
+    @pytest.mark.asyncio
+    @patch('app.infrastructure.postgresql_repository.create_async_engine')
+    @patch('app.infrastructure.postgresql_repository.async_sessionmaker')
+    async def test_get_user_event_counts_groups_in_database(
+        self,
+        mock_sessionmaker,
+        mock_engine,
+        mock_session_factory,
+        mock_session
+    ):
+        # Arrange
+        mock_sessionmaker.return_value = mock_session_factory
+        repo = PostgreSQLRepository()
+        repo.async_session_factory = mock_session_factory
+        since = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        mock_session.execute.return_value = [
+            SimpleNamespace(key="click", event_count=4, first_seen=since, last_seen=since + timedelta(hours=2))
+        ]
+        
+        # Act
+        result = await repo.get_user_event_counts("test_user", since=since)
+        
+        # Assert
+        sql = str(mock_session.execute.call_args[0][0].compile(dialect=postgresql.dialect()))
+        assert "count(*)" in sql
+        assert "GROUP BY user_analytics_events.event_type" in sql
+        assert "user_analytics_events.timestamp >=" in sql
+        assert "metadata" not in sql
+        assert result == [{
+            "event_type": "click",
+            "event_count": 4,
+            "first_seen": "2024-01-01T00:00:00+00:00",
+            "last_seen": "2024-01-01T02:00:00+00:00"
+        }]
+    
+    @pytest.mark.asyncio
+    @patch('app.infrastructure.postgresql_repository.create_async_engine')
+    @patch('app.infrastructure.postgresql_repository.async_sessionmaker')
+    async def test_get_researcher_counts_folds_molecule_groups(
+        self,
+        mock_sessionmaker,
+        mock_engine,
+        mock_session_factory,
+        mock_session
+    ):
+        # Arrange
+        mock_sessionmaker.return_value = mock_session_factory
+        repo = PostgreSQLRepository()
+        repo.async_session_factory = mock_session_factory
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        mock_session.execute.return_value = [
+            SimpleNamespace(key="mol_2", event_count=1, first_seen=start + timedelta(days=1), last_seen=start + timedelta(days=1)),
+            SimpleNamespace(key="mol_1", event_count=2, first_seen=start, last_seen=start + timedelta(days=3)),
+        ]
+        
+        # Act
+        result = await repo.get_researcher_counts("Dr. Test", until=start + timedelta(days=7))
+        
+        # Assert
+        sql = str(mock_session.execute.call_args[0][0].compile(dialect=postgresql.dialect()))
+        assert "GROUP BY chemical_research_events.molecule_id" in sql
+        assert result == {
+            "experiment_count": 3,
+            "first_seen": "2024-01-01T00:00:00+00:00",
+            "last_seen": "2024-01-04T00:00:00+00:00",
+            "molecules": ["mol_1", "mol_2"]
+        }
+    
+    @pytest.mark.asyncio
+    @patch('app.infrastructure.postgresql_repository.create_async_engine')
+    @patch('app.infrastructure.postgresql_repository.async_sessionmaker')
+    async def test_get_researcher_counts_empty_window(
+        self,
+        mock_sessionmaker,
+        mock_engine,
+        mock_session_factory,
+        mock_session
+    ):
+        # Arrange
+        mock_sessionmaker.return_value = mock_session_factory
+        repo = PostgreSQLRepository()
+        repo.async_session_factory = mock_session_factory
+        mock_session.execute.return_value = []
+        
+        # Act
+        result = await repo.get_researcher_counts("Dr. Test", since=datetime(2024, 1, 1, tzinfo=timezone.utc))
+        
+        # Assert
+        assert result is None
+    
+    @pytest.mark.asyncio
+    @patch('app.infrastructure.postgresql_repository.create_async_engine')
+    @patch('app.infrastructure.postgresql_repository.async_sessionmaker')
+    async def test_get_activity_histogram_counts_uncovered_range_from_events(
+        self,
+        mock_sessionmaker,
+        mock_engine,
+        mock_session_factory,
+        mock_session
+    ):
+        # Arrange
+        mock_sessionmaker.return_value = mock_session_factory
+        repo = PostgreSQLRepository()
+        repo.async_session_factory = mock_session_factory
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        coverage = Mock()
+        coverage.scalar.return_value = start + timedelta(hours=2)
+        mock_session.execute.side_effect = [
+            coverage,
+            [SimpleNamespace(bucket_start=start, event_count=3)],
+            [SimpleNamespace(bucket_start=start + timedelta(hours=2), event_count=5)],
+        ]
+        
+        # Act
+        result = await repo.get_activity_histogram("user", "test_user", "hour", start + timedelta(minutes=10), start + timedelta(hours=3))
+        
+        # Assert
+        fallback = str(mock_session.execute.call_args_list[1][0][0].compile(dialect=postgresql.dialect()))
+        stored = str(mock_session.execute.call_args_list[2][0][0].compile(dialect=postgresql.dialect()))
+        assert "FROM user_analytics_events" in fallback
+        assert "FROM activity_buckets" in stored
+        assert result == [
+            {"start": "2024-01-01T00:00:00+00:00", "count": 3},
+            {"start": "2024-01-01T02:00:00+00:00", "count": 5},
+        ]
+    
+    @pytest.mark.asyncio
+    @patch('app.infrastructure.postgresql_repository.create_async_engine')
+    @patch('app.infrastructure.postgresql_repository.async_sessionmaker')
+    async def test_recent_events_bulk_groups_lateral_rows_by_owner(
+        self,
+        mock_sessionmaker,
+        mock_engine,
+        mock_session_factory,
+        mock_session
+    ):
+        # Arrange
+        mock_sessionmaker.return_value = mock_session_factory
+        repo = PostgreSQLRepository()
+        repo.async_session_factory = mock_session_factory
+        repo.cold_archive = None
+        moment = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        rows = [
+            UserAnalyticsEvent(id=uuid4(), user_id="u1", event_type="click", timestamp=moment + timedelta(hours=1)),
+            UserAnalyticsEvent(id=uuid4(), user_id="u1", event_type="view", timestamp=moment),
+        ]
+        result = Mock()
+        result.scalars.return_value.all.return_value = rows
+        mock_session.execute.return_value = result
+        
+        # Act
+        events = await repo.get_recent_user_analytics_events_bulk(["u1", "u2"], limit=10)
+        
+        # Assert
+        sql = str(mock_session.execute.call_args[0][0].compile(dialect=postgresql.dialect()))
+        assert "JOIN LATERAL" in sql
+        assert [event["event_type"] for event in events["u1"]] == ["click", "view"]
+        assert events["u2"] == []
+    
+    @pytest.mark.asyncio
+    @patch('app.infrastructure.postgresql_repository.create_async_engine')
+    @patch('app.infrastructure.postgresql_repository.async_sessionmaker')
+    async def test_user_event_rollups_bulk_uses_any(
+        self,
+        mock_sessionmaker,
+        mock_engine,
+        mock_session_factory,
+        mock_session
+    ):
+        # Arrange
+        mock_sessionmaker.return_value = mock_session_factory
+        repo = PostgreSQLRepository()
+        repo.async_session_factory = mock_session_factory
+        moment = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        result = Mock()
+        result.scalars.return_value.all.return_value = [
+            SimpleNamespace(user_id="u2", event_type="click", event_count=4, first_seen=moment, last_seen=moment)
+        ]
+        mock_session.execute.return_value = result
+        
+        # Act
+        rollups = await repo.get_user_event_rollups_bulk(["u1", "u2"])
+        
+        # Assert
+        sql = str(mock_session.execute.call_args[0][0].compile(dialect=postgresql.dialect()))
+        assert "user_event_rollups.user_id = ANY (" in sql
+        assert rollups["u1"] == []
+        assert rollups["u2"][0]["event_count"] == 4
+    
+    @pytest.mark.asyncio
+    @patch('app.infrastructure.postgresql_repository.create_async_engine')
+    @patch('app.infrastructure.postgresql_repository.async_sessionmaker')
+    async def test_raise_sketch_registers_in_one_executemany(
+        self,
+        mock_sessionmaker,
+        mock_engine,
+        mock_session_factory,
+        mock_session
+    ):
+        # Arrange
+        mock_sessionmaker.return_value = mock_session_factory
+        repo = PostgreSQLRepository()
+        repo.async_session_factory = mock_session_factory
+        updates = [
+            {"dimension": "event_type", "subject": "click", "day": date(2024, 1, 1), "register": 7, "rank": 3},
+            {"dimension": "event_type", "subject": "click", "day": date(2024, 1, 1), "register": 9, "rank": 1},
+        ]
+        
+        # Act
+        await repo.raise_sketch_registers(updates)
+        
+        # Assert
+        statement, params = mock_session.execute.call_args[0]
+        assert "INSERT INTO distinct_sketches" in str(statement.compile(dialect=postgresql.dialect()))
+        assert params == updates
+        mock_session.commit.assert_called_once()
+    
+    @pytest.mark.asyncio
+    @patch('app.infrastructure.postgresql_repository.create_async_engine')
+    @patch('app.infrastructure.postgresql_repository.async_sessionmaker')
+    async def test_write_session_fragments_merges_named_fragments_before_upsert(
+        self,
+        mock_sessionmaker,
+        mock_engine,
+        mock_session_factory,
+        mock_session
+    ):
+        # Arrange
+        mock_sessionmaker.return_value = mock_session_factory
+        repo = PostgreSQLRepository()
+        repo.async_session_factory = mock_session_factory
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        fragment = {"user_id": "user_1", "session_id": "s1", "event_count": 1, "page_count": 1, "user_agent": None}
+        fragments = [
+            {**fragment, "started_at": start + timedelta(minutes=5), "ended_at": start + timedelta(minutes=5),
+             "entry_page": "/b", "exit_page": "/b"},
+            {**fragment, "started_at": start, "ended_at": start, "entry_page": "/a", "exit_page": "/a"},
+        ]
+        
+        # Act
+        await repo.write_session_fragments(fragments, timedelta(minutes=30))
+        
+        # Assert
+        statement = mock_session.execute.call_args[0][0]
+        params = statement.compile(dialect=postgresql.dialect()).params
+        assert "ON CONFLICT (user_id, session_id)" in str(statement.compile(dialect=postgresql.dialect()))
+        assert (params["event_count_m0"], params["entry_page_m0"], params["exit_page_m0"]) == (2, "/a", "/b")
+        mock_session.commit.assert_called_once()
+    
+    @pytest.mark.asyncio
+    @patch('app.infrastructure.postgresql_repository.create_async_engine')
+    @patch('app.infrastructure.postgresql_repository.async_sessionmaker')
+    async def test_load_user_activity_decodes_binary_copy(
+        self,
+        mock_sessionmaker,
+        mock_engine,
+        mock_session_factory,
+        mock_session
+    ):
+        # Arrange
+        mock_sessionmaker.return_value = mock_session_factory
+        repo = PostgreSQLRepository()
+        repo.async_session_factory = mock_session_factory
+        rows = np.zeros(2, dtype=ACTIVITY_ROW)
+        rows['fields'], rows['user_length'], rows['type_length'], rows['time_length'] = 3, 8, 4, 8
+        rows['user_key'], rows['type_code'], rows['epoch_ms'] = [5, -5], [1, 0], [2000, 1000]
+        
+        async def copy_from_query(query, *args, output, format):
+            await output(COPY_SIGNATURE + bytes(8) + rows.tobytes() + COPY_TRAILER)
+        
+        driver = SimpleNamespace(copy_from_query=AsyncMock(side_effect=copy_from_query))
+        connection = SimpleNamespace(
+            dialect=asyncpg.dialect(),
+            get_raw_connection=AsyncMock(return_value=SimpleNamespace(driver_connection=driver))
+        )
+        mock_session.connection = AsyncMock(return_value=connection)
+        since, until = datetime(2024, 1, 1, tzinfo=timezone.utc), datetime(2024, 1, 8, tzinfo=timezone.utc)
+        
+        # Act
+        columns = await repo.load_user_activity(since, until, ["page_view", "signup"])
+        
+        # Assert
+        query, *args = driver.copy_from_query.call_args.args
+        assert "hashtextextended(user_analytics_events.user_id" in query
+        assert "array_position(" in query
+        assert since in args and until in args and ["page_view", "signup"] in args
+        assert [column.tolist() for column in columns.arrays()] == [[1, 0], [1, 0], [2000, 1000]]
+    
+    @pytest.mark.asyncio
+    @patch('app.infrastructure.postgresql_repository.create_async_engine')
+    @patch('app.infrastructure.postgresql_repository.async_sessionmaker')
+    async def test_get_distinct_sketch_merges_days(
+        self,
+        mock_sessionmaker,
+        mock_engine,
+        mock_session_factory,
+        mock_session
+    ):
+        # Arrange
+        mock_sessionmaker.return_value = mock_session_factory
+        repo = PostgreSQLRepository()
+        repo.async_session_factory = mock_session_factory
+        mock_session.execute.return_value = [(bytes([0, 3, 1]),), (bytes([2, 1, 1]),)]
+        
+        # Act
+        result = await repo.get_distinct_sketch("researcher", "Dr. Test", date(2024, 1, 1), date(2024, 1, 2))
+        
+        # Assert
+        assert result == bytes([2, 3, 1])
+    
+    @pytest.mark.asyncio
+    @patch('app.infrastructure.postgresql_repository.create_async_engine')
+    @patch('app.infrastructure.postgresql_repository.async_sessionmaker')
+    async def test_save_chemical_research_event_with_status_error(
+        self, 
+        mock_sessionmaker, 
+        mock_engine,
+        mock_session_factory,
+        mock_session
+    ):
+        # Arrange
+        mock_sessionmaker.return_value = mock_session_factory
+        repo = PostgreSQLRepository()
+        repo.async_session_factory = mock_session_factory
+        
+        mock_session.execute.side_effect = Exception("Database error")
+        
+        event_data = {
+            "molecule_id": "mol_123",
+            "researcher": "Dr. Test",
+            "data": {"formula": "H2O"},
+            "timestamp": "2024-01-01T12:00:00Z"
+        }
+        
+        # Act & Assert
+        with pytest.raises(Exception, match="Database error"):
+            await repo.save_chemical_research_event_with_status(event_data)
+        
+        mock_session.rollback.assert_called_once()
+        mock_session.commit.assert_not_called()
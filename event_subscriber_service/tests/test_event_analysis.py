@@ -0,0 +1,180 @@
+import pytest
+import numpy as np
+from datetime import datetime, timezone
+from app.infrastructure.event_analysis import (
+    ACTIVITY_ROW,
+    COPY_SIGNATURE,
+    COPY_TRAILER,
+    ActivityCopyDecoder,
+    EventColumns,
+    analysis_key,
+    dense_codes,
+    funnel_counts,
+    funnel_payload,
+    period_count,
+    retention_matrix,
+    retention_payload
+)
+
+HOUR = 3600 * 1000
+DAY = 24 * HOUR
+
+def _columns(events):
+    """(user, step, ms) tuples as int64 columns"""
+    return tuple(np.array(column, dtype=np.int64) for column in zip(*events))
+
+def _copy_stream(rows):
+    """A binary COPY of (bigint, integer, bigint) rows, as Postgres sends it"""
+    data = np.zeros(len(rows), dtype=ACTIVITY_ROW)
+    data['fields'] = 3
+    data['user_length'], data['type_length'], data['time_length'] = 8, 4, 8
+    for index, (user_key, type_code, epoch_ms) in enumerate(rows):
+        data[index]['user_key'], data[index]['type_code'], data[index]['epoch_ms'] = user_key, type_code, epoch_ms
+    return COPY_SIGNATURE + bytes(8) + data.tobytes() + COPY_TRAILER
+
+class TestFunnelCounts:
+
+    def test_counts_users_reaching_each_step_in_order(self):
+        # Arrange
+        users, steps, times = _columns([
+            (0, 0, 0), (0, 1, HOUR), (0, 2, 2 * HOUR),  # whole funnel
+            (1, 0, 0), (1, 1, HOUR),                    # first two steps
+            (2, 1, 0), (2, 0, HOUR),                    # second step before the first
+            (3, 2, 0),                                  # never starts
+        ])
+
+        # Act
+        counts = funnel_counts(users, steps, times, 3, DAY)
+
+        # Assert
+        assert counts.tolist() == [3, 2, 1]
+
+    def test_steps_must_fall_within_window_of_first(self):
+        # Arrange
+        users, steps, times = _columns([(0, 0, 0), (0, 1, HOUR), (0, 2, 3 * HOUR)])
+
+        # Act
+        counts = funnel_counts(users, steps, times, 3, 2 * HOUR)
+
+        # Assert
+        assert counts.tolist() == [1, 1, 0]
+
+    def test_later_start_can_complete_the_funnel(self):
+        # Arrange
+        users, steps, times = _columns([(0, 0, 0), (0, 0, 10 * HOUR), (0, 1, 11 * HOUR)])
+
+        # Act
+        counts = funnel_counts(users, steps, times, 2, 2 * HOUR)
+
+        # Assert
+        assert counts.tolist() == [1, 1]
+
+    def test_no_events(self):
+        # Arrange
+        empty = np.zeros(0, dtype=np.int64)
+
+        # Act
+        counts = funnel_counts(empty, empty, empty, 3, DAY)
+
+        # Assert
+        assert counts.tolist() == [0, 0, 0]
+
+class TestRetentionMatrix:
+
+    def test_cohorts_by_first_period(self):
+        # Arrange
+        users, _, times = _columns([
+            (0, 0, 0), (0, 0, DAY + 1), (0, 0, 2 * DAY),
+            (1, 0, DAY), (1, 0, DAY + HOUR), (1, 0, 2 * DAY),
+            (2, 0, HOUR),
+        ])
+
+        # Act
+        matrix = retention_matrix(users, times, 0, DAY, 3)
+
+        # Assert
+        assert matrix.tolist() == [[2, 1, 1], [1, 1, 0], [0, 0, 0]]
+
+    def test_payload_lists_non_empty_cohorts(self):
+        # Arrange
+        since = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        matrix = np.array([[2, 1, 1], [0, 0, 0], [4, 0, 0]])
+
+        # Act
+        payload = retention_payload(since, datetime(2024, 1, 4, tzinfo=timezone.utc), 'day', None, matrix)
+
+        # Assert
+        assert payload["cohorts"] == [
+            {"cohort_start": "2024-01-01T00:00:00+00:00", "users": 2, "retained": [2, 1, 1], "retention_rates": [1.0, 0.5, 0.5]},
+            {"cohort_start": "2024-01-03T00:00:00+00:00", "users": 4, "retained": [4], "retention_rates": [1.0]},
+        ]
+
+    def test_period_count_covers_partial_period(self):
+        # Act & Assert
+        since = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        assert period_count(since, datetime(2024, 1, 15, tzinfo=timezone.utc), 'week') == 2
+        assert period_count(since, datetime(2024, 1, 15, 1, tzinfo=timezone.utc), 'week') == 3
+
+class TestActivityColumns:
+
+    @pytest.mark.asyncio
+    async def test_decodes_copy_stream_split_anywhere(self):
+        # Arrange
+        columns = EventColumns()
+        decoder = ActivityCopyDecoder(columns)
+        stream = _copy_stream([(-7, 0, 1000), (42, 1, 2000), (-7, 1, 3000)])
+
+        # Act
+        for start in range(0, len(stream), 5):
+            await decoder.feed(stream[start:start + 5])
+        decoder.finish()
+
+        # Assert
+        users, types, times = columns.arrays()
+        assert users.tolist() == [0, 1, 0]
+        assert types.tolist() == [0, 1, 1]
+        assert times.tolist() == [1000, 2000, 3000]
+
+    @pytest.mark.asyncio
+    async def test_truncated_stream_is_rejected(self):
+        # Arrange
+        decoder = ActivityCopyDecoder(EventColumns())
+        stream = _copy_stream([(1, 0, 1000)])
+
+        # Act
+        await decoder.feed(stream[:-10])
+
+        # Assert
+        with pytest.raises(ValueError):
+            decoder.finish()
+
+    @pytest.mark.asyncio
+    async def test_other_streams_are_rejected(self):
+        # Act & Assert
+        with pytest.raises(ValueError):
+            await ActivityCopyDecoder(EventColumns()).feed(b"user_id,event_type,timestamp\n")
+
+    def test_dense_codes(self):
+        # Act & Assert
+        assert dense_codes(np.array([9, -3, 9, 5], dtype=np.int64)).tolist() == [2, 0, 2, 1]
+        assert [len(column) for column in EventColumns().arrays()] == [0, 0, 0]
+
+class TestPayloads:
+
+    def test_funnel_payload_conversion_rates(self):
+        # Act
+        payload = funnel_payload(
+            ["page_view", "signup", "purchase"],
+            datetime(2024, 1, 1, tzinfo=timezone.utc), datetime(2024, 1, 8, tzinfo=timezone.utc),
+            3600.0, np.array([4, 2, 1])
+        )
+
+        # Assert
+        assert [step["users"] for step in payload["steps"]] == [4, 2, 1]
+        assert [step["conversion_rate"] for step in payload["steps"]] == [1.0, 0.5, 0.25]
+        assert [step["step_conversion_rate"] for step in payload["steps"]] == [1.0, 0.5, 0.5]
+
+    def test_analysis_key_is_canonical(self):
+        # Act & Assert
+        assert analysis_key('funnel', steps=["a", "b"], window_seconds=60) == analysis_key('funnel', window_seconds=60, steps=["a", "b"])
+        assert analysis_key('funnel', steps=["a", "b"]) != analysis_key('funnel', steps=["b", "a"])
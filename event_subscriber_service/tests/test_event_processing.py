@@ -1,18 +1,30 @@
 import pytest
 import asyncio
+import numpy as np
+from datetime import date, datetime, timezone
 from unittest.mock import Mock, AsyncMock, patch
 from uuid import uuid4
 from app.core.event_processing_service import EventProcessingService, DataAnalyticsService
+from app.infrastructure.summary_cache import SummaryCache
+from app.infrastructure.event_analysis import EventColumns
+from app.infrastructure.hot_store import HotStore
+from app.infrastructure.heavy_hitters import TopKTracker
+from app.infrastructure.sessions import Sessionizer
+from app.infrastructure.write_behind import WriteBehindBuffer
 
 @pytest.fixture
 def mock_database_repo():
     repo = Mock()
     repo.save_user_analytics_event = AsyncMock(return_value=uuid4())
     repo.save_chemical_research_event = AsyncMock(return_value=uuid4())
+    repo.save_user_analytics_event_with_status = AsyncMock(return_value=(uuid4(), True))
+    repo.save_chemical_research_event_with_status = AsyncMock(return_value=(uuid4(), True))
     repo.create_event_processing_status = AsyncMock(return_value=uuid4())
     repo.update_event_processing_status = AsyncMock()
     repo.get_user_analytics_events = AsyncMock(return_value=[])
     repo.get_chemical_research_events = AsyncMock(return_value=[])
+    repo.get_user_event_rollups = AsyncMock(return_value=[])
+    repo.get_researcher_rollup = AsyncMock(return_value=None)
     return repo
 
 @pytest.fixture
@@ -65,11 +77,11 @@ class TestEventProcessingService:
         
         # Assert
         assert result is not None
-        mock_database_repo.save_user_analytics_event.assert_called_once_with(sample_user_analytics_event)
-        mock_database_repo.create_event_processing_status.assert_called_once()
-        mock_database_repo.update_event_processing_status.assert_called_with(
-            result, 'completed'
+        mock_database_repo.save_user_analytics_event_with_status.assert_called_once_with(
+            sample_user_analytics_event
         )
+        mock_database_repo.create_event_processing_status.assert_not_called()
+        mock_database_repo.update_event_processing_status.assert_not_called()
     
     @pytest.mark.asyncio
     async def test_process_user_analytics_event_missing_field(
@@ -99,10 +111,12 @@ class TestEventProcessingService:
         mock_llm_service.extract_chemical_properties.assert_called_once_with(
             sample_chemical_research_event["data"]
         )
-        mock_database_repo.save_chemical_research_event.assert_called_once()
+        mock_database_repo.save_chemical_research_event_with_status.assert_called_once()
+        mock_database_repo.create_event_processing_status.assert_not_called()
+        mock_database_repo.update_event_processing_status.assert_not_called()
         
         # Check that LLM properties were added
-        saved_event = mock_database_repo.save_chemical_research_event.call_args[0][0]
+        saved_event = mock_database_repo.save_chemical_research_event_with_status.call_args[0][0]
         assert "llm_properties" in saved_event
     
     @pytest.mark.asyncio
@@ -117,8 +131,149 @@ class TestEventProcessingService:
         with pytest.raises(ValueError, match="Missing required field"):
             await event_processing_service.process_chemical_research_event(invalid_event)
 
+    @pytest.mark.asyncio
+    async def test_ingest_listeners_notified_after_save(
+        self,
+        mock_database_repo,
+        mock_llm_service,
+        sample_user_analytics_event
+    ):
+        # Arrange
+        listener = Mock()
+        listener.event_ingested = AsyncMock()
+        service = EventProcessingService(mock_database_repo, mock_llm_service, ingest_listeners=[listener])
+        
+        # Act
+        await service.process_user_analytics_event(sample_user_analytics_event)
+        
+        # Assert
+        listener.event_ingested.assert_awaited_once_with('user_analytics', sample_user_analytics_event)
+    
+    @pytest.mark.asyncio
+    async def test_redelivered_event_does_not_inflate_top_k(
+        self,
+        mock_database_repo,
+        mock_llm_service,
+        sample_user_analytics_event
+    ):
+        # Arrange
+        event_id = uuid4()
+        mock_database_repo.save_user_analytics_event_with_status.side_effect = [(event_id, True), (event_id, False)]
+        mock_database_repo.checkpoint_top_k = AsyncMock()
+        tracker = TopKTracker(mock_database_repo, checkpoint_interval=3600, checkpoint_events=100)
+        service = EventProcessingService(mock_database_repo, mock_llm_service, ingest_listeners=[tracker])
+        
+        # Act
+        first = await service.process_user_analytics_event(dict(sample_user_analytics_event))
+        redelivered = await service.process_user_analytics_event(dict(sample_user_analytics_event))
+        await tracker.checkpoint()
+        
+        # Assert
+        assert first == redelivered == event_id
+        counts = {call.args[0]: call.args[2] for call in mock_database_repo.checkpoint_top_k.call_args_list}
+        assert counts == {"users": [("test_user_123", 1, 0)], "pages": [("/dashboard", 1, 0)]}
+    
+    @pytest.mark.asyncio
+    async def test_redelivered_event_is_not_sessionized_again(
+        self,
+        mock_database_repo,
+        mock_llm_service,
+        sample_user_analytics_event
+    ):
+        # Arrange
+        event_id = uuid4()
+        mock_database_repo.save_user_analytics_event_with_status.side_effect = [(event_id, True), (event_id, False)]
+        mock_database_repo.write_session_fragments = AsyncMock()
+        sessionizer = Sessionizer(mock_database_repo, checkpoint_interval=3600)
+        service = EventProcessingService(mock_database_repo, mock_llm_service, ingest_listeners=[sessionizer])
+        
+        # Act
+        await service.process_user_analytics_event(dict(sample_user_analytics_event))
+        await service.process_user_analytics_event(dict(sample_user_analytics_event))
+        await sessionizer.checkpoint()
+        
+        # Assert
+        (fragment,) = mock_database_repo.write_session_fragments.call_args.args[0]
+        assert (fragment["event_count"], fragment["page_count"]) == (1, 1)
+    
+    @pytest.mark.asyncio
+    async def test_listener_failure_does_not_fail_ingest(
+        self,
+        mock_database_repo,
+        mock_llm_service,
+        sample_chemical_research_event
+    ):
+        # Arrange
+        listener = Mock()
+        listener.event_ingested = AsyncMock(side_effect=ConnectionError("redis down"))
+        service = EventProcessingService(mock_database_repo, mock_llm_service, ingest_listeners=[listener])
+        
+        # Act
+        result = await service.process_chemical_research_event(sample_chemical_research_event)
+        
+        # Assert
+        assert result is not None
+        listener.event_ingested.assert_awaited_once()
+    
+    @pytest.mark.asyncio
+    async def test_failed_save_does_not_notify_listeners(
+        self,
+        mock_database_repo,
+        mock_llm_service,
+        sample_user_analytics_event
+    ):
+        # Arrange
+        listener = Mock()
+        listener.event_ingested = AsyncMock()
+        mock_database_repo.save_user_analytics_event_with_status.side_effect = RuntimeError("database down")
+        service = EventProcessingService(mock_database_repo, mock_llm_service, ingest_listeners=[listener])
+        
+        # Act & Assert
+        with pytest.raises(RuntimeError):
+            await service.process_user_analytics_event(sample_user_analytics_event)
+        listener.event_ingested.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_process_events_shares_one_write_behind_batch(self, mock_database_repo, mock_llm_service):
+        # Arrange
+        stored = uuid4()
+        flush = AsyncMock(side_effect=lambda key, rows: [(stored, True)] * len(rows))
+        buffer = WriteBehindBuffer(flush, max_batch_size=100, max_delay=0.01)
+        
+        async def save(event_data):
+            return await buffer.submit("user_analytics", event_data)
+        
+        mock_database_repo.save_user_analytics_event_with_status = AsyncMock(side_effect=save)
+        service = EventProcessingService(mock_database_repo, mock_llm_service)
+        events = [
+            {"type": "user_analytics", "user_id": f"user_{n}", "event_type": "click", "timestamp": "2024-01-01T12:00:00Z"}
+            for n in range(3)
+        ]
+        
+        # Act
+        results = await service.process_events(events + [{"type": "unknown"}])
+        
+        # Assert
+        assert results[:3] == [stored] * 3
+        assert isinstance(results[3], ValueError)
+        flush.assert_awaited_once()
+        assert len(flush.call_args.args[1]) == 3
+
 class TestDataAnalyticsService:
     
+    @pytest.mark.asyncio
+    async def test_summary_served_from_cache(self, mock_database_repo):
+        # Arrange
+        service = DataAnalyticsService(mock_database_repo, cache=SummaryCache())
+        
+        # Act
+        first = await service.get_researcher_summary("Dr. Test")
+        second = await service.get_researcher_summary("Dr. Test")
+        
+        # Assert
+        assert first == second
+        mock_database_repo.get_researcher_rollup.assert_awaited_once_with("Dr. Test")
+    
     @pytest.mark.asyncio
     async def test_get_user_analytics_summary(
         self, 
@@ -126,6 +281,10 @@ class TestDataAnalyticsService:
         mock_database_repo
     ):
         # Arrange
+        mock_database_repo.get_user_event_rollups.return_value = [
+            {"event_type": "page_view", "event_count": 250, "first_seen": "2024-01-01T00:00:00+00:00", "last_seen": "2024-01-03T00:00:00+00:00"},
+            {"event_type": "click", "event_count": 1, "first_seen": "2024-01-02T00:00:00+00:00", "last_seen": "2024-01-02T00:00:00+00:00"},
+        ]
         mock_events = [
             {"event_type": "page_view", "user_id": "test_user"},
             {"event_type": "click", "user_id": "test_user"},
@@ -138,10 +297,220 @@ class TestDataAnalyticsService:
         
         # Assert
         assert result["user_id"] == "test_user"
-        assert result["total_events"] == 3
-        assert result["event_types"]["page_view"] == 2
+        assert result["total_events"] == 251
+        assert result["event_types"]["page_view"] == 250
         assert result["event_types"]["click"] == 1
+        assert result["first_seen"] == "2024-01-01T00:00:00+00:00"
+        assert result["last_seen"] == "2024-01-03T00:00:00+00:00"
         assert len(result["recent_events"]) == 3
+        mock_database_repo.get_user_analytics_events.assert_called_once_with("test_user", limit=10)
+    
+    @pytest.mark.asyncio
+    async def test_get_user_analytics_summary_unknown_user(
+        self, 
+        analytics_service, 
+        mock_database_repo
+    ):
+        # Act
+        result = await analytics_service.get_user_analytics_summary("nobody")
+        
+        # Assert
+        assert result["total_events"] == 0
+        assert result["event_types"] == {}
+        assert result["first_seen"] is None
+    
+    @pytest.mark.asyncio
+    async def test_windowed_user_summary_counts_in_database(
+        self, 
+        analytics_service, 
+        mock_database_repo
+    ):
+        # Arrange
+        since = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        mock_database_repo.get_user_event_counts = AsyncMock(return_value=[
+            {"event_type": "click", "event_count": 4, "first_seen": "2024-01-01T01:00:00+00:00", "last_seen": "2024-01-01T02:00:00+00:00"}
+        ])
+        
+        # Act
+        result = await analytics_service.get_user_analytics_summary("test_user", since=since)
+        
+        # Assert
+        assert result["total_events"] == 4
+        mock_database_repo.get_user_event_counts.assert_awaited_once_with("test_user", since=since)
+        mock_database_repo.get_user_event_rollups.assert_not_called()
+        mock_database_repo.get_user_analytics_events.assert_called_once_with("test_user", limit=10, since=since)
+    
+    @pytest.mark.asyncio
+    async def test_windowed_summary_from_hot_store(self, mock_database_repo):
+        # Arrange
+        store = HotStore(10)
+        store.rings['user_analytics'].restart(datetime(2024, 1, 1, tzinfo=timezone.utc))
+        await store.event_ingested('user_analytics', {
+            "event_id": str(uuid4()), "user_id": "test_user", "event_type": "click", "timestamp": "2024-01-01T12:00:00Z"
+        })
+        mock_database_repo.get_user_event_counts = AsyncMock(return_value=[])
+        service = DataAnalyticsService(mock_database_repo, hot_store=store)
+        
+        # Act
+        result = await service.get_user_analytics_summary(
+            "test_user", since=datetime(2024, 1, 1, 6, tzinfo=timezone.utc)
+        )
+        early = await service.get_user_analytics_summary(
+            "test_user", since=datetime(2023, 12, 31, tzinfo=timezone.utc)
+        )
+        
+        # Assert
+        assert result["event_types"] == {"click": 1}
+        assert result["recent_events"][0]["event_type"] == "click"
+        mock_database_repo.get_user_event_counts.assert_awaited_once()
+        mock_database_repo.get_user_analytics_events.assert_awaited_once()
+        assert early["event_types"] == {}
+    
+    @pytest.mark.asyncio
+    async def test_windowed_summary_bypasses_cache(self, mock_database_repo):
+        # Arrange
+        until = datetime(2024, 2, 1, tzinfo=timezone.utc)
+        mock_database_repo.get_researcher_counts = AsyncMock(return_value=None)
+        service = DataAnalyticsService(mock_database_repo, cache=SummaryCache())
+        
+        # Act
+        await service.get_researcher_summary("Dr. Test", until=until)
+        result = await service.get_researcher_summary("Dr. Test", until=until)
+        
+        # Assert
+        assert result["total_experiments"] == 0
+        assert mock_database_repo.get_researcher_counts.await_count == 2
+        mock_database_repo.get_researcher_rollup.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_activity_histogram_widens_to_whole_buckets(
+        self, 
+        analytics_service, 
+        mock_database_repo
+    ):
+        # Arrange
+        mock_database_repo.get_activity_histogram = AsyncMock(return_value=[{"start": "2024-01-01T12:00:00+00:00", "count": 2}])
+        
+        # Act
+        result = await analytics_service.get_activity_histogram(
+            "user", "test_user", "hour",
+            datetime(2024, 1, 1, 12, 15, tzinfo=timezone.utc), datetime(2024, 1, 1, 13, 5, tzinfo=timezone.utc)
+        )
+        
+        # Assert
+        assert result["since"] == "2024-01-01T12:00:00+00:00"
+        assert result["until"] == "2024-01-01T14:00:00+00:00"
+        assert result["buckets"] == [{"start": "2024-01-01T12:00:00+00:00", "count": 2}]
+    
+    @pytest.mark.asyncio
+    async def test_distinct_count_covers_whole_utc_days(
+        self, 
+        analytics_service, 
+        mock_database_repo
+    ):
+        # Arrange
+        mock_database_repo.get_distinct_sketch = AsyncMock(return_value=None)
+        
+        # Act
+        result = await analytics_service.get_distinct_count(
+            "event_type", "click",
+            datetime(2024, 1, 1, 12, 15, tzinfo=timezone.utc), datetime(2024, 1, 7, 13, 5, tzinfo=timezone.utc)
+        )
+        
+        # Assert
+        mock_database_repo.get_distinct_sketch.assert_awaited_once_with(
+            "event_type", "click", date(2024, 1, 1), date(2024, 1, 7)
+        )
+        assert result["since"] == "2024-01-01"
+        assert result["until"] == "2024-01-07"
+        assert result["distinct_estimate"] == 0
+    
+    @pytest.mark.asyncio
+    async def test_funnel_counts_loaded_activity(
+        self, 
+        analytics_service, 
+        mock_database_repo
+    ):
+        # Arrange
+        columns = EventColumns()
+        columns.add(
+            np.array([11, 11, 22, 22, 33]), np.array([0, 1, 0, 1, 1]),
+            np.array([0, 60000, 0, 7200000, 0])
+        )
+        mock_database_repo.load_user_activity = AsyncMock(return_value=columns)
+        since, until = datetime(2024, 1, 1, tzinfo=timezone.utc), datetime(2024, 1, 8, tzinfo=timezone.utc)
+        
+        # Act
+        result = await analytics_service.get_funnel(["page_view", "signup"], since, until, 3600.0)
+        
+        # Assert
+        mock_database_repo.load_user_activity.assert_awaited_once_with(since, until, ["page_view", "signup"], 50000)
+        assert [step["users"] for step in result["steps"]] == [2, 1]
+    
+    @pytest.mark.asyncio
+    async def test_retention_served_from_cache(self, mock_database_repo):
+        # Arrange
+        columns = EventColumns()
+        columns.add(np.array([11, 11]), np.array([0, 0]), np.array([0, 86400000]))
+        mock_database_repo.load_user_activity = AsyncMock(return_value=columns)
+        service = DataAnalyticsService(mock_database_repo, cache=SummaryCache())
+        since, until = datetime(1970, 1, 1, tzinfo=timezone.utc), datetime(1970, 1, 3, tzinfo=timezone.utc)
+        
+        # Act
+        first = await service.get_retention(since, until, "day", "page_view")
+        second = await service.get_retention(since, until, "day", "page_view")
+        
+        # Assert
+        mock_database_repo.load_user_activity.assert_awaited_once_with(since, until, ["page_view"], 50000)
+        assert first == second
+        assert first["cohorts"][0]["retained"] == [1, 1]
+    
+    @pytest.mark.asyncio
+    async def test_user_summaries_fan_out_in_chunks(
+        self, 
+        mock_database_repo
+    ):
+        # Arrange
+        service = DataAnalyticsService(mock_database_repo, bulk_chunk_size=2)
+        mock_database_repo.get_user_event_rollups_bulk = AsyncMock(side_effect=lambda ids: {
+            user_id: [{"event_type": "click", "event_count": 2, "first_seen": "a", "last_seen": "b"}] for user_id in ids
+        })
+        mock_database_repo.get_recent_user_analytics_events_bulk = AsyncMock(
+            side_effect=lambda ids, limit: {user_id: [] for user_id in ids}
+        )
+        
+        # Act
+        result = await service.get_user_analytics_summaries(["u1", "u2", "u3", "u1"])
+        
+        # Assert
+        assert list(result) == ["u1", "u2", "u3"]
+        assert result["u3"]["total_events"] == 2
+        chunks = [call.args[0] for call in mock_database_repo.get_user_event_rollups_bulk.call_args_list]
+        assert chunks == [["u1", "u2"], ["u3"]]
+    
+    @pytest.mark.asyncio
+    async def test_researcher_summaries_match_single_summary_shape(
+        self, 
+        analytics_service, 
+        mock_database_repo
+    ):
+        # Arrange
+        mock_database_repo.get_researcher_rollups_bulk = AsyncMock(return_value={
+            "Dr. Test": {"experiment_count": 3, "first_seen": "a", "last_seen": "b", "molecules": ["mol_1", "mol_2"]},
+            "Dr. None": None
+        })
+        mock_database_repo.get_recent_chemical_research_events_bulk = AsyncMock(
+            return_value={"Dr. Test": [{"molecule_id": "mol_1"}], "Dr. None": []}
+        )
+        
+        # Act
+        result = await analytics_service.get_researcher_summaries(["Dr. Test", "Dr. None"])
+        
+        # Assert
+        assert result["Dr. Test"]["total_experiments"] == 3
+        assert result["Dr. Test"]["unique_molecules"] == 2
+        assert result["Dr. None"]["total_experiments"] == 0
+        assert result["Dr. None"]["molecules_list"] == []
     
     @pytest.mark.asyncio
     async def test_get_researcher_summary(
@@ -150,6 +519,12 @@ class TestDataAnalyticsService:
         mock_database_repo
     ):
         # Arrange
+        mock_database_repo.get_researcher_rollup.return_value = {
+            "experiment_count": 3,
+            "first_seen": "2024-01-01T00:00:00+00:00",
+            "last_seen": "2024-01-02T00:00:00+00:00",
+            "molecules": ["mol_1", "mol_2"]
+        }
         mock_events = [
             {"molecule_id": "mol_1", "researcher": "Dr. Test"},
             {"molecule_id": "mol_2", "researcher": "Dr. Test"},
@@ -166,3 +541,4 @@ class TestDataAnalyticsService:
         assert result["unique_molecules"] == 2
         assert "mol_1" in result["molecules_list"]
         assert "mol_2" in result["molecules_list"]
+        assert len(result["recent_experiments"]) == 3
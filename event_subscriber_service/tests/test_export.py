@@ -0,0 +1,127 @@
+import io
+import json
+import pytest
+from datetime import datetime, timezone
+from unittest.mock import patch
+from uuid import uuid4
+from fastapi.testclient import TestClient
+from app.main import app
+from app.infrastructure.database_models import UserAnalyticsEvent
+from app.infrastructure.export import encode_export
+
+COLUMNS = UserAnalyticsEvent.__table__.columns
+
+def _row(i):
+    return {
+        "id": uuid4(),
+        "user_id": f"user_{i}",
+        "event_type": "click",
+        "page_url": None,
+        "user_agent": None,
+        "session_id": None,
+        "timestamp": datetime(2024, 1, 1, 12, i, tzinfo=timezone.utc),
+        "metadata": {"button": "signup", "n": i},
+        "processed": False,
+        "processed_at": None,
+        "created_at": None,
+        "updated_at": None,
+    }
+
+async def _chunks(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+async def _collect(stream):
+    return [part async for part in stream]
+
+class TestExportEncoders:
+    
+    @pytest.mark.asyncio
+    async def test_ndjson_yields_one_part_per_chunk(self):
+        # Act
+        parts = await _collect(encode_export("ndjson", _chunks([_row(0), _row(1)], [_row(2)]), COLUMNS))
+        
+        # Assert
+        assert len(parts) == 2
+        lines = b"".join(parts).decode().splitlines()
+        assert [json.loads(line)["user_id"] for line in lines] == ["user_0", "user_1", "user_2"]
+        assert json.loads(lines[0])["metadata"] == {"button": "signup", "n": 0}
+    
+    @pytest.mark.asyncio
+    async def test_csv_writes_header_once_and_json_columns_as_text(self):
+        # Act
+        parts = await _collect(encode_export("csv", _chunks([_row(0)], [_row(1)]), COLUMNS))
+        
+        # Assert
+        lines = b"".join(parts).decode().splitlines()
+        assert lines[0].startswith("id,user_id,event_type")
+        assert len(lines) == 3
+        assert '"{""button"": ""signup"", ""n"": 1}"' in lines[2]
+    
+    @pytest.mark.asyncio
+    async def test_csv_of_empty_export_is_just_the_header(self):
+        # Act
+        parts = await _collect(encode_export("csv", _chunks(), COLUMNS))
+        
+        # Assert
+        assert b"".join(parts).decode().splitlines() == [",".join(column.name for column in COLUMNS)]
+    
+    @pytest.mark.asyncio
+    async def test_arrow_stream_has_one_batch_per_chunk(self):
+        # Arrange
+        pa = pytest.importorskip("pyarrow")
+        
+        # Act
+        parts = await _collect(encode_export("arrow", _chunks([_row(0), _row(1)], [_row(2)]), COLUMNS))
+        
+        # Assert
+        reader = pa.ipc.open_stream(b"".join(parts))
+        batches = list(reader)
+        assert [batch.num_rows for batch in batches] == [2, 1]
+        assert reader.schema.field("timestamp").type == pa.timestamp("us", tz="UTC")
+        assert json.loads(batches[0].column("metadata")[1].as_py()) == {"button": "signup", "n": 1}
+    
+    @pytest.mark.asyncio
+    async def test_parquet_has_one_row_group_per_chunk(self):
+        # Arrange
+        pytest.importorskip("pyarrow")
+        import pyarrow.parquet as pq
+        
+        # Act
+        parts = await _collect(encode_export("parquet", _chunks([_row(0), _row(1)], [_row(2)]), COLUMNS))
+        
+        # Assert
+        parquet_file = pq.ParquetFile(io.BytesIO(b"".join(parts)))
+        assert parquet_file.metadata.num_row_groups == 2
+        assert parquet_file.read().column("user_id").to_pylist() == ["user_0", "user_1", "user_2"]
+
+class TestExportEndpoints:
+    
+    @patch('app.main.database_repo')
+    def test_export_streams_repository_chunks(self, mock_repo):
+        # Arrange
+        mock_repo.stream_user_analytics_events.return_value = _chunks([_row(0)], [_row(1)])
+        client = TestClient(app)
+        
+        # Act
+        response = client.get("/api/v1/export/user_analytics?format=ndjson&user_id=user_1&event_type=click")
+        
+        # Assert
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        assert len(response.text.splitlines()) == 2
+        kwargs = mock_repo.stream_user_analytics_events.call_args.kwargs
+        assert kwargs["user_id"] == "user_1"
+        assert kwargs["event_type"] == "click"
+    
+    @patch('app.main.database_repo')
+    def test_export_rejects_unknown_format(self, mock_repo):
+        # Arrange
+        mock_repo.stream_chemical_research_events.return_value = _chunks()
+        client = TestClient(app)
+        
+        # Act
+        response = client.get("/api/v1/export/chemical_research?format=xml")
+        
+        # Assert
+        assert response.status_code == 400
@@ -0,0 +1,161 @@
+import pytest
+import random
+from datetime import date
+from unittest.mock import AsyncMock, Mock
+from sqlalchemy.dialects import postgresql
+from app.infrastructure.heavy_hitters import (
+    SpaceSaving,
+    TopKTracker,
+    checkpoint_statements,
+    event_item,
+    top_payload
+)
+
+def _sql(statement):
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+class TestSpaceSaving:
+
+    def test_counts_exactly_within_capacity(self):
+        # Arrange
+        summary = SpaceSaving(capacity=3)
+
+        # Act
+        for item in ["a", "b", "a", "c", "a", "b"]:
+            summary.add(item)
+
+        # Assert
+        assert summary.items() == [("a", 3, 0), ("b", 2, 0), ("c", 1, 0)]
+
+    def test_new_item_replaces_lightest_and_inherits_its_count(self):
+        # Arrange
+        summary = SpaceSaving(capacity=2)
+        for item in ["a", "a", "a", "b"]:
+            summary.add(item)
+
+        # Act
+        summary.add("c")
+
+        # Assert
+        assert summary.items() == [("a", 3, 0), ("c", 2, 1)]
+
+    def test_heavy_hitters_survive_a_long_tail(self):
+        # Arrange
+        summary = SpaceSaving(capacity=50)
+
+        # Act
+        for i in range(10000):
+            summary.add("hot" if i % 10 == 0 else f"tail_{i}")
+
+        # Assert
+        item, count, error = summary.items()[0]
+        assert item == "hot"
+        assert count - error <= 1000 <= count
+
+    def test_evictions_match_a_scan_for_the_lightest_item(self):
+        # Arrange
+        rng = random.Random(7)
+        summary = SpaceSaving(capacity=20)
+        expected = {}
+
+        # Act
+        for _ in range(5000):
+            item, count = f"item_{rng.randrange(60)}", rng.choice([1, 1, 1, 3])
+            summary.add(item, count)
+            if item in expected:
+                expected[item][0] += count
+                continue
+            error = 0
+            if len(expected) >= 20:
+                error = expected.pop(min(expected, key=lambda key: expected[key][0]))[0]
+            expected[item] = [count + error, error]
+
+        # Assert
+        assert summary.counters == expected
+        assert len(summary._heap) <= 2 * 20 + 16
+
+class TestEventItem:
+
+    def test_items_per_dimension(self):
+        # Arrange
+        event = {"user_id": "user_1", "event_type": "page_view", "metadata": {"page": "/dashboard"}}
+
+        # Act & Assert
+        assert event_item('users', 'user_analytics', event) == "user_1"
+        assert event_item('pages', 'user_analytics', event) == "/dashboard"
+        assert event_item('molecules', 'user_analytics', event) is None
+        assert event_item('molecules', 'chemical_research', {"molecule_id": "mol_1"}) == "mol_1"
+
+    def test_pages_count_only_page_views(self):
+        # Arrange
+        click = {"user_id": "user_1", "event_type": "click", "metadata": {"page": "/dashboard"}}
+        no_page = {"user_id": "user_1", "event_type": "page_view", "metadata": None}
+
+        # Act & Assert
+        assert event_item('pages', 'user_analytics', click) is None
+        assert event_item('pages', 'user_analytics', no_page) is None
+
+class TestCheckpointStatements:
+
+    def test_new_items_start_from_floor_and_day_is_trimmed(self):
+        # Act
+        upsert, trim = checkpoint_statements('users', date(2024, 1, 1), [("user_1", 5, 0)], floor=7, capacity=100)
+
+        # Assert
+        assert upsert.compile(dialect=postgresql.dialect()).params["event_count_m0"] == 12
+        assert "event_count = ((top_k_items.event_count + excluded.event_count) - " in _sql(upsert)
+        assert "ORDER BY top_k_items.event_count DESC, top_k_items.item" in _sql(trim)
+        assert "RETURNING top_k_items.event_count" in _sql(trim)
+
+    def test_payload_reports_guaranteed_count(self):
+        # Act
+        payload = top_payload('users', date(2024, 1, 1), date(2024, 1, 2), [
+            {"item": "user_1", "event_count": 12, "error": 7}
+        ])
+
+        # Assert
+        assert payload["items"] == [{"item": "user_1", "count": 12, "guaranteed_count": 5}]
+
+class TestTopKTracker:
+
+    @pytest.fixture
+    def mock_repo(self):
+        repo = Mock()
+        repo.checkpoint_top_k = AsyncMock()
+        return repo
+
+    @pytest.mark.asyncio
+    async def test_checkpoints_after_enough_events(self, mock_repo):
+        # Arrange
+        tracker = TopKTracker(mock_repo, checkpoint_interval=3600, checkpoint_events=3)
+        event = {"user_id": "user_1", "event_type": "page_view", "metadata": {"page": "/x"}, "timestamp": "2024-01-01T12:00:00Z"}
+
+        # Act
+        await tracker.event_ingested('user_analytics', event)
+        await tracker.event_ingested('user_analytics', event)
+        mock_repo.checkpoint_top_k.assert_not_called()
+        await tracker.event_ingested('user_analytics', event)
+
+        # Assert
+        calls = {call.args[:2]: call.args[2] for call in mock_repo.checkpoint_top_k.call_args_list}
+        assert calls == {
+            ('pages', date(2024, 1, 1)): [("/x", 3, 0)],
+            ('users', date(2024, 1, 1)): [("user_1", 3, 0)],
+        }
+        assert tracker.get_metrics()["pending_events"] == 0
+
+    @pytest.mark.asyncio
+    async def test_failed_checkpoint_keeps_counts(self, mock_repo):
+        # Arrange
+        mock_repo.checkpoint_top_k.side_effect = [Exception("DB down"), None]
+        tracker = TopKTracker(mock_repo, checkpoint_interval=3600, checkpoint_events=100)
+        await tracker.event_ingested('chemical_research', {"molecule_id": "mol_1", "timestamp": "2024-01-01T12:00:00Z"})
+
+        # Act
+        with pytest.raises(Exception, match="DB down"):
+            await tracker.checkpoint()
+        await tracker.event_ingested('chemical_research', {"molecule_id": "mol_1", "timestamp": "2024-01-01T13:00:00Z"})
+        await tracker.checkpoint()
+
+        # Assert
+        assert mock_repo.checkpoint_top_k.call_args.args[2] == [("mol_1", 2, 0)]
@@ -0,0 +1,126 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import DateTime, String, column, values
+from sqlalchemy.dialects import postgresql
+from app.infrastructure.histograms import (
+    bucket_count,
+    bucket_upserts,
+    ceil_bucket,
+    event_counts_query,
+    floor_bucket,
+    histogram_payload,
+    prune_statements,
+    split_by_coverage
+)
+from app.infrastructure.postgresql_repository import rollup_upserts
+
+MOMENT = datetime(2024, 1, 1, 12, 34, 56, tzinfo=timezone.utc)
+
+def _sql(statement):
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+class TestBucketBounds:
+
+    def test_floor_and_ceil_to_whole_buckets(self):
+        # Act & Assert
+        assert floor_bucket(MOMENT, 'minute') == datetime(2024, 1, 1, 12, 34, tzinfo=timezone.utc)
+        assert floor_bucket(MOMENT, 'hour') == datetime(2024, 1, 1, 12, tzinfo=timezone.utc)
+        assert ceil_bucket(MOMENT, 'day') == datetime(2024, 1, 2, tzinfo=timezone.utc)
+        assert ceil_bucket(datetime(2024, 1, 1, 12, tzinfo=timezone.utc), 'hour') == datetime(2024, 1, 1, 12, tzinfo=timezone.utc)
+
+    def test_naive_and_offset_moments_are_utc(self):
+        # Arrange
+        offset = datetime(2024, 1, 1, 14, 34, tzinfo=timezone(timedelta(hours=2)))
+
+        # Act & Assert
+        assert floor_bucket(datetime(2024, 1, 1, 12, 34), 'hour') == datetime(2024, 1, 1, 12, tzinfo=timezone.utc)
+        assert floor_bucket(offset, 'day') == datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    def test_bucket_count(self):
+        # Act & Assert
+        assert bucket_count(MOMENT, MOMENT + timedelta(hours=2), 'hour') == 3
+        assert bucket_count(MOMENT, MOMENT + timedelta(days=7), 'minute') == 7 * 1440 + 1
+        assert bucket_count(MOMENT, MOMENT - timedelta(minutes=1), 'day') == 0
+
+class TestSplitByCoverage:
+
+    def test_fully_covered_without_coverage_row(self):
+        # Act
+        ranges = split_by_coverage(MOMENT, MOMENT + timedelta(days=1), None)
+
+        # Assert
+        assert ranges == {'events': None, 'buckets': (MOMENT, MOMENT + timedelta(days=1))}
+
+    def test_range_before_coverage_is_counted_from_events(self):
+        # Arrange
+        covered_from = MOMENT + timedelta(hours=6)
+
+        # Act
+        ranges = split_by_coverage(MOMENT, MOMENT + timedelta(days=1), covered_from)
+
+        # Assert
+        assert ranges == {
+            'events': (MOMENT, covered_from),
+            'buckets': (covered_from, MOMENT + timedelta(days=1)),
+        }
+
+    def test_range_entirely_before_coverage(self):
+        # Act
+        ranges = split_by_coverage(MOMENT, MOMENT + timedelta(hours=1), MOMENT + timedelta(days=1))
+
+        # Assert
+        assert ranges == {'events': (MOMENT, MOMENT + timedelta(hours=1)), 'buckets': None}
+
+class TestBucketStatements:
+
+    def test_user_events_feed_user_and_event_type_buckets(self):
+        # Act
+        statements = bucket_upserts('user_analytics', _source())
+
+        # Assert
+        sql = [_sql(statement) for statement in statements]
+        assert len(sql) == 6
+        assert all("ON CONFLICT (dimension, subject, granularity, bucket_start) DO UPDATE" in s for s in sql)
+        assert all("activity_buckets.event_count + excluded.event_count" in s for s in sql)
+        assert "GROUP BY new_event.user_id, date_trunc(" in sql[0]
+
+    def test_ingest_statements_include_buckets(self):
+        # Act
+        statements = rollup_upserts('chemical_research', _source())
+
+        # Assert
+        assert sum("activity_buckets" in _sql(statement) for statement in statements) == 3
+
+    def test_fallback_counts_events_with_date_trunc(self):
+        # Act
+        sql = _sql(event_counts_query('event_type', 'click', 'hour', MOMENT, MOMENT + timedelta(hours=5)))
+
+        # Assert
+        assert "date_trunc(" in sql
+        assert "WHERE user_analytics_events.event_type = " in sql
+        assert "GROUP BY" in sql
+
+    def test_prune_advances_coverage_without_moving_it_back(self):
+        # Act
+        deleted, *coverage = prune_statements('minute', MOMENT)
+
+        # Assert
+        assert "DELETE FROM activity_buckets" in _sql(deleted)
+        assert len(coverage) == 3
+        assert "greatest(activity_bucket_coverage.covered_from, excluded.covered_from)" in _sql(coverage[0])
+
+    def test_payload_is_sorted_and_serialized(self):
+        # Act
+        payload = histogram_payload({MOMENT + timedelta(hours=1): 2, MOMENT: 5})
+
+        # Assert
+        assert payload == [
+            {"start": "2024-01-01T12:34:56+00:00", "count": 5},
+            {"start": "2024-01-01T13:34:56+00:00", "count": 2},
+        ]
+
+def _source():
+    return values(
+        column('user_id', String), column('event_type', String), column('researcher', String),
+        column('molecule_id', String), column('timestamp', DateTime(timezone=True)),
+        name='new_event'
+    ).data([("user_1", "click", "Dr. Test", "mol_1", MOMENT)])
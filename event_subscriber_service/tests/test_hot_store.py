@@ -0,0 +1,200 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import Mock
+from uuid import UUID
+from app.infrastructure.hot_store import HotStore, build_hot_store
+from app.infrastructure.read_routing import read_your_writes
+
+START = datetime(2024, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+def _event(n, user_id="user_1", event_type="click", minutes=None):
+    return {
+        "event_id": str(UUID(int=n)),
+        "user_id": user_id,
+        "event_type": event_type,
+        "timestamp": (START + timedelta(minutes=n if minutes is None else minutes)).isoformat(),
+        "metadata": {"page": "/x"},
+    }
+
+async def _fed_store(events, capacity=100):
+    store = HotStore(capacity)
+    store.rings['user_analytics'].restart(START)
+    for event in events:
+        await store.event_ingested('user_analytics', event)
+    return store
+
+class TestHotStoreEvents:
+
+    @pytest.mark.asyncio
+    async def test_pages_newest_first_like_the_database(self):
+        # Arrange
+        store = await _fed_store([_event(n) for n in range(1, 6)] + [_event(9, user_id="user_2")])
+
+        # Act
+        page = store.user_events("user_1", limit=2, since=START)
+
+        # Assert
+        assert [event["id"] for event in page] == [str(UUID(int=5)), str(UUID(int=4))]
+        assert page[0]["timestamp"] == "2024-01-01T12:05:00+00:00"
+        assert set(page[0]) == {"id", "user_id", "event_type", "page_url", "timestamp", "metadata", "processed_at"}
+
+    @pytest.mark.asyncio
+    async def test_cursor_continues_through_equal_timestamps(self):
+        # Arrange
+        store = await _fed_store([_event(n, minutes=1) for n in (1, 2, 3)])
+        first = store.user_events("user_1", limit=2, since=START)
+        last = first[-1]
+
+        # Act
+        rest = store.user_events("user_1", limit=2, since=START, cursor=(START + timedelta(minutes=1), UUID(last["id"])))
+
+        # Assert
+        assert [event["id"] for event in first + rest] == [str(UUID(int=n)) for n in (3, 2, 1)]
+
+    @pytest.mark.asyncio
+    async def test_range_before_coverage_goes_to_the_database(self):
+        # Arrange
+        store = await _fed_store([_event(n) for n in range(1, 4)])
+
+        # Act & Assert
+        assert store.user_events("user_1", limit=10, since=START - timedelta(hours=1)) is None
+        # Without since, a page filled with covered events is still exact
+        assert len(store.user_events("user_1", limit=3)) == 3
+        assert store.user_events("user_1", limit=4) is None
+        assert store.get_metrics()["hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_unfed_store_answers_nothing(self):
+        # Arrange
+        store = HotStore(10)
+        await store.event_ingested('user_analytics', _event(1))
+
+        # Act & Assert
+        assert store.user_events("user_1", limit=1, since=START) is None
+        assert not store.covers('user_analytics', START)
+
+    @pytest.mark.asyncio
+    async def test_overwritten_events_move_coverage_past_them(self):
+        # Arrange
+        store = await _fed_store([_event(n) for n in range(1, 6)], capacity=3)
+
+        # Act & Assert
+        assert store.user_events("user_1", limit=10, since=START) is None
+        assert len(store.user_events("user_1", limit=10, since=START + timedelta(minutes=3))) == 3
+        assert store.get_metrics()["datasets"]["user_analytics"]["events"] == 3
+
+    @pytest.mark.asyncio
+    async def test_repeated_event_id_is_held_once(self):
+        # Arrange
+        store = await _fed_store([_event(1), _event(2), _event(1)], capacity=2)
+
+        # Act
+        page = store.user_events("user_1", limit=10, since=START)
+        counts = store.user_event_counts("user_1", START)
+
+        # Assert
+        assert [event["id"] for event in page] == [str(UUID(int=2)), str(UUID(int=1))]
+        assert counts[0]["event_count"] == 2
+        assert store.get_metrics()["datasets"]["user_analytics"]["duplicates_skipped"] == 1
+
+    @pytest.mark.asyncio
+    async def test_overwritten_event_id_can_come_back(self):
+        # Arrange
+        store = await _fed_store([_event(1), _event(2), _event(3)], capacity=2)
+
+        # Act
+        await store.event_ingested('user_analytics', _event(1, minutes=4))
+
+        # Assert
+        page = store.user_events("user_1", limit=10, since=START + timedelta(minutes=3))
+        assert [event["id"] for event in page] == [str(UUID(int=1)), str(UUID(int=3))]
+
+    @pytest.mark.asyncio
+    async def test_dictionaries_stay_bounded(self):
+        # Arrange
+        store = await _fed_store([_event(n, user_id=f"user_{n}") for n in range(1, 51)], capacity=5)
+
+        # Act
+        page = store.user_events("user_50", limit=1, since=START + timedelta(minutes=46))
+
+        # Assert
+        assert page[0]["user_id"] == "user_50"
+        assert store.get_metrics()["datasets"]["user_analytics"]["dictionary_sizes"]["user_id"] <= 10
+
+    @pytest.mark.asyncio
+    async def test_event_it_cannot_hold_leaves_a_hole(self):
+        # Arrange
+        store = await _fed_store([_event(1)])
+        broken = _event(2)
+        del broken["event_id"]
+
+        # Act
+        await store.event_ingested('user_analytics', broken)
+
+        # Assert
+        assert store.user_events("user_1", limit=10, since=START) is None
+
+    @pytest.mark.asyncio
+    async def test_read_your_writes_bypasses_store(self):
+        # Arrange
+        store = await _fed_store([_event(1)])
+
+        # Act & Assert
+        with read_your_writes():
+            assert store.user_events("user_1", limit=10, since=START) is None
+            assert not store.covers('user_analytics', START)
+
+class TestHotStoreCounts:
+
+    @pytest.mark.asyncio
+    async def test_user_event_counts_per_type(self):
+        # Arrange
+        store = await _fed_store([
+            _event(1), _event(2, event_type="view"), _event(3), _event(4, user_id="user_2")
+        ])
+
+        # Act
+        counts = store.user_event_counts("user_1", START, START + timedelta(minutes=3))
+
+        # Assert
+        assert counts == [
+            {"event_type": "click", "event_count": 1, "first_seen": "2024-01-01T12:01:00+00:00", "last_seen": "2024-01-01T12:01:00+00:00"},
+            {"event_type": "view", "event_count": 1, "first_seen": "2024-01-01T12:02:00+00:00", "last_seen": "2024-01-01T12:02:00+00:00"},
+        ]
+
+    @pytest.mark.asyncio
+    async def test_researcher_counts_per_molecule(self):
+        # Arrange
+        store = HotStore(10)
+        store.rings['chemical_research'].restart(START)
+        for n, molecule in enumerate(["mol_2", "mol_1", "mol_2"], start=1):
+            await store.event_ingested('chemical_research', {
+                "event_id": str(UUID(int=n)), "researcher": "Dr. Test", "molecule_id": molecule,
+                "data": {}, "timestamp": (START + timedelta(minutes=n)).isoformat()
+            })
+
+        # Act
+        rollup = store.researcher_counts("Dr. Test", START)
+
+        # Assert
+        assert rollup == {
+            "experiment_count": 3,
+            "first_seen": "2024-01-01T12:01:00+00:00",
+            "last_seen": "2024-01-01T12:03:00+00:00",
+            "molecules": ["mol_1", "mol_2"],
+        }
+        assert store.researcher_counts("Dr. Nobody", START) is None
+
+    def test_build_needs_live_channel(self):
+        # Arrange
+        settings = Mock(
+            HOT_STORE_ENABLED=True, HOT_STORE_CAPACITY=10, LIVE_ENABLED=True,
+            LIVE_REDIS_URL=None, CELERY_BROKER_URL="amqp://broker"
+        )
+
+        # Act & Assert
+        assert build_hot_store(settings) is None
+        settings.LIVE_REDIS_URL = "redis://redis:6379/2"
+        assert build_hot_store(settings).get_metrics()["datasets"]["user_analytics"]["capacity"] == 10
+        settings.HOT_STORE_ENABLED = False
+        assert build_hot_store(settings) is None
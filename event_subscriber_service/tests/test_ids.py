@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+from unittest.mock import patch
+from app.infrastructure.ids import uuid7
+from app.infrastructure.postgresql_repository import _user_analytics_values
+
+def _created(value: UUID) -> datetime:
+    return datetime.fromtimestamp((value.int >> 80) / 1000, tz=timezone.utc)
+
+class TestUuid7:
+
+    def test_sets_version_and_variant(self):
+        # Act
+        value = uuid7()
+
+        # Assert
+        assert value.version == 7
+        assert value.variant == "specified in RFC 4122"
+
+    def test_ids_strictly_increase(self):
+        # Act
+        values = [uuid7() for _ in range(10000)]
+
+        # Assert
+        assert values == sorted(values)
+        assert len(set(values)) == len(values)
+
+    def test_counter_overflow_advances_timestamp(self):
+        # Arrange
+        with patch("app.infrastructure.ids.time.time_ns", return_value=1_700_000_000_000 * 1_000_000):
+
+            # Act
+            values = [uuid7() for _ in range(5000)]
+
+        # Assert
+        assert values == sorted(values)
+        assert _created(values[-1]) > _created(values[0])
+
+    def test_embeds_creation_time(self):
+        # Arrange
+        before = datetime.now(timezone.utc) - timedelta(milliseconds=1)
+
+        # Act
+        created = _created(uuid7())
+
+        # Assert
+        assert before <= created <= datetime.now(timezone.utc) + timedelta(milliseconds=1)
+
+    def test_repository_mints_time_ordered_event_ids(self):
+        # Act
+        values = _user_analytics_values({
+            "user_id": "user_1",
+            "event_type": "click",
+            "timestamp": "2024-01-01T12:00:00Z",
+        })
+
+        # Assert
+        assert values["id"].version == 7
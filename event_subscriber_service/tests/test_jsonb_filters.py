@@ -0,0 +1,86 @@
+import pytest
+from sqlalchemy.dialects import postgresql
+from app.infrastructure.jsonb_filters import JsonFilter, parse_json_filter, parse_json_filters
+from app.infrastructure.postgresql_repository import (
+    user_analytics_events_query,
+    chemical_research_export_query
+)
+
+ALLOWED = ["metadata", "llm_properties"]
+
+class TestParseJsonFilter:
+    
+    @pytest.mark.parametrize("expression, expected", [
+        ("metadata.page=/dashboard", JsonFilter("metadata", ["page"], "=", "/dashboard")),
+        ("metadata.cart.total>=10.5", JsonFilter("metadata", ["cart", "total"], ">=", 10.5)),
+        ("llm_properties.toxic=false", JsonFilter("llm_properties", ["toxic"], "=", False)),
+        ('metadata.code="007"', JsonFilter("metadata", ["code"], "=", "007")),
+        ("metadata.campaign", JsonFilter("metadata", ["campaign"])),
+    ])
+    def test_parses_expressions(self, expression, expected):
+        # Act & Assert
+        assert parse_json_filter(expression, ALLOWED) == expected
+    
+    @pytest.mark.parametrize("expression", [
+        "data.state=gas",
+        "metadata",
+        "metadata.$bad=1",
+        "metadata.score>{\"a\": 1}",
+    ])
+    def test_rejects_invalid_expressions(self, expression):
+        # Act & Assert
+        with pytest.raises(ValueError):
+            parse_json_filter(expression, ALLOWED)
+    
+    def test_builds_containment_document_and_jsonpath(self):
+        # Arrange
+        equality, comparison = parse_json_filters(
+            ["metadata.cart.currency=USD", 'llm_properties.color!=say "blue"'], ALLOWED
+        )
+        
+        # Act & Assert
+        assert equality.containment_document() == {"cart": {"currency": "USD"}}
+        assert comparison.jsonpath() == '$."color" ? (@ != "say \\"blue\\"")'
+
+class TestJsonFilterMatches:
+    
+    @pytest.mark.parametrize("expression, document, expected", [
+        ("metadata.page=/dashboard", {"page": "/dashboard"}, True),
+        ("metadata.page=/dashboard", {"page": ["/home", "/dashboard"]}, True),
+        ("metadata.cart.total>=10.5", {"cart": {"total": 12}}, True),
+        ("metadata.cart.total>=10.5", {"cart": {"total": "12"}}, False),
+        ("llm_properties.toxic=false", {"toxic": 0}, False),
+        ("metadata.campaign", {"campaign": None}, True),
+        ("metadata.campaign", {"page": "/"}, False),
+        ("metadata.cart.total>1", {"cart": 5}, False),
+    ])
+    def test_mirrors_sql_semantics(self, expression, document, expected):
+        # Arrange
+        json_filter = parse_json_filter(expression, ALLOWED)
+        
+        # Act & Assert
+        assert json_filter.matches(document) is expected
+
+class TestJsonFilterPushdown:
+    
+    def _sql(self, statement):
+        return str(statement.compile(dialect=postgresql.dialect()))
+    
+    def test_equality_compiles_to_containment(self):
+        # Act
+        sql = self._sql(user_analytics_events_query(
+            "user_1", 10, json_filters=[JsonFilter("metadata", ["page"], "=", "/dashboard")]
+        ))
+        
+        # Assert
+        assert "user_analytics_events.metadata @> " in sql
+    
+    def test_comparison_compiles_to_jsonpath_predicate(self):
+        # Act
+        sql = self._sql(chemical_research_export_query(
+            json_filters=[JsonFilter("llm_properties", ["ph"], ">", 7)]
+        ))
+        
+        # Assert
+        assert "chemical_research_events.llm_properties @? CAST(" in sql
+        assert "AS JSONPATH)" in sql
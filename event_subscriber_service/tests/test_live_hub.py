@@ -0,0 +1,163 @@
+import asyncio
+import json
+import pytest
+from unittest.mock import AsyncMock, Mock
+from app.infrastructure.live_hub import (
+    LiveBridge,
+    LiveEventPublisher,
+    LiveHub,
+    SubscriberEvicted,
+    build_live_bridge,
+    build_live_publisher,
+    live_redis_url
+)
+
+class _FakePubSub:
+
+    def __init__(self, messages):
+        self.messages = messages
+        self.subscribe = AsyncMock()
+        self.aclose = AsyncMock()
+
+    async def listen(self):
+        for message in self.messages:
+            yield message
+        await asyncio.Event().wait()
+
+class TestLiveHub:
+
+    @pytest.mark.asyncio
+    async def test_delivers_only_matching_events(self):
+        # Arrange
+        hub = LiveHub()
+        subscription = hub.subscribe({"user_id": "user_1", "researcher": None})
+
+        # Act
+        hub.publish('user_analytics', {"user_id": "user_2", "event_type": "click"})
+        hub.publish('user_analytics', {"user_id": "user_1", "event_type": "click"})
+
+        # Assert
+        message = await subscription.get(timeout=0.1)
+        assert message == {"type": "event", "event_type": "user_analytics", "event": {"user_id": "user_1", "event_type": "click"}}
+        assert await subscription.get(timeout=0.01) is None
+
+    @pytest.mark.asyncio
+    async def test_evicts_subscriber_whose_buffer_overflows(self):
+        # Arrange
+        hub = LiveHub(max_buffer=2)
+        slow = hub.subscribe()
+        fast = hub.subscribe({"event_type": "view"})
+
+        # Act
+        for _ in range(3):
+            hub.publish('user_analytics', {"user_id": "user_1", "event_type": "click"})
+
+        # Assert
+        with pytest.raises(SubscriberEvicted):
+            await slow.get(timeout=0.1)
+        assert hub.get_metrics() == {"enabled": True, "subscribers": 1, "published": 3, "delivered": 2, "evicted": 1}
+        fast.close()
+        assert hub.get_metrics()["subscribers"] == 0
+
+class TestLiveChannel:
+
+    @pytest.mark.asyncio
+    async def test_publisher_sends_event_as_json(self):
+        # Arrange
+        redis = Mock()
+        redis.publish = AsyncMock()
+        publisher = LiveEventPublisher(redis, channel="live")
+
+        # Act
+        await publisher.event_ingested('chemical_research', {"researcher": "Dr. Test"})
+
+        # Assert
+        channel, payload = redis.publish.call_args.args
+        assert channel == "live"
+        assert json.loads(payload) == {"event_type": "chemical_research", "event": {"researcher": "Dr. Test"}}
+
+    @pytest.mark.asyncio
+    async def test_bridge_relays_channel_messages_into_hub(self):
+        # Arrange
+        hub = LiveHub()
+        subscription = hub.subscribe({"researcher": "Dr. Test"})
+        pubsub = _FakePubSub([
+            {"type": "subscribe", "data": 1},
+            {"type": "message", "data": json.dumps({"event_type": "chemical_research", "event": {"researcher": "Dr. Test"}})},
+        ])
+        redis = Mock()
+        redis.pubsub.return_value = pubsub
+        redis.aclose = AsyncMock()
+        bridge = LiveBridge(redis, hub, channel="live")
+
+        # Act
+        bridge.start()
+        message = await subscription.get(timeout=1)
+        await bridge.close()
+
+        # Assert
+        assert message["event"] == {"researcher": "Dr. Test"}
+        pubsub.subscribe.assert_awaited_once_with("live")
+        pubsub.aclose.assert_awaited_once()
+        redis.aclose.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_bridge_resubscribes_after_error(self):
+        # Arrange
+        hub = LiveHub()
+        subscription = hub.subscribe()
+        broken = _FakePubSub([])
+        broken.subscribe.side_effect = ConnectionError("Redis down")
+        working = _FakePubSub([
+            {"type": "message", "data": json.dumps({"event_type": "user_analytics", "event": {"user_id": "user_1"}})},
+        ])
+        redis = Mock()
+        redis.pubsub.side_effect = [broken, working]
+        redis.aclose = AsyncMock()
+        bridge = LiveBridge(redis, hub, retry_delay=0)
+
+        # Act
+        bridge.start()
+        message = await subscription.get(timeout=1)
+        await bridge.close()
+
+        # Assert
+        assert message["event"] == {"user_id": "user_1"}
+
+    @pytest.mark.asyncio
+    async def test_bridge_feeds_listeners_and_tells_them_of_each_subscription(self):
+        # Arrange
+        hub = LiveHub()
+        subscription = hub.subscribe()
+        pubsub = _FakePubSub([
+            {"type": "message", "data": json.dumps({"event_type": "user_analytics", "event": {"user_id": "user_1"}})},
+        ])
+        redis = Mock()
+        redis.pubsub.return_value = pubsub
+        redis.aclose = AsyncMock()
+        failing = Mock()
+        failing.event_ingested = AsyncMock(side_effect=RuntimeError("full"))
+        listener = Mock()
+        listener.event_ingested = AsyncMock()
+        bridge = LiveBridge(redis, hub, listeners=[failing, listener])
+
+        # Act
+        bridge.start()
+        await subscription.get(timeout=1)
+        await asyncio.sleep(0)
+        await bridge.close()
+
+        # Assert
+        listener.feed_started.assert_called_once_with()
+        listener.event_ingested.assert_awaited_once_with('user_analytics', {"user_id": "user_1"})
+
+    def test_live_redis_url_falls_back_to_redis_broker(self):
+        # Arrange
+        settings = Mock(LIVE_ENABLED=True, LIVE_REDIS_URL=None, CELERY_BROKER_URL="redis://broker:6379/0")
+
+        # Act & Assert
+        assert live_redis_url(settings) == "redis://broker:6379/0"
+        settings.CELERY_BROKER_URL = "amqp://broker"
+        assert live_redis_url(settings) is None
+        assert build_live_publisher(settings) is None
+        assert build_live_bridge(settings, LiveHub()) is None
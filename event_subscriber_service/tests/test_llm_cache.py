@@ -0,0 +1,252 @@
+import asyncio
+import httpx
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, Mock, patch
+from uuid import uuid4
+from sqlalchemy.dialects import postgresql
+from app.infrastructure.llm_cache import (
+    CachedLLMService,
+    build_llm_cache,
+    cached_properties_delete,
+    cached_properties_upsert,
+    properties_cache_key
+)
+from app.infrastructure.llm_service import HTTPLLMService, MockLLMService, build_llm_service
+from app.config.settings import Settings
+from app.core.event_processing_service import EventProcessingService
+
+PROPERTIES = {"color": "colorless", "ph": 7.0}
+
+def _repo(cached=None):
+    repo = Mock()
+    repo.get_cached_llm_properties = AsyncMock(return_value=cached)
+    repo.save_cached_llm_properties = AsyncMock()
+    repo.invalidate_cached_llm_properties = AsyncMock(return_value=1)
+    return repo
+
+async def _no_fallback(chemical_data, error):
+    raise error
+
+def _llm(*results):
+    llm = Mock()
+    llm.request_chemical_properties = AsyncMock(side_effect=list(results) or [dict(PROPERTIES)])
+    llm.fallback_chemical_properties = AsyncMock(side_effect=_no_fallback)
+    return llm
+
+def _service(llm, repo, **options):
+    return CachedLLMService(llm, repo, prompt="Extract: {chemical_data}", model_version="v1", **options)
+
+class TestPropertiesCacheKey:
+
+    def test_key_is_canonical(self):
+        # Act & Assert
+        key = properties_cache_key({"formula": "H2O", "weight": 18.015}, "p", "v1")
+        assert key == properties_cache_key({"weight": 18.015, "formula": "H2O"}, "p", "v1")
+        assert len(key) == 64
+
+    def test_key_covers_prompt_and_model_version(self):
+        # Act & Assert
+        key = properties_cache_key({"formula": "H2O"}, "p", "v1")
+        assert key != properties_cache_key({"formula": "H2O"}, "p2", "v1")
+        assert key != properties_cache_key({"formula": "H2O"}, "p", "v2")
+        assert key != properties_cache_key({"formula": "H2O", "state": "gas"}, "p", "v1")
+
+    def test_upsert_replaces_entry_and_delete_targets_keys(self):
+        # Arrange
+        now = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+        # Act
+        upsert = str(cached_properties_upsert("k", "v1", PROPERTIES, now, now + timedelta(days=1)).compile(dialect=postgresql.dialect()))
+        one = str(cached_properties_delete(["k"]).compile(dialect=postgresql.dialect()))
+        every = str(cached_properties_delete().compile(dialect=postgresql.dialect()))
+
+        # Assert
+        assert "ON CONFLICT (cache_key) DO UPDATE" in upsert
+        assert "WHERE llm_property_cache.cache_key IN" in one
+        assert "WHERE" not in every
+
+class TestCachedLLMService:
+
+    @pytest.mark.asyncio
+    async def test_repeated_payload_calls_llm_once(self):
+        # Arrange
+        llm, repo = _llm(), _repo()
+        service = _service(llm, repo)
+
+        # Act
+        first = await service.extract_chemical_properties({"formula": "H2O"})
+        first["ph"] = 1.0
+        second = await service.extract_chemical_properties({"formula": "H2O"})
+
+        # Assert
+        assert second == PROPERTIES
+        llm.request_chemical_properties.assert_awaited_once()
+        repo.save_cached_llm_properties.assert_awaited_once()
+        assert repo.save_cached_llm_properties.call_args.args[:3] == (service.cache_key({"formula": "H2O"}), "v1", PROPERTIES)
+        assert service.get_metrics()["local_hits"] == 1
+        assert service.get_metrics()["misses"] == 1
+
+    @pytest.mark.asyncio
+    async def test_shared_hit_skips_llm(self):
+        # Arrange
+        llm = _llm()
+        repo = _repo(cached=(PROPERTIES, datetime.now(timezone.utc) + timedelta(days=1)))
+        service = _service(llm, repo)
+
+        # Act
+        result = await service.extract_chemical_properties({"formula": "H2O"})
+        await service.extract_chemical_properties({"formula": "H2O"})
+
+        # Assert
+        assert result == PROPERTIES
+        llm.request_chemical_properties.assert_not_awaited()
+        repo.get_cached_llm_properties.assert_awaited_once()
+        assert service.get_metrics()["hit_rate"] == 1.0
+
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_share_one_call(self):
+        # Arrange
+        release = asyncio.Event()
+        llm = Mock()
+
+        async def extract(chemical_data):
+            await release.wait()
+            return dict(PROPERTIES)
+
+        llm.request_chemical_properties = AsyncMock(side_effect=extract)
+        service = _service(llm, _repo())
+
+        # Act
+        waiting = [asyncio.ensure_future(service.extract_chemical_properties({"formula": "H2O"})) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*waiting)
+
+        # Assert
+        assert results == [PROPERTIES] * 3
+        llm.request_chemical_properties.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_failed_extraction_is_not_cached(self):
+        # Arrange
+        llm, repo = _llm(RuntimeError("LLM down"), dict(PROPERTIES)), _repo()
+        service = _service(llm, repo)
+
+        # Act
+        with pytest.raises(RuntimeError):
+            await service.extract_chemical_properties({"formula": "H2O"})
+        result = await service.extract_chemical_properties({"formula": "H2O"})
+
+        # Assert
+        assert result == PROPERTIES
+        assert llm.request_chemical_properties.await_count == 2
+        repo.save_cached_llm_properties.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    @patch('httpx.AsyncClient')
+    async def test_http_fallback_properties_are_not_cached(self, mock_client):
+        # Arrange
+        mock_client.return_value.is_closed = False
+        mock_client.return_value.post = AsyncMock(side_effect=httpx.ConnectError("LLM down"))
+        llm, repo = HTTPLLMService("http://test-api"), _repo()
+        llm.fallback_chemical_properties = AsyncMock(return_value={"color": "fallback"})
+        service = _service(llm, repo)
+
+        # Act
+        first = await service.extract_chemical_properties({"formula": "H2O"})
+        second = await service.extract_chemical_properties({"formula": "H2O"})
+
+        # Assert
+        assert first == second == {"color": "fallback"}
+        assert mock_client.return_value.post.await_count == 2
+        repo.save_cached_llm_properties.assert_not_awaited()
+        assert service.get_metrics()["local_entries"] == 0
+        assert service.get_metrics()["fallbacks"] == 2
+
+    @pytest.mark.asyncio
+    async def test_unreachable_shared_tier_falls_back_to_llm(self):
+        # Arrange
+        llm, repo = _llm(), _repo()
+        repo.get_cached_llm_properties.side_effect = Exception("connection refused")
+        repo.save_cached_llm_properties.side_effect = Exception("connection refused")
+        service = _service(llm, repo)
+
+        # Act
+        result = await service.extract_chemical_properties({"formula": "H2O"})
+
+        # Assert
+        assert result == PROPERTIES
+        assert service.get_metrics()["errors"] == 2
+
+    @pytest.mark.asyncio
+    async def test_local_entries_expire_after_local_ttl(self):
+        # Arrange
+        repo = _repo(cached=(PROPERTIES, datetime.now(timezone.utc) + timedelta(days=1)))
+        service = _service(_llm(), repo, local_ttl=0)
+
+        # Act
+        await service.extract_chemical_properties({"formula": "H2O"})
+        await service.extract_chemical_properties({"formula": "H2O"})
+
+        # Assert
+        assert repo.get_cached_llm_properties.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_invalidate_one_payload_or_all(self):
+        # Arrange
+        llm, repo = _llm(dict(PROPERTIES), dict(PROPERTIES), dict(PROPERTIES)), _repo()
+        service = _service(llm, repo)
+        await service.extract_chemical_properties({"formula": "H2O"})
+        await service.extract_chemical_properties({"formula": "CO2"})
+
+        # Act
+        await service.invalidate({"formula": "H2O"})
+        await service.extract_chemical_properties({"formula": "H2O"})
+        await service.extract_chemical_properties({"formula": "CO2"})
+        await service.invalidate()
+
+        # Assert
+        assert llm.request_chemical_properties.await_count == 3
+        assert repo.invalidate_cached_llm_properties.call_args_list[0].args == ([service.cache_key({"formula": "H2O"})],)
+        assert repo.invalidate_cached_llm_properties.call_args_list[1].args == ()
+        assert service.get_metrics()["local_entries"] == 0
+
+    def test_build_from_settings(self):
+        # Arrange
+        settings = Mock(
+            LLM_CACHE_ENABLED=True, LLM_MODEL_VERSION="v2", LLM_CACHE_TTL=60.0,
+            LLM_CACHE_LOCAL_TTL=5.0, LLM_CACHE_LOCAL_MAX_ENTRIES=10
+        )
+
+        # Act & Assert
+        service = build_llm_cache(settings, _llm(), _repo())
+        assert service.model_version == "v2"
+        assert service.max_entries == 10
+        settings.LLM_CACHE_ENABLED = False
+        assert build_llm_cache(settings, _llm(), _repo()) is None
+
+    @pytest.mark.asyncio
+    async def test_default_settings_cache_mock_extraction(self):
+        # Arrange
+        settings = Settings(
+            _env_file=None, KAFKA_BOOTSTRAP_SERVERS="kafka:9092", KAFKA_TOPIC="events",
+            KAFKA_GROUP_ID="subscribers", POSTGRES_DSN="postgresql://localhost/events_db",
+            LLM_API_URL="http://llm"
+        )
+        repo = _repo()
+        repo.save_chemical_research_event_with_status = AsyncMock(return_value=(uuid4(), True))
+        llm_service = build_llm_service(settings)
+        service = EventProcessingService(repo, build_llm_cache(settings, llm_service, repo))
+        event = {
+            "molecule_id": "mol_h2o", "researcher": "Dr. Smith",
+            "data": {"formula": "H2O", "weight": 18.015}, "timestamp": "2024-01-01T12:00:00Z"
+        }
+
+        # Act
+        await service.process_chemical_research_event(event)
+
+        # Assert
+        assert isinstance(llm_service, MockLLMService)
+        assert event["llm_properties"]["color"] == "colorless"
+        repo.save_cached_llm_properties.assert_awaited_once()
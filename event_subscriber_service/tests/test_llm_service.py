@@ -1,6 +1,6 @@
 import pytest
 from unittest.mock import Mock, AsyncMock, patch
-from app.infrastructure.llm_service import MockLLMService, HTTPLLMService
+from app.infrastructure.llm_service import MockLLMService, HTTPLLMService, build_llm_service
 
 class TestMockLLMService:
     
@@ -49,10 +49,8 @@ class TestHTTPLLMService:
         }
         mock_response.raise_for_status = Mock()
         
-        mock_client_instance = Mock()
-        mock_client_instance.post = AsyncMock(return_value=mock_response)
-        mock_client.return_value.__aenter__ = AsyncMock(return_value=mock_client_instance)
-        mock_client.return_value.__aexit__ = AsyncMock(return_value=None)
+        mock_client.return_value.is_closed = False
+        mock_client.return_value.post = AsyncMock(return_value=mock_response)
         
         service = HTTPLLMService("http://test-api", "test-key")
         chemical_data = {"formula": "Fe2O3"}
@@ -69,10 +67,8 @@ class TestHTTPLLMService:
     @patch('httpx.AsyncClient')
     async def test_extract_chemical_properties_http_error_fallback(self, mock_client):
         # Arrange
-        mock_client_instance = Mock()
-        mock_client_instance.post = AsyncMock(side_effect=Exception("HTTP Error"))
-        mock_client.return_value.__aenter__ = AsyncMock(return_value=mock_client_instance)
-        mock_client.return_value.__aexit__ = AsyncMock(return_value=None)
+        mock_client.return_value.is_closed = False
+        mock_client.return_value.post = AsyncMock(side_effect=Exception("HTTP Error"))
         
         service = HTTPLLMService("http://test-api", "test-key")
         chemical_data = {"formula": "H2O"}
@@ -84,3 +80,73 @@ class TestHTTPLLMService:
         assert result["color"] == "colorless"  # H2O properties from mock
         assert result["ph"] == 7.0
         assert "model_version" in result
+    
+    @pytest.mark.asyncio
+    @patch('httpx.AsyncClient')
+    async def test_requests_share_one_pooled_client(self, mock_client):
+        # Arrange
+        mock_response = Mock()
+        mock_response.json.return_value = {"color": "red"}
+        mock_response.raise_for_status = Mock()
+        mock_client.return_value.is_closed = False
+        mock_client.return_value.post = AsyncMock(return_value=mock_response)
+        mock_client.return_value.aclose = AsyncMock()
+        
+        service = HTTPLLMService(
+            "http://test-api", "test-key", max_connections=5, max_keepalive_connections=2,
+            connect_timeout=1.0, read_timeout=20.0
+        )
+        
+        # Act
+        await service.extract_chemical_properties({"formula": "Fe2O3"})
+        await service.extract_chemical_properties({"formula": "H2O"})
+        
+        # Assert
+        mock_client.assert_called_once()
+        options = mock_client.call_args.kwargs
+        assert options["headers"]["Authorization"] == "Bearer test-key"
+        assert options["limits"].max_connections == 5
+        assert options["limits"].max_keepalive_connections == 2
+        assert options["timeout"].connect == 1.0
+        assert options["timeout"].read == 20.0
+        assert mock_client.return_value.post.await_count == 2
+    
+    @pytest.mark.asyncio
+    @patch('httpx.AsyncClient')
+    async def test_close_releases_client(self, mock_client):
+        # Arrange
+        mock_response = Mock()
+        mock_response.json.return_value = {"color": "red"}
+        mock_response.raise_for_status = Mock()
+        mock_client.return_value.is_closed = False
+        mock_client.return_value.post = AsyncMock(return_value=mock_response)
+        mock_client.return_value.aclose = AsyncMock()
+        service = HTTPLLMService("http://test-api")
+        await service.extract_chemical_properties({"formula": "Fe2O3"})
+        
+        # Act
+        await service.close()
+        await service.close()
+        
+        # Assert
+        mock_client.return_value.aclose.assert_awaited_once()
+        assert "Authorization" not in mock_client.call_args.kwargs["headers"]
+    
+    def test_build_llm_service_from_settings(self):
+        # Arrange
+        settings = Mock(
+            LLM_PROVIDER="http", LLM_API_URL="http://test-api", LLM_API_KEY=None,
+            LLM_MAX_CONNECTIONS=8, LLM_MAX_KEEPALIVE_CONNECTIONS=4, LLM_KEEPALIVE_EXPIRY=15.0,
+            LLM_HTTP2=False, LLM_CONNECT_TIMEOUT=2.0, LLM_READ_TIMEOUT=30.0,
+            LLM_WRITE_TIMEOUT=10.0, LLM_POOL_TIMEOUT=5.0
+        )
+        
+        # Act
+        service = build_llm_service(settings)
+        
+        # Assert
+        assert isinstance(service, HTTPLLMService)
+        assert service.limits.max_connections == 8
+        assert service.limits.keepalive_expiry == 15.0
+        settings.LLM_PROVIDER = "mock"
+        assert isinstance(build_llm_service(settings), MockLLMService)
@@ -0,0 +1,83 @@
+import pytest
+from datetime import datetime, timezone
+from uuid import uuid4
+from sqlalchemy.dialects import postgresql
+from app.infrastructure.pagination import encode_cursor, decode_cursor
+from app.infrastructure.postgresql_repository import (
+    user_analytics_events_query,
+    chemical_research_events_query
+)
+
+class TestCursor:
+    
+    def test_round_trip(self):
+        # Arrange
+        timestamp = datetime(2024, 1, 1, 12, 0, tzinfo=timezone.utc)
+        event_id = uuid4()
+        
+        # Act
+        cursor = encode_cursor(timestamp, event_id)
+        
+        # Assert
+        assert decode_cursor(cursor) == (timestamp, event_id)
+    
+    def test_accepts_serialized_row_values(self):
+        # Arrange
+        event_id = uuid4()
+        
+        # Act
+        cursor = encode_cursor("2024-01-01T12:00:00Z", str(event_id))
+        
+        # Assert
+        assert decode_cursor(cursor) == (datetime(2024, 1, 1, 12, 0, tzinfo=timezone.utc), event_id)
+    
+    @pytest.mark.parametrize("cursor", ["not-a-cursor", "", encode_cursor("yesterday", uuid4())])
+    def test_rejects_malformed_cursor(self, cursor):
+        # Act & Assert
+        with pytest.raises(ValueError):
+            decode_cursor(cursor)
+
+class TestEventListQueries:
+    
+    def _sql(self, statement):
+        return str(statement.compile(dialect=postgresql.dialect()))
+    
+    def test_first_page_has_no_keyset_predicate(self):
+        # Act
+        sql = self._sql(user_analytics_events_query("user_1", 10))
+        
+        # Assert
+        assert "(user_analytics_events.timestamp, user_analytics_events.id) <" not in sql
+        assert "ORDER BY user_analytics_events.timestamp DESC, user_analytics_events.id DESC" in sql
+    
+    def test_cursor_and_filters_are_pushed_into_sql(self):
+        # Arrange
+        cursor = (datetime(2024, 1, 2, tzinfo=timezone.utc), uuid4())
+        
+        # Act
+        sql = self._sql(user_analytics_events_query(
+            "user_1", 10,
+            cursor=cursor,
+            since=datetime(2024, 1, 1, tzinfo=timezone.utc),
+            until=datetime(2024, 1, 3, tzinfo=timezone.utc),
+            event_type="click"
+        ))
+        
+        # Assert
+        assert "(user_analytics_events.timestamp, user_analytics_events.id) < (" in sql
+        assert "user_analytics_events.timestamp >= " in sql
+        assert "user_analytics_events.timestamp < " in sql
+        assert "user_analytics_events.event_type = " in sql
+        assert "OFFSET" not in sql
+    
+    def test_researcher_query_filters_by_experiment_type(self):
+        # Act
+        sql = self._sql(chemical_research_events_query(
+            "Dr. Test", 10,
+            cursor=(datetime(2024, 1, 2, tzinfo=timezone.utc), uuid4()),
+            experiment_type="synthesis"
+        ))
+        
+        # Assert
+        assert "(chemical_research_events.timestamp, chemical_research_events.id) < (" in sql
+        assert "chemical_research_events.experiment_type = " in sql
@@ -0,0 +1,51 @@
+import pytest
+from datetime import datetime, timezone
+from unittest.mock import Mock
+from app.infrastructure.partition_manager import (
+    PartitionManager,
+    partition_start,
+    next_partition_start,
+    partition_name,
+    parse_partition_name
+)
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+class TestPartitionHelpers:
+    
+    def test_daily_partition_bounds_and_name(self):
+        # Act
+        start = partition_start(utc(2024, 1, 31, 23, 59), 'daily')
+        end = next_partition_start(start, 'daily')
+        
+        # Assert
+        assert start == utc(2024, 1, 31)
+        assert end == utc(2024, 2, 1)
+        assert partition_name('user_analytics_events', start, 'daily') == 'user_analytics_events_p20240131'
+    
+    def test_monthly_partition_rolls_over_year(self):
+        # Act
+        start = partition_start(utc(2024, 12, 15), 'monthly')
+        end = next_partition_start(start, 'monthly')
+        
+        # Assert
+        assert start == utc(2024, 12, 1)
+        assert end == utc(2025, 1, 1)
+        assert partition_name('chemical_research_events', start, 'monthly') == 'chemical_research_events_p202412'
+    
+    def test_parse_partition_name_round_trips(self):
+        # Assert
+        assert parse_partition_name('user_analytics_events', 'user_analytics_events_p20240131') == (
+            utc(2024, 1, 31), utc(2024, 2, 1)
+        )
+        assert parse_partition_name('user_analytics_events', 'user_analytics_events_p202402') == (
+            utc(2024, 2, 1), utc(2024, 3, 1)
+        )
+        assert parse_partition_name('user_analytics_events', 'user_analytics_events_default') is None
+        assert parse_partition_name('user_analytics_events', 'chemical_research_events_p202402') is None
+    
+    def test_rejects_unknown_interval(self):
+        # Act & Assert
+        with pytest.raises(ValueError, match="Unsupported partition interval"):
+            PartitionManager(Mock(), interval='weekly')
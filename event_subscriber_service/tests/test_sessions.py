@@ -0,0 +1,213 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, Mock
+from sqlalchemy.dialects import postgresql
+from app.infrastructure.sessions import (
+    SessionFragment,
+    Sessionizer,
+    event_page,
+    merge_sessions,
+    named_session_upsert,
+    sessions_payload
+)
+
+BASE = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+def _event(user_id, minutes, page=None, session_id=None):
+    event = {"user_id": user_id, "event_type": "page_view", "timestamp": (BASE + timedelta(minutes=minutes)).isoformat()}
+    if page is not None:
+        event["page_url"] = page
+    if session_id is not None:
+        event["session_id"] = session_id
+    return event
+
+def _fragment_values(session_id):
+    fragment = SessionFragment("user_1", session_id, BASE)
+    fragment.add(BASE, "/a", None)
+    return fragment.values()
+
+class TestSessionFragment:
+
+    def test_tracks_entry_and_exit_pages_out_of_order(self):
+        # Arrange
+        fragment = SessionFragment("user_1", None, BASE + timedelta(minutes=5))
+
+        # Act
+        fragment.add(BASE + timedelta(minutes=5), "/second", None)
+        fragment.add(BASE, "/first", "Mozilla/5.0")
+        fragment.add(BASE + timedelta(minutes=7), None, None)
+
+        # Assert
+        values = fragment.values()
+        assert (values["started_at"], values["ended_at"]) == (BASE, BASE + timedelta(minutes=7))
+        assert (values["event_count"], values["page_count"]) == (3, 2)
+        assert (values["entry_page"], values["exit_page"]) == ("/first", "/second")
+        assert values["user_agent"] == "Mozilla/5.0"
+
+    def test_take_starts_over_from_last_event(self):
+        # Arrange
+        fragment = SessionFragment("user_1", None, BASE)
+        fragment.add(BASE, "/a", None)
+        fragment.add(BASE + timedelta(minutes=3), "/b", None)
+
+        # Act
+        taken = fragment.take()
+
+        # Assert
+        assert taken["event_count"] == 2
+        assert fragment.event_count == 0
+        assert fragment.started_at == fragment.ended_at == BASE + timedelta(minutes=3)
+
+    def test_continues_by_session_id_or_gap(self):
+        # Arrange
+        gap = timedelta(minutes=30)
+        inferred = SessionFragment("user_1", None, BASE)
+        named = SessionFragment("user_1", "s1", BASE)
+
+        # Act & Assert
+        assert inferred.continues(None, BASE + timedelta(minutes=30), gap)
+        assert not inferred.continues(None, BASE + timedelta(minutes=31), gap)
+        assert not inferred.continues("s1", BASE, gap)
+        assert named.continues("s1", BASE + timedelta(days=1), gap)
+        assert not named.continues(None, BASE, gap)
+
+    def test_merge_keeps_earliest_entry_and_latest_exit(self):
+        # Arrange
+        early = {"started_at": BASE, "ended_at": BASE + timedelta(minutes=5), "event_count": 2, "page_count": 2,
+                 "entry_page": "/a", "exit_page": "/b", "user_agent": None}
+        late = {"started_at": BASE + timedelta(minutes=10), "ended_at": BASE + timedelta(minutes=20), "event_count": 3,
+                "page_count": 1, "entry_page": "/c", "exit_page": "/d", "user_agent": "curl"}
+
+        # Act
+        merged = merge_sessions(late, early)
+
+        # Assert
+        assert merged == {"started_at": BASE, "ended_at": BASE + timedelta(minutes=20), "event_count": 5,
+                          "page_count": 3, "entry_page": "/a", "exit_page": "/d", "user_agent": "curl"}
+
+    def test_event_page_falls_back_to_metadata(self):
+        # Act & Assert
+        assert event_page({"page_url": "/url", "metadata": {"page": "/meta"}}) == "/url"
+        assert event_page({"metadata": {"page": "/meta"}}) == "/meta"
+        assert event_page({"metadata": None}) is None
+
+    def test_named_upsert_merges_on_user_and_session(self):
+        # Act
+        sql = str(named_session_upsert([_fragment_values("s1")]).compile(dialect=postgresql.dialect()))
+
+        # Assert
+        assert "ON CONFLICT (user_id, session_id) DO UPDATE" in sql
+        assert "least(user_sessions.started_at, excluded.started_at)" in sql
+        assert "user_sessions.event_count + excluded.event_count" in sql
+
+class TestSessionizer:
+
+    @pytest.fixture
+    def mock_repo(self):
+        repo = Mock()
+        repo.write_session_fragments = AsyncMock()
+        return repo
+
+    def _written(self, mock_repo):
+        return [fragment for call in mock_repo.write_session_fragments.call_args_list for fragment in call.args[0]]
+
+    @pytest.mark.asyncio
+    async def test_gap_closes_session(self, mock_repo):
+        # Arrange
+        sessionizer = Sessionizer(mock_repo, inactivity_gap=1800, checkpoint_interval=3600)
+
+        # Act
+        await sessionizer.event_ingested('user_analytics', _event("user_1", 0, "/home"))
+        await sessionizer.event_ingested('user_analytics', _event("user_1", 10, "/pricing"))
+        await sessionizer.event_ingested('user_analytics', _event("user_1", 60, "/home"))
+        await sessionizer.event_ingested('chemical_research', {"researcher": "Dr. Test"})
+        await sessionizer.checkpoint()
+
+        # Assert
+        written = self._written(mock_repo)
+        assert [(f["event_count"], f["entry_page"], f["exit_page"]) for f in written] == [(2, "/home", "/pricing"), (1, "/home", "/home")]
+        assert mock_repo.write_session_fragments.call_args.args[1] == timedelta(seconds=1800)
+        assert sessionizer.get_metrics()["closed"] == 1
+
+    @pytest.mark.asyncio
+    async def test_new_session_id_closes_session(self, mock_repo):
+        # Arrange
+        sessionizer = Sessionizer(mock_repo, checkpoint_interval=3600)
+
+        # Act
+        await sessionizer.event_ingested('user_analytics', _event("user_1", 0, session_id="s1"))
+        await sessionizer.event_ingested('user_analytics', _event("user_1", 300, session_id="s1"))
+        await sessionizer.event_ingested('user_analytics', _event("user_1", 301, session_id="s2"))
+        await sessionizer.checkpoint()
+
+        # Assert
+        assert [(f["session_id"], f["event_count"]) for f in self._written(mock_repo)] == [("s1", 2), ("s2", 1)]
+
+    @pytest.mark.asyncio
+    async def test_bounded_store_evicts_least_recently_active_user(self, mock_repo):
+        # Arrange
+        sessionizer = Sessionizer(mock_repo, max_open=1, checkpoint_interval=3600)
+
+        # Act
+        await sessionizer.event_ingested('user_analytics', _event("user_1", 0))
+        await sessionizer.event_ingested('user_analytics', _event("user_2", 1))
+
+        # Assert
+        assert sessionizer.get_metrics()["open_sessions"] == 1
+        assert sessionizer.get_metrics()["evicted"] == 1
+        await sessionizer.checkpoint()
+        assert [f["user_id"] for f in self._written(mock_repo)] == ["user_1", "user_2"]
+
+    @pytest.mark.asyncio
+    async def test_checkpoint_writes_open_sessions_once_and_closes_idle_ones(self, mock_repo):
+        # Arrange
+        sessionizer = Sessionizer(mock_repo, inactivity_gap=1800, checkpoint_interval=3600, checkpoint_events=2)
+
+        # Act
+        await sessionizer.event_ingested('user_analytics', _event("user_1", 0))
+        await sessionizer.event_ingested('user_analytics', _event("user_2", 5))
+        await sessionizer.event_ingested('user_analytics', _event("user_2", 100))
+        await sessionizer.event_ingested('user_analytics', _event("user_2", 101))
+
+        # Assert
+        assert mock_repo.write_session_fragments.await_count == 2
+        first, second = (call.args[0] for call in mock_repo.write_session_fragments.call_args_list)
+        assert sorted(f["user_id"] for f in first) == ["user_1", "user_2"]
+        assert [(f["user_id"], f["event_count"]) for f in second] == [("user_2", 2)]
+        assert sessionizer.get_metrics()["open_sessions"] == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_checkpoint_keeps_fragments(self, mock_repo):
+        # Arrange
+        mock_repo.write_session_fragments.side_effect = [Exception("DB down"), None]
+        sessionizer = Sessionizer(mock_repo, checkpoint_interval=3600)
+        await sessionizer.event_ingested('user_analytics', _event("user_1", 0))
+
+        # Act
+        with pytest.raises(Exception, match="DB down"):
+            await sessionizer.checkpoint()
+        await sessionizer.checkpoint()
+
+        # Assert
+        assert [f["event_count"] for f in mock_repo.write_session_fragments.call_args.args[0]] == [1]
+        assert sessionizer.get_metrics()["pending_fragments"] == 0
+
+class TestSessionsPayload:
+
+    def test_reports_duration_and_open_sessions(self):
+        # Arrange
+        now = datetime.now(timezone.utc)
+        sessions = [
+            {"session_id": None, "started_at": now - timedelta(minutes=10), "ended_at": now - timedelta(minutes=5),
+             "event_count": 4, "page_count": 3, "entry_page": "/a", "exit_page": "/b", "user_agent": None},
+            {"session_id": "s1", "started_at": BASE, "ended_at": BASE + timedelta(minutes=2),
+             "event_count": 1, "page_count": 1, "entry_page": "/a", "exit_page": "/a", "user_agent": None},
+        ]
+
+        # Act
+        payload = sessions_payload("user_1", BASE, now, timedelta(minutes=30), {"sessions": 2}, sessions)
+
+        # Assert
+        assert [s["duration_seconds"] for s in payload["sessions"]] == [300.0, 120.0]
+        assert [s["open"] for s in payload["sessions"]] == [True, False]
+        assert payload["inactivity_gap_seconds"] == 1800.0
@@ -0,0 +1,174 @@
+import pytest
+from datetime import date, datetime, timedelta, timezone
+from unittest.mock import AsyncMock, Mock
+from sqlalchemy.dialects import postgresql
+from app.infrastructure.sketches import (
+    REGISTERS,
+    DistinctSketchWriter,
+    RegisterCache,
+    distinct_payload,
+    estimate,
+    merge_registers,
+    register_update,
+    register_upsert,
+    sketch_day
+)
+
+def _sketch(elements):
+    registers = bytearray(REGISTERS)
+    for element in elements:
+        register, rank = register_update(element)
+        registers[register] = max(registers[register], rank)
+    return bytes(registers)
+
+class TestHyperLogLog:
+
+    def test_register_update_is_deterministic(self):
+        # Act
+        register, rank = register_update("user_1")
+
+        # Assert
+        assert register_update("user_1") == (register, rank)
+        assert 0 <= register < REGISTERS
+        assert 1 <= rank <= 53
+
+    def test_empty_sketch_estimates_zero(self):
+        # Act & Assert
+        assert estimate(bytes(REGISTERS)) == 0
+
+    @pytest.mark.parametrize("cardinality", [10, 1000, 100000])
+    def test_estimate_within_error_bound(self, cardinality):
+        # Arrange
+        registers = _sketch(f"user_{i}" for i in range(cardinality))
+
+        # Act
+        count = estimate(registers)
+
+        # Assert
+        assert abs(count - cardinality) <= 0.05 * cardinality + 1
+
+    def test_repeated_elements_do_not_change_sketch(self):
+        # Arrange
+        elements = [f"molecule_{i}" for i in range(500)]
+
+        # Act & Assert
+        assert _sketch(elements * 3) == _sketch(elements)
+
+    def test_merge_is_sketch_of_union(self):
+        # Arrange
+        monday = _sketch(f"user_{i}" for i in range(0, 3000))
+        tuesday = _sketch(f"user_{i}" for i in range(2000, 5000))
+
+        # Act
+        merged = merge_registers(monday, tuesday)
+
+        # Assert
+        assert merged == _sketch(f"user_{i}" for i in range(5000))
+
+    def test_sketch_day_is_utc(self):
+        # Act & Assert
+        assert sketch_day("2024-01-01T23:30:00-02:00") == date(2024, 1, 2)
+        assert sketch_day(datetime(2024, 1, 1, 23, 30, tzinfo=timezone(timedelta(hours=2)))) == date(2024, 1, 1)
+        assert sketch_day("2024-01-01T12:00:00Z") == date(2024, 1, 1)
+
+    def test_register_upsert_only_raises_registers(self):
+        # Act
+        sql = str(register_upsert().compile(dialect=postgresql.dialect()))
+
+        # Assert
+        assert "ON CONFLICT (dimension, subject, day) DO UPDATE" in sql
+        assert "set_byte(distinct_sketches.registers" in sql
+        assert "WHERE get_byte(distinct_sketches.registers" in sql
+
+    def test_payload_reports_error_bound(self):
+        # Arrange
+        registers = _sketch(f"user_{i}" for i in range(10000))
+
+        # Act
+        payload = distinct_payload('event_type', 'click', date(2024, 1, 1), date(2024, 1, 31), registers)
+
+        # Assert
+        assert payload["counts"] == "user_id"
+        assert payload["relative_standard_error"] == 0.0163
+        assert payload["lower_bound"] < payload["distinct_estimate"] < payload["upper_bound"]
+        assert payload["lower_bound"] <= 10000 <= payload["upper_bound"]
+
+    def test_payload_without_sketches_is_zero(self):
+        # Act
+        payload = distinct_payload('researcher', 'Dr. Test', date(2024, 1, 1), date(2024, 1, 1), None)
+
+        # Assert
+        assert payload["distinct_estimate"] == 0
+        assert payload["upper_bound"] == 0
+
+class TestRegisterCache:
+
+    def test_pending_updates_per_dimension(self):
+        # Arrange
+        cache = RegisterCache()
+        event = {"researcher": "Dr. Test", "molecule_id": "mol_1", "timestamp": "2024-01-01T12:00:00Z"}
+
+        # Act
+        updates = cache.pending('chemical_research', [event])
+
+        # Assert
+        assert {(u["dimension"], u["subject"]) for u in updates} == {("researcher", "Dr. Test"), ("molecule", "mol_1")}
+        assert all(u["day"] == date(2024, 1, 1) for u in updates)
+
+    def test_skips_updates_that_cannot_raise_a_register(self):
+        # Arrange
+        cache = RegisterCache()
+        event = {"user_id": "user_1", "event_type": "click", "timestamp": "2024-01-01T12:00:00Z"}
+        cache.written(cache.pending('user_analytics', [event]))
+
+        # Act
+        updates = cache.pending('user_analytics', [event])
+
+        # Assert
+        assert updates == []
+        assert cache.skipped == 1
+
+    def test_evicts_least_recently_written_sketch(self):
+        # Arrange
+        cache = RegisterCache(max_sketches=1)
+        first = {"user_id": "user_1", "event_type": "click", "timestamp": "2024-01-01T12:00:00Z"}
+        second = {"user_id": "user_1", "event_type": "view", "timestamp": "2024-01-01T12:00:00Z"}
+        cache.written(cache.pending('user_analytics', [first]))
+        cache.written(cache.pending('user_analytics', [second]))
+
+        # Act & Assert
+        assert len(cache.pending('user_analytics', [first])) == 1
+
+class TestDistinctSketchWriter:
+
+    @pytest.mark.asyncio
+    async def test_writes_each_register_update_once(self):
+        # Arrange
+        repo = Mock()
+        repo.raise_sketch_registers = AsyncMock()
+        writer = DistinctSketchWriter(repo)
+        event = {"user_id": "user_1", "event_type": "click", "timestamp": "2024-01-01T12:00:00Z"}
+
+        # Act
+        await writer.event_ingested('user_analytics', event)
+        await writer.event_ingested('user_analytics', event)
+
+        # Assert
+        repo.raise_sketch_registers.assert_awaited_once()
+        assert writer.get_metrics() == {"written": 1, "skipped": 1}
+
+    @pytest.mark.asyncio
+    async def test_failed_write_is_retried_by_next_delivery(self):
+        # Arrange
+        repo = Mock()
+        repo.raise_sketch_registers = AsyncMock(side_effect=[Exception("DB down"), None])
+        writer = DistinctSketchWriter(repo)
+        event = {"user_id": "user_1", "event_type": "click", "timestamp": "2024-01-01T12:00:00Z"}
+
+        # Act
+        with pytest.raises(Exception):
+            await writer.event_ingested('user_analytics', event)
+        await writer.event_ingested('user_analytics', event)
+
+        # Assert
+        assert repo.raise_sketch_registers.await_count == 2
@@ -0,0 +1,260 @@
+import pytest
+import asyncio
+from unittest.mock import AsyncMock, Mock, patch
+from app.infrastructure.read_routing import read_your_writes
+from app.infrastructure.summary_cache import SummaryCache, build_summary_cache, cache_redis_url
+
+class FakeRedis:
+    """In-memory stand-in for the handful of redis.asyncio calls the cache makes"""
+
+    def __init__(self):
+        self.store = {}
+
+    async def get(self, key):
+        return self.store.get(key)
+
+    async def set(self, key, value, nx=False, px=None, ex=None):
+        if nx and key in self.store:
+            return None
+        self.store[key] = value.encode() if isinstance(value, str) else value
+        return True
+
+    async def delete(self, key):
+        self.store.pop(key, None)
+
+    async def aclose(self):
+        pass
+
+@pytest.fixture
+def loader():
+    return AsyncMock(return_value={"user_id": "user_1", "total_events": 3})
+
+class TestSummaryCacheLocal:
+
+    @pytest.mark.asyncio
+    async def test_second_read_is_a_local_hit(self, loader):
+        # Arrange
+        cache = SummaryCache()
+
+        # Act
+        first = await cache.get_or_load('user_summary', 'user_1', loader)
+        second = await cache.get_or_load('user_summary', 'user_1', loader)
+
+        # Assert
+        assert first == second == {"user_id": "user_1", "total_events": 3}
+        loader.assert_awaited_once()
+        assert cache.get_metrics()["local_hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_expired_entry_is_reloaded(self, loader):
+        # Arrange
+        cache = SummaryCache(ttls={'user_summary': 30.0})
+        with patch("app.infrastructure.summary_cache.time.monotonic", return_value=1000.0):
+            await cache.get_or_load('user_summary', 'user_1', loader)
+
+        # Act
+        with patch("app.infrastructure.summary_cache.time.monotonic", return_value=1031.0):
+            await cache.get_or_load('user_summary', 'user_1', loader)
+
+        # Assert
+        assert loader.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_ingest_invalidates_only_the_event_owner(self, loader):
+        # Arrange
+        cache = SummaryCache()
+        other = AsyncMock(return_value={"user_id": "user_2"})
+        await cache.get_or_load('user_summary', 'user_1', loader)
+        await cache.get_or_load('user_summary', 'user_2', other)
+
+        # Act
+        await cache.event_ingested('user_analytics', {"user_id": "user_1", "event_type": "click"})
+        await cache.get_or_load('user_summary', 'user_1', loader)
+        await cache.get_or_load('user_summary', 'user_2', other)
+
+        # Assert
+        assert loader.await_count == 2
+        other.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_unscoped_endpoint_expires_only_by_ttl(self, loader):
+        # Arrange
+        cache = SummaryCache(ttls={'funnel': 300.0})
+        with patch("app.infrastructure.summary_cache.time.monotonic", return_value=1000.0):
+            await cache.get_or_load('funnel', 'key', loader)
+            await cache.event_ingested('user_analytics', {"user_id": "user_1", "event_type": "click"})
+            
+            # Act
+            await cache.get_or_load('funnel', 'key', loader)
+        with patch("app.infrastructure.summary_cache.time.monotonic", return_value=1301.0):
+            await cache.get_or_load('funnel', 'key', loader)
+
+        # Assert
+        assert loader.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_share_one_load(self):
+        # Arrange
+        cache = SummaryCache()
+        release = asyncio.Event()
+        calls = 0
+
+        async def slow_loader():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return {"researcher": "Dr. Test"}
+
+        # Act
+        readers = [
+            asyncio.ensure_future(cache.get_or_load('researcher_summary', 'Dr. Test', slow_loader))
+            for _ in range(10)
+        ]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*readers)
+
+        # Assert
+        assert calls == 1
+        assert all(result == {"researcher": "Dr. Test"} for result in results)
+
+    @pytest.mark.asyncio
+    async def test_read_your_writes_bypasses_cache(self, loader):
+        # Arrange
+        cache = SummaryCache()
+        await cache.get_or_load('user_summary', 'user_1', loader)
+
+        # Act
+        with read_your_writes():
+            await cache.get_or_load('user_summary', 'user_1', loader)
+
+        # Assert
+        assert loader.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_loader_errors_are_not_cached(self, loader):
+        # Arrange
+        cache = SummaryCache()
+        failing = AsyncMock(side_effect=RuntimeError("database down"))
+
+        # Act
+        with pytest.raises(RuntimeError):
+            await cache.get_or_load('user_summary', 'user_1', failing)
+        result = await cache.get_or_load('user_summary', 'user_1', loader)
+
+        # Assert
+        assert result["total_events"] == 3
+
+    @pytest.mark.asyncio
+    async def test_local_entries_are_bounded(self, loader):
+        # Arrange
+        cache = SummaryCache(max_entries=2)
+
+        # Act
+        for owner in ['user_1', 'user_2', 'user_3']:
+            await cache.get_or_load('user_summary', owner, loader)
+
+        # Assert
+        assert cache.get_metrics()["local_entries"] == 2
+
+class TestSummaryCacheShared:
+
+    @pytest.mark.asyncio
+    async def test_value_is_shared_between_processes(self, loader):
+        # Arrange
+        redis = FakeRedis()
+        first_process = SummaryCache(redis)
+        second_process = SummaryCache(redis)
+        await first_process.get_or_load('user_summary', 'user_1', loader)
+
+        # Act
+        result = await second_process.get_or_load('user_summary', 'user_1', loader)
+
+        # Assert
+        assert result == {"user_id": "user_1", "total_events": 3}
+        loader.assert_awaited_once()
+        assert second_process.get_metrics()["shared_hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_invalidation_reaches_other_processes(self, loader):
+        # Arrange
+        redis = FakeRedis()
+        api_process = SummaryCache(redis)
+        worker_process = SummaryCache(redis)
+        await api_process.get_or_load('researcher_summary', 'Dr. Test', loader)
+
+        # Act
+        await worker_process.event_ingested('chemical_research', {"researcher": "Dr. Test", "molecule_id": "mol_1"})
+        await api_process.get_or_load('researcher_summary', 'Dr. Test', loader)
+
+        # Assert
+        assert loader.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_waits_for_another_process_holding_the_lock(self, loader):
+        # Arrange
+        redis = FakeRedis()
+        cache = SummaryCache(redis, lock_timeout=1.0)
+        value_key = cache._value_key('user_summary', 'user_1', '0')
+        await redis.set(f"{value_key}:lock", '1')
+
+        async def other_process_finishes():
+            await asyncio.sleep(0.1)
+            await redis.set(value_key, '{"user_id": "user_1", "total_events": 7}')
+
+        # Act
+        result, _ = await asyncio.gather(
+            cache.get_or_load('user_summary', 'user_1', loader),
+            other_process_finishes()
+        )
+
+        # Assert
+        assert result["total_events"] == 7
+        loader.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_redis_errors_read_through(self, loader):
+        # Arrange
+        redis = Mock()
+        redis.get = AsyncMock(side_effect=ConnectionError("redis down"))
+        cache = SummaryCache(redis)
+
+        # Act
+        result = await cache.get_or_load('user_summary', 'user_1', loader)
+
+        # Assert
+        assert result["total_events"] == 3
+        assert cache.get_metrics()["errors"] == 1
+
+class TestBuildSummaryCache:
+
+    def _settings(self, **overrides):
+        values = {
+            "CACHE_ENABLED": True,
+            "CACHE_REDIS_URL": None,
+            "CACHE_REDIS_TIMEOUT": 0.5,
+            "CACHE_USER_SUMMARY_TTL": 30.0,
+            "CACHE_RESEARCHER_SUMMARY_TTL": 60.0,
+            "CACHE_LOCAL_MAX_ENTRIES": 1024,
+            "CACHE_LOCK_TIMEOUT": 5.0,
+            "CELERY_BROKER_URL": "amqp://guest@localhost//",
+        }
+        values.update(overrides)
+        return Mock(**values)
+
+    def test_disabled_returns_none(self):
+        # Act & Assert
+        assert build_summary_cache(self._settings(CACHE_ENABLED=False)) is None
+
+    def test_without_redis_is_process_local(self):
+        # Act
+        cache = build_summary_cache(self._settings())
+
+        # Assert
+        assert cache.redis is None
+        assert cache.ttls['researcher_summary'] == 60.0
+
+    def test_falls_back_to_redis_broker(self):
+        # Act & Assert
+        assert cache_redis_url(self._settings(CELERY_BROKER_URL="redis://redis:6379/0")) == "redis://redis:6379/0"
+        assert cache_redis_url(self._settings(CACHE_REDIS_URL="redis://cache:6379/1")) == "redis://cache:6379/1"
@@ -0,0 +1,85 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock
+from app.infrastructure.write_behind import WriteBehindBuffer
+
+class TestWriteBehindBuffer:
+    
+    @pytest.mark.asyncio
+    async def test_coalesces_concurrent_submits_into_one_batch(self):
+        # Arrange
+        handler = AsyncMock(side_effect=lambda key, rows: [row["n"] * 10 for row in rows])
+        buffer = WriteBehindBuffer(handler, max_batch_size=100, max_delay=0.01)
+        
+        # Act
+        results = await asyncio.gather(*(buffer.submit("events", {"n": n}) for n in range(5)))
+        
+        # Assert
+        assert results == [0, 10, 20, 30, 40]
+        handler.assert_called_once()
+        assert len(handler.call_args[0][1]) == 5
+        assert buffer.get_metrics()["batch_size"]["max"] == 5
+    
+    @pytest.mark.asyncio
+    async def test_flushes_when_batch_is_full(self):
+        # Arrange
+        handler = AsyncMock(side_effect=lambda key, rows: [None] * len(rows))
+        buffer = WriteBehindBuffer(handler, max_batch_size=2, max_delay=60)
+        
+        # Act
+        await asyncio.wait_for(
+            asyncio.gather(buffer.submit("events", {}), buffer.submit("events", {})),
+            timeout=1
+        )
+        
+        # Assert
+        handler.assert_called_once()
+    
+    @pytest.mark.asyncio
+    async def test_batches_are_kept_separate_per_key(self):
+        # Arrange
+        handler = AsyncMock(side_effect=lambda key, rows: [key] * len(rows))
+        buffer = WriteBehindBuffer(handler, max_batch_size=100, max_delay=0.01)
+        
+        # Act
+        results = await asyncio.gather(buffer.submit("a", {}), buffer.submit("b", {}))
+        
+        # Assert
+        assert results == ["a", "b"]
+        assert handler.call_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_failed_batch_is_retried_per_row(self):
+        # Arrange
+        async def handler(key, rows):
+            if any(row["bad"] for row in rows):
+                raise ValueError("bad row")
+            return ["ok"] * len(rows)
+        buffer = WriteBehindBuffer(handler, max_batch_size=100, max_delay=0.01)
+        
+        # Act
+        results = await asyncio.gather(
+            buffer.submit("events", {"bad": False}),
+            buffer.submit("events", {"bad": True}),
+            return_exceptions=True
+        )
+        
+        # Assert
+        assert results[0] == "ok"
+        assert isinstance(results[1], ValueError)
+    
+    @pytest.mark.asyncio
+    async def test_close_flushes_pending_rows(self):
+        # Arrange
+        handler = AsyncMock(side_effect=lambda key, rows: [None] * len(rows))
+        buffer = WriteBehindBuffer(handler, max_batch_size=100, max_delay=60)
+        pending = asyncio.ensure_future(buffer.submit("events", {}))
+        await asyncio.sleep(0)
+        
+        # Act
+        await buffer.close()
+        
+        # Assert
+        await asyncio.wait_for(pending, timeout=1)
+        handler.assert_called_once()
+        assert buffer.get_metrics()["pending_rows"] == 0